@@ -21,11 +21,12 @@ from gofer.messaging.auth import ValidationFailed
 
 from pulp.common.bundle import Bundle
 from pulp.common.config import parse_bool
+from pulp.common.profile import delta as profile_delta
 from pulp.agent.lib.dispatcher import Dispatcher
 from pulp.agent.lib.conduit import Conduit as HandlerConduit
 from pulp.bindings.server import PulpConnection
 from pulp.bindings.bindings import Bindings
-from pulp.bindings.exceptions import NotFoundException
+from pulp.bindings.exceptions import ConflictException, NotFoundException
 from pulp.client.consumer.config import read_config
 
 
@@ -46,6 +47,10 @@ plugin = Plugin.find(__name__)
 # registration status
 registered = False
 
+# the profiles last acknowledged by the server
+# (consumer_id, content type): (profile_hash returned by the server, profile)
+reported_profiles = {}
+
 
 @initializer
 def init_plugin():
@@ -496,9 +501,46 @@ class Profile(object):
                 continue
 
             details = profile_report['details']
-            http = bindings.profile.send(consumer_id, type_id, details)
+            http = self._send(bindings, consumer_id, type_id, details)
 
             msg = _('profile (%(t)s), reported: %(r)s')
             log.info(msg, {'t': type_id, 'r': http.response_code})
 
         return report.dict()
+
+    @staticmethod
+    def _send(bindings, consumer_id, type_id, profile):
+        """
+        Send a content profile to the server. When the server has acknowledged
+        an earlier version of the profile, only its hash is sent if the profile
+        has not changed, or a delta against it if it has. The full profile is
+        sent when the server no longer has that version.
+        :param bindings: The pulp bindings.
+        :type bindings: PulpBindings
+        :param consumer_id: The consumer ID.
+        :type consumer_id: str
+        :param type_id: The profile (content) type ID.
+        :type type_id: str
+        :param profile: The content profile.
+        :type profile: object
+        :return: The server response.
+        :rtype: pulp.bindings.responses.Response
+        """
+        key = (consumer_id, type_id)
+        last = reported_profiles.pop(key, None)
+        http = None
+        if last is not None:
+            profile_hash, last_profile = last
+            try:
+                if profile == last_profile:
+                    http = bindings.profile.send_hash(consumer_id, type_id, profile_hash)
+                elif isinstance(profile, list) and isinstance(last_profile, list):
+                    delta = profile_delta(last_profile, profile)
+                    http = bindings.profile.send_delta(consumer_id, type_id, profile_hash, delta)
+            except ConflictException:
+                msg = _('profile (%(t)s) changed on the server, sending it in full')
+                log.info(msg, {'t': type_id})
+        if http is None:
+            http = bindings.profile.send(consumer_id, type_id, profile)
+        reported_profiles[key] = (http.response_body['profile_hash'], profile)
+        return http
@@ -803,6 +803,48 @@ class TestProfile(PluginTest):
         mock_dispatcher().profile.assert_called_with(mock_conduit())
         mock_bindings().profile.send.assert_called_once_with(TEST_CN, 'BB', 5678)
 
+    def test_send_unchanged(self):
+        bindings = Mock()
+        bindings.profile.send.return_value.response_body = {'profile_hash': 'h1'}
+        bindings.profile.send_hash.return_value.response_body = {'profile_hash': 'h1'}
+        profile = [{'name': 'a'}]
+
+        # test
+        self.plugin.Profile._send(bindings, TEST_CN, 'rpm', profile)
+        self.plugin.Profile._send(bindings, TEST_CN, 'rpm', [{'name': 'a'}])
+
+        # validation
+        bindings.profile.send.assert_called_once_with(TEST_CN, 'rpm', profile)
+        bindings.profile.send_hash.assert_called_once_with(TEST_CN, 'rpm', 'h1')
+
+    def test_send_changed(self):
+        bindings = Mock()
+        bindings.profile.send.return_value.response_body = {'profile_hash': 'h1'}
+        bindings.profile.send_delta.return_value.response_body = {'profile_hash': 'h2'}
+
+        # test
+        self.plugin.Profile._send(bindings, TEST_CN, 'rpm', [{'name': 'a'}])
+        self.plugin.Profile._send(bindings, TEST_CN, 'rpm', [{'name': 'b'}])
+
+        # validation
+        bindings.profile.send_delta.assert_called_once_with(
+            TEST_CN, 'rpm', 'h1', {'added': [{'name': 'b'}], 'removed': [{'name': 'a'}]})
+        self.assertEqual(self.plugin.reported_profiles[(TEST_CN, 'rpm')],
+                         ('h2', [{'name': 'b'}]))
+
+    def test_send_conflict(self):
+        bindings = Mock()
+        bindings.profile.send.return_value.response_body = {'profile_hash': 'h1'}
+        bindings.profile.send_hash.side_effect = self.plugin.ConflictException({})
+        profile = [{'name': 'a'}]
+
+        # test
+        self.plugin.Profile._send(bindings, TEST_CN, 'rpm', profile)
+        self.plugin.Profile._send(bindings, TEST_CN, 'rpm', profile)
+
+        # validation
+        self.assertEqual(bindings.profile.send.call_count, 2)
+
 
 class TestAttach(PluginTest):
 
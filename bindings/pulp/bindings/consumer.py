@@ -186,6 +186,32 @@ class ProfilesAPI(PulpAPI):
         data = { 'content_type':content_type, 'profile':profile }
         return self.server.POST(path, data)
 
+    def send_hash(self, id, content_type, profile_hash):
+        """
+        Confirm that a profile has not changed since it was last sent.
+
+        :param profile_hash: the profile_hash returned when the profile was last sent
+        :type  profile_hash: str
+        :raise ConflictException: if the server has a different version of the profile
+        """
+        path = self.BASE_PATH % id
+        data = {'content_type': content_type, 'profile_hash': profile_hash}
+        return self.server.POST(path, data)
+
+    def send_delta(self, id, content_type, profile_hash, delta):
+        """
+        Send the changes to a profile since it was last sent.
+
+        :param profile_hash: the profile_hash returned when the profile was last sent
+        :type  profile_hash: str
+        :param delta:        the changes; see pulp.common.profile
+        :type  delta:        dict
+        :raise ConflictException: if the server has a different version of the profile
+        """
+        path = self.BASE_PATH % id
+        data = {'content_type': content_type, 'profile_hash': profile_hash, 'delta': delta}
+        return self.server.POST(path, data)
+
 
 class ConsumerHistoryAPI(PulpAPI):
     """
@@ -54,6 +54,34 @@ class TasksAPI(PulpAPI):
         response.response_body = Task(response.response_body)
         return response
 
+    def get_tasks(self, task_ids, known_states=None, timeout=None):
+        """
+        Retrieves the statuses of many tasks in a single call. If a timeout is specified, the
+        server waits until one of the tasks is in a state other than the one given for it in
+        known_states (or, if known_states is not given, other than its state at the time of the
+        call) before responding, or until the timeout expires.
+
+        :param task_ids:     IDs of the tasks to retrieve
+        :type  task_ids:     list
+        :param known_states: mapping of task ID to the state the caller last saw for it
+        :type  known_states: dict
+        :param timeout:      maximum number of seconds the server should wait for a change
+        :type  timeout:      float
+        :return:             response with a list of Task objects; tasks that do not exist
+                             are not included
+        :rtype:              Response
+        """
+        path = '/v2/tasks/status/'
+        body = {'task_ids': task_ids}
+        if known_states is not None:
+            body['known_states'] = known_states
+        if timeout is not None:
+            body['timeout'] = timeout
+
+        response = self.server.POST(path, body)
+        response.response_body = [Task(doc) for doc in response.response_body]
+        return response
+
     def get_all_tasks(self, tags=()):
         """
         Retrieves all tasks in the system. If tags are specified, only tasks
@@ -21,9 +21,14 @@ class UploadAPI(PulpAPI):
     def __init__(self, pulp_connection):
         super(UploadAPI, self).__init__(pulp_connection)
 
-    def initialize_upload(self):
+    def initialize_upload(self, size=None, checksum_types=None):
         url = '/v2/content/uploads/'
-        return self.server.POST(url)
+        body = {}
+        if size is not None:
+            body['size'] = size
+        if checksum_types is not None:
+            body['checksum_types'] = checksum_types
+        return self.server.POST(url, body or None)
 
     def upload_segment(self, upload_id, offset, data):
         url = '/v2/content/uploads/%s/%s/' % (upload_id, offset)
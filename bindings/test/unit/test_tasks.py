@@ -88,6 +88,32 @@ class TestGetAllTasks(unittest.TestCase):
             self.assertTrue(isinstance(task, responses.Task))
 
 
+class TestGetTasks(unittest.TestCase):
+    def setUp(self):
+        self.server = mock.MagicMock()
+        self.api = tasks.TasksAPI(self.server)
+
+        self.server.POST.return_value.response_body = copy.deepcopy(TASKS)
+
+    def test_get_tasks(self):
+        task_ids = [t['task_id'] for t in TASKS]
+
+        ret = self.api.get_tasks(task_ids).response_body
+
+        self.server.POST.assert_called_once_with('/v2/tasks/status/', {'task_ids': task_ids})
+        self.assertEqual(len(ret), 3)
+        for task in ret:
+            self.assertTrue(isinstance(task, responses.Task))
+
+    def test_get_tasks_long_poll(self):
+        known_states = {'t1': 'running'}
+
+        self.api.get_tasks(['t1'], known_states=known_states, timeout=10)
+
+        expected_body = {'task_ids': ['t1'], 'known_states': known_states, 'timeout': 10}
+        self.server.POST.assert_called_once_with('/v2/tasks/status/', expected_body)
+
+
 TASKS = [
     {
         'exception': None,
@@ -2,7 +2,6 @@
 Contains base classes for commands that poll the server for asynchronous tasks.
 """
 
-import time
 from gettext import gettext as _
 
 from pulp.client.extensions.extensions import PulpCliCommand, PulpCliFlag
@@ -210,10 +209,18 @@ class PollingCommand(PulpCliCommand):
                     first_run = False
                 self.progress(task, running_spinner)
 
-            time.sleep(self.poll_frequency_in_seconds)
-
-            response = self.context.server.tasks.get_task(task.task_id)
-            task = response.response_body
+            # Rather than sleeping between requests, ask the server to hold the request until
+            # the task changes state or the poll frequency elapses, so state changes are
+            # displayed as soon as they happen.
+            response = self.context.server.tasks.get_tasks(
+                [task.task_id], known_states={task.task_id: task.state},
+                timeout=self.poll_frequency_in_seconds)
+            if not response.response_body:
+                # Let the single task call raise the appropriate not found error
+                response = self.context.server.tasks.get_task(task.task_id)
+                task = response.response_body
+            else:
+                task = response.response_body[0]
 
         # One final call to update the progress with the end state. It's possible the run state
         # was never hit in the loop above, so we check for first_run again for the missing blank
@@ -22,13 +22,26 @@ import copy
 import errno
 import os
 import pickle
+import Queue
 import sys
+import threading
+import time
 
 from pulp.common.lock import LockFile
 
 # -- constants ----------------------------------------------------------------
 
 DEFAULT_CHUNKSIZE = 1048576 # 1 MB per upload call
+DEFAULT_CONCURRENCY = 1 # number of chunks in flight at once
+
+# Bounds and target duration used when adapting the chunk size to the link
+MIN_ADAPTIVE_CHUNKSIZE = 262144 # 256 KB
+MAX_ADAPTIVE_CHUNKSIZE = 16777216 # 16 MB
+ADAPTIVE_TARGET_SECONDS = 2.0
+
+# How long to block on chunk results before checking again; keeps the main
+# thread responsive to ctrl+c while chunks are in flight
+RESULT_POLL_SECONDS = 0.5
 
 # -- exceptions ---------------------------------------------------------------
 
@@ -85,7 +98,8 @@ class UploadManager(object):
     on disk state files.
     """
 
-    def __init__(self, upload_working_dir, bindings, chunk_size=DEFAULT_CHUNKSIZE):
+    def __init__(self, upload_working_dir, bindings, chunk_size=DEFAULT_CHUNKSIZE,
+                 concurrency=DEFAULT_CONCURRENCY, adaptive_chunk_size=False):
         """
         @param upload_working_dir: directory in which to store client-side files
                to track upload requests; if it doesn't exist it will be created
@@ -96,12 +110,23 @@ class UploadManager(object):
         @type  bindings: Bindings
 
         @param chunk_size: size in bytes of data to upload on each call to the
-               server
+               server; when adaptive_chunk_size is enabled this is the initial size
         @type  chunk_size: int
+
+        @param concurrency: maximum number of chunks being uploaded to the
+               server at the same time
+        @type  concurrency: int
+
+        @param adaptive_chunk_size: if true, the chunk size is grown or shrunk
+               during an upload so each call takes roughly
+               ADAPTIVE_TARGET_SECONDS to complete
+        @type  adaptive_chunk_size: bool
         """
         self.upload_working_dir = upload_working_dir
         self.bindings = bindings
         self.chunk_size = chunk_size
+        self.concurrency = max(1, concurrency)
+        self.adaptive_chunk_size = adaptive_chunk_size
 
         # Internal state
         self.tracker_files = {}
@@ -125,7 +150,13 @@ class UploadManager(object):
         upload_working_dir = os.path.join(context.config['filesystem']['upload_working_dir'],
                                           'default')
         upload_working_dir = os.path.expanduser(upload_working_dir)
-        return cls(upload_working_dir, context.server)
+
+        server_config = context.config.get('server', {})
+        chunk_size = int(server_config.get('upload_chunk_size', DEFAULT_CHUNKSIZE))
+        concurrency = int(server_config.get('upload_concurrency', DEFAULT_CONCURRENCY))
+
+        return cls(upload_working_dir, context.server, chunk_size=chunk_size,
+                   concurrency=concurrency)
 
     def initialize(self):
         """
@@ -167,7 +198,12 @@ class UploadManager(object):
         if not os.path.exists(self.upload_working_dir):
             os.makedirs(self.upload_working_dir)
 
-        response = self.bindings.uploads.initialize_upload().response_body
+        # Declaring the size lets the server allocate the file up front
+        size = None
+        if filename and os.path.isfile(filename):
+            size = os.path.getsize(filename)
+
+        response = self.bindings.uploads.initialize_upload(size=size).response_body
 
         upload_id = response['upload_id']
         location = response['_href']
@@ -198,13 +234,18 @@ class UploadManager(object):
         Begins or resumes the upload process for the given upload request.
         This call will not return until the upload is complete. The other
         expected exit point is a KeyboardError to kill the process. The
-        client-side on disk tracker files will store the current offset and
-        resume the upload from where it left off on the next call to this method.
+        client-side on disk tracker files record each chunk the server has
+        acknowledged, so the next call to this method only uploads the ranges
+        of the file that are still missing.
+
+        Up to the instance's concurrency value chunks are sent to the server at
+        once, each on its own connection. Chunks may therefore be acknowledged
+        out of order; the server accepts segments at any offset.
 
         The callback_func is used to get feedback on the upload process. After
         each successful upload segment call to the server, this function
-        will be invoked with the new offset in the file and the file size
-        (intended to be fed into a progress indicator). As this is called
+        will be invoked with the number of bytes uploaded so far and the file
+        size (intended to be fed into a progress indicator). As this is called
         after each upload segment call, the granularity at which it is called
         depends on the chunk_size value for this instance.
 
@@ -248,23 +289,51 @@ class UploadManager(object):
             tracker_file.save()
 
             source_file_size = os.path.getsize(tracker_file.source_filename)
+            chunk_size = self.chunk_size
 
-            f = open(tracker_file.source_filename, 'r')
-            while True:
-                # Load the chunk to upload
-                f.seek(tracker_file.offset)
-                data = f.read(self.chunk_size)
-                if not data:
-                    break
-
-                # Server request
-                self.bindings.uploads.upload_segment(upload_id, tracker_file.offset, data)
+            results = Queue.Queue()
+            in_flight = 0
+            error = None
 
-                # Status update and callback notification
-                tracker_file.offset = min(tracker_file.offset + self.chunk_size, source_file_size)
-                tracker_file.save()
-
-                callback_func(tracker_file.offset, source_file_size)
+            f = open(tracker_file.source_filename, 'r')
+            try:
+                missing = self._missing_chunks(tracker_file, source_file_size)
+                missing.next()
+                offset, length = missing.send(chunk_size)
+                while True:
+                    # Keep the pipe full unless a previous chunk failed, in
+                    # which case only the chunks already sent are waited on
+                    while error is None and length is not None and in_flight < self.concurrency:
+                        f.seek(offset)
+                        data = f.read(length)
+                        self._start_chunk(upload_id, offset, data, results)
+                        in_flight += 1
+                        offset, length = missing.send(chunk_size)
+
+                    if in_flight == 0:
+                        break
+
+                    chunk_offset, chunk_length, elapsed, exc_info = self._next_result(results)
+                    in_flight -= 1
+
+                    if exc_info is not None:
+                        error = error or exc_info
+                        continue
+
+                    # Status update and callback notification
+                    tracker_file.add_completed_range(chunk_offset, chunk_offset + chunk_length)
+                    tracker_file.save()
+
+                    if callback_func:
+                        callback_func(tracker_file.bytes_uploaded(), source_file_size)
+
+                    if self.adaptive_chunk_size:
+                        chunk_size = self._adapt_chunk_size(chunk_size, chunk_length, elapsed)
+            finally:
+                f.close()
+
+            if error is not None:
+                raise error[0], error[1], error[2]
 
             tracker_file.is_finished_uploading = True
         finally:
@@ -383,6 +452,81 @@ class UploadManager(object):
         self._uncache_tracker_file(tracker)
         tracker.delete()
 
+    # -- chunk utilities ------------------------------------------------------
+
+    @staticmethod
+    def _missing_chunks(tracker_file, source_file_size):
+        """
+        Coroutine that carves the ranges the server has not yet acknowledged
+        into chunks. The chunk size to use for the next chunk is sent in on
+        each iteration, which lets the caller adapt it mid-upload. Once every
+        missing range has been handed out, (None, None) is produced.
+
+        :param tracker_file:     tracker for the upload being performed
+        :type  tracker_file:     UploadTracker
+        :param source_file_size: total size of the file being uploaded
+        :type  source_file_size: int
+        """
+        chunk_size = yield
+        for start, end in tracker_file.missing_ranges(source_file_size):
+            offset = start
+            while offset < end:
+                length = min(chunk_size, end - offset)
+                chunk_size = yield offset, length
+                offset += length
+        while True:
+            yield None, None
+
+    def _start_chunk(self, upload_id, offset, data, results):
+        """
+        Uploads a single chunk in a background thread. When the server call
+        finishes, a tuple of (offset, length, elapsed seconds, exc_info) is put
+        on the results queue; exc_info is None if the call succeeded.
+        """
+        def _upload():
+            start = time.time()
+            try:
+                self.bindings.uploads.upload_segment(upload_id, offset, data)
+            except Exception:
+                results.put((offset, len(data), time.time() - start, sys.exc_info()))
+            else:
+                results.put((offset, len(data), time.time() - start, None))
+
+        thread = threading.Thread(target=_upload)
+        thread.setDaemon(True)
+        thread.start()
+
+    @staticmethod
+    def _next_result(results):
+        """
+        Blocks until the next chunk result is available. A timeout is used on
+        each wait so a KeyboardInterrupt is delivered promptly.
+        """
+        while True:
+            try:
+                return results.get(timeout=RESULT_POLL_SECONDS)
+            except Queue.Empty:
+                continue
+
+    @staticmethod
+    def _adapt_chunk_size(chunk_size, chunk_length, elapsed):
+        """
+        Doubles the chunk size when chunks are completing well under the target
+        duration and halves it when they are taking well over it.
+
+        :return: chunk size to use for the next chunk
+        :rtype:  int
+        """
+        # A short trailing chunk says nothing about the link
+        if chunk_length < chunk_size:
+            return chunk_size
+
+        if elapsed < ADAPTIVE_TARGET_SECONDS / 2:
+            return min(chunk_size * 2, MAX_ADAPTIVE_CHUNKSIZE)
+        if elapsed > ADAPTIVE_TARGET_SECONDS * 2:
+            return max(chunk_size / 2, MIN_ADAPTIVE_CHUNKSIZE)
+        return chunk_size
+
     # -- tracker utilities ----------------------------------------------------
 
     def _tracker_filename(self, upload_id):
@@ -413,7 +557,8 @@ class UploadTracker(object):
         # Upload call information
         self.upload_id = None
         self.location = None # URL to the upload request on the server
-        self.offset = None # start of next chunk to upload
+        self.offset = None # end of the contiguous range uploaded from the start of the file
+        self.completed_ranges = [] # sorted (start, end) ranges acknowledged by the server
         self.source_filename = None # path on disk to the file to upload
 
         # Import call information
@@ -426,6 +571,54 @@ class UploadTracker(object):
         self.is_running = False
         self.is_finished_uploading = False
 
+    def add_completed_range(self, start, end):
+        """
+        Records that the server has acknowledged the bytes in [start, end).
+        Adjacent and overlapping ranges are merged so the list stays small,
+        and the offset is updated to the end of the range starting at zero.
+
+        :param start: offset of the first byte acknowledged
+        :type  start: int
+        :param end:   offset one past the last byte acknowledged
+        :type  end:   int
+        """
+        merged = []
+        for r_start, r_end in sorted(self.completed_ranges + [(start, end)]):
+            if merged and r_start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], r_end))
+            else:
+                merged.append((r_start, r_end))
+        self.completed_ranges = merged
+
+        if merged and merged[0][0] == 0:
+            self.offset = merged[0][1]
+        else:
+            self.offset = 0
+
+    def missing_ranges(self, total_size):
+        """
+        :param total_size: size of the file being uploaded
+        :type  total_size: int
+        :return: list of (start, end) ranges not yet acknowledged by the server
+        :rtype:  list
+        """
+        missing = []
+        position = 0
+        for start, end in self.completed_ranges:
+            if start > position:
+                missing.append((position, min(start, total_size)))
+            position = max(position, end)
+        if position < total_size:
+            missing.append((position, total_size))
+        return missing
+
+    def bytes_uploaded(self):
+        """
+        :return: total number of bytes acknowledged by the server
+        :rtype:  int
+        """
+        return sum(end - start for start, end in self.completed_ranges)
+
     def save(self):
         """
         Saves the current state of the tracker file. This will lock on the file
@@ -465,4 +658,10 @@ class UploadTracker(object):
         status_file = pickle.load(f)
         f.close()
 
+        # Trackers written before per-chunk tracking only know the offset
+        if not hasattr(status_file, 'completed_ranges'):
+            status_file.completed_ranges = []
+            if status_file.offset:
+                status_file.completed_ranges.append((0, status_file.offset))
+
         return status_file
@@ -41,20 +41,20 @@ class PollingCommandTests(base.PulpClientTests):
         # Verify
         self.assertEqual(.5, command.poll_frequency_in_seconds)  # from test-override-admin.conf
 
-    @mock.patch('time.sleep')
-    def test_poll_single_task(self, mock_sleep):
+    def test_poll_single_task(self):
         """
         Task Count: 1
         Statuses: None; normal progression of waiting to running to completed
         Result: Success
 
-        This test verifies the sleep and progress callback calls, which will be omitted
+        This test verifies the long-poll and progress callback calls, which will be omitted
         in most other tests cases where appropriate.
         """
 
         # Setup
         sim = TaskSimulator()
         sim.install(self.bindings)
+        sim.get_tasks = mock.MagicMock(wraps=sim.get_tasks)
 
         task_id = '123'
         state_progression = [STATE_WAITING,
@@ -78,8 +78,11 @@ class PollingCommandTests(base.PulpClientTests):
         expected_tags = ['abort', 'delayed-spinner', 'delayed-spinner', 'succeeded']
         self.assertEqual(self.prompt.get_write_tags(), expected_tags)
 
-        self.assertEqual(4, mock_sleep.call_count) # 2 for waiting, 2 for running
-        self.assertEqual(mock_sleep.call_args_list[0][0][0], 0)  # frequency passed to sleep
+        self.assertEqual(4, sim.get_tasks.call_count) # 2 for waiting, 2 for running
+        first_call = sim.get_tasks.call_args_list[0]
+        self.assertEqual(first_call[0][0], [task_id])
+        self.assertEqual(first_call[1]['known_states'], {task_id: STATE_WAITING})
+        self.assertEqual(first_call[1]['timeout'], 0)  # frequency passed as the wait
 
         self.assertEqual(3, mock_progress_call.call_count) # 2 running, 1 final
 
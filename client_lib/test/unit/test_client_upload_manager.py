@@ -302,6 +302,113 @@ class UploadManagerTests(unittest.TestCase):
         tracker = self.upload_manager._get_tracker_file_by_id(upload_id)
         self.assertEqual(rpm_size, tracker.offset)
 
+    def test_upload_parallel_chunks(self):
+        # Setup
+        self.upload_manager.chunk_size = 100
+        self.upload_manager.concurrency = 4
+        self.upload_manager.initialize()
+        upload_id = self.upload_manager.initialize_upload(TEST_RPM_FILENAME, 'repo-1', 'type-1',
+                                                          {'k' : 'v'}, 'm-1')
+
+        mock_callback = mock.Mock()
+
+        # Test
+        self.upload_manager.upload(upload_id, mock_callback.update_status)
+
+        # Verify
+        rpm_size = os.path.getsize(TEST_RPM_FILENAME)
+        num_upload_calls = int(math.ceil(float(rpm_size) / float(self.upload_manager.chunk_size)))
+        self.assertEqual(num_upload_calls, self.mock_upload_bindings.upload_segment.call_count)
+        self.assertEqual(num_upload_calls, mock_callback.update_status.call_count)
+        self.assertEqual(rpm_size, mock_callback.update_status.call_args[0][0])
+
+        # Reassembling the chunks by offset must produce the original file
+        calls = self.mock_upload_bindings.upload_segment.call_args_list
+        chunks = dict((c[0][1], c[0][2]) for c in calls)
+        f = open(TEST_RPM_FILENAME, 'r')
+        expected = f.read()
+        f.close()
+        self.assertEqual(expected, ''.join(chunks[k] for k in sorted(chunks)))
+
+        tracker = self.upload_manager._get_tracker_file_by_id(upload_id)
+        self.assertEqual(rpm_size, tracker.offset)
+        self.assertEqual([(0, rpm_size)], tracker.completed_ranges)
+        self.assertEqual(True, tracker.is_finished_uploading)
+
+    def test_upload_resumes_missing_ranges(self):
+        # Setup
+        self.upload_manager.chunk_size = 100
+        self.upload_manager.initialize()
+        upload_id = self.upload_manager.initialize_upload(TEST_RPM_FILENAME, 'repo-1', 'type-1',
+                                                          {'k' : 'v'}, 'm-1')
+        rpm_size = os.path.getsize(TEST_RPM_FILENAME)
+
+        # Simulate a previous, interrupted run that uploaded two ranges
+        tracker = self.upload_manager._get_tracker_file_by_id(upload_id)
+        tracker.add_completed_range(0, 300)
+        tracker.add_completed_range(500, rpm_size)
+
+        # Test
+        self.upload_manager.upload(upload_id)
+
+        # Verify only the gap was sent
+        self.assertEqual(2, self.mock_upload_bindings.upload_segment.call_count)
+        offsets = [c[0][1] for c in self.mock_upload_bindings.upload_segment.call_args_list]
+        self.assertEqual([300, 400], offsets)
+
+        tf_filename = self.upload_manager._tracker_filename(upload_id)
+        tracker = upload_util.UploadTracker.load(tf_filename)
+        self.assertEqual([(0, rpm_size)], tracker.completed_ranges)
+        self.assertEqual(rpm_size, tracker.offset)
+
+    def test_upload_failed_chunk_keeps_acknowledged_ranges(self):
+        # Setup
+        self.upload_manager.chunk_size = 100
+        self.upload_manager.initialize()
+        upload_id = self.upload_manager.initialize_upload(TEST_RPM_FILENAME, 'repo-1', 'type-1',
+                                                          {'k' : 'v'}, 'm-1')
+
+        def fail_second_chunk(upload_id, offset, data):
+            if offset == 100:
+                raise NotFoundException({})
+            return Response(200, {})
+        self.mock_upload_bindings.upload_segment.side_effect = fail_second_chunk
+
+        # Test
+        self.assertRaises(NotFoundException, self.upload_manager.upload, upload_id)
+
+        # Verify
+        tf_filename = self.upload_manager._tracker_filename(upload_id)
+        tracker = upload_util.UploadTracker.load(tf_filename)
+        self.assertEqual([(0, 100)], tracker.completed_ranges)
+        self.assertEqual(False, tracker.is_finished_uploading)
+        self.assertEqual(False, tracker.is_running)
+
+    def test_load_legacy_tracker(self):
+        os.makedirs(self.upload_working_dir)
+        filename = self.upload_manager._tracker_filename('legacy')
+        tracker = upload_util.UploadTracker(filename)
+        tracker.offset = 200
+        del tracker.completed_ranges
+        tracker.save()
+
+        # Test
+        loaded = upload_util.UploadTracker.load(filename)
+
+        # Verify
+        self.assertEqual([(0, 200)], loaded.completed_ranges)
+        self.assertEqual([(200, 1000)], loaded.missing_ranges(1000))
+
+    def test_adapt_chunk_size(self):
+        adapt = upload_util.UploadManager._adapt_chunk_size
+        size = upload_util.MIN_ADAPTIVE_CHUNKSIZE * 2
+
+        self.assertEqual(size * 2, adapt(size, size, 0.1))
+        self.assertEqual(size / 2, adapt(size, size, upload_util.ADAPTIVE_TARGET_SECONDS * 3))
+        self.assertEqual(size, adapt(size, size, upload_util.ADAPTIVE_TARGET_SECONDS))
+        # short trailing chunks do not change the size
+        self.assertEqual(size, adapt(size, 10, 0.1))
+
     def test_upload_concurrent_upload(self):
         # Setup
         self.upload_manager.initialize()
@@ -81,6 +81,14 @@ PLP0030 = Error("PLP0030", _("Authentication with username %(user)s failed: inva
 PLP0031 = Error("PLP0031", _("Content source %(id)s could not be found at %(url)s"), ['id', 'url'])
 PLP0032 = Error("PLP0032", _("Task %(task_id)s encountered one or more failures during execution."), ['task_id'])
 PLP0033 = Error("PLP0033", _("Working Directory requested outside of asynchronous task. "), [])
+PLP0034 = Error("PLP0034",
+                _("The %(content_type)s profile of consumer %(consumer_id)s does not match the "
+                  "profile hash %(profile_hash)s. The full profile must be sent."),
+                ['consumer_id', 'content_type', 'profile_hash'])
+PLP0035 = Error("PLP0035",
+                _("Distributor %(distributor_id)s of repository group %(group_id)s is still "
+                  "publishing the members of the group."),
+                ['group_id', 'distributor_id'])
 # Create a section for general validation errors (PLP1000 - PLP2999)
 # Validation problems should be reported with a general PLP1000 error with a more specific
 # error message nested inside of it.
@@ -0,0 +1,101 @@
+"""
+Deltas between two versions of a content unit profile.
+
+Consumers report a changed profile as a delta against the last version the
+server acknowledged, instead of sending the whole profile again. Only profiles
+that are lists, such as the list of packages installed on the consumer, can
+be reported as deltas. A delta is a dict:
+
+  {'added': [<item>, ...], 'removed': [<item>, ...]}
+
+Items are compared by value, so the order of the items in the profile does
+not matter.
+"""
+
+from pulp.common.compat import json
+
+
+ADDED = 'added'
+REMOVED = 'removed'
+
+
+def item_key(item):
+    """
+    A key for an item of a profile, equal for items that are equal.
+
+    :param item: an item of a profile
+    :type  item: object
+    :return: the key of the item
+    :rtype:  str
+    """
+    return json.dumps(item, separators=(',', ':'), sort_keys=True)
+
+
+def delta(old_profile, new_profile):
+    """
+    Calculate the delta that turns one version of a profile into another.
+
+    :param old_profile: the version of the profile the delta is against
+    :type  old_profile: list
+    :param new_profile: the version of the profile the delta produces
+    :type  new_profile: list
+    :return: the delta
+    :rtype:  dict
+    """
+    old_counts = _counts(old_profile)
+    added = []
+    for item in new_profile:
+        key = item_key(item)
+        if old_counts.get(key):
+            old_counts[key] -= 1
+        else:
+            added.append(item)
+    new_counts = _counts(new_profile)
+    removed = []
+    for item in old_profile:
+        key = item_key(item)
+        if new_counts.get(key):
+            new_counts[key] -= 1
+        else:
+            removed.append(item)
+    return {ADDED: added, REMOVED: removed}
+
+
+def apply_delta(profile, profile_delta):
+    """
+    Apply a delta to a profile. The profile is not modified.
+
+    :param profile:       the version of the profile the delta is against
+    :type  profile:       list
+    :param profile_delta: the delta
+    :type  profile_delta: dict
+    :return: the version of the profile the delta produces
+    :rtype:  list
+    :raise ValueError: if the delta removes an item that is not in the profile
+    """
+    removed = _counts(profile_delta.get(REMOVED, []))
+    result = []
+    for item in profile:
+        key = item_key(item)
+        if removed.get(key):
+            removed[key] -= 1
+        else:
+            result.append(item)
+    if any(removed.values()):
+        raise ValueError('delta removes items that are not in the profile')
+    result.extend(profile_delta.get(ADDED, []))
+    return result
+
+
+def _counts(items):
+    """
+    :param items: items of a profile
+    :type  items: list
+    :return: number of occurrences of each item, by item key
+    :rtype:  dict
+    """
+    counts = {}
+    for item in items:
+        key = item_key(item)
+        counts[key] = counts.get(key, 0) + 1
+    return counts
@@ -0,0 +1,42 @@
+import unittest
+
+from pulp.common import profile
+
+
+class TestDelta(unittest.TestCase):
+
+    def test_delta(self):
+        old = [{'name': 'a', 'version': '1'}, {'name': 'b', 'version': '1'}]
+        new = [{'version': '2', 'name': 'a'}, {'name': 'b', 'version': '1'}]
+
+        delta = profile.delta(old, new)
+
+        self.assertEqual(delta, {'added': [{'name': 'a', 'version': '2'}],
+                                 'removed': [{'name': 'a', 'version': '1'}]})
+
+    def test_delta_unchanged(self):
+        old = [{'name': 'a'}, {'name': 'b'}]
+
+        delta = profile.delta(old, list(reversed(old)))
+
+        self.assertEqual(delta, {'added': [], 'removed': []})
+
+    def test_delta_duplicates(self):
+        delta = profile.delta([{'name': 'a'}], [{'name': 'a'}, {'name': 'a'}])
+
+        self.assertEqual(delta, {'added': [{'name': 'a'}], 'removed': []})
+
+    def test_apply_delta(self):
+        old = [{'name': 'a', 'version': '1'}, {'name': 'b', 'version': '1'}]
+        new = [{'name': 'b', 'version': '1'}, {'name': 'c', 'version': '1'}]
+
+        result = profile.apply_delta(old, profile.delta(old, new))
+
+        self.assertEqual(sorted(result), sorted(new))
+        # the profile is not modified
+        self.assertEqual(len(old), 2)
+
+    def test_apply_delta_not_in_profile(self):
+        delta = {'added': [], 'removed': [{'name': 'x'}]}
+
+        self.assertRaises(ValueError, profile.apply_delta, [{'name': 'a'}], delta)
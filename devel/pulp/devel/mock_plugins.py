@@ -220,7 +220,9 @@ def install():
     MOCK_DISTRIBUTOR_2.publish_repo.return_value = PublishReport(True, 'Summary of the publish', 'Details of the publish')
 
     MOCK_GROUP_DISTRIBUTOR.validate_config.return_value = True, None
+    MOCK_GROUP_DISTRIBUTOR.split_group_publish.return_value = False
     MOCK_GROUP_DISTRIBUTOR_2.validate_config.return_value = True, None
+    MOCK_GROUP_DISTRIBUTOR_2.split_group_publish.return_value = False
 
     for profiler in MOCK_PROFILERS:
         profiler.update_profile = \
@@ -135,6 +135,20 @@ class TaskSimulator(object):
 
         return response
 
+    def get_tasks(self, task_ids, known_states=None, timeout=None):
+        """
+        Returns the next state for each of the given tasks. The simulated server never
+        waits, regardless of the timeout.
+
+        :return: response object as if the bindings had contacted the server
+        :rtype:  pulp.bindings.response.Response
+
+        :raises ValueError: if no states are defined for one of the given task IDs
+        """
+        task_list = [self.get_task(task_id).response_body for task_id in task_ids]
+        response = responses.Response('200', task_list)
+
+        return response
 
     def get_all_tasks(self, tags=()):
         """
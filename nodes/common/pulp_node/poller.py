@@ -10,7 +10,6 @@
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
 import httplib
-from time import sleep
 from gettext import gettext as _
 
 from pulp.common.constants import CALL_COMPLETE_STATES, CALL_ERROR_STATE
@@ -40,7 +39,8 @@ class TaskPoller(object):
     The task poller is used to poll a running task by ID.
     :ivar binding: A pulp API binding.
     :type binding: pulp_node.handlers.model.PulpBinding
-    :ivar delay: The delay in seconds between each poll.
+    :ivar delay: The longest the server is asked to wait for the task to change
+        state before responding to each poll, in seconds.
     :type delay: int
     """
 
@@ -50,7 +50,8 @@ class TaskPoller(object):
         """
         :param binding: A pulp API binding.
         :type binding: pulp_node.handlers.model.PulpBinding
-        :param delay: The delay in seconds between each poll.
+        :param delay: The longest the server is asked to wait for the task to change
+            state before responding to each poll, in seconds.
         :type delay: int
         """
         self.binding = binding
@@ -73,20 +74,23 @@ class TaskPoller(object):
         poll = True
         task_result = None
         last_hash = 0
+        known_states = None
 
         while poll:
             if cancelled():
                 poll = False
                 continue
 
-            sleep(self.delay)
-
-            http = self.binding.tasks.get_task(task_id)
-            if http.response_code != httplib.OK:
+            # The server holds the request until the task changes state or the
+            # delay elapses, which replaces sleeping between requests.
+            http = self.binding.tasks.get_tasks(
+                [task_id], known_states=known_states, timeout=self.delay)
+            if http.response_code != httplib.OK or not http.response_body:
                 msg = FETCH_TASK_FAILED % {'t': task_id, 'c': http.response_code}
                 raise PollingFailed(msg)
 
-            task = http.response_body
+            task = http.response_body[0]
+            known_states = {task_id: task.state}
 
             if task.state == CALL_ERROR_STATE:
                 msg = TASK_FAILED % {'t': task_id, 's': task.state}
@@ -6,8 +6,8 @@ from pymongo.errors import DuplicateKeyError
 
 from pulp.plugins.model import Unit, PublishReport
 from pulp.plugins.types import database as types_db
+from pulp.server.async.status_writer import progress_writer
 from pulp.server.async.tasks import get_current_task_id
-from pulp.server.db.model.dispatch import TaskStatus
 from pulp.server.exceptions import MissingResource
 import pulp.plugins.conduits._common as common_utils
 import pulp.server.managers.factory as manager_factory
@@ -618,8 +618,7 @@ class StatusMixin(object):
 
         try:
             self.progress_report[self.report_id] = status
-            TaskStatus.objects(task_id=self.task_id).update_one(
-                set__progress_report=self.progress_report)
+            progress_writer.set_progress(self.task_id, self.progress_report)
         except Exception, e:
             _logger.exception(
                 'Exception from server setting progress for report [%s]' % self.report_id)
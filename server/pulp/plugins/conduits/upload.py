@@ -1,13 +1,44 @@
 from pulp.plugins.conduits.mixins import (
     AddUnitMixin, SingleRepoUnitsMixin, SearchUnitsMixin,
     ImporterConduitException)
+from pulp.plugins.util import verification
 
 
 class UploadConduit(AddUnitMixin, SingleRepoUnitsMixin, SearchUnitsMixin):
 
     def __init__(self, repo_id, importer_id, association_owner_type,
-                 association_owner_id):
+                 association_owner_id, file_path=None, checksum_types=None, checksums=None):
         AddUnitMixin.__init__(self, repo_id, importer_id,
                               association_owner_type, association_owner_id)
         SingleRepoUnitsMixin.__init__(self, repo_id, ImporterConduitException)
         SearchUnitsMixin.__init__(self, ImporterConduitException)
+
+        self._file_path = file_path
+        self._checksum_types = list(checksum_types or [])
+        self._checksums = dict(checksums or {})
+
+    def get_checksum(self, checksum_type):
+        """
+        Returns a checksum of the uploaded file. Checksums the server
+        calculated while the file was being written are returned as they are.
+        Otherwise the file is read once to calculate the requested type along
+        with every declared type still missing, so importers that need several
+        checksums do not read the file for each of them.
+
+        :param checksum_type: type of checksum to return; one of the TYPE_* constants in
+                              pulp.plugins.util.verification
+        :type  checksum_type: str
+        :return: hex digest of the uploaded file, or None if there is no uploaded file
+        :rtype:  str
+        :raise ValueError: if the checksum type isn't one of the TYPE_* constants
+        """
+        checksum_type = verification.sanitize_checksum_type(checksum_type)
+        if self._file_path is None:
+            return None
+        if checksum_type not in self._checksums:
+            checksum_types = set(self._checksum_types).difference(self._checksums)
+            checksum_types.add(checksum_type)
+            with open(self._file_path) as uploaded_file:
+                self._checksums.update(
+                    verification.calculate_checksums(uploaded_file, checksum_types))
+        return self._checksums[checksum_type]
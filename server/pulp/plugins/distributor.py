@@ -13,6 +13,8 @@
 
 import sys
 
+from pulp.plugins.model import PublishReport
+
 
 class Distributor(object):
     """
@@ -323,6 +325,95 @@ class GroupDistributor(object):
         """
         raise NotImplementedError()
 
+    def split_group_publish(self, repo_group, config):
+        """
+        Decides whether the given repository group is published with a single
+        call to publish_group or one member repository at a time. In the latter
+        case Pulp calls publish_group_member for each member repository in its
+        own task, so the members may be published on different workers at the
+        same time, and then calls finish_publish_group once all of them are done.
+
+        @param repo_group: metadata describing the repository group
+        @type  repo_group: pulp.plugins.model.RepositoryGroup
+
+        @param config: plugin configuration
+        @type  config: pulp.plugins.config.PluginCallConfiguration
+
+        @return: True to publish each member repository separately
+        @rtype:  bool
+        """
+        return False
+
+    def publish_group_member(self, repo_group, repo, publish_conduit, config):
+        """
+        Publishes one member repository of the given repository group. Only
+        called if split_group_publish returns True.
+
+        Calls for different members of the same group may run at the same time
+        in different processes, so they should not depend on each other.
+
+        The working_dir of repo_group and repo is the working directory of the
+        member's task, which is deleted when that task ends. Output that
+        finish_publish_group needs must be published, or returned in the
+        report, rather than left in the working directory.
+
+        @param repo_group: metadata describing the repository group
+        @type  repo_group: pulp.plugins.model.RepositoryGroup
+
+        @param repo: metadata describing the member repository to publish
+        @type  repo: pulp.plugins.model.Repository
+
+        @param publish_conduit: provides access to relevant Pulp functionality
+        @type  publish_conduit: pulp.plugins.conduits.repo_publish.RepoGroupPublishConduit
+
+        @param config: plugin configuration
+        @type  config: pulp.plugins.config.PluginCallConfiguration
+
+        @return: report describing the publish of the member repository
+        @rtype:  pulp.plugins.model.PublishReport
+        """
+        raise NotImplementedError()
+
+    def finish_publish_group(self, repo_group, publish_conduit, config, member_reports):
+        """
+        Completes the publish of a repository group whose member repositories
+        were published separately, and merges their reports into the report
+        for the group. Only called if split_group_publish returns True, after
+        publish_group_member has finished for every member.
+
+        The default implementation succeeds only if every member did, and
+        reports the summary and details of each member by repository ID.
+
+        @param repo_group: metadata describing the repository group
+        @type  repo_group: pulp.plugins.model.RepositoryGroup
+
+        @param publish_conduit: provides access to relevant Pulp functionality
+        @type  publish_conduit: pulp.plugins.conduits.repo_publish.RepoGroupPublishConduit
+
+        @param config: plugin configuration
+        @type  config: pulp.plugins.config.PluginCallConfiguration
+
+        @param member_reports: report of each member's publish, keyed by repository
+                               ID; None for members whose publish raised an error,
+                               was canceled or did not finish in time
+        @type  member_reports: dict
+
+        @return: report describing the publish of the group
+        @rtype:  pulp.plugins.model.PublishReport
+        """
+        success = True
+        summary = {}
+        details = {}
+        for repo_id, report in member_reports.items():
+            if report is None:
+                success = False
+                summary[repo_id] = details[repo_id] = None
+                continue
+            success = success and report.success_flag
+            summary[repo_id] = report.summary
+            details[repo_id] = report.details
+        return PublishReport(success, summary, details)
+
     def cancel_publish_group(self, call_request, call_report):
         """
         Call cancellation control hook.
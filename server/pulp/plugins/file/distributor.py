@@ -1,18 +1,31 @@
 from gettext import gettext as _
+from multiprocessing.pool import ThreadPool
 import csv
 import errno
+import hashlib
 import logging
 import os
 import shutil
+import tempfile
 import traceback
+import uuid
 
 from pulp.common.plugins.distributor_constants import MANIFEST_FILENAME
 from pulp.common.plugins.progress import ProgressReport
+from pulp.common.util import encode_unicode
 from pulp.plugins.distributor import Distributor
+from pulp.server import config as pulp_config
+from pulp.server.compat import json
 
 
 BUILD_DIRNAME = 'build'
 
+# Name of the file in the master publish dir listing the hosting locations that were published
+LOCATIONS_FILENAME = '.hosting_locations'
+
+# Most threads creating unit symlinks at the same time during a publish
+MAX_SYMLINK_THREADS = 4
+
 _logger = logging.getLogger(__name__)
 
 
@@ -73,36 +86,35 @@ class FileDistributor(Distributor):
             progress_report.state = progress_report.STATE_IN_PROGRESS
             units = publish_conduit.get_units()
 
-            # Set up an empty build_dir
-            build_dir = os.path.join(repo.working_dir, BUILD_DIRNAME)
-            # Let's erase the path at build_dir so we can be sure it's a clean directory
-            self._rmtree_if_exists(build_dir)
-            os.makedirs(build_dir)
-
-            self.initialize_metadata(build_dir)
-
-            try:
-                # process each unit
-                for unit in units:
-                    links_to_create = self.get_paths_for_unit(unit)
-                    self._symlink_unit(build_dir, unit, links_to_create)
-                    self.publish_metadata_for_unit(unit)
-            finally:
-                # Finalize the processing
-                self.finalize_metadata()
+            # The tree is named after its contents, so a tree built by an earlier publish
+            # of the same contents is still complete and can be published again as is
+            master_dir = self.get_master_publish_dir(repo, config)
+            links = self._get_links(units)
+            tree_dir = os.path.join(master_dir, self._tree_digest(units, links))
+            if not os.path.isdir(tree_dir):
+                self._build_tree(master_dir, tree_dir, units, links)
+
+            # Point each hosting location at the tree
+            hosting_locations = [location.rstrip('/') for location in
+                                 self.get_hosting_locations(repo, config)]
+            for location in hosting_locations:
+                self._swap_symlink(tree_dir, location)
 
-            # Let's unpublish, and then republish
-            self.unpublish_repo(repo, config)
+            # Stop serving the repository at locations that are no longer configured,
+            # such as a protocol that was turned off since the last publish
+            for location in self._get_published_locations(master_dir):
+                if location not in hosting_locations and os.path.islink(location):
+                    os.remove(location)
+            self._set_published_locations(master_dir, hosting_locations)
 
-            hosting_locations = self.get_hosting_locations(repo, config)
-            for location in hosting_locations:
-                shutil.copytree(build_dir, location, symlinks=True)
+            # Clean up the trees of earlier publishes
+            for name in os.listdir(master_dir):
+                path = os.path.join(master_dir, name)
+                if path != tree_dir and name != LOCATIONS_FILENAME:
+                    self._rmtree_if_exists(path)
 
             self.post_repo_publish(repo, config)
 
-            # Clean up our build_dir
-            self._rmtree_if_exists(build_dir)
-
             # Report that we are done
             progress_report.state = progress_report.STATE_COMPLETE
             return progress_report.build_final_report()
@@ -126,9 +138,12 @@ class FileDistributor(Distributor):
         :param config: plugin configuration
         :type  config: pulp.plugins.config.PluginCallConfiguration
         """
-        hosting_locations = self.get_hosting_locations(repo, config)
+        master_dir = self.get_master_publish_dir(repo, config)
+        hosting_locations = set(self.get_hosting_locations(repo, config))
+        hosting_locations.update(self._get_published_locations(master_dir))
         for location in hosting_locations:
             self._rmtree_if_exists(location)
+        self._rmtree_if_exists(master_dir)
 
     def validate_config(self, repo, config, config_conduit):
         raise NotImplementedError()
@@ -185,6 +200,21 @@ class FileDistributor(Distributor):
         """
         return []
 
+    def get_master_publish_dir(self, repo, config):
+        """
+        Get the path on the filesystem where the published trees of the repository are built.
+        Each hosting location is a symlink to the current tree in this directory.
+
+        :param repo: The repository that is going to be hosted
+        :type repo: pulp.plugins.model.Repository
+        :param config:    plugin configuration
+        :type  config:    pulp.plugins.config.PluginConfiguration
+        :return: path of the directory that holds the published trees of the repository
+        :rtype:  str
+        """
+        storage_dir = pulp_config.config.get('server', 'storage_dir')
+        return os.path.join(storage_dir, 'published', 'master', self.metadata()['id'], repo.id)
+
     def post_repo_publish(self, repo, config):
         """
         API method that is called after the contents of a published repo have
@@ -197,6 +227,167 @@ class FileDistributor(Distributor):
         """
         pass
 
+    def _get_links(self, units):
+        """
+        Get the symlinks the units are published as. If more than one unit is published at
+        the same path, the last one is.
+
+        :param units: the units being published
+        :type  units: list of pulp.plugins.model.AssociatedUnit
+        :return: the unit to link at each path in the tree
+        :rtype:  dict
+        """
+        links = {}
+        for unit in units:
+            for target_path in self.get_paths_for_unit(unit):
+                links[target_path] = unit
+        return links
+
+    @staticmethod
+    def _tree_digest(units, links):
+        """
+        Calculate a digest of everything the published tree is built from.
+
+        :param units: the units being published
+        :type  units: list of pulp.plugins.model.AssociatedUnit
+        :param links: the unit to link at each path in the tree
+        :type  links: dict
+        :return: hex digest identifying the contents of the tree
+        :rtype:  str
+        """
+        digest = hashlib.sha256()
+        for unit_key in sorted(json.dumps(unit.unit_key, sort_keys=True) for unit in units):
+            digest.update(unit_key + '\n')
+        for target_path in sorted(links):
+            digest.update('%s\0%s\n' % (encode_unicode(target_path),
+                                        encode_unicode(links[target_path].storage_path)))
+        return digest.hexdigest()
+
+    def _build_tree(self, master_dir, tree_dir, units, links):
+        """
+        Build the published tree in a temporary directory next to its final location and
+        move it there once it is complete.
+
+        :param master_dir: The directory that holds the published trees of the repository
+        :type  master_dir: basestring
+        :param tree_dir:   The path the tree is built at
+        :type  tree_dir:   basestring
+        :param units:      the units being published
+        :type  units:      list of pulp.plugins.model.AssociatedUnit
+        :param links:      the unit to link at each path in the tree
+        :type  links:      dict
+        """
+        if not os.path.isdir(master_dir):
+            os.makedirs(master_dir)
+        build_dir = tempfile.mkdtemp(prefix='.%s-' % BUILD_DIRNAME, dir=master_dir)
+        try:
+            self.initialize_metadata(build_dir)
+            try:
+                for unit in units:
+                    self.publish_metadata_for_unit(unit)
+            finally:
+                # Finalize the processing
+                self.finalize_metadata()
+
+            self._symlink_units(build_dir, links)
+            # mkdtemp creates the directory readable by its owner alone, and the published
+            # tree must be readable by the web server
+            os.chmod(build_dir, 0755)
+            os.rename(build_dir, tree_dir)
+        except Exception:
+            self._rmtree_if_exists(build_dir)
+            raise
+
+    def _symlink_units(self, build_dir, links):
+        """
+        Create the unit symlinks in the build dir, in up to MAX_SYMLINK_THREADS threads.
+
+        :param build_dir: The path on the local filesystem that we want to symlink the units into.
+                          This path should already exist.
+        :type  build_dir: basestring
+        :param links:     the unit to link at each path in the tree
+        :type  links:     dict
+        """
+        if not links:
+            return
+
+        def symlink(link):
+            target_path, unit = link
+            self._symlink_unit(build_dir, unit, [target_path])
+
+        pool = ThreadPool(min(MAX_SYMLINK_THREADS, len(links)))
+        try:
+            # raises the first error from any of the threads
+            for _result in pool.imap_unordered(symlink, links.items(), chunksize=64):
+                pass
+        finally:
+            pool.terminate()
+            pool.join()
+
+    @staticmethod
+    def _get_published_locations(master_dir):
+        """
+        Get the hosting locations the last publish of the repository pointed at its tree.
+
+        :param master_dir: The directory that holds the published trees of the repository
+        :type  master_dir: basestring
+        :return: the published hosting locations; empty if none were recorded
+        :rtype:  list of str
+        """
+        try:
+            with open(os.path.join(master_dir, LOCATIONS_FILENAME)) as locations_file:
+                return json.load(locations_file)
+        except IOError, e:
+            if e.errno != errno.ENOENT:
+                raise
+            return []
+
+    @staticmethod
+    def _set_published_locations(master_dir, locations):
+        """
+        Record the hosting locations that point at the tree of the repository, replacing the
+        record of the previous publish in one step.
+
+        :param master_dir: The directory that holds the published trees of the repository
+        :type  master_dir: basestring
+        :param locations:  the published hosting locations
+        :type  locations:  list of str
+        """
+        locations_path = os.path.join(master_dir, LOCATIONS_FILENAME)
+        tmp_path = '%s-%s' % (locations_path, uuid.uuid4())
+        with open(tmp_path, 'w') as locations_file:
+            json.dump(locations, locations_file)
+        os.rename(tmp_path, locations_path)
+
+    @staticmethod
+    def _swap_symlink(tree_dir, location):
+        """
+        Make the hosting location a symlink to the published tree. An existing symlink is
+        replaced atomically, so the location always serves either the old or the new tree.
+
+        :param tree_dir: The path of the published tree
+        :type  tree_dir: basestring
+        :param location: The hosting location
+        :type  location: basestring
+        """
+        location = location.rstrip('/')
+        parent_dir = os.path.dirname(location)
+        if not os.path.isdir(parent_dir):
+            os.makedirs(parent_dir)
+        elif os.path.isdir(location) and not os.path.islink(location):
+            # published by copying the tree, before hosting locations were symlinks
+            shutil.rmtree(location)
+
+        tmp_link_name = os.path.join(parent_dir,
+                                     '.%s-%s' % (os.path.basename(location), uuid.uuid4()))
+        os.symlink(tree_dir, tmp_link_name)
+        try:
+            # rename() replaces the existing symlink in one step
+            os.rename(tmp_link_name, location)
+        except Exception:
+            os.remove(tmp_link_name)
+            raise
+
     def _symlink_unit(self, build_dir, unit, target_paths):
         """
         For each unit, put a symlink in the build dir that points to its canonical location on disk.
@@ -237,12 +428,15 @@ class FileDistributor(Distributor):
 
     def _rmtree_if_exists(self, path):
         """
-        If the given path exists, remove it recursively. Else, do nothing.
+        If the given path exists, remove it recursively. Else, do nothing. A symlink is
+        removed without touching what it points to.
 
         :param path: The path you want to recursively delete.
         :type  path: basestring
         """
-        if os.path.exists(path):
+        if os.path.islink(path):
+            os.remove(path)
+        elif os.path.exists(path):
             shutil.rmtree(path)
 
 
@@ -4,16 +4,21 @@ This module covers both the ContentType collection itself as well as any
 type-specific collections that exist to suit the type needs.
 """
 
+import hashlib
 import logging
 
 from pymongo import ASCENDING
 
+from pulp.common.compat import json
 from pulp.server.db.model.content import ContentType
 import pulp.server.db.connection as pulp_db
 
 
 TYPE_COLLECTION_PREFIX = 'units_'
 
+# Field of every content unit holding the digest of its unit key; see unit_key_digest()
+UNIT_KEY_DIGEST = '_unit_key_digest'
+
 _logger = logging.getLogger(__name__)
 
 
@@ -241,6 +246,25 @@ def type_units_unit_key(type_id):
     return type_def['unit_key']
 
 
+def unit_key_digest(unit_key):
+    """
+    Returns a digest of a unit key. Content units store the digest of their
+    unit key in the UNIT_KEY_DIGEST field, which is uniquely indexed, so a unit
+    can be found by its key with a query on that one field.
+
+    The digest does not depend on the order of the fields in the unit key, nor
+    on whether string values are str or unicode.
+
+    @param unit_key: dictionary of the unit key fields and their values
+    @type  unit_key: dict
+
+    @return: hex digest of the unit key
+    @rtype:  str
+    """
+    serialized = json.dumps(unit_key, separators=(',', ':'), sort_keys=True)
+    return hashlib.sha256(serialized).hexdigest()
+
+
 def _create_or_update_type(type_def):
     """
     This method creates or updates a type definition in MongoDB.
@@ -309,6 +333,12 @@ def _update_indexes(type_def, unique):
 def _update_unit_key(type_def):
     _update_indexes(type_def, True)
 
+    # Units stored before the digest was introduced get it from a migration, which runs after
+    # the types are loaded; the index is sparse so they do not collide in the meantime.
+    collection_name = unit_collection_name(type_def.id)
+    collection = pulp_db.get_collection(collection_name, create=False)
+    collection.ensure_index(UNIT_KEY_DIGEST, unique=True, sparse=True, drop_dups=False)
+
 
 def _update_search_indexes(type_def):
     _update_indexes(type_def, False)
@@ -3,7 +3,10 @@ import glob
 import gzip
 import logging
 import os
+import Queue
 import shutil
+import sys
+import threading
 import traceback
 
 
@@ -15,6 +18,10 @@ from verification import CHECKSUM_FUNCTIONS
 
 _LOG = logging.getLogger(__name__)
 BUFFER_SIZE = 1024
+# Amount of data collected before it is handed to the background writer thread, in bytes
+BACKGROUND_BUFFER_SIZE = 65536
+# Number of buffers that may wait for the background writer thread before writes block
+BACKGROUND_QUEUE_SIZE = 16
 
 
 class MetadataFileContext(object):
@@ -22,7 +29,7 @@ class MetadataFileContext(object):
     Context manager class for metadata file generation.
     """
 
-    def __init__(self, metadata_file_path, checksum_type=None):
+    def __init__(self, metadata_file_path, checksum_type=None, background_writes=False):
         """
         :param metadata_file_path: full path to metadata file to be generated
         :type  metadata_file_path: str
@@ -30,12 +37,18 @@ class MetadataFileContext(object):
                               to the file names of files. If checksum_type is None,
                               no checksum is added to the filename
         :type checksum_type: str or None
+        :param background_writes: if True, compressing and writing the file happen in a
+                                  separate thread, so they overlap with generating the content
+        :type background_writes: bool
         """
 
         self.metadata_file_path = metadata_file_path
         self.metadata_file_handle = None
         self.checksum_type = checksum_type
         self.checksum = None
+        self.background_writes = background_writes
+        # the handle for the file on disk, which calculates the checksum as data is written
+        self.checksum_file_handle = None
         if self.checksum_type is not None:
             checksum_function = CHECKSUM_FUNCTIONS.get(checksum_type)
             if not checksum_function:
@@ -96,9 +109,17 @@ class MetadataFileContext(object):
         # Add calculated checksum to the filename
         file_name = os.path.basename(self.metadata_file_path)
         if self.checksum_type is not None:
-            with open(self.metadata_file_path, 'rb') as file_handle:
-                content = file_handle.read()
-                checksum = self.checksum_constructor(content).hexdigest()
+            if self.checksum_file_handle is not None:
+                checksum = self.checksum_file_handle.hexdigest()
+            else:
+                # the file was not written through _open_metadata_file_handle()
+                checksum_object = self.checksum_constructor()
+                with open(self.metadata_file_path, 'rb') as file_handle:
+                    content = file_handle.read(BACKGROUND_BUFFER_SIZE)
+                    while content:
+                        checksum_object.update(content)
+                        content = file_handle.read(BACKGROUND_BUFFER_SIZE)
+                checksum = checksum_object.hexdigest()
 
             self.checksum = checksum
             file_name_with_checksum = checksum + '-' + file_name
@@ -109,6 +130,7 @@ class MetadataFileContext(object):
 
         # Set the metadata_file_handle to None so we don't double call finalize
         self.metadata_file_handle = None
+        self.checksum_file_handle = None
 
     def _open_metadata_file_handle(self):
         """
@@ -142,11 +164,26 @@ class MetadataFileContext(object):
         msg = _('Opening metadata file handle for [%(p)s]')
         _LOG.debug(msg % {'p': self.metadata_file_path})
 
+        checksum_constructor = None
+        if self.checksum_type is not None:
+            checksum_constructor = self.checksum_constructor
+        self.checksum_file_handle = ChecksumFile(open(self.metadata_file_path, 'wb'),
+                                                 checksum_constructor)
+
         if self.metadata_file_path.endswith('.gz'):
-            self.metadata_file_handle = gzip.open(self.metadata_file_path, 'w')
+            # the checksum is calculated over the compressed data, as it is written
+            file_handle = gzip.GzipFile(self.metadata_file_path, 'wb',
+                                        fileobj=self.checksum_file_handle)
+            # Have the GzipFile close the file on disk when it is closed, as gzip.open() does
+            file_handle.myfileobj = self.checksum_file_handle
 
         else:
-            self.metadata_file_handle = open(self.metadata_file_path, 'w')
+            file_handle = self.checksum_file_handle
+
+        if self.background_writes:
+            file_handle = BackgroundWriter(file_handle)
+
+        self.metadata_file_handle = file_handle
 
     def _write_file_header(self):
         """
@@ -168,6 +205,8 @@ class MetadataFileContext(object):
         if not self._is_closed(self.metadata_file_handle):
             self.metadata_file_handle.flush()
             self.metadata_file_handle.close()
+        if not self._is_closed(self.checksum_file_handle):
+            self.checksum_file_handle.close()
 
     @staticmethod
     def _is_closed(file_object):
@@ -195,6 +234,143 @@ class MetadataFileContext(object):
                 raise
 
 
+class ChecksumFile(object):
+    """
+    Write-only file object that calculates the checksum of the data written to a file.
+    """
+
+    def __init__(self, file_object, checksum_constructor=None):
+        """
+        :param file_object: the file to write to
+        :type  file_object: file
+        :param checksum_constructor: constructor of the checksum object, such as hashlib.sha256,
+                                     or None if no checksum should be calculated
+        :type  checksum_constructor: callable
+        """
+        self.file_object = file_object
+        self.checksum_object = None
+        if checksum_constructor is not None:
+            self.checksum_object = checksum_constructor()
+
+    @property
+    def closed(self):
+        return self.file_object.closed
+
+    @property
+    def name(self):
+        return self.file_object.name
+
+    def write(self, data):
+        """
+        :param data: the data to write
+        :type  data: str
+        """
+        self.file_object.write(data)
+        if self.checksum_object is not None:
+            self.checksum_object.update(data)
+
+    def flush(self):
+        self.file_object.flush()
+
+    def close(self):
+        self.file_object.close()
+
+    def hexdigest(self):
+        """
+        :return: the checksum of all the data written so far
+        :rtype:  str
+        """
+        return self.checksum_object.hexdigest()
+
+
+class BackgroundWriter(object):
+    """
+    Write-only file object that collects data and writes it to another file object in a separate
+    thread. Once writing fails in the thread, no more data is written and every later call to
+    write(), flush() or close() raises the error.
+    """
+
+    def __init__(self, file_object):
+        """
+        :param file_object: the file to write to
+        :type  file_object: file
+        """
+        self.file_object = file_object
+        self.closed = False
+        self._buffer = []
+        self._buffered = 0
+        self._error = None
+        self._queue = Queue.Queue(maxsize=BACKGROUND_QUEUE_SIZE)
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def write(self, data):
+        """
+        :param data: the data to write
+        :type  data: str
+        """
+        self._raise_error()
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= BACKGROUND_BUFFER_SIZE:
+            self._send()
+
+    def flush(self):
+        """
+        Wait for all data written so far to be written to the file object, and flush it.
+        """
+        self._send()
+        self._queue.join()
+        self._raise_error()
+        self.file_object.flush()
+
+    def close(self):
+        """
+        Wait for all data to be written, stop the thread, and close the file object.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self._send()
+        self._queue.put(None)
+        self._thread.join()
+        self.file_object.close()
+        self._raise_error()
+
+    def _send(self):
+        """
+        Hand the collected data to the thread.
+        """
+        if self._buffer:
+            self._queue.put(''.join(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+
+    def _raise_error(self):
+        """
+        Raise the first error that happened in the thread, if any.
+        """
+        if self._error is not None:
+            raise self._error[0], self._error[1], self._error[2]
+
+    def _run(self):
+        """
+        Write the data handed to the thread until told to stop.
+        """
+        while True:
+            data = self._queue.get()
+            try:
+                if data is None:
+                    return
+                if self._error is None:
+                    self.file_object.write(data)
+            except Exception:
+                self._error = sys.exc_info()
+            finally:
+                self._queue.task_done()
+
+
 class JSONArrayFileContext(MetadataFileContext):
     """
     Context manager for writing out units as a json array.
@@ -1,4 +1,5 @@
 import errno
+import filecmp
 from gettext import gettext as _
 import itertools
 import logging
@@ -146,3 +147,65 @@ def clear_directory(path, skip_list=()):
 
         elif os.path.isfile(entry_path):
             os.unlink(entry_path)
+
+
+def link_tree(source_dir, target_dir, previous_dir=None):
+    """
+    Recreate the tree at source_dir at target_dir, which must not exist yet, the way
+    shutil.copytree(source_dir, target_dir, symlinks=True) would, while copying as little data
+    as possible.
+
+    Regular files are hard linked to the files in source_dir. When that is not possible, for
+    example because the two directories are on different filesystems, a file is hard linked to
+    the file at the same relative path in previous_dir if that file has identical contents, and
+    copied otherwise. Symbolic links are recreated, not followed.
+
+    The files in target_dir may share their inode with files in source_dir and previous_dir, so
+    none of the three trees may be modified in place afterwards; files must be replaced instead.
+
+    :param source_dir: path of the tree to recreate
+    :type  source_dir: str
+    :param target_dir: path at which to recreate the tree
+    :type  target_dir: str
+    :param previous_dir: path of an older copy of the tree whose unchanged files may be reused
+    :type  previous_dir: str or None
+    """
+    link_source = True
+    for dir_path, dir_names, file_names in os.walk(source_dir):
+        relative_dir = os.path.relpath(dir_path, source_dir)
+        target_path = os.path.normpath(os.path.join(target_dir, relative_dir))
+        os.makedirs(target_path)
+        shutil.copystat(dir_path, target_path)
+
+        # os.walk() does not descend into symlinks to directories, but lists them with directories
+        for name in dir_names + file_names:
+            source_file = os.path.join(dir_path, name)
+            target_file = os.path.join(target_path, name)
+            if os.path.islink(source_file):
+                os.symlink(os.readlink(source_file), target_file)
+                continue
+            if os.path.isdir(source_file):
+                continue
+
+            if link_source:
+                try:
+                    os.link(source_file, target_file)
+                    continue
+                except OSError, e:
+                    if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                        raise
+                    # Do not try again for every other file in the tree
+                    link_source = False
+
+            if previous_dir is not None:
+                previous_file = os.path.normpath(os.path.join(previous_dir, relative_dir, name))
+                if os.path.isfile(previous_file) and not os.path.islink(previous_file) and \
+                        filecmp.cmp(previous_file, source_file, shallow=False):
+                    try:
+                        os.link(previous_file, target_file)
+                        continue
+                    except OSError, e:
+                        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                            raise
+
+            shutil.copy2(source_file, target_file)
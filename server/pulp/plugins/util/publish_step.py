@@ -3,9 +3,11 @@ from itertools import chain, imap
 import copy
 import logging
 import os
+import Queue
 import shutil
 import sys
 import tarfile
+import threading
 import time
 import traceback
 import uuid
@@ -26,6 +28,13 @@ import pulp.server.managers.factory as manager_factory
 
 _logger = logging.getLogger(__name__)
 
+# Shortest time between two progress reports written for a step tree, in seconds
+REPORT_INTERVAL_SECONDS = 1
+
+# Default number of steps a step tree processes at the same time when some of its steps have
+# concurrent children
+DEFAULT_MAX_CONCURRENT_STEPS = 4
+
 
 def _post_order(step):
     """
@@ -68,6 +77,18 @@ class Step(object):
         self.children = []
         self.last_report_time = 0
         self.last_reported_state = self.state
+        # (signature, child reports, report) from the last call to get_progress_report()
+        self._progress_cache = None
+        # the last report handed to the status conduit by this step, if it is the root
+        self._last_progress_report = None
+        # serializes progress reports from steps processed concurrently, if this is the root
+        self._report_lock = threading.RLock()
+        # if True, the children of this step are processed concurrently, each waiting only for
+        # the steps in its dependencies list; otherwise each child waits for the previous one
+        self.concurrent_children = False
+        self.dependencies = []
+        # the number of steps processed at the same time, if this is the root
+        self.max_concurrent_steps = DEFAULT_MAX_CONCURRENT_STEPS
         self.timestamp = str(time.time())
         self.non_halting_exceptions = non_halting_exceptions
         self.exceptions = []
@@ -94,6 +115,16 @@ class Step(object):
         step.parent = self
         self.children.insert(index, step)
 
+    def add_dependency(self, step):
+        """
+        Add a step that must be complete before this step, or any of its children, starts. This is
+        only used when the parent of this step processes its children concurrently.
+
+        :param step: The step to wait for
+        :type step: Step
+        """
+        self.dependencies.append(step)
+
     def get_status_conduit(self):
         if self.status_conduit:
             return self.status_conduit
@@ -118,14 +149,92 @@ class Step(object):
         * finalize - All finalize steps will be called even if one of them throws an exception.
                      This is so that open file handles can be closed.
         * post_process
+
+        If any step in the tree has concurrent_children set, up to max_concurrent_steps steps are
+        processed at the same time in separate threads. A step still only starts once all of its
+        children are complete, and once the previous sibling or the declared dependencies of it
+        and of its ancestors are complete. After a step fails no more steps are started, the
+        steps already running are allowed to finish, and the first error is raised.
         """
         try:
-            # Process the steps in post order
-            for step in _post_order(self):
-                step.process()
+            if any(step.concurrent_children for step in _post_order(self)):
+                self._process_concurrently()
+            else:
+                # Process the steps in post order
+                for step in _post_order(self):
+                    step.process()
         finally:
             self.report_progress(force=True)
 
+    def _process_concurrently(self):
+        """
+        Process the steps in this tree in post order, running steps whose prerequisites are
+        complete at the same time, in up to max_concurrent_steps threads.
+        """
+        pending = list(_post_order(self))
+        running = set()
+        done = set()
+        finished = Queue.Queue()
+        error = None
+
+        def process(step):
+            try:
+                step.process()
+                finished.put((step, None))
+            except Exception:
+                finished.put((step, sys.exc_info()))
+
+        while pending or running:
+            if error is None:
+                for step in [s for s in pending if self._is_ready(s, done)]:
+                    if len(running) >= self.max_concurrent_steps:
+                        break
+                    pending.remove(step)
+                    running.add(step)
+                    thread = threading.Thread(target=process, args=(step,))
+                    thread.daemon = True
+                    thread.start()
+            if not running:
+                if error is None:
+                    raise RuntimeError(_('Step dependencies can not be satisfied: %(steps)s') %
+                                       {'steps': ', '.join(s.step_id for s in pending)})
+                break
+            step, exc_info = finished.get()
+            running.remove(step)
+            done.add(step)
+            if exc_info is not None and error is None:
+                error = exc_info
+
+        if error is not None:
+            raise error[0], error[1], error[2]
+
+    @staticmethod
+    def _is_ready(step, done):
+        """
+        Determine whether a step can be processed, given the steps that are complete.
+
+        :param step: the step to check
+        :type step: Step
+        :param done: the steps that are complete
+        :type done: set
+
+        :return: whether the step can be processed
+        :rtype: bool
+        """
+        if not all(child in done for child in step.children):
+            return False
+        while step.parent is not None:
+            parent = step.parent
+            if parent.concurrent_children:
+                if not all(dependency in done for dependency in step.dependencies):
+                    return False
+            else:
+                index = parent.children.index(step)
+                if index > 0 and parent.children[index - 1] not in done:
+                    return False
+            step = parent
+        return True
+
     def is_skipped(self):
         """
         Test to find out if the step should be skipped.
@@ -258,6 +367,11 @@ class Step(object):
         """
         Bubble up that something has changed where progress should be reported.
         It is up to the parent to determine what actions should be taken.
+
+        The root step writes the report for the whole tree at most once every
+        REPORT_INTERVAL_SECONDS, unless the write is forced or a step changed state. Reports
+        that have not changed since the last write are not written again.
+
         :param force: Whether or not a write to the database should be forced
         :type force: bool
         """
@@ -267,26 +381,54 @@ class Step(object):
             self.last_reported_state = self.state
         if self.parent:
             self.parent.report_progress(force)
-        else:
-            if force:
-                self.get_status_conduit().set_progress(self.get_progress_report())
-            else:
-                current_time = time.time()
-                if current_time != self.last_report_time:
-                    # Update at most once a second
-                    self.get_status_conduit().set_progress(self.get_progress_report())
-                    self.last_report_time = current_time
+            return
+
+        with self._report_lock:
+            current_time = time.time()
+            if not force and current_time - self.last_report_time < REPORT_INTERVAL_SECONDS:
+                return
+            progress_report = self.get_progress_report()
+            if force or progress_report is not self._last_progress_report:
+                self.get_status_conduit().set_progress(progress_report)
+                self._last_progress_report = progress_report
+            self.last_report_time = current_time
+
+    def _progress_signature(self):
+        """
+        Return the values that the progress report of this step, not counting its children,
+        is built from. The report is only rebuilt when these change.
+
+        :returns: the values the progress report is built from
+        :rtype: tuple
+        """
+        return (self.uuid, self.step_id, self.state, self.progress_successes,
+                self.progress_failures, self.total_units, self.description, self.progress_details,
+                id(self.error_details), len(self.error_details))
 
     def get_progress_report(self):
         """
         Return the machine readable progress report for this task
 
+        The report of each step is cached, and is only built again when the step or one of its
+        children changed since the last call. Callers must not modify the returned report.
+
         :returns: The machine readable progress report for this task
         :rtype: dict
         """
         if self.progress_failures > 0:
             self.state = reporting_constants.STATE_FAILED
 
+        child_reports = []
+        for step in self.children:
+            child_reports.extend(step.get_progress_report())
+
+        signature = self._progress_signature()
+        if self._progress_cache is not None:
+            cached_signature, cached_child_reports, cached_report = self._progress_cache
+            if cached_signature == signature and len(cached_child_reports) == len(child_reports) \
+                    and all(a is b for a, b in zip(cached_child_reports, child_reports)):
+                return cached_report
+
         total_processed = self.progress_successes + self.progress_failures
         report = {
             reporting_constants.PROGRESS_STEP_UUID: self.uuid,
@@ -300,16 +442,15 @@ class Step(object):
             reporting_constants.PROGRESS_DESCRIPTION_KEY: self.description,
             reporting_constants.PROGRESS_DETAILS_KEY: self.progress_details
         }
+        result = [report]
         if self.children:
-            child_reports = []
-            for step in self.children:
-                child_reports.extend(step.get_progress_report())
             report[reporting_constants.PROGRESS_SUB_STEPS_KEY] = child_reports
             # Root object is just a list of reports, this should be the object at some point
             if self.parent is None:
-                return child_reports
+                result = child_reports
 
-        return [report]
+        self._progress_cache = (signature, child_reports, result)
+        return result
 
     def _record_failure(self, e=None, tb=None):
         """
@@ -707,6 +848,10 @@ class AtomicDirectoryPublishStep(PublishStep):
     This works by first copying the files to a master directory and creating or updating a symbolic
     links in the publish locations
 
+    The files are hard linked into the master directory rather than copied where the filesystem
+    allows it. Otherwise files that did not change since the previous publish are hard linked
+    from the previous master directory, and only the rest are copied.
+
     :param source_dir: The source directory to be copied
     :type source_dir: str
     :param publish_locations: The target locations that are being updated
@@ -745,8 +890,9 @@ class AtomicDirectoryPublishStep(PublishStep):
         # Given that it is timestamped for this publish/repo we could skip the copytree
         # for items where http & https are published to a separate directory
 
-        _logger.debug('Copying tree from %s to %s' % (self.source_dir, timestamp_master_dir))
-        shutil.copytree(self.source_dir, timestamp_master_dir, symlinks=True)
+        previous_master_dir = self._get_previous_master_dir()
+        _logger.debug('Linking tree from %s to %s' % (self.source_dir, timestamp_master_dir))
+        misc.link_tree(self.source_dir, timestamp_master_dir, previous_master_dir)
 
         for source_relative_location, publish_location in self.publish_locations:
             if source_relative_location.startswith('/'):
@@ -787,6 +933,32 @@ class AtomicDirectoryPublishStep(PublishStep):
         # Clear out any previously published masters
         self._clear_directory(self.master_publish_dir, skip_list=[self.parent.timestamp])
 
+    def _get_previous_master_dir(self):
+        """
+        Find the master directory written by the most recent earlier publish, if there is one.
+
+        :return: path of the previous master directory, or None if there is none
+        :rtype:  str or None
+        """
+        if not os.path.isdir(self.master_publish_dir):
+            return None
+
+        previous = None
+        for name in os.listdir(self.master_publish_dir):
+            if name == self.parent.timestamp:
+                continue
+            try:
+                timestamp = float(name)
+            except ValueError:
+                continue
+            path = os.path.join(self.master_publish_dir, name)
+            if os.path.isdir(path) and (previous is None or timestamp > previous[0]):
+                previous = (timestamp, path)
+
+        if previous is None:
+            return None
+        return previous[1]
+
 
 class SaveTarFilePublishStep(PublishStep):
     """
@@ -1056,7 +1228,7 @@ class GetLocalUnitsStep(PluginStep):
         units_we_already_had = set()
 
         # for any unit that is already in pulp, save it into the repo
-        for unit_dict in self.content_query_manager.get_multiple_units_by_keys_dicts(
+        for unit_dict in self.content_query_manager.find_units_by_keys_dicts(
                 self.unit_type, self.parent.available_units, self.unit_key_fields):
             unit = self._dict_to_unit(unit_dict)
             self.get_conduit().save_unit(unit)
@@ -3,6 +3,7 @@ Functions for verifying files.
 """
 
 import hashlib
+import os
 
 
 # Number of bytes to read into RAM at a time when validating the checksum
@@ -23,6 +24,10 @@ CHECKSUM_FUNCTIONS = {
     TYPE_SHA256: hashlib.sha256,
 }
 
+# Set once the server's configuration turns out to be unavailable, as it is for the client and
+# for plugin code run outside of a Pulp server; checksums are then never cached
+_server_config_missing = False
+
 
 class InvalidChecksumType(ValueError):
     """
@@ -100,13 +105,107 @@ def verify_checksum(file_object, checksum_type, checksum_value):
     if checksum_type not in CHECKSUM_FUNCTIONS:
         raise InvalidChecksumType('Unknown checksum type [%s]' % checksum_type)
 
-    hasher = CHECKSUM_FUNCTIONS[checksum_type]()
+    # Files in content storage do not change once they are stored, so their checksum is cached
+    identity = _content_file_identity(file_object)
+    checksum = None
+    if identity is not None:
+        # Imported here, so verifying any other file needs neither the server's database
+        # nor its configuration
+        from pulp.server.db.model.content import ContentChecksum
+
+        path, size, mtime, inode = identity
+        checksum = ContentChecksum.get_checksum(path, checksum_type, size, mtime, inode)
+
+    if checksum is None:
+        hasher = CHECKSUM_FUNCTIONS[checksum_type]()
+
+        file_object.seek(0)
+        bits = file_object.read(VALIDATION_CHUNK_SIZE)
+        while bits:
+            hasher.update(bits)
+            bits = file_object.read(VALIDATION_CHUNK_SIZE)
+        checksum = hasher.hexdigest()
+
+        # Only cache the checksum if the file did not change while it was read
+        if identity is not None and identity == _content_file_identity(file_object):
+            ContentChecksum.set_checksum(path, checksum_type, size, mtime, inode, checksum)
+
+    if checksum != checksum_value:
+        raise VerificationException(checksum)
+
+
+def calculate_checksums(file_object, checksum_types):
+    """
+    Calculates several checksums of the contents of the given file-like object in a single pass.
+
+    :param file_object: file-like object to calculate the checksums of
+    :param checksum_types: types of checksum to calculate; each must be one of the TYPE_*
+                           constants in this module
+    :type  checksum_types: list
+
+    :return: dict of checksum type to hex digest
+    :rtype:  dict
+
+    :raises ValueError: if a checksum type isn't one of the TYPE_* constants
+    """
+    hashers = {}
+    for checksum_type in checksum_types:
+        if checksum_type not in CHECKSUM_FUNCTIONS:
+            raise InvalidChecksumType('Unknown checksum type [%s]' % checksum_type)
+        hashers[checksum_type] = CHECKSUM_FUNCTIONS[checksum_type]()
 
     file_object.seek(0)
     bits = file_object.read(VALIDATION_CHUNK_SIZE)
     while bits:
-        hasher.update(bits)
+        for hasher in hashers.values():
+            hasher.update(bits)
         bits = file_object.read(VALIDATION_CHUNK_SIZE)
+    return dict((t, h.hexdigest()) for t, h in hashers.items())
+
+
+def _content_file_identity(file_object):
+    """
+    Identify the version of a file in content storage that a file object is open on.
 
-    if hasher.hexdigest() != checksum_value:
-        raise VerificationException(hasher.hexdigest())
+    :param file_object: file-like object to identify
+    :return: (absolute path, size, modification time, inode number) of the file, or None if the
+             file object is not a file in content storage
+    :rtype:  tuple or None
+    """
+    path = getattr(file_object, 'name', None)
+    if not isinstance(path, basestring):
+        return None
+    try:
+        stat = os.fstat(file_object.fileno())
+    except (AttributeError, ValueError, EnvironmentError):
+        return None
+
+    content_dir = _content_storage_dir()
+    if content_dir is None:
+        return None
+    path = os.path.abspath(path)
+    if not path.startswith(content_dir):
+        return None
+    return path, stat.st_size, stat.st_mtime, stat.st_ino
+
+
+def _content_storage_dir():
+    """
+    Find the directory the server stores content in.
+
+    :return: absolute path of the content storage directory, ending in a separator, or None if
+             the server's configuration is not available
+    :rtype:  str or None
+    """
+    global _server_config_missing
+    if _server_config_missing:
+        return None
+    try:
+        # Loading the configuration raises a RuntimeError if server.conf does not exist
+        from pulp.server.config import config
+    except (ImportError, RuntimeError):
+        _server_config_missing = True
+        return None
+
+    storage_dir = os.path.abspath(config.get('server', 'storage_dir'))
+    return os.path.join(storage_dir, 'content', '')
@@ -80,6 +80,8 @@ class ReplyHandler(Listener):
         consumer_id = call_context['consumer_id']
         repo_id = call_context['repo_id']
         distributor_id = call_context['distributor_id']
+        # actions requested in bulk share an action ID other than the task_id
+        action_id = call_context.get('action_id', action_id)
         manager.action_succeeded(consumer_id, repo_id, distributor_id, action_id)
 
     @staticmethod
@@ -111,6 +113,8 @@ class ReplyHandler(Listener):
         consumer_id = call_context['consumer_id']
         repo_id = call_context['repo_id']
         distributor_id = call_context['distributor_id']
+        # actions requested in bulk share an action ID other than the task_id
+        action_id = call_context.get('action_id', action_id)
         manager.action_failed(consumer_id, repo_id, distributor_id, action_id)
 
     # added for clarity
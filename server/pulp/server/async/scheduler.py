@@ -17,7 +17,8 @@ from pulp.server.async.tasks import _delete_worker
 from pulp.server.db import connection as db_connection
 from pulp.server.db.connection import retry_decorator
 from pulp.server.db.model.criteria import Criteria
-from pulp.server.db.model.dispatch import ScheduledCall, ScheduleEntry
+from pulp.server.db.model.dispatch import (ScheduledCall, ScheduledCallChange,
+                                           ScheduledCallChangeStamp, ScheduleEntry)
 from pulp.server.managers import resources
 from pulp.server.managers.schedule import utils
 
@@ -29,6 +30,12 @@ import pulp.server.logs  # noqa
 
 _logger = logging.getLogger(__name__)
 
+# A change stamp is allocated just before its change is recorded, so a stamp whose change
+# cannot be read is normally recorded moments later. If it still cannot be read after this many
+# seconds, the process that allocated it is assumed to have died, or the change was dropped
+# from the capped collection, and the whole schedule is loaded again.
+SCHEDULE_CHANGE_GAP_TIMEOUT = 60
+
 
 class FailureWatcher(object):
     _default_pop = (None, None, None)
@@ -274,6 +281,9 @@ class Scheduler(beat.Scheduler):
         self._schedule = None
         self._failure_watcher = FailureWatcher()
         self._loaded_from_db_count = 0
+        self._loaded_from_db_ids = set()
+        self._change_stamp = None
+        self._change_gap_since = None
 
         # Force the use of the Pulp celery_instance when this custom Scheduler is used.
         kwargs['app'] = app
@@ -344,12 +354,17 @@ class Scheduler(beat.Scheduler):
         for key, value in self.app.conf.CELERYBEAT_SCHEDULE.iteritems():
             self._schedule[key] = beat.ScheduleEntry(**dict(value, name=key))
 
+        # read the stamp before the schedules, so anything changed while they
+        # are loading gets merged on a later tick
+        self._change_stamp = ScheduledCallChangeStamp.get()
+        self._change_gap_since = None
+
         # include a "0" as the default in case there are no schedules to load
         update_timestamps = [0]
 
         _logger.debug(_('loading schedules from DB'))
         ignored_db_count = 0
-        self._loaded_from_db_count = 0
+        self._loaded_from_db_ids = set()
         for call in itertools.imap(ScheduledCall.from_db, utils.get_enabled()):
             if call.remaining_runs == 0:
                 _logger.debug(
@@ -358,31 +373,83 @@ class Scheduler(beat.Scheduler):
             else:
                 self._schedule[call.id] = call.as_schedule_entry()
                 update_timestamps.append(call.last_updated)
-                self._loaded_from_db_count += 1
+                self._loaded_from_db_ids.add(call.id)
+        self._loaded_from_db_count = len(self._loaded_from_db_ids)
 
         _logger.debug('loaded %(count)d schedules' % {'count': self._loaded_from_db_count})
 
         self._most_recent_timestamp = max(update_timestamps)
 
+    def merge_schedule_changes(self):
+        """
+        Merges schedules that were added, updated, disabled or deleted in the
+        database since they were last loaded into the "_schedule" dictionary.
+        Only the schedules named by changes recorded after the last merged
+        change stamp are read, so unchanged schedules are not read from the
+        database or parsed again.
+
+        Stamps are allocated by the database, so no change is missed because
+        of clock skew between processes. The last merged stamp only advances
+        over stamps whose changes have been read; if a change stays missing for
+        SCHEDULE_CHANGE_GAP_TIMEOUT seconds, the whole schedule is reloaded.
+        """
+        latest_stamp = ScheduledCallChangeStamp.get()
+
+        merged_stamp = self._change_stamp
+        changed_ids = set()
+        for change in ScheduledCallChange.get_since(self._change_stamp):
+            changed_ids.update(change['schedule_ids'])
+            if change['stamp'] == merged_stamp + 1:
+                merged_stamp = change['stamp']
+
+        if merged_stamp > self._change_stamp:
+            self._change_gap_since = None
+        if merged_stamp < latest_stamp:
+            if self._change_gap_since is None:
+                self._change_gap_since = time.time()
+            elif time.time() - self._change_gap_since > SCHEDULE_CHANGE_GAP_TIMEOUT:
+                _logger.warning(_('schedule change %(stamp)d was not recorded, reloading '
+                                  'all schedules') % {'stamp': merged_stamp + 1})
+                self.setup_schedule()
+                return
+
+        # changes to the same schedules after a missing stamp are merged now and
+        # merged again once the missing change is read, which is harmless
+        found_ids = set()
+        for call in utils.get(changed_ids):
+            found_ids.add(call.id)
+            if call.enabled and call.remaining_runs != 0:
+                self._schedule[call.id] = call.as_schedule_entry()
+                self._loaded_from_db_ids.add(call.id)
+            elif call.id in self._loaded_from_db_ids:
+                _logger.debug(_('removing disabled schedule: %(id)s') % {'id': call.id})
+                self._schedule.pop(call.id, None)
+                self._loaded_from_db_ids.discard(call.id)
+
+        for schedule_id in (changed_ids - found_ids) & self._loaded_from_db_ids:
+            _logger.debug(_('removing deleted schedule: %(id)s') % {'id': schedule_id})
+            self._schedule.pop(schedule_id, None)
+            self._loaded_from_db_ids.discard(schedule_id)
+
+        self._change_stamp = merged_stamp
+        self._loaded_from_db_count = len(self._loaded_from_db_ids)
+        _logger.debug('merged schedule changes, %(count)d schedules loaded' %
+                      {'count': self._loaded_from_db_count})
+
     @property
     @retry_decorator()
     def schedule_changed(self):
         """
-        Looks at the update timestamps in the database to determine if there
-        are new or modified schedules.
-
-        Indexing should make this very fast.
+        Compares the change stamp in the database, which every create, update
+        and delete of a schedule increments, with the one seen when schedules
+        were last loaded. This is a single lookup by ID.
 
         :return:    True iff the set of enabled scheduled calls has changed
                     in the database.
         :rtype:     bool
         """
-        if utils.get_enabled().count() != self._loaded_from_db_count:
-            logging.debug(_('number of enabled schedules has changed'))
-            return True
-
-        if utils.get_updated_since(self._most_recent_timestamp).count() > 0:
-            logging.debug(_('one or more enabled schedules has been updated'))
+        if ScheduledCallChangeStamp.get() != self._change_stamp:
+            logging.debug(_('one or more schedules has changed'))
             return True
 
         return False
@@ -399,7 +466,7 @@ class Scheduler(beat.Scheduler):
             return self.get_schedule()
 
         if self.schedule_changed:
-            self.setup_schedule()
+            self.merge_schedule_changes()
 
         return self._schedule
 
@@ -0,0 +1,144 @@
+"""
+A module for writing task progress to TaskStatus documents without writing every single update.
+
+Plugins may report progress many times per second, and each report used to be an update to the
+task_status collection. The ProgressWriter in this module writes the first report for a task right
+away, and then at most one report per task every PROGRESS_WINDOW_SECONDS. Only the most recent
+report from each window is written, by a timer thread at the end of the window. When a task
+reaches a terminal state, the pending report is handed to the code that writes that state so both
+go to the database in a single update.
+"""
+import copy
+from gettext import gettext as _
+import logging
+import threading
+import time
+
+from pulp.server.db.model.dispatch import TaskStatus
+
+
+_logger = logging.getLogger(__name__)
+
+# Shortest time between two progress report writes for the same task, in seconds
+PROGRESS_WINDOW_SECONDS = 2
+
+
+class ProgressWriter(object):
+    """
+    Coalesces progress report writes for tasks running in this process.
+
+    :ivar window: shortest time between two progress report writes for the same task, in seconds
+    :type window: float
+    """
+
+    def __init__(self, window=PROGRESS_WINDOW_SECONDS):
+        self.window = window
+        self._lock = threading.Lock()
+        # task_id: time of the last write for that task
+        self._last_write = {}
+        # task_id: (progress report waiting to be written, timer that will write it)
+        self._pending = {}
+
+    def set_progress(self, task_id, progress_report):
+        """
+        Write the progress report for a task, or hold it to be written at the end of the current
+        window if one was written less than a window ago. A held report replaces any report that
+        was already waiting for the same task.
+
+        Errors from an immediate write are raised to the caller. Errors from a delayed write are
+        logged.
+
+        :param task_id:         ID of the task whose progress is reported
+        :type  task_id:         basestring
+        :param progress_report: the complete progress report for the task
+        :type  progress_report: dict
+        """
+        # The caller keeps changing its report, so write a snapshot of it
+        progress_report = copy.deepcopy(progress_report)
+
+        with self._lock:
+            now = time.time()
+            self._trim(now)
+            last_write = self._last_write.get(task_id)
+            if last_write is not None and now - last_write < self.window:
+                if task_id in self._pending:
+                    timer = self._pending[task_id][1]
+                else:
+                    timer = threading.Timer(last_write + self.window - now,
+                                            self._write_pending, [task_id])
+                    timer.daemon = True
+                    timer.start()
+                self._pending[task_id] = (progress_report, timer)
+                return
+            self._last_write[task_id] = now
+
+        try:
+            self._write(task_id, progress_report)
+        except Exception:
+            # Let the next report try again right away
+            with self._lock:
+                self._last_write.pop(task_id, None)
+            raise
+
+    def pop_pending(self, task_id):
+        """
+        Stop tracking a task and return the progress report that is waiting to be written for it,
+        so it can be written along with the task's terminal state.
+
+        :param task_id: ID of the task
+        :type  task_id: basestring
+
+        :return: the progress report waiting to be written, or None if there is none
+        :rtype:  dict
+        """
+        with self._lock:
+            self._last_write.pop(task_id, None)
+            progress_report, timer = self._pending.pop(task_id, (None, None))
+        if timer is not None:
+            timer.cancel()
+        return progress_report
+
+    def _write_pending(self, task_id):
+        """
+        Timer callback that writes the progress report held for a task at the end of its window.
+
+        :param task_id: ID of the task
+        :type  task_id: basestring
+        """
+        with self._lock:
+            progress_report, timer = self._pending.pop(task_id, (None, None))
+            if progress_report is None:
+                # pop_pending() already took it
+                return
+            self._last_write[task_id] = time.time()
+
+        try:
+            self._write(task_id, progress_report)
+        except Exception:
+            _logger.exception(_('Error writing progress for task [%(id)s]') % {'id': task_id})
+
+    def _trim(self, now):
+        """
+        Forget tasks whose last write was more than a window ago and that have nothing waiting,
+        so tasks that never reach pop_pending() do not accumulate. The lock must be held.
+
+        :param now: the current time, in seconds since the epoch
+        :type  now: float
+        """
+        for task_id, last_write in self._last_write.items():
+            if now - last_write >= self.window and task_id not in self._pending:
+                del self._last_write[task_id]
+
+    @staticmethod
+    def _write(task_id, progress_report):
+        """
+        :param task_id:         ID of the task
+        :type  task_id:         basestring
+        :param progress_report: the complete progress report for the task
+        :type  progress_report: dict
+        """
+        TaskStatus.objects(task_id=task_id).update_one(set__progress_report=progress_report)
+
+
+# The writer shared by everything running in this process
+progress_writer = ProgressWriter()
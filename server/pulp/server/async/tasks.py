@@ -14,11 +14,12 @@ from mongoengine.queryset import DoesNotExist
 from pulp.common import constants, dateutils
 from pulp.server.async.celery_instance import celery, RESOURCE_MANAGER_QUEUE, \
     DEDICATED_QUEUE_EXCHANGE
+from pulp.server.async.status_writer import progress_writer
 from pulp.server.exceptions import PulpException, MissingResource
+from pulp.server.db import connection
 from pulp.server.db.model.criteria import Criteria
 from pulp.server.db.model.dispatch import TaskStatus
 from pulp.server.db.model.resources import ReservedResource, Worker
-from pulp.server.exceptions import NoWorkers
 from pulp.server.managers import resources
 from pulp.server.managers.repo import _common as common_utils
 
@@ -26,6 +27,12 @@ from pulp.server.managers.repo import _common as common_utils
 controller = control.Control(app=celery)
 _logger = logging.getLogger(__name__)
 
+# Longest a task status query may block waiting for a state change, in seconds
+MAX_STATUS_WAIT_SECONDS = 30
+
+# Time between checks of the task states while a task status query is waiting, in seconds
+STATUS_WAIT_INTERVAL_SECONDS = 0.25
+
 
 @task(acks_late=True)
 def _queue_reserved_task(name, task_id, resource_id, inner_args, inner_kwargs):
@@ -37,8 +44,8 @@ def _queue_reserved_task(name, task_id, resource_id, inner_args, inner_kwargs):
     and keyword arguments using the * and ** operators.
 
     The inner task is dispatched into a dedicated queue for a worker that is decided at dispatch
-    time. The logic deciding which queue receives a task is controlled through the
-    find_worker function.
+    time. Until a worker can take it, the inner task waits in the reservation request queue, from
+    which _dispatch_reservation_requests() dispatches it.
 
     :param name:          The name of the task to be called
     :type name:           basestring
@@ -53,34 +60,72 @@ def _queue_reserved_task(name, task_id, resource_id, inner_args, inner_kwargs):
 
     :return: None
     """
-    while True:
-        try:
-            worker = resources.get_worker_for_reservation(resource_id)
-        except NoWorkers:
-            pass
-        else:
-            break
+    # Queued before looking for a worker, so that a release in between still wakes us up
+    resources.queue_reservation_request(task_id, resource_id, name, inner_args, inner_kwargs)
+    _dispatch_reservation_requests()
 
-        try:
-            worker = resources.get_unreserved_worker()
-        except NoWorkers:
-            pass
-        else:
-            break
 
-        # No worker is ready for this work, so we need to wait
-        time.sleep(0.25)
+@task
+def _dispatch_reservation_requests():
+    """
+    Dispatch every task waiting in the reservation request queue that can be dispatched now. This
+    runs in the resource manager, when a task is queued and whenever reservation capacity may
+    have changed, so waiting tasks never poll for a worker.
+
+    A task whose resource is reserved goes to the worker that has it reserved. Otherwise it goes
+    to a worker from the set of free workers, if any is left. Tasks for the same resource are
+    dispatched in the order they were queued: once one of them has to wait, the ones queued after
+    it wait too. Tasks for other resources are not held up behind it.
+    """
+    requests = list(resources.get_reservation_requests())
+    if not requests:
+        return
+    reserving_workers = resources.get_reserving_worker_names(
+        set(r['resource_id'] for r in requests))
+    free_workers = None
+    waiting_resources = set()
+
+    for request in requests:
+        resource_id = request['resource_id']
+        if resource_id in waiting_resources:
+            continue
+        worker_name = reserving_workers.get(resource_id)
+        if worker_name is None:
+            if free_workers is None:
+                free_workers = [w.name for w in resources.get_unreserved_workers()]
+            if not free_workers:
+                waiting_resources.add(resource_id)
+                continue
+            worker_name = free_workers.pop(0)
+        reserving_workers[resource_id] = worker_name
+        _dispatch_reserved_task(request['task_id'], worker_name)
+
+
+def _dispatch_reserved_task(task_id, worker_name):
+    """
+    Reserve the resource of a queued task on the given worker, and dispatch the task to it.
+
+    :param task_id:     The UUID of the queued task
+    :type  task_id:     basestring
+    :param worker_name: The name of the worker to dispatch the task to
+    :type  worker_name: basestring
+    """
+    request = resources.pop_reservation_request(task_id)
+    if request is None:
+        # The task was canceled while it waited
+        return
 
-    ReservedResource(task_id, worker['name'], resource_id).save()
+    ReservedResource(task_id, worker_name, request.resource_id).save()
 
-    inner_kwargs['routing_key'] = worker.name
+    inner_kwargs = request.inner_kwargs
+    inner_kwargs['routing_key'] = worker_name
     inner_kwargs['exchange'] = DEDICATED_QUEUE_EXCHANGE
     inner_kwargs['task_id'] = task_id
 
     try:
-        celery.tasks[name].apply_async(*inner_args, **inner_kwargs)
+        celery.tasks[request.task_name].apply_async(*request.inner_args, **inner_kwargs)
     finally:
-        _release_resource.apply_async((task_id, ), routing_key=worker.name,
+        _release_resource.apply_async((task_id, ), routing_key=worker_name,
                                       exchange=DEDICATED_QUEUE_EXCHANGE)
 
 
@@ -115,6 +160,7 @@ def _delete_worker(name, normal_shutdown=False):
 
     # Delete all reserved_resource documents for the worker
     ReservedResource.get_collection().remove({'worker_name': name})
+    resources.notify_reservation_event('worker deleted')
 
     # Cancel all of the tasks that were assigned to this worker's queue
     worker = Worker.from_bson({'_id': name})
@@ -139,6 +185,7 @@ def _release_resource(task_id):
     :type  task_id: basestring
     """
     ReservedResource.get_collection().remove({'_id': task_id})
+    resources.notify_reservation_event('resource released')
 
 
 class TaskResult(object):
@@ -307,24 +354,37 @@ class Task(CeleryTask, ReservedTaskMixin):
         This overrides CeleryTask's __call__() method. We use this method
         for task state tracking of Pulp tasks.
         """
-        # Check task status and skip running the task if task state is 'canceled'.
-        try:
-            task_status = TaskStatus.objects.get(task_id=self.request.id)
-        except DoesNotExist:
-            task_status = None
-        if task_status and task_status['state'] == constants.CALL_CANCELED_STATE:
-            _logger.debug("Task cancel received for task-id : [%s]" % self.request.id)
-            return
-        # Update start_time and set the task state to 'running' for asynchronous tasks.
-        # Skip updating status for eagerly executed tasks, since we don't want to track
-        # synchronous tasks in our database.
+        # Update start_time and set the task state to 'running' for asynchronous tasks, unless
+        # the task was canceled. Skip updating status for eagerly executed tasks, since we don't
+        # want to track synchronous tasks in our database.
         if not self.request.called_directly:
+            connection.reset_operation_stats(self.request.id)
             now = datetime.now(dateutils.utc_tz())
             start_time = dateutils.format_iso8601_datetime(now)
-            # Using 'upsert' to avoid a possible race condition described in the apply_async method
-            # above.
-            TaskStatus.objects(task_id=self.request.id).update_one(
-                set__state=constants.CALL_RUNNING_STATE, set__start_time=start_time, upsert=True)
+            # Checking for cancellation and starting the task is a single update in the usual
+            # case. Only if nothing matched do we need to find out why.
+            started = TaskStatus.objects(
+                task_id=self.request.id, state__ne=constants.CALL_CANCELED_STATE).update_one(
+                set__state=constants.CALL_RUNNING_STATE, set__start_time=start_time)
+            if not started:
+                if TaskStatus.objects(task_id=self.request.id).only('state').first():
+                    # The task status exists, so it was canceled.
+                    _logger.debug("Task cancel received for task-id : [%s]" % self.request.id)
+                    return
+                # Using 'upsert' to avoid a possible race condition described in the apply_async
+                # method above.
+                TaskStatus.objects(task_id=self.request.id).update_one(
+                    set__state=constants.CALL_RUNNING_STATE, set__start_time=start_time,
+                    upsert=True)
+        else:
+            # Check task status and skip running the task if task state is 'canceled'.
+            try:
+                task_status = TaskStatus.objects.get(task_id=self.request.id)
+            except DoesNotExist:
+                task_status = None
+            if task_status and task_status['state'] == constants.CALL_CANCELED_STATE:
+                _logger.debug("Task cancel received for task-id : [%s]" % self.request.id)
+                return
         # Run the actual task
         _logger.debug("Running task : [%s]" % self.request.id)
         return super(Task, self).__call__(*args, **kwargs)
@@ -345,19 +405,12 @@ class Task(CeleryTask, ReservedTaskMixin):
         if not self.request.called_directly:
             now = datetime.now(dateutils.utc_tz())
             finish_time = dateutils.format_iso8601_datetime(now)
-            task_status = TaskStatus.objects.get(task_id=task_id)
-            task_status['finish_time'] = finish_time
-            task_status['result'] = retval
+            delta = {'finish_time': finish_time, 'result': retval}
 
-            # Only set the state to finished if it's not already in a complete state. This is
-            # important for when the task has been canceled, so we don't move the task from canceled
-            # to finished.
-            if task_status['state'] not in constants.CALL_COMPLETE_STATES:
-                task_status['state'] = constants.CALL_FINISHED_STATE
             if isinstance(retval, TaskResult):
-                task_status['result'] = retval.return_value
+                delta['result'] = retval.return_value
                 if retval.error:
-                    task_status['error'] = retval.error.to_dict()
+                    delta['error'] = retval.error.to_dict()
                 if retval.spawned_tasks:
                     task_list = []
                     for spawned_task in retval.spawned_tasks:
@@ -365,12 +418,15 @@ class Task(CeleryTask, ReservedTaskMixin):
                             task_list.append(spawned_task.task_id)
                         elif isinstance(spawned_task, dict):
                             task_list.append(spawned_task['task_id'])
-                    task_status['spawned_tasks'] = task_list
+                    delta['spawned_tasks'] = task_list
             if isinstance(retval, AsyncResult):
-                task_status['spawned_tasks'] = [retval.task_id, ]
-                task_status['result'] = None
+                delta['spawned_tasks'] = [retval.task_id, ]
+                delta['result'] = None
 
-            task_status.save()
+            # Only set the state to finished if it's not already in a complete state. This is
+            # important for when the task has been canceled, so we don't move the task from canceled
+            # to finished.
+            _save_terminal_status(task_id, constants.CALL_FINISHED_STATE, delta)
             common_utils.delete_working_directory()
 
     def on_failure(self, exc, task_id, args, kwargs, einfo):
@@ -389,18 +445,46 @@ class Task(CeleryTask, ReservedTaskMixin):
         if not self.request.called_directly:
             now = datetime.now(dateutils.utc_tz())
             finish_time = dateutils.format_iso8601_datetime(now)
-            task_status = TaskStatus.objects.get(task_id=task_id)
-            task_status['state'] = constants.CALL_ERROR_STATE
-            task_status['finish_time'] = finish_time
-            task_status['traceback'] = einfo.traceback
             if not isinstance(exc, PulpException):
                 exc = PulpException(str(exc))
-            task_status['error'] = exc.to_dict()
+            delta = {'finish_time': finish_time, 'traceback': einfo.traceback,
+                     'error': exc.to_dict()}
 
-            task_status.save()
+            _save_terminal_status(task_id, constants.CALL_ERROR_STATE, delta, override=True)
             common_utils.delete_working_directory()
 
 
+def _save_terminal_status(task_id, state, delta, override=False):
+    """
+    Synchronously write the terminal state of a task, together with any other changed fields, the
+    progress report that is still waiting to be written for it, and the database operations the
+    current thread made while running it, as a single update.
+
+    :param task_id:  ID of the task
+    :type  task_id:  basestring
+    :param state:    the terminal state to set
+    :type  state:    basestring
+    :param delta:    other fields to set, keyed by field name
+    :type  delta:    dict
+    :param override: if True the state is always set, otherwise a task that is already in a
+                     complete state, such as a canceled one, keeps its state
+    :type  override: bool
+    """
+    progress_report = progress_writer.pop_pending(task_id)
+    if progress_report is not None:
+        delta['progress_report'] = progress_report
+    delta['database_operations'] = connection.get_operation_stats()
+    update = dict(('set__%s' % field, value) for field, value in delta.items())
+
+    if override:
+        TaskStatus.objects(task_id=task_id).update_one(set__state=state, **update)
+        return
+
+    incomplete = TaskStatus.objects(task_id=task_id, state__nin=constants.CALL_COMPLETE_STATES)
+    if not incomplete.update_one(set__state=state, **update):
+        TaskStatus.objects(task_id=task_id).update_one(**update)
+
+
 def cancel(task_id):
     """
     Cancel the task that is represented by the given task_id. This method cancels only the task
@@ -422,6 +506,8 @@ def cancel(task_id):
         _logger.info(msg % {'task_id': task_id, 'state': task_status['state']})
         return
     controller.revoke(task_id, terminate=True)
+    # A task that still waits for a reservation is never dispatched
+    resources.pop_reservation_request(task_id)
     TaskStatus.objects(task_id=task_id, state__nin=constants.CALL_COMPLETE_STATES).\
         update_one(set__state=constants.CALL_CANCELED_STATE)
     msg = _('Task canceled: %(task_id)s.')
@@ -429,6 +515,51 @@ def cancel(task_id):
     _logger.info(msg)
 
 
+def get_task_statuses(task_ids, known_states=None, timeout=0):
+    """
+    Returns the statuses of many tasks in a single query. If a timeout is given, this call
+    blocks until at least one of the tasks is in a state other than the one the caller knows
+    about, or until the timeout expires, whichever comes first. This lets callers watching many
+    tasks replace a request per task per poll interval with a single long-poll request.
+
+    While waiting, only the task IDs and states are fetched from the database; the full
+    statuses are loaded once, when the call returns.
+
+    :param task_ids:     IDs of the tasks to return
+    :type  task_ids:     list
+    :param known_states: mapping of task ID to the state the caller last saw for it; if not
+                         specified, the states at the time of the call are used
+    :type  known_states: dict
+    :param timeout:      maximum number of seconds to wait for a state change; capped at
+                         MAX_STATUS_WAIT_SECONDS. If 0, the statuses are returned immediately.
+    :type  timeout:      float
+    :return:             statuses of the tasks that exist; unknown task IDs are omitted
+    :rtype:              list of pulp.server.db.model.dispatch.TaskStatus
+    """
+    timeout = min(max(timeout or 0, 0), MAX_STATUS_WAIT_SECONDS)
+    deadline = time.time() + timeout
+
+    def _current_states():
+        statuses = TaskStatus.objects(task_id__in=task_ids).only('task_id', 'state')
+        return dict((status['task_id'], status['state']) for status in statuses)
+
+    if timeout:
+        states = _current_states()
+        if known_states is None:
+            known_states = states
+
+        while time.time() < deadline:
+            if any(states.get(t) != known_states.get(t) for t in task_ids):
+                break
+            # Tasks in a complete state will never change again
+            if all(states.get(t) in constants.CALL_COMPLETE_STATES for t in task_ids):
+                break
+            time.sleep(min(STATUS_WAIT_INTERVAL_SECONDS, max(deadline - time.time(), 0)))
+            states = _current_states()
+
+    return list(TaskStatus.objects(task_id__in=task_ids))
+
+
 def get_current_task_id():
     """"
     Get the current task id from celery. If this is called outside of a running
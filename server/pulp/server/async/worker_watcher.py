@@ -69,8 +69,9 @@ def handle_worker_heartbeat(event):
 
     The event is first parsed and logged.  Then the existing Worker objects are
     searched for one to update. If an existing one is found, it is updated.
-    Otherwise a new Worker entry is created. Logging at the info and debug
-    level is also done.
+    Otherwise a new Worker entry is created, and a reservation event is recorded so
+    that tasks waiting for an unreserved worker are dispatched to it. Logging at the
+    info and debug level is also done.
 
     :param event: A celery event to handle.
     :type event: dict
@@ -91,6 +92,8 @@ def handle_worker_heartbeat(event):
         msg = _("New worker '%(worker_name)s' discovered") % event_info
         _logger.info(msg)
         new_worker.save()
+        # A new worker can take a task that is waiting for an unreserved worker
+        resources.notify_reservation_event('worker discovered')
 
 
 def handle_worker_offline(event):
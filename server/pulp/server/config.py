@@ -21,6 +21,7 @@ _default_values = {
         'repo_sync_history': '60',
         'repo_publish_history': '60',
         'repo_group_publish_history': '60',
+        'repo_group_member_publish': '1',
         'task_status_history': '7',
         'task_result_history': '3',
     },
@@ -34,6 +35,9 @@ _default_values = {
         'ssl_certfile': '',
         'verify_ssl': 'true',
         'ca_path': '/etc/pki/tls/certs/ca-bundle.crt',
+        'slow_operation_threshold': '1',
+        'search_read_preference': 'primary',
+        'report_read_preference': 'primary',
     },
     'email': {
         'host': 'localhost',
@@ -1,14 +1,18 @@
 # -*- coding: utf-8 -*-
 
+import contextlib
 import copy
 import itertools
 import logging
 import ssl
+import threading
 import time
 from gettext import gettext as _
 
 import mongoengine
+from pymongo import ReadPreference
 from pymongo.collection import Collection
+from pymongo.cursor import Cursor
 from pymongo.errors import AutoReconnect, OperationFailure
 from pymongo.son_manipulator import NamespaceInjector
 
@@ -20,6 +24,25 @@ from pulp.server.exceptions import PulpException
 _CONNECTION = None
 _DATABASE = None
 _DEFAULT_MAX_POOL_SIZE = 10
+# Operations taking at least this many seconds are logged; 0 disables the log
+_SLOW_OPERATION_THRESHOLD = 0
+
+# Classes of read-only operations that may be configured to read from replica set secondaries
+READ_SEARCH = 'search'
+READ_REPORT = 'report'
+READ_CLASSES = (READ_SEARCH, READ_REPORT)
+
+# Values of the <read class>_read_preference settings
+READ_PREFERENCES = {
+    'primary': ReadPreference.PRIMARY,
+    'primaryPreferred': ReadPreference.PRIMARY_PREFERRED,
+    'secondary': ReadPreference.SECONDARY,
+    'secondaryPreferred': ReadPreference.SECONDARY_PREFERRED,
+    'nearest': ReadPreference.NEAREST,
+}
+
+# The read preference of each read class, loaded from the configuration by initialize()
+_READ_PREFERENCES = {}
 # please keep this in X.Y.Z format, with only integers.
 # see version.cpp in mongo source code for version format info.
 MONGO_MINIMUM_VERSION = "2.4.0"
@@ -36,11 +59,14 @@ def initialize(name=None, seeds=None, max_pool_size=None, replica_set=None, max_
                         connection retries
     :type  max_timeout: int
     """
-    global _CONNECTION, _DATABASE
+    global _CONNECTION, _DATABASE, _SLOW_OPERATION_THRESHOLD, _READ_PREFERENCES
 
     try:
         connection_kwargs = {}
 
+        _SLOW_OPERATION_THRESHOLD = config.config.getfloat('database', 'slow_operation_threshold')
+        _READ_PREFERENCES = _load_read_preferences()
+
         if name is None:
             name = config.config.get('database', 'name')
 
@@ -65,7 +91,14 @@ def initialize(name=None, seeds=None, max_pool_size=None, replica_set=None, max_
                 replica_set = config.config.get('database', 'replica_set')
 
         if replica_set is not None:
-            connection_kwargs['replicaset'] = replica_set
+            if [p for p in _READ_PREFERENCES.values() if p != ReadPreference.PRIMARY]:
+                # Only a replica set client sends reads to secondaries. It takes all the seeds
+                # as its host, and no port.
+                connection_kwargs['replicaSet'] = replica_set
+                connection_kwargs['host'] = seeds
+                connection_kwargs.pop('port', None)
+            else:
+                connection_kwargs['replicaset'] = replica_set
 
         # Process SSL settings
         if config.config.getboolean('database', 'ssl'):
@@ -143,6 +176,48 @@ def initialize(name=None, seeds=None, max_pool_size=None, replica_set=None, max_
         raise
 
 
+def _load_read_preferences():
+    """
+    Read the read preference of each read class from the configuration.
+
+    :return: the pymongo read preference of each read class
+    :rtype:  dict
+    :raises RuntimeError: if a configured read preference is not valid
+    """
+    read_preferences = {}
+    for read_class in READ_CLASSES:
+        value = config.config.get('database', '%s_read_preference' % read_class)
+        if value not in READ_PREFERENCES:
+            msg = _('Invalid %(read_class)s_read_preference [%(value)s], must be one of: '
+                    '%(valid)s')
+            raise RuntimeError(msg % {'read_class': read_class, 'value': value,
+                                      'valid': ', '.join(sorted(READ_PREFERENCES))})
+        read_preferences[read_class] = READ_PREFERENCES[value]
+    return read_preferences
+
+
+_read_scope = threading.local()
+
+
+@contextlib.contextmanager
+def read_preference(read_class):
+    """
+    Context manager that makes queries started by the current thread inside it use the read
+    preference configured for the given class of read-only operations, unless they specify one.
+    Only use it around code that does not write, and that can use data that is slightly behind
+    the primary.
+
+    :param read_class: one of the READ_* classes
+    :type  read_class: str
+    """
+    previous = getattr(_read_scope, 'read_preference', None)
+    _read_scope.read_preference = _READ_PREFERENCES.get(read_class, ReadPreference.PRIMARY)
+    try:
+        yield
+    finally:
+        _read_scope.read_preference = previous
+
+
 class PulpCollectionFailure(PulpException):
     """
     Exceptions generated by the PulpCollection class
@@ -178,12 +253,160 @@ def retry_decorator(full_name=None):
     return _decorator
 
 
+class _OperationStats(threading.local):
+    """
+    Counts the database operations made by the current thread since the last reset.
+
+    :ivar task_id:   ID of the task the thread is running, if any
+    :type task_id:   basestring
+    :ivar count:     number of operations
+    :type count:     int
+    :ivar seconds:   total time spent in the operations
+    :type seconds:   float
+    :ivar documents: total number of documents returned by the operations
+    :type documents: int
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self, task_id=None):
+        self.task_id = task_id
+        self.count = 0
+        self.seconds = 0.0
+        self.documents = 0
+
+
+_operation_stats = _OperationStats()
+
+
+def reset_operation_stats(task_id=None):
+    """
+    Start counting the database operations made by the current thread from zero.
+
+    :param task_id: ID of the task the thread is about to run, which is included when slow
+                    operations are logged
+    :type  task_id: basestring
+    """
+    _operation_stats.reset(task_id)
+
+
+def get_operation_stats():
+    """
+    :return: the number of database operations made by the current thread since the last call to
+             reset_operation_stats(), the total seconds they took, and the total number of
+             documents they returned, as a dict with keys 'count', 'seconds' and 'documents'
+    :rtype:  dict
+    """
+    return {'count': _operation_stats.count,
+            'seconds': _operation_stats.seconds,
+            'documents': _operation_stats.documents}
+
+
+def query_shape(spec):
+    """
+    Return the shape of a query, with every value replaced by a placeholder, so that queries
+    that differ only in their values look the same in the log.
+
+    :param spec: a query document, or any value in one
+    :type  spec: object
+    :return: the query with its values replaced
+    :rtype:  object
+    """
+    if isinstance(spec, dict):
+        return dict((key, query_shape(value)) for key, value in spec.iteritems())
+    if isinstance(spec, (list, tuple)):
+        if spec and isinstance(spec[0], (dict, list, tuple)):
+            return [query_shape(spec[0])]
+        return ['?']
+    return '?'
+
+
+def _record_operation(collection_name, operation, spec, seconds, documents):
+    """
+    Count a database operation made by the current thread, and log it if it was slow.
+
+    :param collection_name: full name of the collection the operation was made on
+    :type  collection_name: basestring
+    :param operation:       name of the operation
+    :type  operation:       basestring
+    :param spec:            the query of the operation, if it has one
+    :type  spec:            dict or None
+    :param seconds:         time the operation took
+    :type  seconds:         float
+    :param documents:       number of documents the operation returned
+    :type  documents:       int
+    """
+    _operation_stats.count += 1
+    _operation_stats.seconds += seconds
+    _operation_stats.documents += documents
+
+    if _SLOW_OPERATION_THRESHOLD and seconds >= _SLOW_OPERATION_THRESHOLD:
+        msg = _('Slow database operation: %(operation)s on %(name)s took %(seconds).3f seconds '
+                'and returned %(documents)d documents for task %(task_id)s, query: %(query)s')
+        _logger.warning(msg % {'operation': operation, 'name': collection_name,
+                               'seconds': seconds, 'documents': documents,
+                               'task_id': _operation_stats.task_id,
+                               'query': query_shape(spec)})
+
+
+def instrument_decorator(full_name=None):
+    """
+    Collection instance method decorator that counts and times the operation, and logs it if it
+    is slow.
+
+    :param full_name: the full name of the database collection
+    :type  full_name: str
+    """
+
+    def _decorator(method):
+
+        @wraps(method)
+        def instrumented(*args, **kwargs):
+            spec = kwargs.get('spec', kwargs.get('query'))
+            if spec is None and args and isinstance(args[0], dict):
+                spec = args[0]
+            start = time.time()
+            result = method(*args, **kwargs)
+            documents = len(result) if isinstance(result, list) else 0
+            _record_operation(full_name, method.__name__, spec, time.time() - start, documents)
+            return result
+
+        return instrumented
+
+    return _decorator
+
+
+class PulpCursor(Cursor):
+    """
+    pymongo.cursor.Cursor that counts and times each round trip to the database, and logs it if it
+    is slow.
+    """
+
+    def __init__(self, collection, *args, **kwargs):
+        super(PulpCursor, self).__init__(collection, *args, **kwargs)
+        self._pulp_spec = kwargs.get('spec', args[0] if args else None)
+
+    def _refresh(self):
+        if not self.alive:
+            # nothing will be sent to the database
+            return super(PulpCursor, self)._refresh()
+        start = time.time()
+        documents = super(PulpCursor, self)._refresh()
+        _record_operation(self.collection.full_name, 'find', self._pulp_spec,
+                          time.time() - start, documents)
+        return documents
+
+
 class PulpCollection(Collection):
     """
     pymongo.collection.Collection wrapper that provides auto-retry support when
     pymongo.errors.AutoReconnect exception is raised
     and automatically manages connection sockets for long-running and threaded
     applications
+
+    The operations that read or write documents are counted and timed per thread, see
+    get_operation_stats(), and logged with the shape of their query if they are slow.
     """
 
     _decorated_methods = ('get_lasterror_options', 'set_lasterror_options',
@@ -193,12 +416,38 @@ class PulpCollection(Collection):
                           'group', 'rename', 'distinct', 'map_reduce', 'inline_map_reduce',
                           'find_and_modify')
 
+    # find() and find_one() are counted by PulpCursor as the documents are fetched
+    _instrumented_methods = ('insert', 'save', 'update', 'remove', 'count', 'group', 'distinct',
+                             'map_reduce', 'inline_map_reduce', 'find_and_modify')
+
     def __init__(self, database, name, create=False, **kwargs):
         super(PulpCollection, self).__init__(database, name, create=create, **kwargs)
 
+        for m in self._instrumented_methods:
+            setattr(self, m, instrument_decorator(self.full_name)(getattr(self, m)))
         for m in self._decorated_methods:
             setattr(self, m, retry_decorator(self.full_name)(getattr(self, m)))
 
+    def find(self, *args, **kwargs):
+        """
+        Query the collection, returning a PulpCursor. Takes the same arguments as
+        pymongo.collection.Collection.find(). Inside read_preference(), the query uses the read
+        preference configured for that class of reads.
+
+        :return: cursor for the query
+        :rtype:  PulpCursor
+        """
+        # the same defaults pymongo.collection.Collection.find() passes to its cursor, except
+        # for the read preference, which may be set for the thread by read_preference()
+        kwargs.setdefault('slave_okay', self.slave_okay)
+        scope_read_preference = getattr(_read_scope, 'read_preference', None)
+        if scope_read_preference is not None:
+            kwargs.setdefault('read_preference', scope_read_preference)
+        kwargs.setdefault('read_preference', self.read_preference)
+        kwargs.setdefault('tag_sets', self.tag_sets)
+        kwargs.setdefault('secondary_acceptable_latency_ms', self.secondary_acceptable_latency_ms)
+        return PulpCursor(self, *args, **kwargs)
+
     def __getstate__(self):
         return {'name': self.name}
 
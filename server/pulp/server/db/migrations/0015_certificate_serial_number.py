@@ -0,0 +1,35 @@
+"""
+This migration moves the serial number of the last certificate signed by the Pulp CA from the
+serial number file into the database, so that certificates signed after the upgrade do not reuse
+serial numbers.
+"""
+import logging
+
+from pulp.server import config
+from pulp.server.db.model.auth import CertificateSerialNumber
+
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(*args, **kwargs):
+    """
+    Perform the migration as described in this module's docblock.
+
+    :param args:   unused
+    :type  args:   list
+    :param kwargs: unused
+    :type  kwargs: dict
+    """
+    path = config.config.get('security', 'serial_number_path')
+    try:
+        with open(path) as serial_file:
+            serial = int(serial_file.read())
+    except (IOError, ValueError):
+        # No certificate was ever signed, or the file was damaged, which older versions of Pulp
+        # also treated as no certificate having been signed.
+        return
+
+    if serial > CertificateSerialNumber.get():
+        CertificateSerialNumber.reset(serial)
+        _logger.info('Certificate serial number %(s)d moved to the database' % {'s': serial})
@@ -0,0 +1,37 @@
+"""
+This migration stores the digest of its unit key on every content unit of every type, so units can
+be looked up by key through the unique index on the digest field.
+"""
+import logging
+
+from pulp.plugins.types import database
+
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(*args, **kwargs):
+    """
+    Perform the migration as described in this module's docblock.
+
+    :param args:   unused
+    :type  args:   list
+    :param kwargs: unused
+    :type  kwargs: dict
+    """
+    for type_def in database.all_type_definitions():
+        key_fields = type_def['unit_key']
+        if not key_fields:
+            continue
+        collection = database.type_units_collection(type_def['id'])
+        query = {database.UNIT_KEY_DIGEST: {'$exists': False}}
+        count = 0
+        for unit in collection.find(query, fields=key_fields):
+            unit_key = dict((f, unit.get(f)) for f in key_fields)
+            digest = database.unit_key_digest(unit_key)
+            collection.update({'_id': unit['_id']},
+                              {'$set': {database.UNIT_KEY_DIGEST: digest}}, safe=True)
+            count += 1
+        if count:
+            _logger.info('Unit key digest stored on %(c)d units of type %(t)s' %
+                         {'c': count, 't': type_def['id']})
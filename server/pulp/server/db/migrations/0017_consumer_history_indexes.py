@@ -0,0 +1,31 @@
+"""
+This migration drops the single-field consumer_id and type indexes on the consumer history, which
+are covered by the compound indexes it is now queried and paged through.
+"""
+import logging
+
+from pymongo import DESCENDING
+
+from pulp.server.db import connection
+
+
+_logger = logging.getLogger(__name__)
+
+OBSOLETE_INDEXES = ([('consumer_id', DESCENDING)], [('type', DESCENDING)])
+
+
+def migrate(*args, **kwargs):
+    """
+    Perform the migration as described in this module's docblock.
+
+    :param args:   unused
+    :type  args:   list
+    :param kwargs: unused
+    :type  kwargs: dict
+    """
+    collection = connection.get_collection('consumer_history')
+    existing = collection.index_information()
+    for name, info in existing.items():
+        if info['key'] in OBSOLETE_INDEXES:
+            collection.drop_index(name)
+            _logger.info('Dropped index %(n)s from consumer_history' % {'n': name})
@@ -11,6 +11,8 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+from pymongo.errors import DuplicateKeyError
+
 from pulp.server.db.model.base import Model
 
 # -- classes -----------------------------------------------------------------
@@ -96,3 +98,63 @@ class Permission(Model):
 
         self.resource = resource
         self.users = users or []
+
+
+class CertificateSerialNumber(Model):
+    """
+    A single document holding the serial number of the last certificate the
+    Pulp CA signed. It is incremented atomically so that any number of server
+    processes can sign certificates without reusing a serial number.
+    """
+
+    collection_name = 'certificate_serial_number'
+    unique_indices = ()
+
+    SERIAL_ID = 'serial_number'
+
+    @classmethod
+    def next(cls):
+        """
+        Allocate the next serial number.
+
+        :return: the allocated serial number, starting at 1
+        :rtype:  int
+        """
+        try:
+            counter = cls._increment()
+        except DuplicateKeyError:
+            # Another process created the counter at the same time; it exists now
+            counter = cls._increment()
+        return counter['serial']
+
+    @classmethod
+    def get(cls):
+        """
+        :return: the last allocated serial number, which is 0 if none was ever allocated
+        :rtype:  int
+        """
+        counter = cls.get_collection().find_one({'_id': cls.SERIAL_ID})
+        if counter is None:
+            return 0
+        return counter['serial']
+
+    @classmethod
+    def reset(cls, serial=0):
+        """
+        Set the last allocated serial number.
+
+        :param serial: the serial number the next allocation follows
+        :type  serial: int
+        """
+        cls.get_collection().update({'_id': cls.SERIAL_ID}, {'$set': {'serial': serial}},
+                                    upsert=True, safe=True)
+
+    @classmethod
+    def _increment(cls):
+        """
+        :return: the counter document after it is incremented
+        :rtype:  dict
+        """
+        return cls.get_collection().find_and_modify({'_id': cls.SERIAL_ID},
+                                                    {'$inc': {'serial': 1}},
+                                                    upsert=True, new=True)
@@ -311,6 +311,36 @@ class UnitProfile(Model):
         return hasher.hexdigest()
 
 
+class ReportedUnitProfile(Model):
+    """
+    The unit profile exactly as a consumer reported it, kept for the profiles that the
+    profiler translated before they were stored as a UnitProfile. Consumers calculate the
+    changes to their profile against what they last reported, so the changes are applied to
+    this copy rather than to the translated profile.
+
+    :ivar  consumer_id:  A consumer ID.
+    :type consumer_id:  str
+    :ivar  content_type: The profile (unit) type ID.
+    :type content_type: str
+    :ivar  profile:      The reported profile.
+    :type profile:      object
+    :ivar  profile_hash: The hash of the UnitProfile that was stored for this report
+    :type profile_hash: basestring
+    """
+
+    collection_name = 'consumer_reported_unit_profiles'
+    unique_indices = (
+        ('consumer_id', 'content_type'),
+    )
+
+    def __init__(self, consumer_id, content_type, profile, profile_hash):
+        super(ReportedUnitProfile, self).__init__()
+        self.consumer_id = consumer_id
+        self.content_type = content_type
+        self.profile = profile
+        self.profile_hash = profile_hash
+
+
 class ConsumerHistoryEvent(Model, ReaperMixin):
     """
     Represents a consumer history event.
@@ -336,7 +366,13 @@ class ConsumerHistoryEvent(Model, ReaperMixin):
     :type details: dict
     """
     collection_name = 'consumer_history'
-    search_indices = ('consumer_id', 'originator', 'type', )
+    # history is queried by consumer and/or type, sorted and paged by timestamp and _id;
+    # each compound index serves one of those query shapes in either sort direction
+    search_indices = ('originator',
+                      ('consumer_id', 'timestamp', '_id'),
+                      ('consumer_id', 'type', 'timestamp', '_id'),
+                      ('type', 'timestamp', '_id'),
+                      ('timestamp', '_id'))
 
     def __init__(self, consumer_id, originator, event_type, details):
         super(ConsumerHistoryEvent, self).__init__()
@@ -10,6 +10,8 @@
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
 import json
+import os
+import re
 
 from hashlib import sha256
 from datetime import datetime, timedelta
@@ -148,3 +150,89 @@ class ContentCatalog(Model):
         self.unit_key = unit_key
         self.locator = self.get_locator(type_id, unit_key)
         self.url = url
+
+
+class ContentChecksum(Model):
+    """
+    Caches the checksum calculated for a file in content storage, so that verifying the file
+    again does not require reading it as long as it has not changed. A cached checksum is only
+    valid for the file it was calculated for, identified by its path, size, modification time
+    and inode.
+
+    :ivar path: The absolute path of the file.
+    :type path: str
+    :ivar algorithm: The checksum algorithm.
+    :type algorithm: str
+    :ivar size: The size of the file in bytes.
+    :type size: int
+    :ivar mtime: The modification time of the file.
+    :type mtime: float
+    :ivar inode: The inode number of the file.
+    :type inode: int
+    :ivar checksum: The hex digest of the file's contents.
+    :type checksum: str
+    """
+
+    collection_name = 'content_checksums'
+    unique_indices = (('path', 'algorithm'),)
+
+    @classmethod
+    def get_checksum(cls, path, algorithm, size, mtime, inode):
+        """
+        Get the cached checksum of a file.
+
+        :param path: The absolute path of the file.
+        :type path: str
+        :param algorithm: The checksum algorithm.
+        :type algorithm: str
+        :param size: The size of the file in bytes.
+        :type size: int
+        :param mtime: The modification time of the file.
+        :type mtime: float
+        :param inode: The inode number of the file.
+        :type inode: int
+        :return: The cached hex digest, or None if there is none for this version of the file.
+        :rtype: str or None
+        """
+        spec = {'path': path, 'algorithm': algorithm, 'size': size, 'mtime': mtime,
+                'inode': inode}
+        document = cls.get_collection().find_one(spec, fields=['checksum'])
+        if document is None:
+            return None
+        return document['checksum']
+
+    @classmethod
+    def set_checksum(cls, path, algorithm, size, mtime, inode, checksum):
+        """
+        Cache the checksum of a file, replacing any checksum cached for an earlier version of it.
+
+        :param path: The absolute path of the file.
+        :type path: str
+        :param algorithm: The checksum algorithm.
+        :type algorithm: str
+        :param size: The size of the file in bytes.
+        :type size: int
+        :param mtime: The modification time of the file.
+        :type mtime: float
+        :param inode: The inode number of the file.
+        :type inode: int
+        :param checksum: The hex digest of the file's contents.
+        :type checksum: str
+        """
+        cls.get_collection().update(
+            {'path': path, 'algorithm': algorithm},
+            {'$set': {'size': size, 'mtime': mtime, 'inode': inode, 'checksum': checksum}},
+            upsert=True)
+
+    @classmethod
+    def remove_checksums(cls, path):
+        """
+        Remove the cached checksums of a file, or of every file under a directory, when it is
+        deleted from content storage.
+
+        :param path: The absolute path of the file or directory.
+        :type path: str
+        """
+        path = os.path.abspath(path)
+        cls.get_collection().remove(
+            {'$or': [{'path': path}, {'path': {'$regex': '^%s/' % re.escape(path)}}]})
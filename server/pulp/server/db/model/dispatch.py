@@ -10,10 +10,13 @@ from celery import beat
 from celery.schedules import schedule as CelerySchedule
 from celery.utils.timeutils import timedelta_seconds
 from mongoengine import DictField, Document, DynamicField, ListField, StringField
+from pymongo import ASCENDING
+from pymongo.errors import CollectionInvalid, DuplicateKeyError
 import isodate
 
 from pulp.common import constants, dateutils
 from pulp.server.async.celery_instance import celery as app
+from pulp.server.db import connection
 from pulp.server.db.model.base import Model, CriteriaQuerySet
 from pulp.server.db.model.fields import ISO8601StringField
 from pulp.server.db.model.reaper_base import ReaperMixin
@@ -70,6 +73,131 @@ class QueuedCallGroup(Model):
         self.completed_calls = 0
 
 
+class ScheduledCallChangeStamp(Model):
+    """
+    A single document whose counter is incremented by the database whenever a ScheduledCall is
+    created, updated, disabled or deleted. The scheduler compares it with the value it last saw
+    to find out cheaply whether it needs to merge changes from the scheduled_calls collection.
+    """
+
+    collection_name = 'scheduled_call_change_stamp'
+    unique_indices = ()
+
+    STAMP_ID = 'scheduled_calls'
+
+    @classmethod
+    def increment(cls):
+        """
+        Allocate the next change stamp.
+
+        :return:    the allocated stamp, starting at 1
+        :rtype:     int
+        """
+        try:
+            stamp = cls._increment()
+        except DuplicateKeyError:
+            # Another process created the stamp at the same time; it exists now
+            stamp = cls._increment()
+        return stamp['stamp']
+
+    @classmethod
+    def get(cls):
+        """
+        :return:    the current value of the change stamp, which is 0 if nothing was ever changed
+        :rtype:     int
+        """
+        stamp = cls.get_collection().find_one({'_id': cls.STAMP_ID})
+        if stamp is None:
+            return 0
+        return stamp['stamp']
+
+    @classmethod
+    def _increment(cls):
+        """
+        :return:    the stamp document after it is incremented
+        :rtype:     dict
+        """
+        return cls.get_collection().find_and_modify({'_id': cls.STAMP_ID},
+                                                    {'$inc': {'stamp': 1}},
+                                                    upsert=True, new=True)
+
+
+class ScheduledCallChange(Model):
+    """
+    Records which schedules a single change stamp was allocated for. They are stored in a capped
+    collection, so the scheduler can read the changes made since the stamp it last merged
+    without relying on the clocks of the processes that made them. Every change is recorded
+    after the schedules themselves are written.
+
+    :ivar stamp:        the ScheduledCallChangeStamp allocated to this change
+    :type stamp:        int
+    :ivar schedule_ids: IDs of the schedules that were created, updated or deleted
+    :type schedule_ids: list of basestring
+    """
+
+    collection_name = 'scheduled_call_changes'
+    unique_indices = ('stamp',)
+
+    # Size of the capped collection, in bytes. The scheduler reads changes a few seconds after
+    # they are made, so this only needs to hold the changes made between two of its ticks.
+    capped_size = 1048576
+
+    def __init__(self, stamp, schedule_ids):
+        """
+        :param stamp:           the ScheduledCallChangeStamp allocated to this change
+        :type  stamp:           int
+        :param schedule_ids:    IDs of the schedules that were created, updated or deleted
+        :type  schedule_ids:    list of basestring
+        """
+        super(ScheduledCallChange, self).__init__()
+
+        self.stamp = stamp
+        self.schedule_ids = schedule_ids
+
+        # We don't need this
+        del self['id']
+
+    @classmethod
+    def _get_collection_from_db(cls):
+        """
+        Create the capped collection if it does not exist yet.
+
+        :return:    the capped collection for schedule changes
+        :rtype:     pulp.server.db.connection.PulpCollection
+        """
+        database = connection.get_database()
+        if cls.collection_name not in database.collection_names():
+            try:
+                database.create_collection(cls.collection_name, capped=True,
+                                           size=cls.capped_size)
+            except CollectionInvalid:
+                # Another process created it first
+                pass
+        return super(ScheduledCallChange, cls)._get_collection_from_db()
+
+    @classmethod
+    def record(cls, schedule_ids):
+        """
+        Allocate a change stamp and record that it was allocated for the given schedules.
+
+        :param schedule_ids:    IDs of the schedules that were created, updated or deleted
+        :type  schedule_ids:    list of basestring
+        """
+        change = cls(ScheduledCallChangeStamp.increment(), list(schedule_ids))
+        cls.get_collection().insert(dict(change), safe=True)
+
+    @classmethod
+    def get_since(cls, stamp):
+        """
+        :param stamp:   the change stamp that was last merged
+        :type  stamp:   int
+
+        :return:    pymongo cursor of changes with a greater stamp, in stamp order
+        :rtype:     pymongo.cursor.Cursor
+        """
+        return cls.get_collection().find({'stamp': {'$gt': stamp}}).sort('stamp', ASCENDING)
+
+
 class ScheduledCall(Model):
     """
     Serialized scheduled call request
@@ -299,6 +427,7 @@ class ScheduledCall(Model):
             as_dict['_id'] = ObjectId(as_dict['_id'])
             self.get_collection().insert(as_dict, safe=True)
             self._new = False
+            ScheduledCallChange.record([self.id])
         else:
             as_dict = self.as_dict()
             del as_dict['_id']
@@ -429,7 +558,11 @@ class ScheduleEntry(beat.ScheduleEntry):
         if self._scheduled_call.remaining_runs == 0:
             _logger.info('disabling schedule with 0 remaining runs: %s' % self._scheduled_call.id)
             self._scheduled_call.enabled = False
-        self._scheduled_call.save()
+            self._scheduled_call.last_updated = time.time()
+            self._scheduled_call.save()
+            ScheduledCallChange.record([self._scheduled_call.id])
+        else:
+            self._scheduled_call.save()
         return self._scheduled_call.as_schedule_entry()
 
     __next__ = next = _next_instance
@@ -523,6 +656,10 @@ class TaskStatus(Document, ReaperMixin):
     :type finish_time: basestring
     :ivar result:      return value of the callable, if any
     :type result:      any
+    :ivar database_operations: the number of database operations the task made through
+                       PulpCollection, the total seconds they took and the documents they
+                       returned, with keys 'count', 'seconds' and 'documents'
+    :type database_operations: dict
     :ivar exception:   Deprecated. This is always None.
     :type exception:   None
     :ivar traceback:   Deprecated. This is always None.
@@ -539,6 +676,7 @@ class TaskStatus(Document, ReaperMixin):
     start_time = ISO8601StringField()
     finish_time = ISO8601StringField()
     result = DynamicField()
+    database_operations = DictField()
 
     # These are deprecated, and will always be None
     exception = StringField()
@@ -1,3 +1,5 @@
+from pymongo.errors import DuplicateKeyError
+
 from pulp.server.db.model.base import Model
 
 
@@ -27,3 +29,48 @@ class EventListener(Model):
         self.notifier_type_id = notifier_type_id
         self.notifier_config = notifier_config
         self.event_types = event_types
+
+
+class EventListenerGeneration(Model):
+    """
+    A single document holding a number that is incremented each time an event
+    listener is created, updated or deleted. Each process compares it with the
+    number it loaded its copy of the listeners at to tell whether the copy is
+    still current.
+    """
+
+    collection_name = 'event_listener_generation'
+    unique_indices = tuple()
+
+    GENERATION_ID = 'event_listeners'
+
+    @classmethod
+    def current(cls):
+        """
+        @return: the current generation of the event listeners; 0 if they have
+                 never been changed
+        @rtype:  int
+        """
+        generation = cls.get_collection().find_one({'_id': cls.GENERATION_ID})
+        if generation is None:
+            return 0
+        return generation['generation']
+
+    @classmethod
+    def increment(cls):
+        """
+        Records that the event listeners changed.
+        """
+        try:
+            cls._increment()
+        except DuplicateKeyError:
+            # Another process created the document at the same time; it exists now
+            cls._increment()
+
+    @classmethod
+    def _increment(cls):
+        """
+        Increments the generation, creating the document if it does not exist.
+        """
+        cls.get_collection().find_and_modify({'_id': cls.GENERATION_ID},
+                                             {'$inc': {'generation': 1}}, upsert=True)
@@ -1,7 +1,8 @@
+from datetime import timedelta
 import traceback as traceback_module
 
 from pulp.server.db.model.base import Model
-from pulp.server.db.model.reaper_base import ReaperMixin
+from pulp.server.db.model.reaper_base import ReaperMixin, _create_expired_object_id
 
 
 class RepoGroup(Model):
@@ -186,3 +187,75 @@ class RepoGroupPublishResult(Model, ReaperMixin):
 
         self.summary = None
         self.details = None
+
+
+class RepoGroupMemberPublish(Model, ReaperMixin):
+    """
+    Tracks a repo group publish that was split into one task per member repository.
+    Each member task records its result here, and the task that records the last one
+    merges them into the group's RepoGroupPublishResult and removes this document.
+
+    A member task that is lost together with its worker never records a result, so
+    documents that are not complete when they are reaped complete the group publish
+    with an error for each member that is still missing and whose task is no longer
+    waiting or running.
+
+    @ivar group_id: identifies the group
+    @type group_id: str
+
+    @ivar distributor_id: identifies the group's distributor
+    @type distributor_id: str
+
+    @ivar started: iso8601 formatted timestamp when the publish was begun
+    @type started: str
+
+    @ivar repo_ids: identify the member repositories being published
+    @type repo_ids: list
+
+    @ivar remaining: number of members whose result has not been recorded yet
+    @type remaining: int
+
+    @ivar member_results: result of each member publish that has finished
+    @type member_results: list
+
+    @ivar member_tasks: ID of the task publishing each member, by repository ID
+    @type member_tasks: dict
+
+    @ivar publish_config_override: values to pass the plugin for this publish call alone
+    @type publish_config_override: dict
+    """
+
+    collection_name = 'repo_group_member_publishes'
+
+    unique_indices = ('id',)
+    search_indices = (('group_id', 'distributor_id'),)
+
+    def __init__(self, group_id, distributor_id, started, repo_ids,
+                 publish_config_override=None):
+        super(RepoGroupMemberPublish, self).__init__()
+
+        self.group_id = group_id
+        self.distributor_id = distributor_id
+        self.started = started
+        self.repo_ids = repo_ids
+        self.remaining = len(repo_ids)
+        self.member_results = []
+        self.member_tasks = {}
+        self.publish_config_override = publish_config_override
+
+    @classmethod
+    def reap_old_documents(cls, config_days):
+        """
+        Completes the group publishes that were started more than config_days ago and
+        are still waiting for member results from tasks that are no longer running.
+
+        @param config_days: age in days after which a publish is no longer waited for
+        @type  config_days: float
+        """
+        # imported here, as the publish manager imports this module
+        from pulp.server.managers import factory as manager_factory
+
+        expired_object_id = _create_expired_object_id(timedelta(days=config_days))
+        publish_manager = manager_factory.repo_group_publish_manager()
+        for member_publish in cls.get_collection().find({'_id': {'$lte': expired_object_id}}):
+            publish_manager.expire_member_publish(member_publish)
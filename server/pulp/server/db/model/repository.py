@@ -31,6 +31,12 @@ class Repo(Model):
                               unit may be associated multiple times.
     @type content_unit_counts: int
 
+    @ivar content_revision: advanced each time units are associated with or
+                            unassociated from this repo, so results computed from
+                            the repo's units can tell whether they are still current;
+                            absent until the first change for repos that predate it
+    @type content_revision: int
+
     @ivar metadata: arbitrary data that describes the contents of the repo;
                     the values may change as the contents of the repo change,
                     either set by the user or by an importer or distributor
@@ -51,6 +57,7 @@ class Repo(Model):
         self.content_unit_counts = content_unit_counts or {}
         self.last_unit_added = None
         self.last_unit_removed = None
+        self.content_revision = 0
 
         # Timeline
         # TODO: figure out how to track repo modified states
@@ -2,6 +2,10 @@
 This module contains models that are used by the resource manager to persist its state so that it
 can survive being restarted.
 """
+import pickle
+
+from pymongo.errors import DuplicateKeyError
+
 from pulp.server.db.model.base import Model
 
 
@@ -131,3 +135,117 @@ class ReservedResource(Model):
         self.get_collection().save(
             {'_id': self.task_id, 'resource_id': self.resource_id, 'worker_name': self.worker_name},
             safe=True)
+
+
+class ReservationRequest(Model):
+    """
+    Instances of this class represent tasks that are waiting in the resource manager for their
+    resource to be reserved on a worker. Requests for the same resource are dispatched in the
+    order they were queued, which is the order of their numbers.
+
+    :ivar task_id:       The uuid of the task that is waiting
+    :type task_id:       basestring
+    :ivar resource_id:   The name of the resource the task waits for
+    :type resource_id:   basestring
+    :ivar seq:           The number ReservationRequestSequence allocated to this request
+    :type seq:           int
+    :ivar task_name:     The name of the task to dispatch
+    :type task_name:     basestring
+    :ivar inner_args:    The positional arguments to dispatch the task with
+    :type inner_args:    list
+    :ivar inner_kwargs:  The keyword arguments to dispatch the task with
+    :type inner_kwargs:  dict
+    """
+    collection_name = 'reservation_requests'
+    unique_indices = tuple()
+    search_indices = ('seq',)
+
+    def __init__(self, task_id, resource_id, seq, task_name, inner_args, inner_kwargs):
+        """
+        :param task_id:       The uuid of the task that is waiting
+        :type  task_id:       basestring
+        :param resource_id:   The name of the resource the task waits for
+        :type  resource_id:   basestring
+        :param seq:           The number ReservationRequestSequence allocated to this request
+        :type  seq:           int
+        :param task_name:     The name of the task to dispatch
+        :type  task_name:     basestring
+        :param inner_args:    The positional arguments to dispatch the task with
+        :type  inner_args:    list
+        :param inner_kwargs:  The keyword arguments to dispatch the task with
+        :type  inner_kwargs:  dict
+        """
+        super(ReservationRequest, self).__init__()
+
+        self.task_id = task_id
+        self.resource_id = resource_id
+        self.seq = seq
+        self.task_name = task_name
+        self.inner_args = inner_args
+        self.inner_kwargs = inner_kwargs
+
+        # We don't need these
+        del self['_id']
+        del self['id']
+
+    @classmethod
+    def from_bson(cls, bson_request):
+        """
+        Instantiate a ReservationRequest from the given bson.
+
+        :param bson_request: A bson object or a dict representing a ReservationRequest.
+        :type  bson_request: bson.BSON or dict
+        :return:             A ReservationRequest representing the given bson_request
+        :rtype:              pulp.server.db.model.resources.ReservationRequest
+        """
+        inner_args, inner_kwargs = pickle.loads(str(bson_request['inner']))
+        return cls(bson_request['_id'], bson_request['resource_id'], bson_request['seq'],
+                   bson_request['task_name'], inner_args, inner_kwargs)
+
+    def save(self):
+        """
+        Insert this ReservationRequest into the database, unless a request for the same task was
+        already inserted. The arguments of the task are stored pickled, like Celery sends them.
+        """
+        inner = pickle.dumps((self.inner_args, self.inner_kwargs))
+        document = {'resource_id': self.resource_id, 'seq': self.seq,
+                    'task_name': self.task_name, 'inner': inner}
+        self.get_collection().update({'_id': self.task_id}, {'$setOnInsert': document},
+                                     upsert=True, safe=True)
+
+
+class ReservationRequestSequence(Model):
+    """
+    A single document holding the number of the last ReservationRequest. The number is
+    incremented atomically by the database, so requests are numbered in the order they were
+    queued.
+    """
+    collection_name = 'reservation_request_sequence'
+    unique_indices = tuple()
+
+    SEQUENCE_ID = 'reservation_requests'
+
+    @classmethod
+    def next(cls):
+        """
+        Allocate the next request number.
+
+        :return: the allocated number, starting at 1
+        :rtype:  int
+        """
+        try:
+            counter = cls._increment()
+        except DuplicateKeyError:
+            # Another process created the counter at the same time; it exists now
+            counter = cls._increment()
+        return counter['seq']
+
+    @classmethod
+    def _increment(cls):
+        """
+        :return: the counter document after it is incremented
+        :rtype:  dict
+        """
+        return cls.get_collection().find_and_modify({'_id': cls.SEQUENCE_ID},
+                                                    {'$inc': {'seq': 1}},
+                                                    upsert=True, new=True)
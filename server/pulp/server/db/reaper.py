@@ -20,6 +20,7 @@ _COLLECTION_TIMEDELTAS = {
     repository.RepoSyncResult: 'repo_sync_history',
     repository.RepoPublishResult: 'repo_publish_history',
     repo_group.RepoGroupPublishResult: 'repo_group_publish_history',
+    repo_group.RepoGroupMemberPublish: 'repo_group_member_publish',
     celery_result.CeleryResult: 'task_result_history',
 }
 
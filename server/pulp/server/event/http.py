@@ -7,69 +7,223 @@ url
   URL with the contents of the events in the body.
 
 Eventually this should be enhanced to support authentication credentials as well.
+
+Events are not posted by the code that fires them. They are queued for the
+server named in the URL, and a delivery thread for that server posts them in
+order over a connection it keeps open while there are events to send. The
+thread and its connection go away after the server's queue has been empty for
+IDLE_TIMEOUT_SECONDS.
 """
 
 import base64
 import httplib
 import logging
+import Queue
+import socket
 import threading
+import time
 
 from pulp.server.compat import json, json_util
 
 
 TYPE_ID = 'http'
 
-_logger = logging.getLogger(__name__)
-
-
-def handle_event(notifier_config, event):
-    # fire the actual http push function off in a separate thread to keep
-    # pulp from blocking or deadlocking due to the tasking subsystem
-
-    data = event.data()
-
-    _logger.info(data)
+# Most events waiting to be posted to a single server; further events for that
+# server are dropped until it catches up
+QUEUE_SIZE = 1000
 
-    body = json.dumps(data, default=json_util.default)
+# Most queued events a delivery thread takes off its queue at once
+BATCH_SIZE = 50
 
-    thread = threading.Thread(target=_send_post, args=[notifier_config, body])
-    thread.setDaemon(True)
-    thread.start()
+# Seconds a delivery thread waits for more events before closing its connection and exiting
+IDLE_TIMEOUT_SECONDS = 30
 
+# Times an event is posted before it is given up on
+MAX_ATTEMPTS = 3
 
-def _send_post(notifier_config, body):
+# Seconds to wait before the first retry of an event; doubled for each further retry
+RETRY_DELAY_SECONDS = 1
 
-    # Basic headers
-    headers = {'Accept': 'application/json',
-               'Content-Type': 'application/json'}
+_logger = logging.getLogger(__name__)
 
-    # Parse the URL for the pieces we need
-    if 'url' not in notifier_config or not notifier_config['url']:
-        _logger.warn('HTTP notifier configured without a URL; cannot fire event')
-        return
 
-    url = notifier_config['url']
+def handle_event(notifier_config, event):
+    # the actual http push happens in a delivery thread to keep pulp from
+    # blocking or deadlocking due to the tasking subsystem
 
-    try:
-        scheme, empty, server, path = url.split('/', 3)
-    except ValueError:
-        _logger.warn('Improperly configured post_sync_url: %(u)s' % {'u': url})
-        return
+    data = event.data()
 
-    connection = _create_connection(scheme, server)
+    _logger.info(data)
 
-    # Process authentication
-    if 'username' in notifier_config and 'password' in notifier_config:
-        raw = ':'.join((notifier_config['username'], notifier_config['password']))
-        encoded = base64.encodestring(raw)[:-1]
-        headers['Authorization'] = 'Basic ' + encoded
+    body = json.dumps(data, default=json_util.default)
 
-    connection.request('POST', '/' + path, body=body, headers=headers)
-    response = connection.getresponse()
-    if response.status != httplib.OK:
-        error_msg = response.read()
+    dispatcher.send(notifier_config, body)
+
+
+class Dispatcher(object):
+    """
+    Queues event bodies for delivery and runs one DeliveryThread per server
+    that has events waiting.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (scheme, server): DeliveryThread
+        self._threads = {}
+
+    def send(self, notifier_config, body):
+        """
+        Queues an event body to be posted as the given notifier configuration
+        describes. Configuration problems are logged and the event is dropped.
+
+        :param notifier_config: configuration of the http notifier
+        :type  notifier_config: dict
+        :param body:            serialized event
+        :type  body:            str
+        """
+        # Parse the URL for the pieces we need
+        if 'url' not in notifier_config or not notifier_config['url']:
+            _logger.warn('HTTP notifier configured without a URL; cannot fire event')
+            return
+
+        url = notifier_config['url']
+
+        try:
+            scheme, empty, server, path = url.split('/', 3)
+        except ValueError:
+            _logger.warn('Improperly configured post_sync_url: %(u)s' % {'u': url})
+            return
+
+        # Basic headers
+        headers = {'Accept': 'application/json',
+                   'Content-Type': 'application/json'}
+
+        # Process authentication
+        if 'username' in notifier_config and 'password' in notifier_config:
+            raw = ':'.join((notifier_config['username'], notifier_config['password']))
+            encoded = base64.encodestring(raw)[:-1]
+            headers['Authorization'] = 'Basic ' + encoded
+
+        key = (scheme, server)
+        with self._lock:
+            thread = self._threads.get(key)
+            if thread is None:
+                thread = DeliveryThread(self, scheme, server)
+                self._threads[key] = thread
+                thread.start()
+            try:
+                thread.queue.put_nowait(('/' + path, headers, body))
+            except Queue.Full:
+                _logger.warn('HTTP notifier queue for %(s)s is full; dropping event' %
+                             {'s': server})
+
+    def _retire(self, thread):
+        """
+        Called by an idle delivery thread. Forgets the thread unless events
+        were queued for it in the meantime.
+
+        :param thread: the idle thread
+        :type  thread: DeliveryThread
+
+        :return: True if the thread may exit, False if it has more events to send
+        :rtype:  bool
+        """
+        with self._lock:
+            if not thread.queue.empty():
+                return False
+            if self._threads.get(thread.key) is thread:
+                del self._threads[thread.key]
+            return True
+
+
+class DeliveryThread(threading.Thread):
+    """
+    Posts the events queued for one server, reusing a single connection
+    between them and retrying failed posts with a growing delay.
+    """
+
+    def __init__(self, dispatcher, scheme, server):
+        super(DeliveryThread, self).__init__(name='http-notifier-%s' % server)
+        self.setDaemon(True)
+        self.dispatcher = dispatcher
+        self.scheme = scheme
+        self.server = server
+        self.key = (scheme, server)
+        self.queue = Queue.Queue(QUEUE_SIZE)
+        self.connection = None
+
+    def run(self):
+        while True:
+            try:
+                batch = [self.queue.get(timeout=IDLE_TIMEOUT_SECONDS)]
+            except Queue.Empty:
+                self._close()
+                if self.dispatcher._retire(self):
+                    return
+                continue
+
+            # take whatever else is already waiting so it goes out over the same connection
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except Queue.Empty:
+                    break
+
+            for path, headers, body in batch:
+                try:
+                    self._deliver(path, headers, body)
+                except Exception:
+                    _logger.exception('Error posting event to %(s)s' % {'s': self.server})
+                    self._close()
+
+    def _deliver(self, path, headers, body):
+        """
+        Posts one event, retrying connection errors and server errors.
+
+        :param path:    path to post the event to
+        :type  path:    str
+        :param headers: request headers
+        :type  headers: dict
+        :param body:    serialized event
+        :type  body:    str
+        """
+        for attempt in range(MAX_ATTEMPTS):
+            if attempt:
+                time.sleep(RETRY_DELAY_SECONDS * 2 ** (attempt - 1))
+            try:
+                status, error_msg = self._post(path, headers, body)
+            except (httplib.HTTPException, socket.error), e:
+                self._close()
+                error_msg = str(e)
+            else:
+                if status == httplib.OK:
+                    return
+                if status < httplib.INTERNAL_SERVER_ERROR:
+                    # the request itself is at fault so posting it again will not help
+                    break
         _logger.warn('Error response from HTTP notifier: %(e)s' % {'e': error_msg})
-    connection.close()
+
+    def _post(self, path, headers, body):
+        """
+        :return: the response status and, if it is not OK, the response body
+        :rtype:  tuple
+        """
+        if self.connection is None:
+            self.connection = _create_connection(self.scheme, self.server)
+        self.connection.request('POST', path, body=body, headers=headers)
+        response = self.connection.getresponse()
+        # the response has to be read completely before the connection can be used again
+        content = response.read()
+        if response.will_close:
+            self._close()
+        if response.status == httplib.OK:
+            content = None
+        return response.status, content
+
+    def _close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
 
 
 def _create_connection(scheme, server):
@@ -78,3 +232,7 @@ def _create_connection(scheme, server):
     else:
         connection = httplib.HTTPConnection(server)
     return connection
+
+
+# The dispatcher shared by everything running in this process
+dispatcher = Dispatcher()
@@ -114,6 +114,15 @@ class PulpCodedValidationException(PulpCodedException):
             self.child_exceptions = validation_exceptions
 
 
+class PulpCodedConflictException(PulpCodedException):
+    """
+    Class for coded exceptions raised when a request conflicts with the current state
+    of a resource. Raising this exception results in a 409 Conflict code being returned.
+    """
+
+    http_status_code = httplib.CONFLICT
+
+
 class PulpCodedAuthenticationException(PulpCodedException):
     """
     Class for coded authentication exceptions. Raising this exception results in a
@@ -1,13 +1,15 @@
-from threading import RLock
+from threading import Lock, Thread
 import logging
+import os
+import Queue
 import subprocess
 
 from M2Crypto import X509, EVP, RSA, util
 
 from pulp.common.util import encode_unicode
 from pulp.server import config
+from pulp.server.db.model.auth import CertificateSerialNumber
 from pulp.server.exceptions import PulpException
-from pulp.server.util import Singleton
 
 
 _logger = logging.getLogger(__name__)
@@ -15,6 +17,9 @@ _logger = logging.getLogger(__name__)
 ADMIN_PREFIX = 'admin:'
 ADMIN_SPLITTER = ':'
 
+# Most private keys generated ahead of time by each process
+KEY_POOL_SIZE = 16
+
 
 class CertGenerationManager(object):
     def make_admin_user_cert(self, user):
@@ -56,9 +61,9 @@ class CertGenerationManager(object):
         # Make a private key
         # Don't use M2Crypto directly as it leads to segfaults when trying to convert
         # the key to a PEM string.  Instead create the key with openssl and return the PEM string
-        # Sorta hacky but necessary.
+        # Sorta hacky but necessary. The keys are generated ahead of time by the key pool.
         # rsa = RSA.gen_key(1024, 65537, callback=passphrase_callback)
-        private_key_pem = _make_priv_key()
+        private_key_pem = key_pool.get()
         rsa = RSA.load_key_string(private_key_pem,
                                   callback=util.no_passphrase_callback)
 
@@ -169,11 +174,12 @@ class CertGenerationManager(object):
         return username, id
 
 
-class SerialNumber:
-
-    PATH = config.config.get('security', 'serial_number_path')
-    __mutex = RLock()
-    __metaclass__ = Singleton
+class SerialNumber(object):
+    """
+    Allocates the serial numbers of the certificates signed by the Pulp CA. The
+    last allocated number is kept in the database, so every server process
+    draws from the same sequence.
+    """
 
     def next(self):
         """
@@ -181,32 +187,87 @@ class SerialNumber:
         @return: The next serial#
         @rtype: int
         """
-        self.__mutex.acquire()
-        try:
-            fp = open(self.PATH, 'a+')
-            try:
-                sn = int(fp.read()) + 1
-            except:
-                sn = 1
-            fp.seek(0)
-            fp.truncate(0)
-            fp.write(str(sn))
-            fp.close()
-            return sn
-        finally:
-            self.__mutex.release()
+        return CertificateSerialNumber.next()
 
     def reset(self):
         """
         Reset the serial number
         """
-        self.__mutex.acquire()
+        CertificateSerialNumber.reset()
+
+
+class KeyPool(object):
+    """
+    Private keys generated ahead of the requests that need them. Taking a key
+    starts a background thread that tops the pool back up, so bursts of
+    certificate requests do not each wait for a key to be generated. When the
+    pool is empty, the key is generated by the caller.
+
+    Keys are only ever handed out once, and the pool is emptied in a process
+    forked from the one that filled it so that parent and child never share keys.
+
+    @ivar size: most keys held in the pool
+    @type size: int
+    """
+
+    def __init__(self, size=KEY_POOL_SIZE):
+        self.size = size
+        self._lock = Lock()
+        self._pid = os.getpid()
+        self._keys = Queue.Queue(size)
+        self._refilling = False
+
+    def get(self):
+        """
+        Take a private key from the pool, or generate one if the pool is empty.
+
+        @return: PEM encoded RSA private key
+        @rtype:  str
+        """
+        self._check_fork()
         try:
-            fp = open(self.PATH, 'w')
-            fp.write('0')
-            fp.close()
+            key = self._keys.get_nowait()
+        except Queue.Empty:
+            key = _make_priv_key()
+        self._start_refill()
+        return key
+
+    def _check_fork(self):
+        with self._lock:
+            if os.getpid() != self._pid:
+                self._pid = os.getpid()
+                self._keys = Queue.Queue(self.size)
+                self._refilling = False
+
+    def _start_refill(self):
+        with self._lock:
+            if self._refilling or self.size < 1:
+                return
+            self._refilling = True
+        thread = Thread(target=self._refill, name='cert-key-pool')
+        thread.setDaemon(True)
+        thread.start()
+
+    def _refill(self):
+        """
+        Generate keys until the pool is full.
+        """
+        keys = self._keys
+        try:
+            while not keys.full():
+                keys.put_nowait(_make_priv_key())
+        except Queue.Full:
+            pass
+        except Exception:
+            _logger.exception('Error generating a private key for the key pool')
         finally:
-            self.__mutex.release()
+            with self._lock:
+                if keys is self._keys:
+                    self._refilling = False
+
+
+# The key pool shared by everything running in this process
+key_pool = KeyPool()
 
 
 def _make_priv_key():
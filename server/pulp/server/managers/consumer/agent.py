@@ -12,7 +12,7 @@ from pulp.plugins.model import Consumer as ProfiledConsumer
 from pulp.plugins.profiler import Profiler, InvalidUnitsRequested
 from pulp.server.agent.context import Context
 from pulp.server.agent.direct.pulpagent import PulpAgent
-from pulp.server.db.model.consumer import Bind
+from pulp.server.db.model.consumer import Bind, Consumer
 from pulp.server.db.model.dispatch import TaskStatus
 from pulp.server.exceptions import PulpExecutionException, PulpDataException, MissingResource
 from pulp.server.managers import factory as managers
@@ -142,6 +142,134 @@ class AgentManager(object):
 
         return task
 
+    @staticmethod
+    def bind_all(bindings, options):
+        """
+        Request the agents of several consumers to perform the same bind. This
+        method will be called after the server-side representation of the bindings
+        has been created. The distributor payload is created once and sent to all
+        of the agents.
+
+        :param bindings: binding objects retrieved from the database, all for the same
+                         repository, distributor and binding configuration
+        :type  bindings: list
+        :param options:  The options are handler specific.
+        :type  options:  dict
+        :return: tuple of the tasks created, and a list of the errors raised for
+                 consumers that could not be notified
+        :rtype:  tuple
+        """
+        if not bindings:
+            return [], []
+        agent_bindings = AgentManager._bindings(bindings[:1])
+        return AgentManager._notify_all(
+            bindings, tags.ACTION_AGENT_BIND, Bind.Action.BIND,
+            lambda agent, context: agent.consumer.bind(context, agent_bindings, options))
+
+    @staticmethod
+    def unbind_all(bindings, options):
+        """
+        Request the agents of several consumers to perform the same unbind.
+
+        :param bindings: binding IDs, all for the same repository and distributor.
+          Each binding is:
+            {consumer_id:<str>, repo_id:<str>, distributor_id:<str>}
+        :type  bindings: list
+        :param options:  The options are handler specific.
+        :type  options:  dict
+        :return: tuple of the tasks created, and a list of the errors raised for
+                 consumers that could not be notified
+        :rtype:  tuple
+        """
+        if not bindings:
+            return [], []
+        agent_bindings = AgentManager._unbindings(bindings[:1])
+        return AgentManager._notify_all(
+            bindings, tags.ACTION_AGENT_UNBIND, Bind.Action.UNBIND,
+            lambda agent, context: agent.consumer.unbind(context, agent_bindings, options))
+
+    @staticmethod
+    def _notify_all(bindings, task_action, bind_action, request):
+        """
+        Send an agent request for each binding, tracking each with a pseudo task.
+        The consumers are fetched with a single query, the pseudo tasks are inserted
+        with a single insert, and the pending action is recorded on all of the
+        bindings with a single update. The pending action shares one ID, which is
+        round tripped to the reply handler as the action_id.
+
+        :param bindings:    bindings all for the same repository and distributor
+        :type  bindings:    list
+        :param task_action: action tag for the pseudo tasks
+        :type  task_action: str
+        :param bind_action: the bind action that is pending; a Bind.Action value
+        :type  bind_action: str
+        :param request:     sends the request; called with the agent and the request context
+        :type  request:     callable
+        :return: tuple of the tasks created, and a list of the errors raised for
+                 consumers that could not be notified
+        :rtype:  tuple
+        """
+        repo_id = bindings[0]['repo_id']
+        distributor_id = bindings[0]['distributor_id']
+        consumer_ids = [b['consumer_id'] for b in bindings]
+        query = {'id': {'$in': consumer_ids}}
+        consumers = dict((c['id'], c) for c in Consumer.get_collection().find(query))
+        bind_manager = managers.consumer_bind_manager()
+        agent = PulpAgent()
+
+        errors = []
+        pending = []
+        for consumer_id in consumer_ids:
+            if consumer_id not in consumers:
+                errors.append(MissingResource(consumer=consumer_id))
+                continue
+            # track agent operations using a pseudo task
+            task_tags = [
+                tags.resource_tag(tags.RESOURCE_CONSUMER_TYPE, consumer_id),
+                tags.resource_tag(tags.RESOURCE_REPOSITORY_TYPE, repo_id),
+                tags.resource_tag(tags.RESOURCE_REPOSITORY_DISTRIBUTOR_TYPE, distributor_id),
+                tags.action_tag(task_action)
+            ]
+            task = TaskStatus(str(uuid4()), 'agent', tags=task_tags)
+            task.validate()
+            pending.append((consumer_id, task))
+        if not pending:
+            return [], errors
+
+        TaskStatus._get_collection().insert([t.to_mongo() for _, t in pending], safe=True)
+
+        # the action is recorded before the requests are sent so that an early
+        # reply from an agent always finds it
+        action_id = str(uuid4())
+        bind_manager.actions_pending(
+            [consumer_id for consumer_id, _ in pending],
+            repo_id,
+            distributor_id,
+            bind_action,
+            action_id)
+
+        tasks = []
+        failed = []
+        for consumer_id, task in pending:
+            try:
+                context = Context(
+                    consumers[consumer_id],
+                    task_id=task['task_id'],
+                    action_id=action_id,
+                    action=bind_action,
+                    consumer_id=consumer_id,
+                    repo_id=repo_id,
+                    distributor_id=distributor_id)
+                request(agent, context)
+                tasks.append(task)
+            except Exception, e:
+                failed.append(consumer_id)
+                errors.append(e)
+
+        # the agents of these consumers were never asked, so nothing is pending
+        bind_manager.actions_withdrawn(failed, repo_id, distributor_id, action_id)
+        return tasks, errors
+
     @staticmethod
     def install_content(consumer_id, units, options):
         """
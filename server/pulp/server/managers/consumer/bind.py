@@ -9,7 +9,7 @@ from celery import task
 from pymongo.errors import DuplicateKeyError
 
 from pulp.server.async.tasks import Task
-from pulp.server.db.model.consumer import Bind
+from pulp.server.db.model.consumer import Bind, Consumer
 from pulp.server.exceptions import MissingResource, InvalidValue
 from pulp.server.managers import factory
 
@@ -81,9 +81,74 @@ class BindManager(object):
         # update history
         details = {'repo_id': repo_id, 'distributor_id': distributor_id}
         manager = factory.consumer_history_manager()
-        manager.record_event(consumer_id, 'repo_bound', details)
+        manager.record_event(consumer_id, 'repo_bound', details, check_consumer=False)
         return bind
 
+    @staticmethod
+    def bind_consumers(consumer_ids, repo_id, distributor_id, notify_agent, binding_config):
+        """
+        Bind several consumers to a specific distributor associated with a
+        repository, with one query or write per step for all of them rather
+        than one per consumer. Like bind(), this call is idempotent.
+
+        :param consumer_ids:    uniquely identify the consumers.
+        :type  consumer_ids:    list
+        :param repo_id:         uniquely identifies the repository.
+        :type  repo_id:         str
+        :param distributor_id:  uniquely identifies a distributor.
+        :type  distributor_id:  str
+
+        :return: tuple of the Bind objects, and the IDs of the consumers that do not exist
+        :rtype:  tuple
+
+        :raise InvalidValid:    when the repository or distributor id is invalid, or
+        if the notify_agent value is invalid
+        """
+        # Validation
+        missing_values = BindManager._validate_repo(repo_id, distributor_id)
+        if missing_values:
+            raise InvalidValue(missing_values.keys())
+
+        # ensure notify_agent is a boolean
+        if not isinstance(notify_agent, bool):
+            raise InvalidValue(['notify_agent'])
+
+        query = {'id': {'$in': consumer_ids}}
+        found = set(c['id'] for c in Consumer.get_collection().find(query, fields=['id']))
+        missing_consumer_ids = [c for c in consumer_ids if c not in found]
+        consumer_ids = [c for c in consumer_ids if c in found]
+        if not consumer_ids:
+            return [], missing_consumer_ids
+
+        # perform the binds
+        collection = Bind.get_collection()
+        query = BindManager.bind_id({'$in': consumer_ids}, repo_id, distributor_id)
+        existing = set(b['consumer_id'] for b in collection.find(query, fields=['consumer_id']))
+        new_binds = [Bind(consumer_id, repo_id, distributor_id, notify_agent, binding_config)
+                     for consumer_id in consumer_ids if consumer_id not in existing]
+        if new_binds:
+            try:
+                collection.insert(new_binds, safe=True, continue_on_error=True)
+            except DuplicateKeyError:
+                # Some were bound in the meantime; rebind all of them to be sure
+                existing = consumer_ids
+        if existing:
+            query = BindManager.bind_id({'$in': list(existing)}, repo_id, distributor_id)
+            update = {'$set': {'notify_agent': notify_agent, 'binding_config': binding_config}}
+            collection.update(query, update, multi=True, safe=True)
+            query['deleted'] = True
+            update = {'$set': {'deleted': False, 'consumer_actions': []}}
+            collection.update(query, update, multi=True, safe=True)
+
+        # fetch the inserted/updated binds
+        query = BindManager.bind_id({'$in': consumer_ids}, repo_id, distributor_id)
+        binds = list(collection.find(query))
+        # update history
+        details = {'repo_id': repo_id, 'distributor_id': distributor_id}
+        manager = factory.consumer_history_manager()
+        manager.record_events(consumer_ids, 'repo_bound', details)
+        return binds, missing_consumer_ids
+
     @staticmethod
     def _update_binding(consumer_id, repo_id, distributor_id, notify_agent, binding_config):
         """
@@ -155,9 +220,99 @@ class BindManager(object):
             'distributor_id': distributor_id
         }
         manager = factory.consumer_history_manager()
-        manager.record_event(consumer_id, 'repo_unbound', details)
+        manager.record_event(consumer_id, 'repo_unbound', details, check_consumer=False)
         return bind
 
+    @staticmethod
+    def unbind_consumers(consumer_ids, repo_id, distributor_id):
+        """
+        Unbind several consumers from a specific distributor associated with a
+        repository, with one query or write per step for all of them rather
+        than one per consumer. Bindings that notify the agent are marked deleted,
+        as unbind() does, and are deleted once the agent confirms the unbind.
+        Bindings that do not notify the agent are deleted right away.
+
+        :param consumer_ids:    uniquely identify the consumers.
+        :type  consumer_ids:    list
+        :param repo_id:         uniquely identifies the repository.
+        :type  repo_id:         str
+        :param distributor_id:  uniquely identifies a distributor.
+        :type  distributor_id:  str
+
+        :return: tuple of the Bind objects of the bindings that notify the agent, and
+                 the IDs of the consumers that are not bound
+        :rtype:  tuple
+        """
+        collection = Bind.get_collection()
+        query = BindManager.bind_id({'$in': consumer_ids}, repo_id, distributor_id)
+        binds = list(collection.find(query))
+        bound = set(b['consumer_id'] for b in binds)
+        unbound_consumer_ids = [c for c in consumer_ids if c not in bound]
+
+        agent_binds = [b for b in binds if b['notify_agent']]
+        quiet_consumer_ids = [b['consumer_id'] for b in binds if not b['notify_agent']]
+
+        # mark deleted
+        unbinding = [b['consumer_id'] for b in agent_binds if not b['deleted']]
+        if unbinding:
+            query = BindManager.bind_id({'$in': unbinding}, repo_id, distributor_id)
+            collection.update(query, {'$set': {'deleted': True}}, multi=True, safe=True)
+            details = {'repo_id': repo_id, 'distributor_id': distributor_id}
+            manager = factory.consumer_history_manager()
+            manager.record_events(unbinding, 'repo_unbound', details)
+
+        # there is no agent to wait for, so delete immediately
+        if quiet_consumer_ids:
+            query = BindManager.bind_id({'$in': quiet_consumer_ids}, repo_id, distributor_id)
+            collection.remove(query, safe=True)
+
+        return agent_binds, unbound_consumer_ids
+
+    @staticmethod
+    def unbind_by_repo(repo_id, distributor_id=None):
+        """
+        Unbind all consumers from a repository, or from one of its distributors,
+        with a single update. Bindings that notify the agent are marked deleted
+        and are deleted once the agent confirms the unbind. Bindings that do not
+        notify the agent are deleted right away.
+
+        :param repo_id:         uniquely identifies the repository.
+        :type  repo_id:         str
+        :param distributor_id:  uniquely identifies a distributor; all of the repository's
+                                distributors when None
+        :type  distributor_id:  str
+
+        :return: the IDs of the bindings whose agents need to be notified
+                 {consumer_id:<str>, repo_id:<str>, distributor_id:<str>}
+        :rtype:  list
+        """
+        collection = Bind.get_collection()
+        query = {'repo_id': repo_id}
+        if distributor_id is not None:
+            query['distributor_id'] = distributor_id
+        fields = ('consumer_id', 'repo_id', 'distributor_id', 'deleted')
+        agent_query = dict(query, notify_agent=True)
+        agent_binds = list(collection.find(agent_query, fields=fields))
+
+        # mark deleted
+        unbinding = [b for b in agent_binds if not b['deleted']]
+        if unbinding:
+            collection.update(dict(agent_query, deleted=False), {'$set': {'deleted': True}},
+                              multi=True, safe=True)
+            by_distributor = {}
+            for bind in unbinding:
+                by_distributor.setdefault(bind['distributor_id'], []).append(bind['consumer_id'])
+            manager = factory.consumer_history_manager()
+            for bound_distributor_id, consumer_ids in by_distributor.items():
+                details = {'repo_id': repo_id, 'distributor_id': bound_distributor_id}
+                manager.record_events(consumer_ids, 'repo_unbound', details)
+
+        # there is no agent to wait for, so delete immediately
+        collection.remove(dict(query, notify_agent=False), safe=True)
+
+        return [BindManager.bind_id(b['consumer_id'], b['repo_id'], b['distributor_id'])
+                for b in agent_binds]
+
     def consumer_deleted(self, consumer_id):
         """
         Removes all bindings associated with the specified consumer.
@@ -346,6 +501,63 @@ class BindManager(object):
         update = {'$push': {'consumer_actions': entry}}
         collection.update(bind_id, update, safe=True)
 
+    def actions_pending(self, consumer_ids, repo_id, distributor_id, action, action_id):
+        """
+        Add the same pending action to the bindings of several consumers
+        with a single update.
+        @param consumer_ids: uniquely identifies the consumers.
+        @type consumer_ids: list
+        @param repo_id: uniquely identifies the repository.
+        @type repo_id: str
+        @param distributor_id: uniquely identifies a distributor.
+        @type distributor_id: str
+        @param action: The action (bind|unbind).
+        @type action: str
+        @param action_id: The ID of the action to begin tracking.
+        @type action_id: str
+        @see Bind.Action
+        """
+        if not consumer_ids:
+            return
+        collection = Bind.get_collection()
+        assert action in (Bind.Action.BIND, Bind.Action.UNBIND)
+        query = {
+            'consumer_id': {'$in': consumer_ids},
+            'repo_id': repo_id,
+            'distributor_id': distributor_id,
+        }
+        entry = dict(
+            id=action_id,
+            timestamp=time(),
+            action=action,
+            status=Bind.Status.PENDING)
+        update = {'$push': {'consumer_actions': entry}}
+        collection.update(query, update, multi=True, safe=True)
+
+    def actions_withdrawn(self, consumer_ids, repo_id, distributor_id, action_id):
+        """
+        Stop tracking an action added by actions_pending() on the bindings of
+        the specified consumers, with a single update.
+        @param consumer_ids: uniquely identifies the consumers.
+        @type consumer_ids: list
+        @param repo_id: uniquely identifies the repository.
+        @type repo_id: str
+        @param distributor_id: uniquely identifies a distributor.
+        @type distributor_id: str
+        @param action_id: The ID of the tracked action.
+        @type action_id: str
+        """
+        if not consumer_ids:
+            return
+        collection = Bind.get_collection()
+        query = {
+            'consumer_id': {'$in': consumer_ids},
+            'repo_id': repo_id,
+            'distributor_id': distributor_id,
+        }
+        update = {'$pull': {'consumer_actions': {'id': action_id}}}
+        collection.update(query, update, multi=True, safe=True)
+
     def action_succeeded(self, consumer_id, repo_id, distributor_id, action_id):
         """
         A tracked consumer action has succeeded.
@@ -430,6 +642,25 @@ class BindManager(object):
             factory.consumer_manager().get_consumer(consumer_id)
         except MissingResource:
             missing_values['consumer_id'] = consumer_id
+        missing_values.update(BindManager._validate_repo(repo_id, distributor_id))
+
+        return missing_values
+
+    @staticmethod
+    def _validate_repo(repo_id, distributor_id):
+        """
+        Validate that the given repository and distributor are present.
+
+        :param repo_id:         The repository id to validate
+        :type  repo_id:         str
+        :param distributor_id:  The distributor_id to validate
+        :type  distributor_id:  str
+
+        :return: A dictionary containing the missing values, or an empty dict if everything is valid
+        :rtype:  dict
+        """
+        missing_values = {}
+
         try:
             factory.repo_query_manager().get_repository(repo_id)
         except MissingResource:
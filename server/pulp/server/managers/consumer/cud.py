@@ -83,7 +83,9 @@ class ConsumerManager(object):
         expiration_date = config.config.getint('security', 'consumer_cert_expiration')
         key, certificate = cert_gen_manager.make_cert(consumer_id, expiration_date, uid=str(_id))
 
-        factory.consumer_history_manager().record_event(consumer_id, 'consumer_registered')
+        # the consumer was just created, so there is no need to look it up again
+        factory.consumer_history_manager().record_event(consumer_id, 'consumer_registered',
+                                                        check_consumer=False)
 
         return consumer, Bundle.join(key, certificate)
 
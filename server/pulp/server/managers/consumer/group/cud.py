@@ -6,17 +6,20 @@ from pymongo.errors import DuplicateKeyError
 
 from pulp.common import error_codes
 from pulp.server import exceptions as pulp_exceptions
-from pulp.server.async.tasks import Task, TaskResult
+from pulp.server.async.status_writer import progress_writer
+from pulp.server.async.tasks import Task, TaskResult, get_current_task_id
 from pulp.server.db.model.consumer import Consumer, ConsumerGroup
 from pulp.server.exceptions import PulpCodedException, PulpException
 from pulp.server.managers import factory as manager_factory
-from pulp.server.tasks.consumer import bind as bind_task, unbind as unbind_task
 
 
 _logger = logging.getLogger(__name__)
 
 _CONSUMER_GROUP_ID_REGEX = re.compile(r'^[\-_A-Za-z0-9]+$')  # letters, numbers, underscore, hyphen
 
+# Number of group members bound or unbound, and whose agents are notified, at a time
+BIND_BATCH_SIZE = 500
+
 
 class ConsumerGroupManager(object):
     @staticmethod
@@ -299,6 +302,10 @@ class ConsumerGroupManager(object):
         """
         Bind the members of the specified consumer group.
 
+        The repository and distributor are validated once, the bindings are written
+        in bulk and the agents are notified in batches of BIND_BATCH_SIZE members,
+        using a distributor payload that is generated once for the whole batch.
+
         :param group_id:       A consumer group ID.
         :type group_id:        str
         :param repo_id:        A repository ID.
@@ -314,27 +321,27 @@ class ConsumerGroupManager(object):
         :type binding_config:  dict
         :return:               Details of the subtasks that were executed
         :rtype:                TaskResult
+
+        :raise InvalidValue: when the repository or distributor id is invalid, or
+        if the notify_agent value is invalid
         """
         manager = manager_factory.consumer_group_query_manager()
         group = manager.get_group(group_id)
+        bind_manager = manager_factory.consumer_bind_manager()
+        agent_manager = manager_factory.consumer_agent_manager()
 
-        bind_errors = []
-        additional_tasks = []
+        def bind_batch(consumer_ids):
+            bindings, missing = bind_manager.bind_consumers(
+                consumer_ids, repo_id, distributor_id, notify_agent, binding_config)
+            errors = [pulp_exceptions.MissingResource(consumer_id=c) for c in missing]
+            tasks = []
+            if notify_agent:
+                tasks, agent_errors = agent_manager.bind_all(bindings, agent_options)
+                errors.extend(agent_errors)
+            return tasks, errors
 
-        for consumer_id in group['consumer_ids']:
-            try:
-                report = bind_task(consumer_id, repo_id, distributor_id, notify_agent,
-                                   binding_config, agent_options)
-                if report.spawned_tasks:
-                    additional_tasks.extend(report.spawned_tasks)
-            except PulpException, e:
-                # Log a message so that we can debug but don't throw
-                _logger.debug(e)
-                bind_errors.append(e)
-            except Exception, e:
-                _logger.exception(e)
-                # Don't do anything else since we still want to process all the other consumers
-                bind_errors.append(e)
+        bind_errors, additional_tasks = ConsumerGroupManager._process_batches(
+            group['consumer_ids'], 'bind', bind_batch)
 
         bind_error = None
         if len(bind_errors) > 0:
@@ -350,6 +357,10 @@ class ConsumerGroupManager(object):
     def unbind(group_id, repo_id, distributor_id, options):
         """
         Unbind the members of the specified consumer group.
+
+        The bindings are updated in bulk and the agents are notified in batches
+        of BIND_BATCH_SIZE members.
+
         :param group_id: A consumer group ID.
         :type group_id: str
         :param repo_id: A repository ID.
@@ -363,22 +374,20 @@ class ConsumerGroupManager(object):
         """
         manager = manager_factory.consumer_group_query_manager()
         group = manager.get_group(group_id)
+        bind_manager = manager_factory.consumer_bind_manager()
+        agent_manager = manager_factory.consumer_agent_manager()
 
-        bind_errors = []
-        additional_tasks = []
+        def unbind_batch(consumer_ids):
+            bindings, unbound = bind_manager.unbind_consumers(
+                consumer_ids, repo_id, distributor_id)
+            errors = [pulp_exceptions.MissingResource(
+                consumer_id=c, repo_id=repo_id, distributor_id=distributor_id) for c in unbound]
+            tasks, agent_errors = agent_manager.unbind_all(bindings, options)
+            errors.extend(agent_errors)
+            return tasks, errors
 
-        for consumer_id in group['consumer_ids']:
-            try:
-                report = unbind_task(consumer_id, repo_id, distributor_id, options)
-                if report:
-                    additional_tasks.extend(report.spawned_tasks)
-            except PulpException, e:
-                # Log a message so that we can debug but don't throw
-                _logger.warn(e)
-                bind_errors.append(e)
-            except Exception, e:
-                bind_errors.append(e)
-                # Don't do anything else since we still want to process all the other consumers
+        bind_errors, additional_tasks = ConsumerGroupManager._process_batches(
+            group['consumer_ids'], 'unbind', unbind_batch)
 
         bind_error = None
         if len(bind_errors) > 0:
@@ -389,6 +398,53 @@ class ConsumerGroupManager(object):
             bind_error.child_exceptions = bind_errors
         return TaskResult(error=bind_error, spawned_tasks=additional_tasks)
 
+    @staticmethod
+    def _process_batches(consumer_ids, action, process_batch):
+        """
+        Process the members of a group in batches of BIND_BATCH_SIZE, reporting
+        the progress of the whole group on the current task after each batch.
+        A batch that fails as a whole counts as failed for all of its members,
+        and the remaining batches are still processed.
+
+        :param consumer_ids:  IDs of the group members
+        :type  consumer_ids:  list
+        :param action:        name of the action, used as the progress report key
+        :type  action:        str
+        :param process_batch: called with a list of consumer IDs; returns a tuple of the
+                              tasks spawned and the errors for individual members
+        :type  process_batch: callable
+        :return: tuple of all the errors, and the IDs of all the spawned tasks
+        :rtype:  tuple
+        """
+        task_id = get_current_task_id()
+        progress = {'total': len(consumer_ids), 'completed': 0, 'failed': 0}
+        errors = []
+        spawned_tasks = []
+
+        for start in range(0, len(consumer_ids), BIND_BATCH_SIZE):
+            batch = consumer_ids[start:start + BIND_BATCH_SIZE]
+            try:
+                tasks, batch_errors = process_batch(batch)
+                spawned_tasks.extend({'task_id': t['task_id']} for t in tasks)
+                errors.extend(batch_errors)
+                failed = len(batch_errors)
+            except PulpException, e:
+                # Log a message so that we can debug but don't throw
+                _logger.warn(e)
+                errors.append(e)
+                failed = len(batch)
+            except Exception, e:
+                _logger.exception(e)
+                # Don't do anything else since we still want to process all the other consumers
+                errors.append(e)
+                failed = len(batch)
+            progress['failed'] += failed
+            progress['completed'] += len(batch) - failed
+            if task_id:
+                progress_writer.set_progress(task_id, {action: progress})
+
+        return errors, spawned_tasks
+
     @staticmethod
     def process_group(consumer_group, error_code, error_kwargs, process_method, *args):
         """
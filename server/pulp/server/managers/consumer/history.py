@@ -6,6 +6,8 @@ consumer history events.
 import datetime
 import isodate
 import pymongo
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
 
 from pulp.common import dateutils
 from pulp.server import config
@@ -55,7 +57,7 @@ class ConsumerHistoryManager(object):
         '''
         return managers_factory.principal_manager().get_principal()['login']
 
-    def record_event(self, consumer_id, event_type, event_details=None):
+    def record_event(self, consumer_id, event_type, event_details=None, check_consumer=True):
         """
         @ivar consumer_id: identifies the consumer
         @type id: str
@@ -66,13 +68,19 @@ class ConsumerHistoryManager(object):
         @param details: event details
         @type details: dict
 
+        @param check_consumer: look up the consumer to make sure it exists; callers
+                               that have already validated the consumer pass False
+        @type check_consumer: bool
+
         @raises MissingResource: if the given consumer does not exist
         @raises InvalidValue: if any of the fields is unacceptable
         """
-        # Check that consumer exists for all except registration event
-        existing_consumer = Consumer.get_collection().find_one({'id': consumer_id})
-        if not existing_consumer and event_type != TYPE_CONSUMER_UNREGISTERED:
-            raise MissingResource(consumer=consumer_id)
+        # Check that consumer exists for all except unregistration event
+        if check_consumer and event_type != TYPE_CONSUMER_UNREGISTERED:
+            existing_consumer = Consumer.get_collection().find_one({'id': consumer_id},
+                                                                   fields=['id'])
+            if not existing_consumer:
+                raise MissingResource(consumer=consumer_id)
 
         invalid_values = []
         if event_type not in TYPES:
@@ -87,8 +95,42 @@ class ConsumerHistoryManager(object):
         event = ConsumerHistoryEvent(consumer_id, self._originator(), event_type, event_details)
         ConsumerHistoryEvent.get_collection().save(event, safe=True)
 
+    def record_events(self, consumer_ids, event_type, event_details=None):
+        """
+        Record the same event for several consumers with a single insert. The caller
+        is responsible for making sure the consumers exist.
+
+        @param consumer_ids: identifies the consumers
+        @type consumer_ids: list
+
+        @param event_type: event type
+        @type event_type: str
+
+        @param event_details: event details
+        @type event_details: dict
+
+        @raises InvalidValue: if any of the fields is unacceptable
+        """
+        invalid_values = []
+        if event_type not in TYPES:
+            invalid_values.append('event_type')
+
+        if event_details is not None and not isinstance(event_details, dict):
+            invalid_values.append('event_details')
+
+        if invalid_values:
+            raise InvalidValue(invalid_values)
+
+        if not consumer_ids:
+            return
+
+        originator = self._originator()
+        events = [ConsumerHistoryEvent(consumer_id, originator, event_type, event_details)
+                  for consumer_id in consumer_ids]
+        ConsumerHistoryEvent.get_collection().insert(events, safe=True)
+
     def query(self, consumer_id=None, event_type=None, limit=None, sort='descending',
-              start_date=None, end_date=None):
+              start_date=None, end_date=None, after=None):
         '''
         Queries the consumer history storage.
 
@@ -104,7 +146,7 @@ class ConsumerHistoryManager(object):
         @type  limit: number greater than zero
 
         @param sort: indicates the sort direction of the results; results are sorted
-                     by timestamp
+                     by timestamp, and events with the same timestamp by ID
         @type  sort: string; valid values are 'ascending' and 'descending'
 
         @param start_date: if specified, no events prior to this date will be returned
@@ -113,6 +155,11 @@ class ConsumerHistoryManager(object):
         @param end_date: if specified, no events after this date will be returned
         @type  end_date: datetime.datetime
 
+        @param after: if specified, only events that come after the event with this
+                      ID in the sort order are returned; passing the ID of the last
+                      event of one page of results retrieves the next page
+        @type  after: string
+
         @return: list of consumer history entries that match the given parameters;
                  empty list (not None) if no matching entries are found
         @rtype:  list of ConsumerHistoryEvent instances
@@ -144,6 +191,17 @@ class ConsumerHistoryManager(object):
             except (ValueError, isodate.ISO8601Error):
                 invalid_values.append('end_date')
 
+        # Verify that the event to page after exists
+        marker = None
+        if after is not None:
+            try:
+                marker = ConsumerHistoryEvent.get_collection().find_one(
+                    {'_id': ObjectId(after)}, fields=['timestamp'])
+            except (InvalidId, TypeError):
+                pass
+            if marker is None:
+                invalid_values.append('after')
+
         if invalid_values:
             raise InvalidValue(invalid_values)
 
@@ -164,14 +222,24 @@ class ConsumerHistoryManager(object):
         if len(date_range) > 0:
             search_params['timestamp'] = date_range
 
+        # Keyset pagination: continue after the marker event in (timestamp, _id) order,
+        # which the compound indexes on the collection serve without skipping documents
+        if marker is not None:
+            beyond = '$lt' if sort == SORT_DESCENDING else '$gt'
+            search_params['$or'] = [
+                {'timestamp': {beyond: marker['timestamp']}},
+                {'timestamp': marker['timestamp'], '_id': {beyond: marker['_id']}},
+            ]
+
         # Determine the correct mongo cursor to retrieve
         if len(search_params) == 0:
             cursor = ConsumerHistoryEvent.get_collection().find()
         else:
             cursor = ConsumerHistoryEvent.get_collection().find(search_params)
 
-        # Sort by most recent entry first
-        cursor.sort('timestamp', direction=SORT_DIRECTION[sort])
+        # Sort by most recent entry first; the _id breaks ties so pages never overlap
+        direction = SORT_DIRECTION[sort]
+        cursor.sort([('timestamp', direction), ('_id', direction)])
 
         # If a limit was specified, add it to the cursor
         if limit:
@@ -13,13 +13,17 @@
 """
 Contains profile management classes
 """
+import copy
+
 from celery import task
 
+from pulp.common import error_codes
+from pulp.common.profile import ADDED, REMOVED, apply_delta
 from pulp.plugins.loader import api as plugin_api, exceptions as plugin_exceptions
 from pulp.plugins.profiler import Profiler
 from pulp.server.async.tasks import Task
-from pulp.server.db.model.consumer import UnitProfile
-from pulp.server.exceptions import MissingResource
+from pulp.server.db.model.consumer import ReportedUnitProfile, UnitProfile
+from pulp.server.exceptions import InvalidValue, MissingResource, PulpCodedConflictException
 from pulp.server.managers import factory
 
 
@@ -27,6 +31,10 @@ class ProfileManager(object):
     """
     Manage consumer installed content unit profiles.
     """
+
+    # The fields of a profile returned when the profile itself is not needed
+    SUMMARY_FIELDS = ('consumer_id', 'content_type', 'profile_hash')
+
     @staticmethod
     def create(consumer_id, content_type, profile):
         """
@@ -54,27 +62,176 @@ class ProfileManager(object):
         :param profile:      The unit profile
         :type  profile:      object
         """
-        try:
-            profiler, config = plugin_api.get_profiler_by_type(content_type)
-        except plugin_exceptions.PluginNotFound:
-            # Not all profile types have a type specific profiler, so let's use the baseclass
-            # Profiler
-            profiler, config = (Profiler(), {})
         consumer = factory.consumer_manager().get_consumer(consumer_id)
-        # Allow the profiler a chance to update the profile before we save it
-        profile = profiler.update_profile(consumer, content_type, profile, config)
+        # the profiler may change the reported profile in place
+        reported_profile = copy.deepcopy(profile)
+        profile = ProfileManager._update_profile(consumer, content_type, profile)
+        profile_hash = UnitProfile.calculate_hash(profile)
 
         try:
             p = ProfileManager.get_profile(consumer_id, content_type)
+            if p.get('profile_hash') == profile_hash and \
+                    ProfileManager._reported_profile(p) == reported_profile:
+                # unchanged, so there is nothing to write
+                return p
             p['profile'] = profile
             # We store the profile's hash anytime the profile gets altered
-            p['profile_hash'] = UnitProfile.calculate_hash(profile)
+            p['profile_hash'] = profile_hash
         except MissingResource:
             p = UnitProfile(consumer_id, content_type, profile)
         collection = UnitProfile.get_collection()
         collection.save(p, safe=True)
+        ProfileManager._save_reported_profile(p, reported_profile)
+        return p
+
+    @staticmethod
+    def confirm(consumer_id, content_type, profile_hash):
+        """
+        Confirm that a consumer's unit profile has not changed since it was last
+        reported, without sending the profile again.
+
+        :param consumer_id:  uniquely identifies the consumer.
+        :type  consumer_id:  str
+        :param content_type: The profile (content) type ID.
+        :type  content_type: str
+        :param profile_hash: The hash of the profile the consumer last reported, as
+                             returned by the server
+        :type  profile_hash: str
+        :return: The stored profile, without the profile itself:
+            {consumer_id:<str>, content_type:<str>, profile_hash:<str>}
+        :rtype:  dict
+        :raise PulpCodedConflictException: when the stored profile has a different
+                                           hash, or there is none
+        """
+        collection = UnitProfile.get_collection()
+        profile_id = dict(consumer_id=consumer_id, content_type=content_type)
+        p = collection.find_one(profile_id, fields=ProfileManager.SUMMARY_FIELDS)
+        if p is None or p.get('profile_hash') != profile_hash:
+            raise PulpCodedConflictException(error_codes.PLP0034, profile_hash=profile_hash,
+                                             **profile_id)
         return p
 
+    @staticmethod
+    def update_delta(consumer_id, content_type, profile_hash, delta):
+        """
+        Update a unit profile with the changes since it was last reported.
+        Only profiles that are lists can be updated this way. The changes are
+        applied to the profile as it was reported, and the result is passed to
+        the profiler like a profile reported in full.
+
+        :param consumer_id:  uniquely identifies the consumer.
+        :type  consumer_id:  str
+        :param content_type: The profile (content) type ID.
+        :type  content_type: str
+        :param profile_hash: The hash of the profile the delta is against, as
+                             returned by the server
+        :type  profile_hash: str
+        :param delta:        The changes; see pulp.common.profile
+        :type  delta:        dict
+        :return: The stored profile, without the profile itself:
+            {consumer_id:<str>, content_type:<str>, profile_hash:<str>}
+        :rtype:  dict
+        :raise InvalidValue: when the delta is not valid
+        :raise PulpCodedConflictException: when the stored profile has a different
+                                           hash, or the delta does not apply to it
+        """
+        if not isinstance(delta, dict) or \
+                not all(isinstance(delta.get(k, []), list) for k in (ADDED, REMOVED)):
+            raise InvalidValue(['delta'])
+
+        conflict = PulpCodedConflictException(
+            error_codes.PLP0034, consumer_id=consumer_id, content_type=content_type,
+            profile_hash=profile_hash)
+        collection = UnitProfile.get_collection()
+        profile_id = dict(consumer_id=consumer_id, content_type=content_type)
+        p = collection.find_one(profile_id)
+        if p is None or p.get('profile_hash') != profile_hash:
+            raise conflict
+        reported_profile = ProfileManager._reported_profile(p)
+        if not isinstance(reported_profile, list):
+            raise conflict
+        try:
+            reported_profile = apply_delta(reported_profile, delta)
+        except ValueError:
+            raise conflict
+
+        consumer = factory.consumer_manager().get_consumer(consumer_id)
+        profile = ProfileManager._update_profile(consumer, content_type,
+                                                 copy.deepcopy(reported_profile))
+        new_hash = UnitProfile.calculate_hash(profile)
+        if new_hash != profile_hash:
+            # only update the version the delta was calculated against
+            query = {'_id': p['_id'], 'profile_hash': profile_hash}
+            update = {'$set': {'profile': profile, 'profile_hash': new_hash}}
+            result = collection.update(query, update, safe=True)
+            if not result['n']:
+                raise conflict
+
+        summary = dict((k, p[k]) for k in ('_id', 'consumer_id', 'content_type'))
+        summary['profile_hash'] = new_hash
+        ProfileManager._save_reported_profile(dict(summary, profile=profile), reported_profile)
+        return summary
+
+    @staticmethod
+    def _reported_profile(p):
+        """
+        Get a unit profile as the consumer reported it, before the profiler
+        translated it.
+
+        :param p: The stored unit profile
+        :type  p: dict
+        :return: The reported profile
+        :rtype:  object
+        """
+        query = dict(consumer_id=p['consumer_id'], content_type=p['content_type'],
+                     profile_hash=p['profile_hash'])
+        reported = ReportedUnitProfile.get_collection().find_one(query, fields=['profile'])
+        if reported is None:
+            # the profiler stored the profile as it was reported
+            return p['profile']
+        return reported['profile']
+
+    @staticmethod
+    def _save_reported_profile(p, reported_profile):
+        """
+        Keep a unit profile as the consumer reported it, if the profiler translated
+        it before it was stored.
+
+        :param p:                The stored unit profile
+        :type  p:                dict
+        :param reported_profile: The profile as the consumer reported it
+        :type  reported_profile: object
+        """
+        collection = ReportedUnitProfile.get_collection()
+        profile_id = dict(consumer_id=p['consumer_id'], content_type=p['content_type'])
+        if reported_profile == p['profile']:
+            collection.remove(profile_id, safe=True)
+        else:
+            update = {'$set': {'profile': reported_profile, 'profile_hash': p['profile_hash']}}
+            collection.update(profile_id, update, upsert=True, safe=True)
+
+    @staticmethod
+    def _update_profile(consumer, content_type, profile):
+        """
+        Allow the profiler a chance to update the profile before it is saved.
+
+        :param consumer:     The consumer.
+        :type  consumer:     dict
+        :param content_type: The profile (content) type ID.
+        :type  content_type: str
+        :param profile:      The unit profile
+        :type  profile:      object
+        :return: The updated profile
+        :rtype:  object
+        """
+        try:
+            profiler, config = plugin_api.get_profiler_by_type(content_type)
+        except plugin_exceptions.PluginNotFound:
+            # Not all profile types have a type specific profiler, so let's use the baseclass
+            # Profiler
+            profiler, config = (Profiler(), {})
+        return profiler.update_profile(consumer, content_type, profile, config)
+
     @staticmethod
     def delete(consumer_id, content_type):
         """
@@ -88,6 +245,8 @@ class ProfileManager(object):
         profile = ProfileManager.get_profile(consumer_id, content_type)
         collection = UnitProfile.get_collection()
         collection.remove(profile, safe=True)
+        ReportedUnitProfile.get_collection().remove(
+            dict(consumer_id=consumer_id, content_type=content_type), safe=True)
 
     def consumer_deleted(self, id):
         """
@@ -99,6 +258,7 @@ class ProfileManager(object):
         collection = UnitProfile.get_collection()
         for p in self.get_profiles(id):
             collection.remove(p, sefe=True)
+        ReportedUnitProfile.get_collection().remove(dict(consumer_id=id), safe=True)
 
     @staticmethod
     def get_profile(consumer_id, content_type):
@@ -2,6 +2,7 @@ import uuid
 
 from pulp.common import dateutils
 from pulp.plugins.types import database as content_types_db
+from pulp.server.db.model.content import ContentChecksum
 from pulp.server.exceptions import InvalidValue
 
 
@@ -32,6 +33,10 @@ class ContentManager(object):
             '_last_updated': dateutils.now_utc_timestamp()
         }
         unit_doc.update(unit_metadata)
+        key_fields = content_types_db.type_units_unit_key(content_type)
+        if key_fields:
+            unit_key = dict((f, unit_doc.get(f)) for f in key_fields)
+            unit_doc[content_types_db.UNIT_KEY_DIGEST] = content_types_db.unit_key_digest(unit_key)
         collection.insert(unit_doc, safe=True)
         return unit_id
 
@@ -47,6 +52,18 @@ class ContentManager(object):
         """
         unit_metadata_delta['_last_updated'] = dateutils.now_utc_timestamp()
         collection = content_types_db.type_units_collection(content_type)
+        # the digest is derived from the unit key here, never taken from the caller
+        unit_metadata_delta.pop(content_types_db.UNIT_KEY_DIGEST, None)
+        key_fields = content_types_db.type_units_unit_key(content_type) or []
+        changed_fields = [f for f in key_fields if f in unit_metadata_delta]
+        if changed_fields:
+            # the unit key is changing, so its digest has to follow
+            unit_key = {}
+            if len(changed_fields) < len(key_fields):
+                unit_key = collection.find_one({'_id': unit_id}, fields=key_fields) or {}
+            unit_key = dict((f, unit_metadata_delta.get(f, unit_key.get(f))) for f in key_fields)
+            digest = content_types_db.unit_key_digest(unit_key)
+            unit_metadata_delta[content_types_db.UNIT_KEY_DIGEST] = digest
         collection.update({'_id': unit_id}, {'$set': unit_metadata_delta}, safe=True)
 
     def remove_content_unit(self, content_type, unit_id):
@@ -59,7 +76,10 @@ class ContentManager(object):
         @type unit_id: str
         """
         collection = content_types_db.type_units_collection(content_type)
-        collection.remove({'_id': unit_id}, safe=True)
+        unit = collection.find_and_modify({'_id': unit_id}, remove=True,
+                                          fields={'_storage_path': 1})
+        if unit is not None and unit.get('_storage_path'):
+            ContentChecksum.remove_checksums(unit['_storage_path'])
 
     def link_referenced_content_units(self, from_type, from_id, to_type, to_ids):
         """
@@ -9,6 +9,7 @@ from celery import task
 from pulp.plugins.types import database as content_types_db
 from pulp.server import config as pulp_config, exceptions as pulp_exceptions
 from pulp.server.async.tasks import Task
+from pulp.server.db.model.content import ContentChecksum
 from pulp.server.db.model.repository import RepoContentUnit
 
 
@@ -300,10 +301,11 @@ class OrphanManager(object):
         """
         Delete the specified path.
         File and links are unlinked.  Directories are recursively deleted.
-        Exceptions are logged and discarded.
+        Exceptions are logged and discarded. Checksums cached for the path are removed.
         :param path: An absolute path.
         :type path: str
         """
+        ContentChecksum.remove_checksums(path)
         try:
             if os.path.isfile(path) or os.path.islink(path):
                 os.unlink(path)
@@ -9,6 +9,10 @@ from pulp.server import config as pulp_config
 from pulp.server.exceptions import InvalidValue, MissingResource
 
 
+# Most unit key values a single query for units by their keys looks up
+UNIT_KEYS_QUERY_CHUNK_SIZE = 1000
+
+
 class ContentQueryManager(object):
     """
     Query operations for content types and individual content units.
@@ -165,10 +169,35 @@ class ContentQueryManager(object):
         @rtype: (possibly empty) tuple of dict's
         @raise ValueError if any of the keys dictionaries are invalid
         """
-        collection = content_types_db.type_units_collection(content_type)
-        spec = _build_multi_keys_spec(content_type, unit_keys_dicts)
-        cursor = collection.find(spec, fields=model_fields)
-        return tuple(cursor)
+        return tuple(self.find_units_by_keys_dicts(content_type, unit_keys_dicts, model_fields))
+
+    def find_units_by_keys_dicts(self, content_type, unit_keys_dicts, model_fields=None):
+        """
+        Look up multiple content units in the collection for the given content
+        type collection that match the list of keys dictionaries, yielding each
+        unit as it is read from the database.
+
+        The keys dictionaries are looked up by the digests of their unit keys,
+        in chunks of at most UNIT_KEYS_QUERY_CHUNK_SIZE, so this scales to lists
+        of many thousands of keys dictionaries. Every unit carries the digest:
+        the ContentManager stores it when a unit is added or its key changes,
+        and migration 0016 stored it on the units added before.
+
+        :param content_type:    unique id of content collection
+        :type  content_type:    str
+        :param unit_keys_dicts: list of dictionaries whose key, value pairs can
+                                uniquely identify a content unit
+        :type  unit_keys_dicts: list of dicts
+        :param model_fields:    fields of each content unit to report,
+                                None means all fields
+        :type  model_fields:    None or list of str
+
+        :return:    generator of content units found in the content type
+                    collection that match the given unit keys dictionaries
+        :rtype:     generator
+        :raise ValueError: if any of the keys dictionaries are invalid
+        """
+        return _find_units_by_keys_dicts(content_type, unit_keys_dicts, model_fields)
 
     def get_multiple_units_by_ids(self, content_type, unit_ids, model_fields=None):
         """
@@ -227,12 +256,8 @@ class ContentQueryManager(object):
         :return:    generator of unit IDs as strings
         :rtype:     generator
         """
-        collection = content_types_db.type_units_collection(content_type)
-        for segment in paginate(unit_keys):
-            spec = _build_multi_keys_spec(content_type, segment)
-            fields = ['_id']
-            for item in collection.find(spec, fields=fields):
-                yield str(item['_id'])
+        for item in _find_units_by_keys_dicts(content_type, unit_keys, ['_id']):
+            yield str(item['_id'])
 
     def get_root_content_dir(self, content_type):
         """
@@ -296,33 +321,50 @@ def _flatten_keys(flat_keys, nested_keys):
             _flatten_keys(flat_keys, key)
 
 
-def _build_multi_keys_spec(content_type, unit_keys_dicts):
+def _find_units_by_keys_dicts(content_type, unit_keys_dicts, model_fields):
     """
-    Build a mongo db spec document for a query on the given content_type
-    collection out of multiple content unit key dictionaries.
+    Generator behind ContentQueryManager.find_units_by_keys_dicts.
     @param content_type: unique id of the content type collection
     @type content_type: str
-    @param unit_key_dict: list of key dictionaries whose key, value pairs can be
-                          used as unique identifiers for a single content unit
-    @return: mongo db spec document for locating documents in a collection
-    @rtype: dict
+    @param unit_keys_dicts: list of key dictionaries whose key, value pairs can
+                            be used as unique identifiers for a single content unit
+    @type unit_keys_dicts: list of dict's
+    @param model_fields: fields of each content unit to report, None means all fields
+    @type model_fields: None or list of str's
+    @return: generator of content units
+    @rtype: generator
+    """
+    key_fields, digests = _digest_keys_dicts(content_type, unit_keys_dicts)
+    if not digests:
+        return
+    collection = content_types_db.type_units_collection(content_type)
+    if not key_fields:
+        # every unit matches an empty keys dictionary
+        for unit in collection.find({}, fields=model_fields):
+            yield unit
+        return
+
+    for page in paginate(digests, UNIT_KEYS_QUERY_CHUNK_SIZE):
+        spec = {content_types_db.UNIT_KEY_DIGEST: {'$in': list(page)}}
+        for unit in collection.find(spec, fields=model_fields):
+            yield unit
+
+
+def _digest_keys_dicts(content_type, unit_keys_dicts):
+    """
+    Validate the given keys dictionaries against the unit key of the given
+    content_type, and digest them.
+    @param content_type: unique id of the content type collection
+    @type content_type: str
+    @param unit_keys_dicts: list of key dictionaries whose key, value pairs can
+                            be used as unique identifiers for a single content unit
+    @type unit_keys_dicts: list of dict's
+    @return: tuple of the unit key fields and the distinct digests of the
+             keys dictionaries, in the order of unit_keys_dicts
+    @rtype: tuple
     @raise: ValueError if any of the key dictionaries do not match the unique
             fields of the collection
     """
-    # NOTE this is just about the coolest mongo db query construction method
-    # you'll find in this entire code base. Not only is it correct in the sense
-    # that it builds a spec doc that will find at most 1 content unit per keys
-    # dictionary passed in, but it does duplicate value elimination and key
-    # validation on every single key and value found in every keys dictionary.
-    # The spec document returned allows us to find multiple documents in a
-    # content type collection with only a single query to the database.
-
-    # I will buy a meal (including drinks if wanted) for the first person that
-    # explains to me why the returned spec document is correct. Here's a hint:
-    # explain why the spec document finds at most one document per keys dict and
-    # explain when the spec will fail to find a document for an arbitrary keys
-    # dict.
-
     # keys dicts validation constants
     key_fields = []
     _flatten_keys(key_fields, content_types_db.type_units_unit_key(content_type))
@@ -330,9 +372,8 @@ def _build_multi_keys_spec(content_type, unit_keys_dicts):
     extra_keys_msg = _('keys dictionary found with superfluous keys %(a)s, valid keys are %(b)s')
     missing_keys_msg = _('keys dictionary missing keys %(a)s, required keys are %(b)s')
     keys_errors = []
-    # spec document valid keys and valid values, used as template to generate
-    # actual spec document for mongo db queries
-    spec_template = dict([(f, set()) for f in key_fields])
+    seen = set()
+    digests = []
     for keys_dict in unit_keys_dicts:
         # keys dict validation
         keys_dict_set = set(keys_dict)
@@ -346,11 +387,12 @@ def _build_multi_keys_spec(content_type, unit_keys_dicts):
                                                    'b': ','.join(key_fields)})
         if extra_keys or missing_keys:
             continue
-        # validation passed, store the keys and values in the template
-        for k, v in keys_dict.items():
-            spec_template[k].add(v)
+        digest = content_types_db.unit_key_digest(keys_dict)
+        if digest in seen:
+            continue
+        seen.add(digest)
+        digests.append(digest)
     if keys_errors:
         value_error_msg = '\n'.join(keys_errors)
         raise ValueError(value_error_msg)
-    spec = dict([(k, {'$in': list(v)}) for k, v in spec_template.items()])
-    return spec
+    return key_fields, digests
@@ -13,27 +13,55 @@
 from celery import task
 from gettext import gettext as _
 from uuid import uuid4
+import errno
+import fcntl
 import logging
 import os
 import sys
+import threading
 
 from pulp.plugins.conduits.upload import UploadConduit
 from pulp.plugins.config import PluginCallConfiguration
 from pulp.plugins.loader import api as plugin_api, exceptions as plugin_exceptions
+from pulp.plugins.util import verification
 from pulp.server import config as pulp_config
 from pulp.server.async.tasks import Task
+from pulp.server.compat import json
 from pulp.server.db.model.repository import RepoContentUnit
-from pulp.server.exceptions import (PulpDataException, MissingResource, PulpExecutionException,
-                                    PulpException)
+from pulp.server.exceptions import (InvalidValue, PulpDataException, MissingResource,
+                                    PulpExecutionException, PulpException)
 import pulp.server.managers.factory as manager_factory
 import pulp.server.managers.repo._common as repo_common_utils
 
 
 logger = logging.getLogger(__name__)
 
+# Suffix of the file kept next to each upload that records what was declared when it was
+# initialized, the ranges received so far and the digests calculated over them
+METADATA_FILE_SUFFIX = '.metadata'
+
+DEFAULT_CHECKSUM_TYPES = (verification.TYPE_SHA256,)
+
+# Number of bytes read at a time when catching the digests up over segments that
+# arrived ahead of the contiguous data
+DIGEST_READ_SIZE = 1048576
+
+# Number of running digests a process keeps; when there are more, the oldest is dropped
+# and the checksums of its upload are calculated when it is imported
+MAX_RUNNING_DIGESTS = 32
+
+# Running digests for uploads whose contiguous data was most recently handled by this
+# process, keyed by upload ID; values are (offset, {type: hasher}). Hash state cannot be
+# written to disk, so the metadata file only holds the hex digests and the offset they
+# cover.
+_running_digests = {}
+# upload IDs in _running_digests, oldest first
+_running_digest_order = []
+_running_digests_lock = threading.Lock()
+
 
 class ContentUploadManager(object):
-    def initialize_upload(self):
+    def initialize_upload(self, size=None, checksum_types=None):
         """
         Informs the Pulp server that a new file is about to be uploaded, allowing
         it to do any preparation it needs to do to store or track the upload.
@@ -41,9 +69,40 @@ class ContentUploadManager(object):
         The ID returned from this call is used to track this specific uploaded
         file for the remainder of its life.
 
+        If the size is declared, the file is allocated to its full length up
+        front. As contiguous data arrives from the start of the file, the
+        requested digests are calculated over it. Any the importer asks for that
+        were not finished while the file was written are calculated together in
+        a single read of the file.
+
+        @param size: total size in bytes of the file that will be uploaded
+        @type  size: int
+
+        @param checksum_types: checksum types to calculate while the data is
+               written; defaults to DEFAULT_CHECKSUM_TYPES
+        @type  checksum_types: list
+
         @return: unique ID to refer to this upload request in the future
         @rtype:  str
+
+        @raise InvalidValue: if the size is negative or a checksum type is not a
+               known checksum type name
         """
+        if checksum_types is None:
+            checksum_types = DEFAULT_CHECKSUM_TYPES
+
+        invalid_values = []
+        if size is not None and (not isinstance(size, (int, long)) or size < 0):
+            invalid_values.append('size')
+        if not isinstance(checksum_types, (list, tuple)) or \
+                [t for t in checksum_types if not isinstance(t, basestring)]:
+            invalid_values.append('checksum_types')
+        else:
+            checksum_types = [verification.sanitize_checksum_type(t) for t in checksum_types]
+            if [t for t in checksum_types if t not in verification.CHECKSUM_FUNCTIONS]:
+                invalid_values.append('checksum_types')
+        if invalid_values:
+            raise InvalidValue(invalid_values)
 
         # Eventually I can see this method keeping track of uploads in the
         # database so a user can later query the server to find incomplete
@@ -57,7 +116,24 @@ class ContentUploadManager(object):
         # before attempting to write bits.
         file_path = ContentUploadManager._upload_file_path(upload_id)
         f = open(file_path, 'w')
-        f.close()
+        try:
+            if size:
+                f.truncate(size)
+        finally:
+            f.close()
+
+        metadata = {
+            'size': size,
+            'checksum_types': checksum_types,
+            'received_ranges': [],
+            'digest_offset': 0,
+            'checksums': {},
+        }
+        f = open(ContentUploadManager._upload_metadata_path(upload_id), 'w')
+        try:
+            json.dump(metadata, f)
+        finally:
+            f.close()
 
         return upload_id
 
@@ -80,14 +156,139 @@ class ContentUploadManager(object):
 
         file_path = ContentUploadManager._upload_file_path(upload_id)
 
-        # Make sure the upload was initialized first and hasn't been deleted
-        if not os.path.exists(file_path):
-            raise MissingResource(upload_request=upload_id)
+        # Segments may arrive in any order and concurrently from different
+        # request handlers, so each write uses its own unbuffered descriptor
+        # and never truncates; writing past the current end of the file simply
+        # leaves a hole to be filled in by the segment that covers it.
+        try:
+            fd = os.open(file_path, os.O_WRONLY)
+        except OSError, e:
+            # Make sure the upload was initialized first and hasn't been deleted
+            if e.errno == errno.ENOENT:
+                raise MissingResource(upload_request=upload_id)
+            raise
+
+        try:
+            os.lseek(fd, offset, os.SEEK_SET)
+            written = 0
+            while written < len(data):
+                written += os.write(fd, data[written:])
+        finally:
+            os.close(fd)
 
-        f = open(file_path, 'r+')
-        f.seek(offset)
-        f.write(data)
-        f.close()
+        self._record_segment(upload_id, offset, data)
+
+    def _record_segment(self, upload_id, offset, data):
+        """
+        Records the range covered by a newly written segment and advances the
+        upload's digests over any data that is now contiguous from the start
+        of the file.
+
+        Hash state cannot be shared between processes, so the running digests
+        live in the process that last advanced them. If a different process
+        receives the next contiguous segment, it only records the range; the
+        owning process catches up from the file the next time it handles a
+        segment. If the upload's declared size has been received and the
+        digests are still behind, the process that received the last segment
+        calculates them again from the start of the file. Without a declared
+        size that cannot be told, so the digests may stop short of the end and
+        are then calculated when the upload is imported. Uploads whose
+        metadata does not track received ranges are left alone.
+
+        :param upload_id: upload request ID
+        :type  upload_id: str
+        :param offset:    offset at which the segment was written
+        :type  offset:    int
+        :param data:      contents of the segment
+        :type  data:      str
+        """
+        try:
+            metadata_file = open(ContentUploadManager._upload_metadata_path(upload_id), 'r+')
+        except IOError, e:
+            if e.errno == errno.ENOENT:
+                return
+            raise
+
+        try:
+            fcntl.flock(metadata_file.fileno(), fcntl.LOCK_EX)
+            metadata = json.load(metadata_file)
+            if 'received_ranges' not in metadata:
+                return
+
+            metadata['received_ranges'] = _merge_range(metadata['received_ranges'],
+                                                       offset, offset + len(data))
+            self._advance_digests(upload_id, metadata, offset, data)
+
+            metadata_file.seek(0)
+            metadata_file.truncate()
+            json.dump(metadata, metadata_file)
+        finally:
+            metadata_file.close()
+
+    @staticmethod
+    def _advance_digests(upload_id, metadata, offset, data):
+        """
+        Feeds the contiguous data not yet hashed into the upload's running
+        digests and stores the current hex digests in the metadata. Data from
+        the segment just written is used directly; data from segments that
+        arrived earlier out of order is read back from the upload file.
+
+        :param upload_id: upload request ID
+        :type  upload_id: str
+        :param metadata:  upload metadata as loaded from its file; updated in place
+        :type  metadata:  dict
+        :param offset:    offset at which the segment was written
+        :type  offset:    int
+        :param data:      contents of the segment
+        :type  data:      str
+        """
+        ranges = metadata['received_ranges']
+        contiguous_end = ranges[0][1] if ranges and ranges[0][0] == 0 else 0
+        digest_offset = metadata['digest_offset']
+        if contiguous_end <= digest_offset:
+            return
+
+        position, hashers = _running_digests.get(upload_id, (None, None))
+        if position != digest_offset:
+            complete = metadata['size'] is not None and contiguous_end >= metadata['size']
+            if digest_offset != 0 and not complete:
+                # Another process owns the running digests, or this one dropped them.
+                # Starting over here would read the file from the beginning for each
+                # segment received by a different process, so that waits until the
+                # whole file has arrived and is read only once.
+                return
+            position = 0
+            hashers = dict((t, verification.CHECKSUM_FUNCTIONS[t]())
+                           for t in metadata['checksum_types'])
+
+        def update(bits):
+            for hasher in hashers.values():
+                hasher.update(bits)
+
+        if offset <= position < offset + len(data):
+            update(data[position - offset:])
+            position = offset + len(data)
+
+        if position < contiguous_end:
+            f = open(ContentUploadManager._upload_file_path(upload_id), 'r')
+            try:
+                f.seek(position)
+                while position < contiguous_end:
+                    bits = f.read(min(DIGEST_READ_SIZE, contiguous_end - position))
+                    if not bits:
+                        break
+                    update(bits)
+                    position += len(bits)
+            finally:
+                f.close()
+
+        metadata['digest_offset'] = position
+        metadata['checksums'] = dict((t, h.hexdigest()) for t, h in hashers.items())
+
+        if metadata['size'] is not None and position >= metadata['size']:
+            _drop_running_digest(upload_id)
+        else:
+            _keep_running_digest(upload_id, position, hashers)
 
     def delete_upload(self, upload_id):
         """
@@ -99,9 +300,12 @@ class ContentUploadManager(object):
         @type  upload_id: str
         """
 
-        file_path = ContentUploadManager._upload_file_path(upload_id)
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        _drop_running_digest(upload_id)
+
+        for path in (ContentUploadManager._upload_file_path(upload_id),
+                     ContentUploadManager._upload_metadata_path(upload_id)):
+            if os.path.exists(path):
+                os.remove(path)
 
     def read_upload(self, upload_id):
         """
@@ -135,7 +339,7 @@ class ContentUploadManager(object):
         @rtype:  list
         """
         upload_dir = ContentUploadManager._upload_storage_dir()
-        upload_ids = os.listdir(upload_dir)
+        upload_ids = [f for f in os.listdir(upload_dir) if not f.endswith(METADATA_FILE_SUFFIX)]
         return upload_ids
 
     @staticmethod
@@ -208,16 +412,24 @@ class ContentUploadManager(object):
             raise MissingResource(repo_id), None, sys.exc_info()[2]
 
         # Assemble the data needed for the import
+        file_path = ContentUploadManager._upload_file_path(upload_id)
+        metadata = ContentUploadManager._upload_metadata(upload_id)
+        checksums = ContentUploadManager._uploaded_checksums(upload_id, metadata)
+        if metadata.get('checksum_types') and not checksums:
+            logger.debug(_('Checksums of upload [%(u)s] were not calculated while it was '
+                           'written; they are calculated when the importer asks for them')
+                         % {'u': upload_id})
         conduit = UploadConduit(repo_id, repo_importer['id'], RepoContentUnit.OWNER_TYPE_USER,
-                                manager_factory.principal_manager().get_principal()['login'])
+                                manager_factory.principal_manager().get_principal()['login'],
+                                file_path=file_path,
+                                checksum_types=metadata.get('checksum_types'),
+                                checksums=checksums)
 
         call_config = PluginCallConfiguration(plugin_config, repo_importer['config'],
                                               override_config)
         transfer_repo = repo_common_utils.to_transfer_repo(repo)
         transfer_repo.working_dir = repo_common_utils.get_working_directory()
 
-        file_path = ContentUploadManager._upload_file_path(upload_id)
-
         # Invoke the importer
         try:
             return importer_instance.upload_unit(transfer_repo, unit_type_id, unit_key,
@@ -235,6 +447,53 @@ class ContentUploadManager(object):
 
         # TODO: Add support for tracking the report as a history entry on the repo
 
+    @staticmethod
+    def _upload_metadata(upload_id):
+        """
+        Returns what was declared when the given upload was initialized, along
+        with the ranges received and the digests calculated so far.
+
+        :param upload_id: identifies the upload in question
+        :type  upload_id: str
+        :return:          dict with the upload's metadata; empty for uploads
+                          initialized before the metadata file was introduced
+        :rtype:           dict
+        """
+        try:
+            f = open(ContentUploadManager._upload_metadata_path(upload_id))
+        except IOError:
+            return {}
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH)
+            return json.load(f)
+        finally:
+            f.close()
+
+    @staticmethod
+    def _uploaded_checksums(upload_id, metadata):
+        """
+        Returns the digests calculated while the upload was being written, if
+        they cover the entire uploaded file.
+
+        :param upload_id: identifies the upload in question
+        :type  upload_id: str
+        :param metadata:  the upload's metadata
+        :type  metadata:  dict
+        :return:          dict of checksum type to hex digest; empty if the digests
+                          do not cover the whole file
+        :rtype:           dict
+        """
+        try:
+            file_size = os.path.getsize(ContentUploadManager._upload_file_path(upload_id))
+        except OSError:
+            return {}
+
+        if metadata.get('digest_offset') != file_size:
+            return {}
+        if metadata.get('size') is not None and metadata['size'] != file_size:
+            return {}
+        return metadata['checksums']
+
     @staticmethod
     def _upload_file_path(upload_id):
         """
@@ -249,6 +508,19 @@ class ContentUploadManager(object):
         path = os.path.join(upload_storage_dir, upload_id)
         return path
 
+    @staticmethod
+    def _upload_metadata_path(upload_id):
+        """
+        Returns the full path to the file recording what was declared when the
+        given upload was initialized and how far it has been received.
+
+        :param upload_id: identifies the upload in question
+        :type  upload_id: str
+        :return:          full path on the server's filesystem
+        :rtype:           str
+        """
+        return ContentUploadManager._upload_file_path(upload_id) + METADATA_FILE_SUFFIX
+
     @staticmethod
     def _upload_storage_dir():
         """
@@ -269,4 +541,60 @@ class ContentUploadManager(object):
         return upload_storage_dir
 
 
+def _merge_range(ranges, start, end):
+    """
+    Adds [start, end) to a sorted list of non-overlapping ranges, merging it
+    with any ranges it overlaps or touches.
+
+    :param ranges: sorted list of [start, end] pairs
+    :type  ranges: list
+    :param start:  start of the range to add
+    :type  start:  int
+    :param end:    end of the range to add (exclusive)
+    :type  end:    int
+    :return:       new sorted list of [start, end] pairs
+    :rtype:        list
+    """
+    merged = []
+    for r_start, r_end in sorted(list(ranges) + [[start, end]]):
+        if merged and r_start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], r_end)
+        else:
+            merged.append([r_start, r_end])
+    return merged
+
+
+def _keep_running_digest(upload_id, position, hashers):
+    """
+    Keeps the running digests of an upload in this process, dropping the
+    oldest ones if this process holds more than MAX_RUNNING_DIGESTS.
+
+    :param upload_id: upload request ID
+    :type  upload_id: str
+    :param position:  offset up to which the data has been hashed
+    :type  position:  int
+    :param hashers:   running hash objects by checksum type
+    :type  hashers:   dict
+    """
+    with _running_digests_lock:
+        if upload_id in _running_digests:
+            _running_digest_order.remove(upload_id)
+        _running_digests[upload_id] = (position, hashers)
+        _running_digest_order.append(upload_id)
+        while len(_running_digest_order) > MAX_RUNNING_DIGESTS:
+            del _running_digests[_running_digest_order.pop(0)]
+
+
+def _drop_running_digest(upload_id):
+    """
+    Releases the running digests of an upload, if this process holds them.
+
+    :param upload_id: upload request ID
+    :type  upload_id: str
+    """
+    with _running_digests_lock:
+        if _running_digests.pop(upload_id, None) is not None:
+            _running_digest_order.remove(upload_id)
+
+
 import_uploaded_unit = task(ContentUploadManager.import_uploaded_unit, base=Task)
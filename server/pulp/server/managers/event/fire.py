@@ -19,13 +19,79 @@ in a consistent event format for that type.
 """
 
 import logging
+import threading
 
-from pulp.server.db.model.event import EventListener
+from pulp.server.db.model.event import EventListener, EventListenerGeneration
 from pulp.server.event import notifiers
 from pulp.server.event import data as e
 
 _LOG = logging.getLogger(__name__)
 
+
+class ListenerCache(object):
+    """
+    Copy of the event listeners, indexed by the event types they listen for,
+    so that firing an event does not have to query all of them. The copy is
+    reloaded when the EventListenerGeneration shows a listener was changed by
+    any process since it was loaded.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_event_type = None
+        self._generation = None
+
+    def listeners(self, event_type):
+        """
+        Returns the listeners for the given event type, including those that
+        listen for all event types.
+
+        @param event_type: type of event being fired
+        @type  event_type: str
+
+        @return: listener SON documents from the database
+        @rtype:  list
+        """
+        # Read before the listeners are loaded, so a change made while they load
+        # is picked up by the next event
+        generation = EventListenerGeneration.current()
+        with self._lock:
+            if self._by_event_type is None or generation != self._generation:
+                self._by_event_type = self._load()
+                self._generation = generation
+            by_event_type = self._by_event_type
+        return by_event_type.get(event_type, []) + by_event_type.get('*', [])
+
+    def invalidate(self):
+        """
+        Records that the listeners changed, so every process reloads them when
+        it next fires an event. Call this after the change is saved.
+        """
+        EventListenerGeneration.increment()
+        with self._lock:
+            self._by_event_type = None
+
+    @staticmethod
+    def _load():
+        """
+        @return: dict of event type to the listeners for that type
+        @rtype:  dict
+        """
+        by_event_type = {}
+        for listener in EventListener.get_collection().find():
+            # a listener is notified once per event, however it lists the type
+            event_types = set(listener['event_types'])
+            if '*' in event_types:
+                event_types = ['*']
+            for event_type in event_types:
+                by_event_type.setdefault(event_type, []).append(listener)
+        return by_event_type
+
+
+# The listener cache shared by everything running in this process
+listener_cache = ListenerCache()
+
+
 class EventFireManager(object):
 
     # -- specific event fire methods ------------------------------------------
@@ -78,8 +144,7 @@ class EventFireManager(object):
         @type  event: pulp.server.event.data.Event
         """
         # Determine which listeners should be notified
-        listeners = list(EventListener.get_collection().find(
-            {'$or': ({'event_types' : event.event_type}, {'event_types' : '*'})}))
+        listeners = listener_cache.listeners(event.event_type)
 
         # For each listener, retrieve the notifier and invoke it. Be sure that
         # an exception from a notifier is logged but does not interrupt the
@@ -344,30 +344,58 @@ class RepoManager(object):
                 message = 'There was a problem updating repository %s' % repo_id
                 raise PulpExecutionException(message), None, sys.exc_info()[2]
 
+    @staticmethod
+    def update_unit_counts(repo_id, deltas):
+        """
+        Updates the total counts of units associated with the repo for several
+        unit types in a single update. See update_unit_count.
+
+        :param repo_id: identifies the repo
+        :type  repo_id: str
+
+        :param deltas: amount by which to change the total count of each unit type,
+                       keyed by unit type ID
+        :type  deltas: dict
+        """
+        increments = dict(('content_unit_counts.%s' % unit_type_id, delta)
+                          for unit_type_id, delta in deltas.items() if delta)
+        if not increments:
+            return
+
+        try:
+            Repo.get_collection().update({'id': repo_id}, {'$inc': increments}, safe=True)
+        except pymongo.errors.OperationFailure:
+            message = 'There was a problem updating repository %s' % repo_id
+            raise PulpExecutionException(message), None, sys.exc_info()[2]
+
     @staticmethod
     def update_last_unit_removed(repo_id):
         """
-        Updates the UTC date record on the repository for the time the last unit was removed.
+        Updates the UTC date record on the repository for the time the last unit was removed,
+        and advances the repository's content revision.
 
         :param repo_id: identifies the repo
         :type  repo_id: str
 
         """
-        RepoManager._set_current_date_on_field(repo_id, 'last_unit_removed')
+        RepoManager._set_current_date_on_field(repo_id, 'last_unit_removed',
+                                               advance_revision=True)
 
     @staticmethod
     def update_last_unit_added(repo_id):
         """
-        Updates the UTC date record on the repository for the time the last unit was added.
+        Updates the UTC date record on the repository for the time the last unit was added,
+        and advances the repository's content revision.
 
         :param repo_id: identifies the repo
         :type  repo_id: str
 
         """
-        RepoManager._set_current_date_on_field(repo_id, 'last_unit_added')
+        RepoManager._set_current_date_on_field(repo_id, 'last_unit_added',
+                                               advance_revision=True)
 
     @staticmethod
-    def _set_current_date_on_field(repo_id, field_name):
+    def _set_current_date_on_field(repo_id, field_name, advance_revision=False):
         """
         Updates the UTC date record the given field to the current UTC time.
 
@@ -377,9 +405,14 @@ class RepoManager(object):
         :param field_name: field to update
         :type  field_name: str
 
+        :param advance_revision: also advance the content revision of the repo in the same update
+        :type  advance_revision: bool
+
         """
         spec = {'id': repo_id}
         operation = {'$set': {field_name: dateutils.now_utc_datetime_with_tzinfo()}}
+        if advance_revision:
+            operation['$inc'] = {'content_revision': 1}
         repo_coll = Repo.get_collection()
         repo_coll.update(spec, operation, safe=True)
 
@@ -528,9 +561,10 @@ class RepoManager(object):
         WARNING: This might take a long time, and it should not be used unless
         absolutely necessary. Not responsible for melted servers.
 
-        This will iterate through the given repositories, which defaults to ALL
-        repositories, and recalculate the content unit counts for each content
-        type.
+        This will recalculate the content unit counts for each content type in
+        the given repositories, which defaults to ALL repositories. The counts
+        for all of them are computed by a single aggregation over the
+        repo_content_units collection, grouped by repository and type.
 
         This method is called from platform migration 0004, so consult that
         migration before changing this method.
@@ -544,18 +578,22 @@ class RepoManager(object):
         # default to all repos if none were specified
         if not repo_ids:
             repo_ids = [repo['id'] for repo in repo_collection.find(fields=['id'])]
+            pipeline = []
+        else:
+            pipeline = [{'$match': {'repo_id': {'$in': repo_ids}}}]
 
         _logger.info('regenerating content unit counts for %d repositories' % len(repo_ids))
 
+        pipeline.append({'$group': {'_id': {'repo_id': '$repo_id', 'unit_type_id': '$unit_type_id'},
+                                    'count': {'$sum': 1}}})
+        all_counts = {}
+        for group in association_collection.aggregate(pipeline)['result']:
+            counts = all_counts.setdefault(group['_id']['repo_id'], {})
+            counts[group['_id']['unit_type_id']] = group['count']
+
         for repo_id in repo_ids:
             _logger.debug('regenerating content unit count for repository "%s"' % repo_id)
-            counts = {}
-            cursor = association_collection.find({'repo_id': repo_id})
-            type_ids = cursor.distinct('unit_type_id')
-            cursor.close()
-            for type_id in type_ids:
-                spec = {'repo_id': repo_id, 'unit_type_id': type_id}
-                counts[type_id] = association_collection.find(spec).count()
+            counts = all_counts.get(repo_id, {})
             repo_collection.update({'id': repo_id}, {'$set': {'content_unit_counts': counts}},
                                    safe=True)
 
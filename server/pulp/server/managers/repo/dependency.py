@@ -1,4 +1,6 @@
+import copy
 import sys
+import threading
 
 from celery import task
 
@@ -6,6 +8,7 @@ from pulp.plugins.conduits.dependency import DependencyResolutionConduit
 from pulp.plugins.config import PluginCallConfiguration
 from pulp.plugins.loader import api as plugin_api, exceptions as plugin_exceptions
 from pulp.server.async.tasks import Task
+from pulp.server.compat import json, json_util
 from pulp.server.exceptions import MissingResource, PulpExecutionException
 import pulp.plugins.conduits._common as conduit_common_utils
 import pulp.plugins.types.database as types_db
@@ -13,6 +16,95 @@ import pulp.server.managers.factory as manager_factory
 import pulp.server.managers.repo._common as common_utils
 
 
+# Most dependency resolution reports a process keeps
+RESOLUTION_CACHE_SIZE = 100
+
+
+class ResolutionCache(object):
+    """
+    Reports of the most recent dependency resolutions, keyed by everything that
+    determines them. The key includes the content revision of the repository,
+    which changes whenever units are associated with or unassociated from it,
+    so reports for earlier contents of a repository are never returned; they
+    are dropped as newer reports take their place.
+    """
+
+    def __init__(self, size=RESOLUTION_CACHE_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        # key: report
+        self._reports = {}
+        # keys of the reports, least recently used first; this is a list rather
+        # than an OrderedDict because the server still runs on python 2.6
+        self._recency = []
+
+    def get(self, key):
+        """
+        :param key: key of the resolution, as returned by key()
+        :type  key: tuple
+        :return: a copy of the report of the resolution
+        :rtype:  object
+        :raise KeyError: if the resolution is not cached
+        """
+        with self._lock:
+            report = self._reports[key]
+            self._recency.remove(key)
+            self._recency.append(key)
+        return copy.deepcopy(report)
+
+    def put(self, key, report):
+        """
+        :param key:    key of the resolution, as returned by key()
+        :type  key:    tuple
+        :param report: report of the resolution from the plugin
+        :type  report: object
+        """
+        report = copy.deepcopy(report)
+        with self._lock:
+            if key in self._reports:
+                self._recency.remove(key)
+            self._reports[key] = report
+            self._recency.append(key)
+            while len(self._recency) > self.size:
+                del self._reports[self._recency.pop(0)]
+
+    def clear(self):
+        with self._lock:
+            self._reports.clear()
+            del self._recency[:]
+
+    @staticmethod
+    def key(repo, repo_importer, units, options):
+        """
+        :param repo:          database representation of the repository
+        :type  repo:          dict
+        :param repo_importer: database representation of the repository's importer
+        :type  repo_importer: dict
+        :param units:         database representations of the units to resolve
+        :type  units:         list
+        :param options:       options passed to the importer
+        :type  options:       dict or None
+        :return: key of the resolution
+        :rtype:  tuple
+        """
+        unit_ids = tuple(sorted(set((u['unit_type_id'], u['unit_id']) for u in units)))
+        # the _id tells apart a repository from an earlier one with the same ID
+        return (repo['_id'], repo.get('content_revision', 0), repo_importer['importer_type_id'],
+                _canonical(repo_importer['config']), _canonical(options), unit_ids)
+
+
+def _canonical(value):
+    """
+    :return: representation of a JSON compatible value that is equal for equal values
+    :rtype:  str
+    """
+    return json.dumps(value, sort_keys=True, default=json_util.default)
+
+
+# The resolution cache shared by everything running in this process
+resolution_cache = ResolutionCache()
+
+
 class DependencyManager(object):
     @staticmethod
     def resolve_dependencies_by_criteria(repo_id, criteria, options):
@@ -41,7 +133,9 @@ class DependencyManager(object):
     def resolve_dependencies_by_units(repo_id, units, options):
         """
         Calculates dependencies for the given set of units in the given
-        repository.
+        repository. The reports of recent resolutions are cached, so resolving
+        the same units with the same options against a repository whose units
+        have not changed since returns the earlier report.
 
         :param repo_id:         identifies the repository
         :type  repo_id:         str
@@ -62,6 +156,12 @@ class DependencyManager(object):
         repo = repo_query_manager.get_repository(repo_id)
         repo_importer = importer_manager.get_importer(repo_id)
 
+        cache_key = ResolutionCache.key(repo, repo_importer, units, options)
+        try:
+            return resolution_cache.get(cache_key)
+        except KeyError:
+            pass
+
         try:
             importer_instance, plugin_config = plugin_api.get_importer_by_id(
                 repo_importer['importer_type_id'])
@@ -97,6 +197,7 @@ class DependencyManager(object):
         except Exception:
             raise PulpExecutionException(), None, sys.exc_info()[2]
 
+        resolution_cache.put(cache_key, dep_report)
         return dep_report
 
 
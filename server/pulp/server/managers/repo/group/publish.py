@@ -1,16 +1,21 @@
 from gettext import gettext as _
 import logging
 import sys
+import traceback
 
 from celery import task
+from celery.signals import task_revoked
 
-from pulp.common import dateutils
+from pulp.common import constants, dateutils, error_codes, tags
 from pulp.plugins.conduits.repo_publish import RepoGroupPublishConduit
 from pulp.plugins.config import PluginCallConfiguration
 from pulp.plugins.loader import api as plugin_api
 from pulp.plugins.model import PublishReport
-from pulp.server.async.tasks import Task
-from pulp.server.db.model.repo_group import RepoGroupPublishResult, RepoGroupDistributor
+from pulp.server.async.tasks import get_current_task_id, Task, TaskResult
+from pulp.server.db.model.dispatch import TaskStatus
+from pulp.server.db.model.repo_group import (RepoGroupPublishResult, RepoGroupDistributor,
+                                             RepoGroupMemberPublish)
+from pulp.server.exceptions import MissingResource, PulpCodedConflictException
 from pulp.server.managers import factory as manager_factory
 from pulp.server.managers.repo import _common as common_utils
 
@@ -27,32 +32,38 @@ class RepoGroupPublishManager(object):
         """
         Requests the given distributor publish the repository group.
 
+        If the distributor publishes the members of the group separately, a task is
+        started for each member repository and this call returns without waiting for
+        them. The last member task to finish completes the publish of the group, and
+        the distributor cannot be published again until it has.
+
         :param group_id:                identifies the repo group
         :type  group_id:                str
         :param distributor_id:          identifies the group's distributor
         :type  distributor_id:          str
         :param publish_config_override: values to pass the plugin for this publish call alone
         :type  publish_config_override: dict
+        :return: the IDs of the member tasks by repository ID, if the members are
+                 published separately
+        :rtype:  pulp.server.async.tasks.TaskResult or None
+        :raise PulpCodedConflictException: if the distributor is still publishing the
+                                           members of the group
         """
-        distributor_manager = manager_factory.repo_group_distributor_manager()
-        distributor = distributor_manager.get_distributor(group_id, distributor_id)
-        distributor_type_id = distributor['distributor_type_id']
-        distributor_instance, plugin_config = plugin_api.get_group_distributor_by_id(
-            distributor_type_id)
-
-        group_query_manager = manager_factory.repo_group_query_manager()
-
-        # Validation
-        group = group_query_manager.get_group(group_id)
-        distributor_type_id = distributor['distributor_type_id']
-
-        # Assemble the data needed for publish
-        conduit = RepoGroupPublishConduit(group_id, distributor)
-
-        call_config = PluginCallConfiguration(plugin_config, distributor['config'],
-                                              publish_config_override)
-        transfer_group = common_utils.to_transfer_repo_group(group)
-        transfer_group.working_dir = common_utils.get_working_directory()
+        # This task holds the reservation of the group, but member tasks do not, so a
+        # second publish must not write to the same output while they run
+        member_publish = RepoGroupMemberPublish.get_collection().find_one(
+            {'group_id': group_id, 'distributor_id': distributor_id})
+        if member_publish is not None:
+            raise PulpCodedConflictException(error_codes.PLP0035, group_id=group_id,
+                                             distributor_id=distributor_id)
+
+        distributor_instance, conduit, call_config, transfer_group = \
+            RepoGroupPublishManager._plugin_call_args(group_id, distributor_id,
+                                                      publish_config_override)
+
+        if distributor_instance.split_group_publish(transfer_group, call_config):
+            return RepoGroupPublishManager._publish_members(transfer_group, distributor_id,
+                                                            publish_config_override)
 
         # TODO: Add events for group publish start/complete
         RepoGroupPublishManager._do_publish(transfer_group, distributor_id, distributor_instance,
@@ -61,37 +72,278 @@ class RepoGroupPublishManager(object):
     @staticmethod
     def _do_publish(group, distributor_id, distributor_instance, conduit, call_config):
 
-        distributor_coll = RepoGroupDistributor.get_collection()
-        publish_result_coll = RepoGroupPublishResult.get_collection()
-        group_id = group.id
-
         # Perform the publish
         publish_start_timestamp = _now_timestamp()
         try:
             report = distributor_instance.publish_group(group, conduit, call_config)
         except Exception, e:
-            publish_end_timestamp = _now_timestamp()
+            RepoGroupPublishManager._save_error(group.id, distributor_id,
+                                                publish_start_timestamp, e, sys.exc_info()[2])
+            raise
 
-            # Reload the distributor in case the scratchpad is changed by the plugin
-            distributor = distributor_coll.find_one(
-                {'id': distributor_id, 'repo_group_id': group_id})
-            distributor['last_publish'] = publish_end_timestamp
-            distributor_coll.save(distributor)
+        return RepoGroupPublishManager._save_report(group.id, distributor_id,
+                                                    publish_start_timestamp, report)
 
-            # Add a publish history entry for the run
-            result = RepoGroupPublishResult.error_result(
-                group_id, distributor_id, distributor['distributor_type_id'],
-                publish_start_timestamp, publish_end_timestamp, e, sys.exc_info()[2])
-            publish_result_coll.save(result, safe=True)
+    @staticmethod
+    def _publish_members(group, distributor_id, publish_config_override):
+        """
+        Starts a task to publish each member repository of the group. Each task holds
+        the reservation of its repository, so they are spread across the workers.
+
+        :param group:                   the repo group
+        :type  group:                   pulp.plugins.model.RepositoryGroup
+        :param distributor_id:          identifies the group's distributor
+        :type  distributor_id:          str
+        :param publish_config_override: values to pass the plugin for this publish call alone
+        :type  publish_config_override: dict
+        :return: the IDs of the member tasks by repository ID
+        :rtype:  pulp.server.async.tasks.TaskResult
+        """
+        group_id = group.id
+        member_publish = RepoGroupMemberPublish(group_id, distributor_id, _now_timestamp(),
+                                                list(group.repo_ids), publish_config_override)
+        RepoGroupMemberPublish.get_collection().insert(member_publish, safe=True)
+
+        if not member_publish['repo_ids']:
+            # nothing to wait for
+            RepoGroupPublishManager._finish_members(member_publish)
+            return TaskResult(result={'members': {}})
+
+        members = {}
+        spawned_tasks = []
+        for repo_id in member_publish['repo_ids']:
+            task_tags = [tags.resource_tag(tags.RESOURCE_REPOSITORY_GROUP_TYPE, group_id),
+                         tags.resource_tag(tags.RESOURCE_REPOSITORY_GROUP_DISTRIBUTOR_TYPE,
+                                           distributor_id),
+                         tags.resource_tag(tags.RESOURCE_REPOSITORY_TYPE, repo_id),
+                         tags.action_tag('publish')]
+            async_result = publish_member.apply_async_with_reservation(
+                tags.RESOURCE_REPOSITORY_TYPE, repo_id,
+                args=[member_publish['id'], repo_id, publish_config_override], tags=task_tags)
+            members[repo_id] = async_result.id
+            spawned_tasks.append(async_result)
+
+        # the reaper only fails members whose task is no longer running
+        RepoGroupMemberPublish.get_collection().update(
+            {'id': member_publish['id']}, {'$set': {'member_tasks': members}}, safe=True)
+
+        return TaskResult(result={'members': members}, spawned_tasks=spawned_tasks)
+
+    @staticmethod
+    def publish_member(member_publish_id, repo_id, publish_config_override=None):
+        """
+        Publishes one member repository of a group whose distributor publishes the
+        members separately, and records the result. If this is the last member to
+        finish, the publish of the group is completed as well.
+
+        :param member_publish_id:       identifies the RepoGroupMemberPublish being run
+        :type  member_publish_id:       str
+        :param repo_id:                 identifies the member repository
+        :type  repo_id:                 str
+        :param publish_config_override: values to pass the plugin for this publish call alone
+        :type  publish_config_override: dict
+        :raise MissingResource: if the group publish no longer exists
+        """
+        collection = RepoGroupMemberPublish.get_collection()
+        member_publish = collection.find_one({'id': member_publish_id})
+        if member_publish is None:
+            raise MissingResource(member_publish=member_publish_id)
+
+        group_id = member_publish['group_id']
+        distributor_id = member_publish['distributor_id']
+        result = {'repo_id': repo_id, 'task_id': get_current_task_id()}
+        try:
+            distributor_instance, conduit, call_config, transfer_group = \
+                RepoGroupPublishManager._plugin_call_args(group_id, distributor_id,
+                                                          publish_config_override)
+            repo = manager_factory.repo_query_manager().get_repository(repo_id)
+            transfer_repo = common_utils.to_transfer_repo(repo)
+            transfer_repo.working_dir = transfer_group.working_dir
+            report = distributor_instance.publish_group_member(transfer_group, transfer_repo,
+                                                               conduit, call_config)
+        except Exception, e:
+            exc_info = sys.exc_info()
+            result['result'] = RepoGroupPublishResult.RESULT_ERROR
+            result['error_message'] = str(e)
+            result['exception'] = repr(e)
+            result['traceback'] = traceback.format_tb(exc_info[2])
+            RepoGroupPublishManager._record_member(member_publish_id, result)
+            raise exc_info[0], exc_info[1], exc_info[2]
+
+        if isinstance(report, PublishReport):
+            if report.success_flag:
+                result['result'] = RepoGroupPublishResult.RESULT_SUCCESS
+            else:
+                result['result'] = RepoGroupPublishResult.RESULT_FAILED
+            result['summary'] = report.summary
+            result['details'] = report.details
+        else:
+            result['result'] = RepoGroupPublishResult.RESULT_SUCCESS
+            result['summary'] = result['details'] = _('Unknown')
+        RepoGroupPublishManager._record_member(member_publish_id, result)
+
+    @staticmethod
+    def record_member_error(member_publish_id, repo_id, task_id, error_message):
+        """
+        Records an error for a member publish that ended without recording its own
+        result, for example because its task was canceled before it ran. Nothing is
+        recorded if the member already has a result.
+
+        :param member_publish_id: identifies the RepoGroupMemberPublish being run
+        :type  member_publish_id: str
+        :param repo_id:           identifies the member repository
+        :type  repo_id:           str
+        :param task_id:           identifies the member task
+        :type  task_id:           str
+        :param error_message:     describes why the member has no result
+        :type  error_message:     str
+        """
+        result = {'repo_id': repo_id, 'task_id': task_id,
+                  'result': RepoGroupPublishResult.RESULT_ERROR,
+                  'error_message': error_message, 'exception': None, 'traceback': None}
+        RepoGroupPublishManager._record_member(member_publish_id, result)
+
+    @staticmethod
+    def expire_member_publish(member_publish):
+        """
+        Completes a group publish that is still waiting for member results after its
+        members should have finished. An error is recorded for each member that has
+        no result and whose task is no longer waiting or running, for example because
+        it was lost with its worker. Once every member has a result, the publish of
+        the group completes.
+
+        :param member_publish: the expired RepoGroupMemberPublish
+        :type  member_publish: dict
+        """
+        recorded = set(result['repo_id'] for result in member_publish['member_results'])
+        member_tasks = member_publish.get('member_tasks', {})
+        running_tasks = set(task_status['task_id'] for task_status in TaskStatus.objects(
+            task_id__in=member_tasks.values(), state__in=constants.CALL_INCOMPLETE_STATES))
+        for repo_id in member_publish['repo_ids']:
+            if repo_id not in recorded and member_tasks.get(repo_id) not in running_tasks:
+                RepoGroupPublishManager.record_member_error(
+                    member_publish['id'], repo_id, member_tasks.get(repo_id),
+                    _('The member publish task ended without recording a result'))
+
+    @staticmethod
+    def _record_member(member_publish_id, result):
+        """
+        Records the result of one member publish, and completes the publish of the
+        group if it was the last one. A member that already has a result is left alone.
+
+        :param member_publish_id:       identifies the RepoGroupMemberPublish being run
+        :type  member_publish_id:       str
+        :param result:                  result of the member publish
+        :type  result:                  dict
+        """
+        # Recording the result and counting it down in one update makes sure exactly
+        # one member task sees the count reach zero
+        member_publish = RepoGroupMemberPublish.get_collection().find_and_modify(
+            {'id': member_publish_id, 'member_results.repo_id': {'$ne': result['repo_id']}},
+            {'$push': {'member_results': result}, '$inc': {'remaining': -1}},
+            new=True)
+        if member_publish is not None and member_publish['remaining'] == 0:
+            RepoGroupPublishManager._finish_members(member_publish)
+
+    @staticmethod
+    def _finish_members(member_publish):
+        """
+        Lets the distributor merge the results of the member publishes into the
+        publish result of the group.
+
+        :param member_publish:          the finished RepoGroupMemberPublish
+        :type  member_publish:          dict
+        """
+        group_id = member_publish['group_id']
+        distributor_id = member_publish['distributor_id']
+        started = member_publish['started']
+        publish_config_override = member_publish.get('publish_config_override')
+        RepoGroupMemberPublish.get_collection().remove({'id': member_publish['id']}, safe=True)
+
+        member_reports = {}
+        for result in member_publish['member_results']:
+            report = None
+            if result['result'] != RepoGroupPublishResult.RESULT_ERROR:
+                success = result['result'] == RepoGroupPublishResult.RESULT_SUCCESS
+                report = PublishReport(success, result['summary'], result['details'])
+            member_reports[result['repo_id']] = report
 
+        try:
+            distributor_instance, conduit, call_config, transfer_group = \
+                RepoGroupPublishManager._plugin_call_args(group_id, distributor_id,
+                                                          publish_config_override)
+            report = distributor_instance.finish_publish_group(transfer_group, conduit,
+                                                               call_config, member_reports)
+        except Exception, e:
+            RepoGroupPublishManager._save_error(group_id, distributor_id, started, e,
+                                                sys.exc_info()[2])
             raise
 
+        RepoGroupPublishManager._save_report(group_id, distributor_id, started, report)
+
+    @staticmethod
+    def _plugin_call_args(group_id, distributor_id, publish_config_override):
+        """
+        :return: the distributor instance, conduit, call configuration and transfer group
+                 to call the group distributor with
+        :rtype:  tuple
+        """
+        distributor_manager = manager_factory.repo_group_distributor_manager()
+        distributor = distributor_manager.get_distributor(group_id, distributor_id)
+        distributor_instance, plugin_config = plugin_api.get_group_distributor_by_id(
+            distributor['distributor_type_id'])
+        group = manager_factory.repo_group_query_manager().get_group(group_id)
+
+        conduit = RepoGroupPublishConduit(group_id, distributor)
+        call_config = PluginCallConfiguration(plugin_config, distributor['config'],
+                                              publish_config_override)
+        transfer_group = common_utils.to_transfer_repo_group(group)
+        transfer_group.working_dir = common_utils.get_working_directory()
+        return distributor_instance, conduit, call_config, transfer_group
+
+    @staticmethod
+    def _save_error(group_id, distributor_id, started, exception, tb):
+        """
+        Records a publish of the group that raised an error.
+
+        :param group_id:       identifies the repo group
+        :type  group_id:       str
+        :param distributor_id: identifies the group's distributor
+        :type  distributor_id: str
+        :param started:        iso8601 formatted timestamp when the publish was begun
+        :type  started:        str
+        :param exception:      exception raised from the plugin
+        :type  exception:      Exception
+        :param tb:             traceback of the exception
+        :type  tb:             traceback
+        """
         publish_end_timestamp = _now_timestamp()
+        distributor = _update_last_publish(group_id, distributor_id, publish_end_timestamp)
 
-        # Reload the distributor in case the scratchpad is changed by the plugin
-        distributor = distributor_coll.find_one({'id': distributor_id, 'repo_group_id': group_id})
-        distributor['last_publish'] = publish_end_timestamp
-        distributor_coll.save(distributor)
+        # Add a publish history entry for the run
+        result = RepoGroupPublishResult.error_result(
+            group_id, distributor_id, distributor['distributor_type_id'],
+            started, publish_end_timestamp, exception, tb)
+        RepoGroupPublishResult.get_collection().save(result, safe=True)
+
+    @staticmethod
+    def _save_report(group_id, distributor_id, started, report):
+        """
+        Records a completed publish of the group.
+
+        :param group_id:       identifies the repo group
+        :type  group_id:       str
+        :param distributor_id: identifies the group's distributor
+        :type  distributor_id: str
+        :param started:        iso8601 formatted timestamp when the publish was begun
+        :type  started:        str
+        :param report:         report returned by the plugin
+        :type  report:         pulp.plugins.model.PublishReport
+        :return: the publish history entry
+        :rtype:  RepoGroupPublishResult
+        """
+        publish_end_timestamp = _now_timestamp()
+        distributor = _update_last_publish(group_id, distributor_id, publish_end_timestamp)
 
         # Add a publish entry
         if report is not None and isinstance(report, PublishReport):
@@ -100,11 +352,11 @@ class RepoGroupPublishManager(object):
             if report.success_flag:
                 result = RepoGroupPublishResult.expected_result(
                     group_id, distributor_id, distributor['distributor_type_id'],
-                    publish_start_timestamp, publish_end_timestamp, summary, details)
+                    started, publish_end_timestamp, summary, details)
             else:
                 result = RepoGroupPublishResult.failed_result(
                     group_id, distributor_id, distributor['distributor_type_id'],
-                    publish_start_timestamp, publish_end_timestamp, summary, details)
+                    started, publish_end_timestamp, summary, details)
         else:
             msg = _('Plugin type [%(t)s] did not return a valid publish report')
             msg = msg % {'t': distributor['distributor_type_id']}
@@ -113,9 +365,9 @@ class RepoGroupPublishManager(object):
             summary = details = _('Unknown')
             result = RepoGroupPublishResult.expected_result(
                 group_id, distributor_id, distributor['distributor_type_id'],
-                publish_start_timestamp, publish_end_timestamp, summary, details)
+                started, publish_end_timestamp, summary, details)
 
-        publish_result_coll.save(result, safe=True)
+        RepoGroupPublishResult.get_collection().save(result, safe=True)
         return result
 
     def last_publish(self, group_id, distributor_id):
@@ -144,7 +396,90 @@ class RepoGroupPublishManager(object):
         return date
 
 
+class MemberPublishTask(Task):
+    """
+    Publishes one member of a group whose distributor publishes the members separately.
+    If the task ends without the member recording its result, an error is recorded for
+    it instead, so the publish of the group is not left waiting for it.
+    """
+
+    def on_success(self, retval, task_id, args, kwargs):
+        """
+        A member task that was canceled before it started returns without running.
+        """
+        super(MemberPublishTask, self).on_success(retval, task_id, args, kwargs)
+        _record_member_ended(task_id, args, _('The member publish was canceled'))
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        """
+        Covers errors raised before or after the member publish itself.
+        """
+        super(MemberPublishTask, self).on_failure(exc, task_id, args, kwargs, einfo)
+        _record_member_ended(task_id, args, str(exc))
+
+
 publish = task(RepoGroupPublishManager.publish, base=Task, ignore_result=True)
+publish_member = task(RepoGroupPublishManager.publish_member, base=MemberPublishTask,
+                      ignore_result=True)
+
+
+@task_revoked.connect
+def _member_publish_revoked(sender=None, request=None, **kwargs):
+    """
+    A member task that is revoked, whether it was still waiting or was terminated while
+    running, never gets to record its result. This records an error for it instead.
+
+    :param sender:  the task that was revoked
+    :type  sender:  celery.app.task.Task
+    :param request: the revoked request
+    :type  request: celery.worker.job.Request
+    """
+    if sender is None or sender.name != publish_member.name:
+        return
+    _record_member_ended(request.id, request.args, _('The member publish was canceled'))
+
+
+def _record_member_ended(task_id, args, error_message):
+    """
+    Records an error for the member published by a task that ended, unless it already
+    recorded a result. Errors are logged rather than raised, as this runs in the task
+    handlers.
+
+    :param task_id:       identifies the member task
+    :type  task_id:       str
+    :param args:          positional arguments of publish_member
+    :type  args:          list
+    :param error_message: describes why the member has no result
+    :type  error_message: str
+    """
+    member_publish_id, repo_id = args[:2]
+    try:
+        RepoGroupPublishManager.record_member_error(member_publish_id, repo_id, task_id,
+                                                    error_message)
+    except Exception:
+        logger.exception(_('Could not record the end of member publish task %(t)s') %
+                         {'t': task_id})
+
+
+def _update_last_publish(group_id, distributor_id, timestamp):
+    """
+    Sets the time of the last publish on a group distributor.
+
+    :param group_id:       identifies the repo group
+    :type  group_id:       str
+    :param distributor_id: identifies the group's distributor
+    :type  distributor_id: str
+    :param timestamp:      iso8601 formatted timestamp when the publish completed
+    :type  timestamp:      str
+    :return: the distributor
+    :rtype:  dict
+    """
+    distributor_coll = RepoGroupDistributor.get_collection()
+    # Reload the distributor in case the scratchpad is changed by the plugin
+    distributor = distributor_coll.find_one({'id': distributor_id, 'repo_group_id': group_id})
+    distributor['last_publish'] = timestamp
+    distributor_coll.save(distributor)
+    return distributor
 
 
 def _now_timestamp():
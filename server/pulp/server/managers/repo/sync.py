@@ -24,6 +24,7 @@ from pulp.server.db.model.repository import Repo, RepoContentUnit, RepoImporter,
 from pulp.server.exceptions import MissingResource, PulpExecutionException, InvalidValue
 from pulp.server.managers import factory as manager_factory
 from pulp.server.managers.repo import _common as common_utils
+from pulp.server.managers.repo import unit_association
 
 
 _logger = logging.getLogger(__name__)
@@ -145,7 +146,8 @@ class RepoSyncManager(object):
             # which will set up cancel_sync_repo() as the target for the signal handler
             sync_repo = register_sigterm_handler(importer_instance.sync_repo,
                                                  importer_instance.cancel_sync_repo)
-            sync_report = sync_repo(transfer_repo, conduit, call_config)
+            with unit_association.batch_repo_metadata():
+                sync_report = sync_repo(transfer_repo, conduit, call_config)
 
         except Exception, e:
             sync_end_timestamp = _now_timestamp()
@@ -3,8 +3,10 @@ Contains the manager class and exceptions for handling the mappings between
 repositories and content units.
 """
 from gettext import gettext as _
+import contextlib
 import logging
 import sys
+import threading
 
 from celery import task
 import pymongo
@@ -45,6 +47,9 @@ _VALID_DIRECTIONS = (SORT_ASCENDING, SORT_DESCENDING)
 
 logger = logging.getLogger(__name__)
 
+# Repository metadata changes held by batch_repo_metadata() for the current thread
+_metadata_batch = threading.local()
+
 
 class RepoUnitAssociationManager(object):
     """
@@ -114,14 +119,9 @@ class RepoUnitAssociationManager(object):
         association = RepoContentUnit(repo_id, unit_id, unit_type_id, owner_type, owner_id)
         RepoContentUnit.get_collection().save(association, safe=True)
 
-        manager = manager_factory.repo_manager()
-
-        # update the count of associated units on the repo object
+        # update the count of associated units and the last added field on the repo object
         if update_repo_metadata and not similar_exists:
-            manager.update_unit_count(repo_id, unit_type_id, 1)
-
-            # update the record for the last added field
-            manager.update_last_unit_added(repo_id)
+            update_repo_metadata_for_change(repo_id, {unit_type_id: 1}, added=True)
 
     def associate_all_by_ids(self, repo_id, unit_type_id, unit_id_list, owner_type, owner_id):
         """
@@ -162,12 +162,10 @@ class RepoUnitAssociationManager(object):
                 unique_count += 1
             self.associate_unit_by_id(repo_id, unit_type_id, unit_id, owner_type, owner_id, False)
 
-        # update the count of associated units on the repo object
+        # update the count of associated units and the timestamp for when the
+        # units were added on the repo object
         if unique_count:
-            manager_factory.repo_manager().update_unit_count(
-                repo_id, unit_type_id, unique_count)
-            # update the timestamp for when the units were added to the repo
-            manager_factory.repo_manager().update_last_unit_added(repo_id)
+            update_repo_metadata_for_change(repo_id, {unit_type_id: unique_count}, added=True)
         return unique_count
 
     @staticmethod
@@ -266,9 +264,10 @@ class RepoUnitAssociationManager(object):
             RepoContentUnit.OWNER_TYPE_USER, login)
 
         try:
-            copied_units = importer_instance.import_units(
-                transfer_source_repo, transfer_dest_repo, conduit, call_config,
-                units=transfer_units)
+            with batch_repo_metadata():
+                copied_units = importer_instance.import_units(
+                    transfer_source_repo, transfer_dest_repo, conduit, call_config,
+                    units=transfer_units)
             unit_ids = [u.to_id_dict() for u in copied_units]
             return {'units_successful': unit_ids}
 
@@ -375,7 +374,7 @@ class RepoUnitAssociationManager(object):
             id_list.append(unit['unit_id'])
 
         collection = RepoContentUnit.get_collection()
-        repo_manager = manager_factory.repo_manager()
+        count_deltas = {}
 
         for unit_type_id, unit_ids in unit_map.items():
             spec = {'repo_id': repo_id,
@@ -387,12 +386,10 @@ class RepoUnitAssociationManager(object):
             unique_count = sum(
                 1 for unit_id in unit_ids if not RepoUnitAssociationManager.association_exists(
                     repo_id, unit_id, unit_type_id))
-            if not unique_count:
-                continue
+            if unique_count:
+                count_deltas[unit_type_id] = -unique_count
 
-            repo_manager.update_unit_count(repo_id, unit_type_id, -unique_count)
-
-        repo_manager.update_last_unit_removed(repo_id)
+        update_repo_metadata_for_change(repo_id, count_deltas, removed=True)
 
         # Convert the units into transfer units. This happens regardless of whether or not
         # the plugin will be notified as it's used to generate the return result,
@@ -443,6 +440,77 @@ associate_from_repo = task(RepoUnitAssociationManager.associate_from_repo, base=
 unassociate_by_criteria = task(RepoUnitAssociationManager.unassociate_by_criteria, base=Task)
 
 
+@contextlib.contextmanager
+def batch_repo_metadata():
+    """
+    Context manager that holds the unit count and last unit added/removed changes
+    that association changes made in the current thread would write to their
+    repositories, and writes them with one update per repository and kind of
+    change when it exits, instead of one per unit. The changes are written even
+    if the block raises, since the associations themselves were already saved.
+    Nested uses write when the outermost one exits.
+    """
+    if getattr(_metadata_batch, 'repos', None) is not None:
+        yield
+        return
+
+    _metadata_batch.repos = {}
+    try:
+        yield
+    finally:
+        repos, _metadata_batch.repos = _metadata_batch.repos, None
+        for repo_id, (count_deltas, added, removed) in repos.items():
+            _write_repo_metadata(repo_id, count_deltas, added, removed)
+
+
+def update_repo_metadata_for_change(repo_id, count_deltas, added=False, removed=False):
+    """
+    Records a change to the units associated with a repository on the repository,
+    or holds it until the end of the current batch_repo_metadata() block.
+
+    :param repo_id:      identifies the repo
+    :type  repo_id:      str
+    :param count_deltas: amount by which to change the unit count of each type, keyed by type ID
+    :type  count_deltas: dict
+    :param added:        True if units were added, to update the last unit added field
+    :type  added:        bool
+    :param removed:      True if units were removed, to update the last unit removed field
+    :type  removed:      bool
+    """
+    repos = getattr(_metadata_batch, 'repos', None)
+    if repos is None:
+        _write_repo_metadata(repo_id, count_deltas, added, removed)
+        return
+
+    pending_deltas, pending_added, pending_removed = repos.get(repo_id, ({}, False, False))
+    for unit_type_id, delta in count_deltas.items():
+        pending_deltas[unit_type_id] = pending_deltas.get(unit_type_id, 0) + delta
+    repos[repo_id] = (pending_deltas, pending_added or added, pending_removed or removed)
+
+
+def _write_repo_metadata(repo_id, count_deltas, added, removed):
+    """
+    :param repo_id:      identifies the repo
+    :type  repo_id:      str
+    :param count_deltas: amount by which to change the unit count of each type, keyed by type ID
+    :type  count_deltas: dict
+    :param added:        True to update the last unit added field
+    :type  added:        bool
+    :param removed:      True to update the last unit removed field
+    :type  removed:      bool
+    """
+    repo_manager = manager_factory.repo_manager()
+    count_deltas = dict((t, d) for t, d in count_deltas.items() if d)
+    if len(count_deltas) == 1:
+        repo_manager.update_unit_count(repo_id, *count_deltas.items()[0])
+    elif count_deltas:
+        repo_manager.update_unit_counts(repo_id, count_deltas)
+    if added:
+        repo_manager.update_last_unit_added(repo_id)
+    if removed:
+        repo_manager.update_last_unit_removed(repo_id)
+
+
 def load_associated_units(source_repo_id, criteria):
     criteria.association_fields = None
 
@@ -3,12 +3,20 @@ This module contains management functions for the models found in the
 pulp.server.db.model.resources module.
 """
 
+import logging
+
 from pulp.common.constants import SCHEDULER_WORKER_NAME
-from pulp.server.async.celery_instance import RESOURCE_MANAGER_QUEUE
+from pulp.server.async.celery_instance import celery, RESOURCE_MANAGER_QUEUE
 from pulp.server.db.model import criteria, resources
 from pulp.server.exceptions import NoWorkers
 
 
+# The task that dispatches the tasks waiting for a reservation, which runs in the resource manager
+DISPATCH_TASK_NAME = 'pulp.server.async.tasks._dispatch_reservation_requests'
+
+_logger = logging.getLogger(__name__)
+
+
 def filter_workers(criteria):
     """
     Return Worker objects that match the given criteria
@@ -70,19 +78,112 @@ def get_unreserved_worker():
     :returns:          The Worker instance that has no reserved_resource entries associated with it.
     :rtype:            pulp.server.db.model.resources.Worker
     """
+    for worker in get_unreserved_workers():
+        return worker
 
-    # Build a mapping of queue names to Worker objects
-    workers_dict = dict((worker['name'], worker) for worker in filter_workers(criteria.Criteria()))
-    worker_names = [name for name in workers_dict.keys()]
-    reserved_names = [r['worker_name'] for r in resources.ReservedResource.get_collection().find()]
+    # All workers are reserved
+    raise NoWorkers()
 
-    # Find an unreserved worker using set differences of the names, and filter
-    # out workers that should not be assigned work.
-    # NB: this is a little messy but set comprehensions are in python 2.7+
-    unreserved_workers = set(filter(_is_worker, worker_names)) - set(reserved_names)
 
-    try:
-        return workers_dict[unreserved_workers.pop()]
-    except KeyError:
-        # All workers are reserved
-        raise NoWorkers()
+def get_unreserved_workers():
+    """
+    Return the Worker instances that have no reserved_resource entries associated with them and
+    can be assigned work. Together they are the set of workers that are free to take a task that
+    waits for a new reservation.
+
+    :return: A generator of the Worker instances that have no reserved_resource entries
+    :rtype:  generator
+    """
+    reserved_names = resources.ReservedResource.get_collection().distinct('worker_name')
+    find_unreserved = criteria.Criteria(filters={'_id': {'$nin': reserved_names}})
+
+    # Filter out workers that should not be assigned work
+    for worker in filter_workers(find_unreserved):
+        if _is_worker(worker['name']):
+            yield worker
+
+
+def get_reserving_worker_names(resource_ids):
+    """
+    Return the names of the workers that the given resources are reserved on, with a single
+    query.
+
+    :param resource_ids: The names of the resources
+    :type  resource_ids: list
+
+    :return: A dictionary of the names of the workers, keyed by the names of the reserved
+             resources. Resources that are not reserved are not included.
+    :rtype:  dict
+    """
+    query = {'resource_id': {'$in': list(resource_ids)}}
+    reservations = resources.ReservedResource.get_collection().find(
+        query, fields=['resource_id', 'worker_name'])
+    return dict((r['resource_id'], r['worker_name']) for r in reservations)
+
+
+def queue_reservation_request(task_id, resource_id, task_name, inner_args, inner_kwargs):
+    """
+    Queue a task to wait for its resource to be reserved on a worker. Queueing the same task
+    again has no effect, so a request that is received twice keeps its place.
+
+    :param task_id:      The uuid of the task
+    :type  task_id:      basestring
+    :param resource_id:  The name of the resource the task waits for
+    :type  resource_id:  basestring
+    :param task_name:    The name of the task to dispatch
+    :type  task_name:    basestring
+    :param inner_args:   The positional arguments to dispatch the task with
+    :type  inner_args:   list
+    :param inner_kwargs: The keyword arguments to dispatch the task with
+    :type  inner_kwargs: dict
+    """
+    seq = resources.ReservationRequestSequence.next()
+    resources.ReservationRequest(task_id, resource_id, seq, task_name, inner_args,
+                                 inner_kwargs).save()
+
+
+def get_reservation_requests():
+    """
+    Return the task IDs and resource IDs of the queued reservation requests, in the order they
+    were queued. The arguments of the tasks are not loaded; see pop_reservation_request().
+
+    :return: A generator of dictionaries with the keys 'task_id' and 'resource_id'
+    :rtype:  generator
+    """
+    collection = resources.ReservationRequest.get_collection()
+    for request in collection.find(fields=['resource_id']).sort('seq'):
+        yield {'task_id': request['_id'], 'resource_id': request['resource_id']}
+
+
+def pop_reservation_request(task_id):
+    """
+    Remove the reservation request of a task from the queue.
+
+    :param task_id: The uuid of the task
+    :type  task_id: basestring
+
+    :return: The removed request, or None if the task had no request queued
+    :rtype:  pulp.server.db.model.resources.ReservationRequest
+    """
+    collection = resources.ReservationRequest.get_collection()
+    request = collection.find_and_modify({'_id': task_id}, remove=True)
+    if request is None:
+        return None
+    return resources.ReservationRequest.from_bson(request)
+
+
+def notify_reservation_event(reason):
+    """
+    Record that reservation capacity may have changed. If any task is waiting for a reservation,
+    the resource manager is asked to dispatch the waiting tasks that can be dispatched now. Call
+    this after the change has been written: requests are queued before the resource manager
+    looks for capacity, so either it sees the change or this sees the request.
+
+    :param reason: A short description of what changed, used only for debugging
+    :type  reason: basestring
+    """
+    collection = resources.ReservationRequest.get_collection()
+    if collection.find_one(fields=['_id']) is None:
+        return
+    _logger.debug('Waking the resource manager: %(r)s' % {'r': reason})
+    celery.send_task(DISPATCH_TASK_NAME, queue=RESOURCE_MANAGER_QUEUE)
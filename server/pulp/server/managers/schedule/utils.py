@@ -14,7 +14,7 @@ import isodate
 from pulp.common import dateutils
 from pulp.server import exceptions
 from pulp.server.db.model.criteria import Criteria
-from pulp.server.db.model.dispatch import ScheduledCall
+from pulp.server.db.model.dispatch import ScheduledCall, ScheduledCallChange
 
 
 SCHEDULE_OPTIONS_FIELDS = ('failure_threshold', 'last_run', 'enabled')
@@ -104,6 +104,7 @@ def delete(schedule_id):
         query=spec, remove=True, safe=True)
     if schedule is None:
         raise exceptions.MissingResource(schedule_id=schedule_id)
+    ScheduledCallChange.record([schedule_id])
 
 
 def delete_by_resource(resource):
@@ -113,7 +114,13 @@ def delete_by_resource(resource):
     :param resource:    string indicating a unique resource
     :type  resource:    basestring
     """
-    ScheduledCall.get_collection().remove({'resource': resource}, safe=True)
+    collection = ScheduledCall.get_collection()
+    object_ids = [schedule['_id'] for schedule in
+                  collection.find({'resource': resource}, fields=['_id'])]
+    if object_ids:
+        # remove exactly the schedules that are recorded as changed
+        collection.remove({'_id': {'$in': object_ids}}, safe=True)
+        ScheduledCallChange.record([str(object_id) for object_id in object_ids])
 
 
 def update(schedule_id, delta):
@@ -152,6 +159,7 @@ def update(schedule_id, delta):
         query=spec, update={'$set': delta}, safe=True, new=True)
     if schedule is None:
         raise exceptions.MissingResource(schedule_id=schedule_id)
+    ScheduledCallChange.record([schedule_id])
     return ScheduledCall.from_db(schedule)
 
 
@@ -172,6 +180,7 @@ def reset_failure_count(schedule_id):
         'last_updated': time.time(),
     }}
     ScheduledCall.get_collection().update(spec=spec, document=delta)
+    ScheduledCallChange.record([schedule_id])
 
 
 def increment_failure_count(schedule_id):
@@ -192,6 +201,7 @@ def increment_failure_count(schedule_id):
     }
     schedule = ScheduledCall.get_collection().find_and_modify(
         query=spec, update=delta, new=True)
+    ScheduledCallChange.record([schedule_id])
     if schedule:
         scheduled_call = ScheduledCall.from_db(schedule)
         if scheduled_call.failure_threshold is None or not scheduled_call.enabled:
@@ -205,6 +215,7 @@ def increment_failure_count(schedule_id):
                 'last_updated': time.time(),
             }}
             ScheduledCall.get_collection().update(spec, delta)
+            ScheduledCallChange.record([schedule_id])
 
 
 def validate_keys(options, valid_keys, all_required=False):
@@ -1,9 +1,16 @@
 import celery
 
+from pulp.common import tags
+from pulp.common.error_codes import PLP0002
 from pulp.server.async.tasks import TaskResult, Task
+from pulp.server.exceptions import PulpCodedException
 from pulp.server.managers import factory as managers
 
 
+# Number of consumers whose agents are notified by each task spawned by unbind_all()
+NOTIFY_BATCH_SIZE = 500
+
+
 def bind(consumer_id, repo_id, distributor_id, notify_agent, binding_config, agent_options):
     """
     Bind a repo to a consumer:
@@ -124,6 +131,76 @@ def force_unbind(consumer_id, repo_id, distributor_id, options):
     return response
 
 
+@celery.task(base=Task)
+def notify_unbind(bindings, options):
+    """
+    Request the agents of a batch of consumers to perform an unbind. The
+    bindings have already been marked deleted on the server, and are deleted
+    by the agent notification handler once each agent confirms the unbind.
+
+    :param bindings: binding IDs, all for the same repository and distributor.
+      Each binding is:
+        {consumer_id:<str>, repo_id:<str>, distributor_id:<str>}
+    :type bindings: list
+    :param options: Unbind options passed to the agent handler.
+    :type options: dict
+    :returns TaskResult containing the agent tasks that were spawned & any errors
+    :rtype: TaskResult
+    """
+    agent_manager = managers.consumer_agent_manager()
+    tasks, errors = agent_manager.unbind_all(bindings, options)
+
+    error = None
+    if errors:
+        error = PulpCodedException(PLP0002,
+                                   repo_id=bindings[0]['repo_id'],
+                                   distributor_id=bindings[0]['distributor_id'])
+        error.child_exceptions = errors
+    # we only want the tasks' IDs, not the full tasks
+    spawned_tasks = [{'task_id': t['task_id']} for t in tasks]
+    return TaskResult(error=error, spawned_tasks=spawned_tasks)
+
+
+def unbind_all(repo_id, distributor_id, options):
+    """
+    Unbind all consumers from a repository, or from one of its distributors.
+    The itinerary is:
+      1. Unbind all of the consumers on the server with a single update.
+      2. Dispatch tasks that request the consumers (agents) perform the unbind,
+         each for a batch of NOTIFY_BATCH_SIZE consumers.
+
+    The server side state is consistent when this returns; the agents are
+    notified by the spawned tasks.
+
+    :param repo_id: A repository ID.
+    :type repo_id: str
+    :param distributor_id: A distributor ID; all of the repository's distributors when None.
+    :type distributor_id: str
+    :param options: Unbind options passed to the agent handler.
+    :type options: dict
+    :returns list of the AsyncResults of the spawned tasks
+    :rtype: list
+    """
+    bind_manager = managers.consumer_bind_manager()
+    bindings = bind_manager.unbind_by_repo(repo_id, distributor_id)
+
+    by_distributor = {}
+    for binding in bindings:
+        by_distributor.setdefault(binding['distributor_id'], []).append(binding)
+
+    spawned_tasks = []
+    for bound_distributor_id, distributor_bindings in sorted(by_distributor.items()):
+        task_tags = [
+            tags.resource_tag(tags.RESOURCE_REPOSITORY_TYPE, repo_id),
+            tags.resource_tag(tags.RESOURCE_REPOSITORY_DISTRIBUTOR_TYPE, bound_distributor_id),
+            tags.action_tag(tags.ACTION_AGENT_UNBIND)
+        ]
+        for start in range(0, len(distributor_bindings), NOTIFY_BATCH_SIZE):
+            batch = distributor_bindings[start:start + NOTIFY_BATCH_SIZE]
+            spawned_tasks.append(notify_unbind.apply_async((batch, options), tags=task_tags))
+    return spawned_tasks
+
+
 @celery.task(base=Task)
 def install_content(consumer_id, units, options):
     """
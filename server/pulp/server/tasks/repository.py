@@ -40,29 +40,16 @@ def delete(repo_id):
     manager = managers.repo_manager()
     manager.delete_repo(repo_id)
 
-    # append unbind itineraries foreach bound consumer
+    # unbind the bound consumers; their agents are notified by the spawned tasks
     options = {}
-    manager = managers.consumer_bind_manager()
-
-    additional_tasks = []
-    errors = []
-    for bind in manager.find_by_repo(repo_id):
-        try:
-            report = consumer.unbind(bind['consumer_id'],
-                                     bind['repo_id'],
-                                     bind['distributor_id'],
-                                     options)
-            if report:
-                additional_tasks.extend(report.spawned_tasks)
-        except Exception, e:
-            errors.append(e)
-
-    error = None
-    if len(errors) > 0:
+    try:
+        additional_tasks = consumer.unbind_all(repo_id, None, options)
+    except Exception, e:
         error = PulpCodedException(PLP0007, repo_id=repo_id)
-        error.child_exceptions = errors
+        error.child_exceptions = [e]
+        return TaskResult(error=error)
 
-    return TaskResult(error=error, spawned_tasks=additional_tasks)
+    return TaskResult(spawned_tasks=additional_tasks)
 
 
 @celery.task(base=Task)
@@ -83,28 +70,17 @@ def distributor_delete(repo_id, distributor_id):
     manager = managers.repo_distributor_manager()
     manager.remove_distributor(repo_id, distributor_id)
 
-    # append unbind itineraries foreach bound consumer
+    # unbind the bound consumers; their agents are notified by the spawned tasks
 
-    unbind_errors = []
-    additional_tasks = []
     options = {}
-    manager = managers.consumer_bind_manager()
-    for bind in manager.find_by_distributor(repo_id, distributor_id):
-        try:
-            report = consumer.unbind(bind['consumer_id'],
-                                     bind['repo_id'],
-                                     bind['distributor_id'],
-                                     options)
-            if report:
-                additional_tasks.extend(report.spawned_tasks)
-        except Exception, e:
-            unbind_errors.append(e)
-
-    bind_error = None
-    if len(unbind_errors) > 0:
+    try:
+        additional_tasks = consumer.unbind_all(repo_id, distributor_id, options)
+    except Exception, e:
         bind_error = PulpCodedException(PLP0003, repo_id=repo_id, distributor_id=distributor_id)
-        bind_error.child_exceptions = unbind_errors
-    return TaskResult(error=bind_error, spawned_tasks=additional_tasks)
+        bind_error.child_exceptions = [e]
+        return TaskResult(error=bind_error)
+
+    return TaskResult(spawned_tasks=additional_tasks)
 
 
 @celery.task(base=Task)
@@ -1,12 +1,15 @@
 """
 This module contains the consumer related web controllers.
 """
+import urllib
+
 from web.webapi import BadRequest
 import web
 
 from pulp.common import tags
 from pulp.server.async.tasks import TaskResult
 from pulp.server.auth.authorization import READ, CREATE, UPDATE, DELETE
+from pulp.server.db import connection
 from pulp.server.db.model.criteria import Criteria
 from pulp.server.exceptions import InvalidValue, MissingValue, OperationPostponed, \
     UnsupportedValue, MissingResource
@@ -15,13 +18,19 @@ from pulp.server.managers.consumer.applicability import (regenerate_applicabilit
 from pulp.server.managers.schedule.consumer import UNIT_INSTALL_ACTION, UNIT_UNINSTALL_ACTION, \
     UNIT_UPDATE_ACTION
 from pulp.server.tasks import consumer
-from pulp.server.webservices import serialization
+from pulp.server.webservices import http, serialization
 from pulp.server.webservices.controllers.base import JSONController
 from pulp.server.webservices.controllers.decorators import auth_required
 from pulp.server.webservices.controllers.search import SearchController
 import pulp.server.managers.factory as managers
 
 
+# number of events in one page of consumer history when the caller does not ask for a limit,
+# and the most that will be returned in a page whatever the caller asks for
+CONSUMER_HISTORY_DEFAULT_LIMIT = 100
+CONSUMER_HISTORY_MAX_LIMIT = 1000
+
+
 def expand_consumers(options, consumers):
     """
     Expand a list of users based on flags specified in the
@@ -390,16 +399,20 @@ class ConsumerHistory(JSONController):
     @auth_required(READ)
     def GET(self, id):
         """
+        Return one page of the consumer's history. When the page is full, a Link header
+        with rel="next" gives the URL of the following page.
+
         @type id: str
         @param id: consumer id
         """
-        valid_filters = ['event_type', 'limit', 'sort', 'start_date', 'end_date']
+        valid_filters = ['event_type', 'limit', 'sort', 'start_date', 'end_date', 'after']
         filters = self.filters(valid_filters)
         event_type = filters.get('event_type', None)
         limit = filters.get('limit', None)
         sort = filters.get('sort', None)
         start_date = filters.get('start_date', None)
         end_date = filters.get('end_date', None)
+        after = filters.get('after', None)
 
         if sort is None:
             sort = 'descending'
@@ -407,7 +420,13 @@ class ConsumerHistory(JSONController):
             sort = sort[0]
 
         if limit:
-            limit = int(limit[0])
+            try:
+                limit = int(limit[0])
+            except ValueError:
+                raise InvalidValue(['limit'])
+            limit = min(limit, CONSUMER_HISTORY_MAX_LIMIT)
+        else:
+            limit = CONSUMER_HISTORY_DEFAULT_LIMIT
 
         if start_date:
             start_date = start_date[0]
@@ -418,18 +437,31 @@ class ConsumerHistory(JSONController):
         if event_type:
             event_type = event_type[0]
 
-        results = managers.consumer_history_manager().query(consumer_id=id,
-                                                            event_type=event_type,
-                                                            limit=limit,
-                                                            sort=sort,
-                                                            start_date=start_date,
-                                                            end_date=end_date)
+        # ID of the last event of the previous page
+        if after:
+            after = after[0]
 
-        if results:
-            return self.ok(results)
-        else:
+        with connection.read_preference(connection.READ_REPORT):
+            results = managers.consumer_history_manager().query(consumer_id=id,
+                                                                event_type=event_type,
+                                                                limit=limit,
+                                                                sort=sort,
+                                                                start_date=start_date,
+                                                                end_date=end_date,
+                                                                after=after)
+
+        if not results:
             return self.not_found()
 
+        # a full page may be followed by more events; point the caller at them
+        if len(results) == limit:
+            query = [(k, v[0]) for k, v in sorted(filters.items()) if k not in ('limit', 'after')]
+            query.extend([('limit', limit), ('after', str(results[-1]['_id']))])
+            next_page = '%s?%s' % (http.uri_path(), urllib.urlencode(query))
+            http.header('Link', '<%s>; rel="next"' % next_page)
+
+        return self.ok(results)
+
 
 class Profiles(JSONController):
     """
@@ -460,19 +492,36 @@ class Profiles(JSONController):
     def POST(self, consumer_id):
         """
         Associate a profile with a consumer by content type ID.
+
+        Instead of the profile, a consumer may send the profile_hash returned
+        when it last reported the profile, to confirm the profile has not
+        changed, or the profile_hash together with a delta of the changes since.
+        A 409 is returned when the profile_hash does not match the stored profile,
+        in which case the full profile must be sent.
         @param consumer_id: A consumer ID.
         @type consumer_id: str
         @return: The created model object:
             {consumer_id:<str>, content_type:<str>, profile:<dict>}
+            The profile is not included when a profile_hash was sent.
         @rtype: dict
         """
         body = self.params()
         content_type = body.get('content_type')
         profile = body.get('profile')
+        profile_hash = body.get('profile_hash')
+        delta = body.get('delta')
 
         manager = managers.consumer_profile_manager()
-        new_profile = manager.create(consumer_id, content_type, profile)
         link = serialization.link.child_link_obj(consumer_id, content_type)
+        if profile is None and profile_hash is not None:
+            if delta is None:
+                summary = manager.confirm(consumer_id, content_type, profile_hash)
+            else:
+                summary = manager.update_delta(consumer_id, content_type, profile_hash, delta)
+            summary.update(link)
+            return self.ok(summary)
+
+        new_profile = manager.create(consumer_id, content_type, profile)
         new_profile.update(link)
         return self.created(link['_href'], new_profile)
 
@@ -579,7 +628,9 @@ class ContentApplicability(JSONController):
         except InvalidValue, e:
             return self.bad_request(str(e))
 
-        return self.ok(retrieve_consumer_applicability(consumer_criteria, content_types))
+        with connection.read_preference(connection.READ_REPORT):
+            report = retrieve_consumer_applicability(consumer_criteria, content_types)
+        return self.ok(report)
 
     def _get_consumer_criteria(self):
         """
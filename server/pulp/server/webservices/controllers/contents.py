@@ -144,8 +144,10 @@ class UploadsCollection(JSONController):
 
     @auth_required(CREATE)
     def POST(self):
+        params = self.params()
         upload_manager = factory.content_upload_manager()
-        upload_id = upload_manager.initialize_upload()
+        upload_id = upload_manager.initialize_upload(size=params.get('size'),
+                                                     checksum_types=params.get('checksum_types'))
         location = serialization.link.child_link_obj(upload_id)
         return self.created(location['_href'], {'_href': location['_href'], 'upload_id': upload_id})
 
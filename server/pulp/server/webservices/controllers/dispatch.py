@@ -7,7 +7,7 @@ from pulp.server.async import tasks
 from pulp.server.auth.authorization import READ, DELETE
 from pulp.server.db.model.dispatch import TaskStatus
 from pulp.server.db.model.resources import Worker
-from pulp.server.exceptions import MissingResource
+from pulp.server.exceptions import InvalidValue, MissingResource, MissingValue
 from pulp.server.webservices import serialization
 from pulp.server.webservices.controllers.base import JSONController
 from pulp.server.webservices.controllers.decorators import auth_required
@@ -82,6 +82,42 @@ class TaskCollection(JSONController):
         return self.ok(serialized_task_statuses)
 
 
+class TaskStatusCollection(JSONController):
+
+    @auth_required(READ)
+    def POST(self):
+        """
+        Returns the statuses of the tasks whose IDs are listed in the required 'task_ids'
+        parameter. If a 'timeout' in seconds is specified, the call waits until one of the tasks
+        changes state before returning, or until the timeout expires. The states the caller
+        already knows about may be passed as a 'known_states' mapping of task ID to state;
+        otherwise the states at the time of the call are used.
+
+        :return: list of serialized task statuses
+        :rtype:  str
+        """
+        params = self.params()
+
+        task_ids = params.get('task_ids')
+        if not task_ids:
+            raise MissingValue(['task_ids'])
+        if not isinstance(task_ids, list):
+            raise InvalidValue(['task_ids'])
+
+        known_states = params.get('known_states')
+        if known_states is not None and not isinstance(known_states, dict):
+            raise InvalidValue(['known_states'])
+
+        try:
+            timeout = float(params.get('timeout') or 0)
+        except (TypeError, ValueError):
+            raise InvalidValue(['timeout'])
+
+        raw_tasks = tasks.get_task_statuses(task_ids, known_states=known_states, timeout=timeout)
+        serialized_task_statuses = [task_serializer(task) for task in raw_tasks]
+        return self.ok(serialized_task_statuses)
+
+
 class TaskResource(JSONController):
 
     @auth_required(READ)
@@ -114,6 +150,7 @@ class TaskResource(JSONController):
 TASK_URLS = (
     '/', TaskCollection,
     '/search/', SearchTaskCollection,
+    '/status/', TaskStatusCollection,
     '/([^/]+)/', TaskResource,
 )
 task_application = web.application(TASK_URLS, globals())
@@ -9,6 +9,7 @@ import web
 from pulp.common import constants, dateutils, error_codes, tags
 from pulp.plugins.loader import api as plugin_api
 from pulp.server.auth.authorization import CREATE, DELETE, EXECUTE, READ, UPDATE
+from pulp.server.db import connection
 from pulp.server.db.model.criteria import Criteria, UnitAssociationCriteria
 from pulp.server.db.model.repository import Repo, RepoContentUnit
 from pulp.server.managers.consumer.applicability import regenerate_applicability_for_repos
@@ -140,17 +141,18 @@ class RepoCollection(JSONController):
         'distributors'.
         """
         query_params = web.input()
-        all_repos = list(Repo.get_collection().find(projection={'scratchpad': 0}))
 
         if query_params.get('details', False):
             query_params['importers'] = True
             query_params['distributors'] = True
 
-        self._process_repos(
-            all_repos,
-            query_params.get('importers', False),
-            query_params.get('distributors', False)
-        )
+        with connection.read_preference(connection.READ_SEARCH):
+            all_repos = list(Repo.get_collection().find(projection={'scratchpad': 0}))
+            self._process_repos(
+                all_repos,
+                query_params.get('importers', False),
+                query_params.get('distributors', False)
+            )
 
         # Return the repos or an empty list; either way it's a 200
         return self.ok(all_repos)
@@ -14,6 +14,7 @@
 import web
 
 from pulp.server.auth.authorization import READ
+from pulp.server.db import connection
 from pulp.server.db.model.criteria import Criteria
 import pulp.server.exceptions as exceptions
 from pulp.server.webservices.controllers.base import JSONController
@@ -94,7 +95,8 @@ class SearchController(JSONController):
             input['fields'] = fields
 
         criteria = Criteria.from_client_input(input)
-        return list(self.query_method(criteria))
+        with connection.read_preference(connection.READ_SEARCH):
+            return list(self.query_method(criteria))
 
     def _get_query_results_from_post(self, is_user_search=False):
         """
@@ -115,4 +117,5 @@ class SearchController(JSONController):
                 criteria.fields.append('id')
             if is_user_search and 'login' not in criteria.fields and u'login' not in criteria.fields:
                 criteria.fields.append('login')
-        return list(self.query_method(criteria))
+        with connection.read_preference(connection.READ_SEARCH):
+            return list(self.query_method(criteria))
@@ -24,18 +24,15 @@ from pulp.server.async import celery_instance
 from pulp.server.db import connection
 from pulp.server.db.model.auth import User
 from pulp.server.db.model.dispatch import TaskStatus
-from pulp.server.db.model.resources import Worker, ReservedResource
+from pulp.server.db.model.resources import Worker, ReservedResource, ReservationRequest
 from pulp.server.logs import start_logging, stop_logging
 from pulp.server.managers import factory as manager_factory
-from pulp.server.managers.auth.cert.cert_generator import SerialNumber
 from pulp.server.managers.auth.role.cud import SUPER_USER_ROLE
 from pulp.server.webservices import http
 from pulp.server.webservices.middleware.exception import ExceptionHandlerMiddleware
 from pulp.server.webservices.middleware.postponed import PostponedOperationMiddleware
 
 
-SerialNumber.PATH = '/tmp/sn.dat'
-
 DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/'))
 
 def load_test_config():
@@ -270,4 +267,5 @@ class ResourceReservationTests(PulpServerTests):
     def tearDown(self):
         Worker.get_collection().remove()
         ReservedResource.get_collection().remove()
+        ReservationRequest.get_collection().remove()
         TaskStatus.objects().delete()
@@ -4,6 +4,7 @@ import csv
 import errno
 import os
 import shutil
+import stat
 import tempfile
 import unittest
 
@@ -11,7 +12,8 @@ from mock import Mock, MagicMock, patch
 
 from pulp.common.plugins.distributor_constants import MANIFEST_FILENAME
 from pulp.devel.mock_distributor import get_publish_conduit
-from pulp.plugins.file.distributor import FileDistributor, FilePublishProgressReport, BUILD_DIRNAME
+from pulp.plugins.file.distributor import (FileDistributor, FilePublishProgressReport,
+                                           BUILD_DIRNAME, LOCATIONS_FILENAME)
 from pulp.plugins.model import Repository, Unit
 
 
@@ -28,6 +30,7 @@ class FileDistributorTest(unittest.TestCase):
         self.temp_dir = tempfile.mkdtemp()
 
         self.target_dir = os.path.join(self.temp_dir, "target")
+        self.master_dir = os.path.join(self.temp_dir, "master")
         self.repo = MagicMock(spec=Repository)
         self.repo.id = "foo"
         self.repo.working_dir = self.temp_dir
@@ -42,6 +45,7 @@ class FileDistributorTest(unittest.TestCase):
         distributor = FileDistributor()
         distributor.get_hosting_locations = Mock()
         distributor.get_hosting_locations.return_value = [self.target_dir, ]
+        distributor.get_master_publish_dir = Mock(return_value=self.master_dir)
         distributor.post_repo_publish = Mock()
         return distributor
 
@@ -148,6 +152,126 @@ class FileDistributorTest(unittest.TestCase):
         # Ensure the old rpm is no longer included
         self.assertFalse(os.path.islink(target_file))
 
+    def test_repo_publish_hosting_locations_share_tree(self):
+        distributor = self.create_distributor_with_mocked_api_calls()
+        second_target_dir = os.path.join(self.temp_dir, 'https', 'target')
+        distributor.get_hosting_locations.return_value = [self.target_dir, second_target_dir]
+
+        distributor.publish_repo(self.repo, self.publish_conduit, {})
+
+        trees = [name for name in os.listdir(self.master_dir) if name != LOCATIONS_FILENAME]
+        self.assertEqual(len(trees), 1)
+        tree_dir = os.path.join(self.master_dir, trees[0])
+        for location in (self.target_dir, second_target_dir):
+            self.assertTrue(os.path.islink(location))
+            self.assertEqual(readlink(location), tree_dir)
+        self.assertTrue(os.path.islink(os.path.join(tree_dir, SAMPLE_RPM)))
+
+    def test_repo_publish_tree_mode(self):
+        distributor = self.create_distributor_with_mocked_api_calls()
+
+        distributor.publish_repo(self.repo, self.publish_conduit, {})
+
+        tree_dir = readlink(self.target_dir)
+        self.assertEqual(stat.S_IMODE(os.stat(tree_dir).st_mode), 0755)
+
+    def test_repo_publish_unchanged_reuses_tree(self):
+        distributor = self.create_distributor_with_mocked_api_calls()
+        distributor.publish_repo(self.repo, self.publish_conduit, {})
+        tree_dir = readlink(self.target_dir)
+
+        with patch.object(distributor, '_build_tree') as mock_build_tree:
+            report = distributor.publish_repo(self.repo, self.publish_conduit, {})
+
+        self.assertTrue(report.success_flag)
+        self.assertFalse(mock_build_tree.called)
+        self.assertEqual(readlink(self.target_dir), tree_dir)
+
+    def test_repo_publish_replaces_copied_location(self):
+        """
+        A hosting location that was published by copying the tree is replaced by a symlink.
+        """
+        os.makedirs(self.target_dir)
+        with open(os.path.join(self.target_dir, 'stale.iso'), 'w') as stale:
+            stale.write('stale')
+        distributor = self.create_distributor_with_mocked_api_calls()
+
+        distributor.publish_repo(self.repo, self.publish_conduit, {})
+
+        self.assertTrue(os.path.islink(self.target_dir))
+        self.assertFalse(os.path.exists(os.path.join(self.target_dir, 'stale.iso')))
+
+    def test_repo_publish_removes_dropped_location(self):
+        """
+        A hosting location that is no longer configured stops serving the repository.
+        """
+        distributor = self.create_distributor_with_mocked_api_calls()
+        http_dir = os.path.join(self.temp_dir, 'http', 'target')
+        distributor.get_hosting_locations.return_value = [self.target_dir, http_dir]
+        distributor.publish_repo(self.repo, self.publish_conduit, {})
+        self.assertTrue(os.path.islink(http_dir))
+
+        distributor.get_hosting_locations.return_value = [self.target_dir]
+        report = distributor.publish_repo(self.repo, self.publish_conduit, {})
+
+        self.assertTrue(report.success_flag)
+        self.assertFalse(os.path.lexists(http_dir))
+        self.assertTrue(os.path.islink(self.target_dir))
+
+    def test_unpublish_repo_removes_dropped_location(self):
+        distributor = self.create_distributor_with_mocked_api_calls()
+        http_dir = os.path.join(self.temp_dir, 'http', 'target')
+        distributor.get_hosting_locations.return_value = [self.target_dir, http_dir]
+        distributor.publish_repo(self.repo, self.publish_conduit, {})
+
+        distributor.get_hosting_locations.return_value = [self.target_dir]
+        distributor.unpublish_repo(self.repo, {})
+
+        self.assertFalse(os.path.lexists(http_dir))
+        self.assertFalse(os.path.lexists(self.target_dir))
+        self.assertFalse(os.path.exists(self.master_dir))
+
+    def test_repo_publish_build_error_cleaned_up(self):
+        distributor = self.create_distributor_with_mocked_api_calls()
+
+        with patch.object(distributor, '_symlink_unit', side_effect=OSError('no space')):
+            report = distributor.publish_repo(self.repo, self.publish_conduit, {})
+
+        self.assertFalse(report.success_flag)
+        self.assertEqual(report.summary['error_message'], 'no space')
+        # neither a partial tree nor the temporary build dir is left behind
+        self.assertEqual(os.listdir(self.master_dir), [])
+        self.assertFalse(os.path.lexists(self.target_dir))
+
+    def test__symlink_units_many(self):
+        build_dir = os.path.join(self.temp_dir, BUILD_DIRNAME)
+        os.makedirs(build_dir)
+        links = dict(('%d.iso' % i, self.unit) for i in range(100))
+
+        distributor = self.create_distributor_with_mocked_api_calls()
+        distributor._symlink_units(build_dir, links)
+
+        self.assertEqual(sorted(os.listdir(build_dir)), sorted(links))
+
+    def test__get_links_last_unit_wins(self):
+        cloned_unit = copy.deepcopy(self.unit)
+        cloned_unit.storage_path = '/other/path'
+
+        distributor = self.create_distributor_with_mocked_api_calls()
+        links = distributor._get_links([self.unit, cloned_unit])
+
+        self.assertEqual(links, {SAMPLE_RPM: cloned_unit})
+
+    @patch('pulp.plugins.file.distributor.pulp_config')
+    def test_get_master_publish_dir(self, mock_config):
+        mock_config.config.get.return_value = '/var/lib/pulp'
+        distributor = FileDistributor()
+        distributor.metadata = Mock(return_value={'id': 'iso_distributor'})
+
+        master_dir = distributor.get_master_publish_dir(self.repo, {})
+
+        self.assertEqual(master_dir, '/var/lib/pulp/published/master/iso_distributor/foo')
+
     def test_distributor_removed_calls_unpublish(self):
         distributor = self.create_distributor_with_mocked_api_calls()
         distributor.unpublish_repo = Mock()
@@ -159,7 +283,8 @@ class FileDistributorTest(unittest.TestCase):
         distributor.publish_repo(self.repo, self.publish_conduit, {})
         self.assertTrue(os.path.exists(self.target_dir))
         distributor.unpublish_repo(self.repo, {})
-        self.assertFalse(os.path.exists(self.target_dir))
+        self.assertFalse(os.path.lexists(self.target_dir))
+        self.assertFalse(os.path.exists(self.master_dir))
 
     def test__rmtree_if_exists(self):
         """
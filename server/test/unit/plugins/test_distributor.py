@@ -5,6 +5,7 @@ import unittest
 import mock
 
 from pulp.plugins.distributor import Distributor, GroupDistributor
+from pulp.plugins.model import PublishReport
 
 
 class TestDistributor(unittest.TestCase):
@@ -21,3 +22,28 @@ class TestGroupDistributor(unittest.TestCase):
     def test_cancel_publish_group_calls_sys_exit(self, mock_sys_exit):
         GroupDistributor().cancel_publish_group(mock.Mock(), mock.Mock())
         mock_sys_exit.assert_called_once_with()
+
+    def test_split_group_publish_default(self):
+        self.assertFalse(GroupDistributor().split_group_publish(mock.Mock(), mock.Mock()))
+
+    def test_finish_publish_group_merges_member_reports(self):
+        member_reports = {'a': PublishReport(True, 'sa', 'da'),
+                          'b': PublishReport(True, 'sb', 'db')}
+
+        report = GroupDistributor().finish_publish_group(mock.Mock(), mock.Mock(), mock.Mock(),
+                                                         member_reports)
+
+        self.assertTrue(report.success_flag)
+        self.assertEqual(report.summary, {'a': 'sa', 'b': 'sb'})
+        self.assertEqual(report.details, {'a': 'da', 'b': 'db'})
+
+    def test_finish_publish_group_member_failed(self):
+        member_reports = {'a': PublishReport(True, 'sa', 'da'),
+                          'b': PublishReport(False, 'sb', 'db'),
+                          'c': None}
+
+        report = GroupDistributor().finish_publish_group(mock.Mock(), mock.Mock(), mock.Mock(),
+                                                         member_reports)
+
+        self.assertFalse(report.success_flag)
+        self.assertEqual(report.summary, {'a': 'sa', 'b': 'sb', 'c': None})
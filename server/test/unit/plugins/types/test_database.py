@@ -1,3 +1,5 @@
+import unittest
+
 from ... import base
 from pulp.plugins.types.model import TypeDefinition
 from pulp.server.db.model.content import ContentType
@@ -41,7 +43,8 @@ class TypesDatabaseTests(base.PulpServerTests):
             collection = types_db.type_units_collection(d.id)
             all_indexes = collection.index_information()
 
-            total_index_count = 1 + 1 + len(d.search_indexes)  # _id + unit key + all search
+            # _id + unit key + unit key digest + all search
+            total_index_count = 1 + 1 + 1 + len(d.search_indexes)
             self.assertEqual(total_index_count, len(all_indexes))
 
     def test_update_no_changes(self):
@@ -70,7 +73,8 @@ class TypesDatabaseTests(base.PulpServerTests):
             collection = types_db.type_units_collection(d.id)
             all_indexes = collection.index_information()
 
-            total_index_count = 1 + 1 + len(d.search_indexes)  # _id + unit key + all search
+            # _id + unit key + unit key digest + all search
+            total_index_count = 1 + 1 + 1 + len(d.search_indexes)
             self.assertEqual(total_index_count, len(all_indexes))
 
     def test_update_missing_no_error(self):
@@ -99,7 +103,8 @@ class TypesDatabaseTests(base.PulpServerTests):
             collection = types_db.type_units_collection(d.id)
             all_indexes = collection.index_information()
 
-            total_index_count = 1 + 1 + len(d.search_indexes)  # _id + unit key + all search
+            # _id + unit key + unit key digest + all search
+            total_index_count = 1 + 1 + 1 + len(d.search_indexes)
             self.assertEqual(total_index_count, len(all_indexes))
 
     def test_update_missing_with_error(self):
@@ -324,7 +329,7 @@ class TypesDatabaseTests(base.PulpServerTests):
 
         index_dict = collection.index_information()
 
-        self.assertEqual(2, len(index_dict))  # default (_id) + unit key
+        self.assertEqual(3, len(index_dict))  # default (_id) + unit key + unit key digest
 
         index = index_dict['individual_1_1']
         self.assertTrue(index['unique'])
@@ -352,7 +357,7 @@ class TypesDatabaseTests(base.PulpServerTests):
 
         index_dict = collection.index_information()
 
-        self.assertEqual(2, len(index_dict))  # default (_id) + unit key
+        self.assertEqual(3, len(index_dict))  # default (_id) + unit key + unit key digest
 
         index = index_dict['compound_1_1_compound_2_1']
         self.assertTrue(index['unique'])
@@ -364,6 +369,10 @@ class TypesDatabaseTests(base.PulpServerTests):
         self.assertEqual('compound_2', keys[1][0])
         self.assertEqual(types_db.ASCENDING, keys[1][1])
 
+        index = index_dict[types_db.UNIT_KEY_DIGEST + '_1']
+        self.assertTrue(index['unique'])
+        self.assertTrue(index['sparse'])
+
     def test_update_search_indexes(self):
         """
         Tests that the unique index creation on a new collection is successful.
@@ -432,4 +441,19 @@ class TypesDatabaseTests(base.PulpServerTests):
 
         index_dict = collection.index_information()
 
-        self.assertEqual(2, len(index_dict))  # default (_id) + new one
+        self.assertEqual(3, len(index_dict))  # default (_id) + new one + unit key digest
+
+
+class UnitKeyDigestTests(unittest.TestCase):
+
+    def test_field_order(self):
+        self.assertEqual(types_db.unit_key_digest({'a': '1', 'b': '2'}),
+                         types_db.unit_key_digest({'b': '2', 'a': '1'}))
+
+    def test_str_and_unicode(self):
+        self.assertEqual(types_db.unit_key_digest({'a': 'caf\xc3\xa9'}),
+                         types_db.unit_key_digest({u'a': u'caf\xe9'}))
+
+    def test_different_keys(self):
+        self.assertNotEqual(types_db.unit_key_digest({'a': '1', 'b': '2'}),
+                            types_db.unit_key_digest({'a': '2', 'b': '1'}))
@@ -14,6 +14,7 @@ from pulp.devel.unit.server.util import assert_validation_exception
 from pulp.plugins.util.metadata_writer import MetadataFileContext, JSONArrayFileContext
 from pulp.plugins.util.metadata_writer import XmlFileContext
 from pulp.plugins.util.metadata_writer import FastForwardXmlFileContext
+from pulp.plugins.util.metadata_writer import BackgroundWriter
 from pulp.plugins.util.verification import TYPE_SHA1
 
 
@@ -247,6 +248,51 @@ class MetadataWriterTests(unittest.TestCase):
                                                    expected_metadata_file_name)
         self.assertEquals(expected_metadata_file_path, context.metadata_file_path)
 
+    def test_finalize_checksum_calculated_while_writing(self):
+
+        path = os.path.join(self.metadata_file_dir, 'test.xml.gz')
+        context = MetadataFileContext(path, 'sha256')
+
+        context._open_metadata_file_handle()
+        context.metadata_file_handle.write('<metadata/>' * 1000)
+        with patch('__builtin__.open') as mock_open:
+            context.finalize()
+            # the finished file was not read again
+            self.assertFalse(mock_open.called)
+
+        with open(context.metadata_file_path, 'rb') as h:
+            self.assertEqual(context.checksum, hashlib.sha256(h.read()).hexdigest())
+        h = gzip.open(context.metadata_file_path)
+        self.assertEqual(h.read(), '<metadata/>' * 1000)
+        h.close()
+
+    def test_finalize_checksum_without_checksum_file_handle(self):
+
+        path = os.path.join(self.metadata_file_dir, 'test.xml')
+        context = MetadataFileContext(path, 'sha256')
+        context.metadata_file_handle = open(path, 'w')
+        context.metadata_file_handle.write('foo')
+
+        context.finalize()
+
+        self.assertEqual(context.checksum, hashlib.sha256('foo').hexdigest())
+
+    def test_background_writes(self):
+
+        path = os.path.join(self.metadata_file_dir, 'test.xml.gz')
+        context = MetadataFileContext(path, 'sha256', background_writes=True)
+
+        context._open_metadata_file_handle()
+        for i in range(10000):
+            context.metadata_file_handle.write('<unit id="%d"/>' % i)
+        context.finalize()
+
+        with open(context.metadata_file_path, 'rb') as h:
+            self.assertEqual(context.checksum, hashlib.sha256(h.read()).hexdigest())
+        h = gzip.open(context.metadata_file_path)
+        self.assertEqual(h.read(), ''.join('<unit id="%d"/>' % i for i in range(10000)))
+        h.close()
+
     @patch('pulp.plugins.util.metadata_writer._LOG.exception')
     def test_finalize_error_on_footer(self, mock_logger):
 
@@ -581,3 +627,38 @@ class FastForwardXmlFileContextTests(unittest.TestCase):
         context._open_metadata_file_handle()
         context._close_metadata_file_handle()
         self.assertTrue(context._is_closed(context.metadata_file_handle))
+
+
+class BackgroundWriterTests(unittest.TestCase):
+
+    def test_write(self):
+        file_object = Mock()
+        writer = BackgroundWriter(file_object)
+
+        writer.write('foo')
+        writer.write('bar')
+        writer.flush()
+
+        file_object.write.assert_called_once_with('foobar')
+        file_object.flush.assert_called_once_with()
+
+        writer.close()
+
+        file_object.close.assert_called_once_with()
+        self.assertTrue(writer.closed)
+        # closing twice does nothing
+        writer.close()
+        self.assertEqual(file_object.close.call_count, 1)
+
+    def test_error_raised(self):
+        file_object = Mock()
+        file_object.write.side_effect = IOError('disk full')
+        writer = BackgroundWriter(file_object)
+
+        writer.write('foo')
+
+        self.assertRaises(IOError, writer.flush)
+        self.assertRaises(IOError, writer.write, 'bar')
+        self.assertRaises(IOError, writer.close)
+        self.assertEqual(file_object.write.call_count, 1)
+        file_object.close.assert_called_once_with()
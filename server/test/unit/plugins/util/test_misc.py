@@ -263,3 +263,78 @@ class TestCreateSymlink(unittest.TestCase):
         touch(link_path)
 
         self.assertRaises(RuntimeError, misc.create_symlink, source_path, link_path)
+
+
+class TestLinkTree(unittest.TestCase):
+
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp(prefix='working_')
+        self.source_dir = os.path.join(self.working_dir, 'source')
+        self.target_dir = os.path.join(self.working_dir, 'target')
+        self.previous_dir = os.path.join(self.working_dir, 'previous')
+        for name, contents in (('a/unchanged', 'same'), ('a/changed', 'new'), ('b', 'b')):
+            path = os.path.join(self.source_dir, name)
+            touch(path)
+            with open(path, 'w') as f:
+                f.write(contents)
+        os.symlink('/some/unit', os.path.join(self.source_dir, 'a', 'unit'))
+        os.symlink('a', os.path.join(self.source_dir, 'c'))
+
+    def tearDown(self):
+        shutil.rmtree(self.working_dir)
+
+    def _write_previous(self):
+        for name, contents in (('a/unchanged', 'same'), ('a/changed', 'old')):
+            path = os.path.join(self.previous_dir, name)
+            touch(path)
+            with open(path, 'w') as f:
+                f.write(contents)
+
+    def _inode(self, root, name):
+        return os.stat(os.path.join(root, name)).st_ino
+
+    def test_hard_links_source(self):
+        misc.link_tree(self.source_dir, self.target_dir)
+
+        for name in ('a/unchanged', 'a/changed', 'b'):
+            self.assertEqual(self._inode(self.source_dir, name),
+                             self._inode(self.target_dir, name))
+        self.assertEqual(os.readlink(os.path.join(self.target_dir, 'a', 'unit')), '/some/unit')
+        self.assertEqual(os.readlink(os.path.join(self.target_dir, 'c')), 'a')
+
+    @patch('os.link')
+    def test_copies_when_link_fails(self, mock_link):
+        mock_link.side_effect = OSError(errno.EXDEV, 'cross-device link')
+
+        misc.link_tree(self.source_dir, self.target_dir)
+
+        # linking the source is only tried once
+        self.assertEqual(mock_link.call_count, 1)
+        with open(os.path.join(self.target_dir, 'a', 'changed')) as f:
+            self.assertEqual(f.read(), 'new')
+        self.assertNotEqual(self._inode(self.source_dir, 'b'), self._inode(self.target_dir, 'b'))
+
+    def test_reuses_unchanged_previous_files(self):
+        self._write_previous()
+        real_link = os.link
+
+        def link(source, target):
+            if source.startswith(self.source_dir):
+                raise OSError(errno.EXDEV, 'cross-device link')
+            real_link(source, target)
+
+        with patch('os.link', side_effect=link):
+            misc.link_tree(self.source_dir, self.target_dir, self.previous_dir)
+
+        self.assertEqual(self._inode(self.previous_dir, 'a/unchanged'),
+                         self._inode(self.target_dir, 'a/unchanged'))
+        self.assertNotEqual(self._inode(self.previous_dir, 'a/changed'),
+                            self._inode(self.target_dir, 'a/changed'))
+        with open(os.path.join(self.target_dir, 'a', 'changed')) as f:
+            self.assertEqual(f.read(), 'new')
+
+    @patch('os.link')
+    def test_other_link_errors_raised(self, mock_link):
+        mock_link.side_effect = OSError(errno.EACCES, 'permission denied')
+
+        self.assertRaises(OSError, misc.link_tree, self.source_dir, self.target_dir)
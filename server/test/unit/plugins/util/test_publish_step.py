@@ -4,6 +4,7 @@ import shutil
 import sys
 import tarfile
 import tempfile
+import threading
 import time
 import traceback
 import unittest
@@ -116,6 +117,136 @@ class StepTests(PublisherBase):
         step.parent.get_status_conduit.return_value = 'foo'
         self.assertEquals('foo', step.get_status_conduit())
 
+    def test_add_dependency(self):
+        step = Step('foo')
+        step2 = Step('step2')
+        step.add_dependency(step2)
+        self.assertEquals(step.dependencies, [step2])
+
+
+class RecordingStep(Step):
+    """
+    Step that records when it is processed, and can wait for and signal events while it runs
+    """
+
+    def __init__(self, step_type, log, wait_for=None, signal=None, error=None):
+        super(RecordingStep, self).__init__(step_type)
+        self.log = log
+        self.wait_for = wait_for
+        self.signal = signal
+        self.error = error
+
+    def process_main(self, item=None):
+        if self.signal:
+            self.signal.set()
+        if self.wait_for and not self.wait_for.wait(5):
+            raise Exception('%s was not run concurrently' % self.step_id)
+        if self.error:
+            raise self.error
+        self.log.append(self.step_id)
+
+
+class ConcurrentStepTests(unittest.TestCase):
+
+    def setUp(self):
+        self.log = []
+        self.root = Step('root', status_conduit=Mock())
+
+    def test_sequential_by_default(self):
+        for name in ('one', 'two', 'three'):
+            self.root.add_child(RecordingStep(name, self.log))
+
+        with patch('pulp.plugins.util.publish_step.threading.Thread') as mock_thread:
+            self.root.process_lifecycle()
+
+        self.assertFalse(mock_thread.called)
+        self.assertEquals(self.log, ['one', 'two', 'three'])
+
+    def test_independent_children_concurrent(self):
+        event = threading.Event()
+        self.root.concurrent_children = True
+        # one can only finish if two runs at the same time
+        self.root.add_child(RecordingStep('one', self.log, wait_for=event))
+        self.root.add_child(RecordingStep('two', self.log, signal=event))
+
+        self.root.process_lifecycle()
+
+        self.assertEquals(self.log, ['two', 'one'])
+        self.assertEquals(self.root.state, reporting_constants.STATE_COMPLETE)
+
+    def test_dependencies_respected(self):
+        self.root.concurrent_children = True
+        one = RecordingStep('one', self.log)
+        two = RecordingStep('two', self.log)
+        child = RecordingStep('child', self.log)
+        two.add_child(child)
+        # two, and so its child, may not start before one is complete
+        two.add_dependency(one)
+        self.root.add_child(two)
+        self.root.add_child(one)
+
+        self.root.process_lifecycle()
+
+        self.assertEquals(self.log, ['one', 'child', 'two'])
+
+    def test_sequential_subtree_order(self):
+        self.root.concurrent_children = True
+        sequential = RecordingStep('sequential', self.log)
+        for name in ('a', 'b', 'c'):
+            sequential.add_child(RecordingStep(name, self.log))
+        self.root.add_child(sequential)
+
+        self.root.process_lifecycle()
+
+        self.assertEquals(self.log, ['a', 'b', 'c', 'sequential'])
+
+    def test_max_concurrent_steps(self):
+        lock = threading.Lock()
+        counts = {'running': 0, 'max': 0}
+
+        def process_main(item=None):
+            with lock:
+                counts['running'] += 1
+                counts['max'] = max(counts['max'], counts['running'])
+            time.sleep(0.05)
+            with lock:
+                counts['running'] -= 1
+
+        self.root.concurrent_children = True
+        self.root.max_concurrent_steps = 2
+        for name in ('one', 'two', 'three', 'four'):
+            step = Step(name)
+            step.process_main = process_main
+            self.root.add_child(step)
+
+        self.root.process_lifecycle()
+
+        self.assertEquals(counts['max'], 2)
+
+    def test_error_stops_processing(self):
+        self.root.concurrent_children = True
+        self.root.max_concurrent_steps = 1
+        one = RecordingStep('one', self.log, error=ValueError('foo'))
+        two = RecordingStep('two', self.log)
+        self.root.add_child(one)
+        self.root.add_child(two)
+
+        self.assertRaises(ValueError, self.root.process_lifecycle)
+
+        self.assertEquals(self.log, [])
+        self.assertEquals(one.state, reporting_constants.STATE_FAILED)
+        self.assertEquals(self.root.state, reporting_constants.STATE_FAILED)
+        self.assertEquals(two.state, reporting_constants.STATE_NOT_STARTED)
+        self.root.status_conduit.set_progress.assert_called_with(self.root.get_progress_report())
+
+    def test_unsatisfiable_dependencies(self):
+        self.root.concurrent_children = True
+        one = RecordingStep('one', self.log)
+        one.add_dependency(Step('not-in-tree'))
+        self.root.add_child(one)
+
+        self.assertRaises(RuntimeError, self.root.process_lifecycle)
+
 
 class PluginStepTests(PluginBase):
     """
@@ -202,6 +333,88 @@ class PluginStepTests(PluginBase):
         plugin_step.report_progress()
         plugin_step.parent.report_progress.assert_called_once_with(False)
 
+    @patch('pulp.plugins.util.publish_step.time')
+    def test_report_progress_throttled(self, mock_time):
+        plugin_step = PluginStep('foo_step', conduit=Mock())
+        plugin_step.last_report_time = 100
+        mock_time.time.return_value = 100.5
+
+        plugin_step.progress_successes += 1
+        plugin_step.report_progress()
+
+        self.assertFalse(plugin_step.get_conduit().set_progress.called)
+
+        mock_time.time.return_value = 101
+        plugin_step.report_progress()
+
+        plugin_step.get_conduit().set_progress.assert_called_once_with(
+            plugin_step.get_progress_report())
+        self.assertEquals(plugin_step.last_report_time, 101)
+
+    @patch('pulp.plugins.util.publish_step.time')
+    def test_report_progress_force(self, mock_time):
+        plugin_step = PluginStep('foo_step', conduit=Mock())
+        plugin_step.last_report_time = 100
+        mock_time.time.return_value = 100
+
+        plugin_step.report_progress(force=True)
+        plugin_step.report_progress(force=True)
+
+        self.assertEquals(plugin_step.get_conduit().set_progress.call_count, 2)
+
+    @patch('pulp.plugins.util.publish_step.time')
+    def test_report_progress_state_change(self, mock_time):
+        parent_step = PluginStep('parent_step', conduit=Mock())
+        plugin_step = PluginStep('foo_step')
+        parent_step.add_child(plugin_step)
+        parent_step.last_report_time = 100
+        mock_time.time.return_value = 100
+
+        plugin_step.state = reporting_constants.STATE_RUNNING
+        plugin_step.report_progress()
+
+        self.assertEquals(parent_step.get_conduit().set_progress.call_count, 1)
+
+    @patch('pulp.plugins.util.publish_step.time')
+    def test_report_progress_unchanged(self, mock_time):
+        plugin_step = PluginStep('foo_step', conduit=Mock())
+        mock_time.time.return_value = 100
+        plugin_step.report_progress()
+        mock_time.time.return_value = 200
+
+        plugin_step.report_progress()
+
+        self.assertEquals(plugin_step.get_conduit().set_progress.call_count, 1)
+        self.assertEquals(plugin_step.last_report_time, 200)
+
+    def test_get_progress_report_cached(self):
+        parent_step = PluginStep('parent_step')
+        step_one = PluginStep('step_one')
+        step_two = PluginStep('step_two')
+        parent_step.add_child(step_one)
+        parent_step.add_child(step_two)
+        report = parent_step.get_progress_report()
+
+        self.assertTrue(parent_step.get_progress_report() is report)
+
+        step_two.progress_successes = 1
+        new_report = parent_step.get_progress_report()
+
+        self.assertFalse(new_report is report)
+        # only the changed step was built again
+        self.assertTrue(new_report[0] is report[0])
+        self.assertFalse(new_report[1] is report[1])
+        self.assertEquals(new_report[1][reporting_constants.PROGRESS_NUM_SUCCESSES_KEY], 1)
+
+    def test_get_progress_report_error_added(self):
+        step = PluginStep('foo_step')
+        report = step.get_progress_report()
+
+        step.error_details.append({'error': 'foo', 'traceback': None})
+        step.progress_successes = 0
+
+        self.assertFalse(step.get_progress_report() is report)
+
     def test_record_failure(self):
         plugin_step = PluginStep('foo_step')
         plugin_step.parent = self.pluginstep
@@ -777,6 +990,36 @@ class TestAtomicDirectoryPublishStep(unittest.TestCase):
         self.assertEquals(True, os.path.exists(target_file))
         self.assertEquals(1, len(os.listdir(master_dir)))
 
+    def test_process_main_links_previous_master(self):
+        source_dir = os.path.join(self.working_directory, 'source')
+        master_dir = os.path.join(self.working_directory, 'master')
+        publish_dir = os.path.join(self.working_directory, 'publish', 'bar')
+        step = AtomicDirectoryPublishStep(source_dir, [('/', publish_dir)], master_dir)
+        step.parent = Mock(timestamp='200.0')
+        touch(os.path.join(source_dir, 'foo', 'bar.html'))
+        os.makedirs(os.path.join(master_dir, '100.0'))
+        os.makedirs(os.path.join(master_dir, '150.0'))
+        os.makedirs(os.path.join(master_dir, 'not-a-timestamp'))
+
+        with patch('pulp.plugins.util.publish_step.misc.link_tree') as mock_link_tree:
+            mock_link_tree.side_effect = lambda source, target, previous: os.makedirs(target)
+            step.process_main()
+
+        mock_link_tree.assert_called_once_with(source_dir, os.path.join(master_dir, '200.0'),
+                                               os.path.join(master_dir, '150.0'))
+        self.assertEquals(['200.0'], os.listdir(master_dir))
+
+    def test_get_previous_master_dir_none(self):
+        master_dir = os.path.join(self.working_directory, 'master')
+        step = AtomicDirectoryPublishStep('foo', [], master_dir)
+        step.parent = Mock(timestamp='200.0')
+
+        self.assertEquals(None, step._get_previous_master_dir())
+
+        os.makedirs(os.path.join(master_dir, '200.0'))
+
+        self.assertEquals(None, step._get_previous_master_dir())
+
     def test_process_main_multiple_targets(self):
         source_dir = os.path.join(self.working_directory, 'source')
         master_dir = os.path.join(self.working_directory, 'master')
@@ -1156,7 +1399,7 @@ class DownloadStepTests(unittest.TestCase):
         self.assertTrue(dlstep.downloader.is_canceled)
 
 
-@patch('pulp.server.managers.content.query.ContentQueryManager.get_multiple_units_by_keys_dicts',
+@patch('pulp.server.managers.content.query.ContentQueryManager.find_units_by_keys_dicts',
        spec_set=True)
 class TestGetLocalUnitsStep(unittest.TestCase):
     class DemoGetLocalUnitsStep(GetLocalUnitsStep):
@@ -1,7 +1,13 @@
 from cStringIO import StringIO
 import hashlib
+import os
+import shutil
+import sys
+import tempfile
 import unittest
 
+import mock
+
 from pulp.plugins.util import verification
 
 
@@ -103,9 +109,121 @@ class VerificationTests(unittest.TestCase):
         self.assertRaises(verification.InvalidChecksumType, verification.verify_checksum,
                           StringIO(), 'fake-type', 'irrelevant')
 
+    def test_calculate_checksums(self):
+        test_file = StringIO('Test data')
+
+        checksums = verification.calculate_checksums(test_file, [verification.TYPE_SHA256,
+                                                                 verification.TYPE_MD5])
+
+        expected = {verification.TYPE_SHA256: hashlib.sha256('Test data').hexdigest(),
+                    verification.TYPE_MD5: hashlib.md5('Test data').hexdigest()}
+        self.assertEqual(checksums, expected)
+
+    def test_calculate_checksums_invalid_checksum(self):
+        self.assertRaises(verification.InvalidChecksumType, verification.calculate_checksums,
+                          StringIO(), ['fake-type'])
+
     def test_checksum_algorithm_mappings(self):
         self.assertEqual(4, len(verification.CHECKSUM_FUNCTIONS))
         self.assertEqual(verification.CHECKSUM_FUNCTIONS[verification.TYPE_MD5], hashlib.md5)
         self.assertEqual(verification.CHECKSUM_FUNCTIONS[verification.TYPE_SHA1], hashlib.sha1)
         self.assertEqual(verification.CHECKSUM_FUNCTIONS[verification.TYPE_SHA], hashlib.sha1)
         self.assertEqual(verification.CHECKSUM_FUNCTIONS[verification.TYPE_SHA256], hashlib.sha256)
+
+
+@mock.patch('pulp.server.db.model.content.ContentChecksum')
+class TestChecksumCache(unittest.TestCase):
+    """
+    This class contains tests for caching the checksums of files in content storage.
+    """
+    def setUp(self):
+        self.storage_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.storage_dir, 'content', 'rpm', 'foo.rpm')
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'w') as f:
+            f.write('Test data')
+        self.checksum = hashlib.sha256('Test data').hexdigest()
+        config = mock.patch('pulp.server.config.config')
+        mock_config = config.start()
+        mock_config.get.return_value = self.storage_dir
+        self.addCleanup(config.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.storage_dir)
+
+    def _identity(self):
+        stat = os.stat(self.path)
+        return self.path, stat.st_size, stat.st_mtime, stat.st_ino
+
+    def test_cache_hit(self, mock_checksum_model):
+        mock_checksum_model.get_checksum.return_value = self.checksum
+
+        with open(self.path) as test_file:
+            mock_sha256 = mock.MagicMock()
+            with mock.patch.dict(verification.CHECKSUM_FUNCTIONS,
+                                 {verification.TYPE_SHA256: mock_sha256}):
+                verification.verify_checksum(test_file, verification.TYPE_SHA256, self.checksum)
+
+        path, size, mtime, inode = self._identity()
+        mock_checksum_model.get_checksum.assert_called_once_with(
+            path, verification.TYPE_SHA256, size, mtime, inode)
+        self.assertFalse(mock_sha256.called)
+        self.assertFalse(mock_checksum_model.set_checksum.called)
+
+    def test_cache_hit_incorrect(self, mock_checksum_model):
+        mock_checksum_model.get_checksum.return_value = 'bar'
+
+        with open(self.path) as test_file:
+            self.assertRaises(verification.VerificationException, verification.verify_checksum,
+                              test_file, verification.TYPE_SHA256, self.checksum)
+
+    def test_cache_miss(self, mock_checksum_model):
+        mock_checksum_model.get_checksum.return_value = None
+
+        with open(self.path) as test_file:
+            verification.verify_checksum(test_file, verification.TYPE_SHA256, self.checksum)
+
+        path, size, mtime, inode = self._identity()
+        mock_checksum_model.set_checksum.assert_called_once_with(
+            path, verification.TYPE_SHA256, size, mtime, inode, self.checksum)
+
+    def test_cache_miss_incorrect(self, mock_checksum_model):
+        mock_checksum_model.get_checksum.return_value = None
+
+        with open(self.path) as test_file:
+            self.assertRaises(verification.VerificationException, verification.verify_checksum,
+                              test_file, verification.TYPE_SHA256, 'foo')
+
+        # the checksum of the file is still known
+        self.assertEqual(mock_checksum_model.set_checksum.call_count, 1)
+
+    def test_outside_content_storage(self, mock_checksum_model):
+        path = os.path.join(self.storage_dir, 'uploads', 'foo')
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write('Test data')
+
+        with open(path) as test_file:
+            verification.verify_checksum(test_file, verification.TYPE_SHA256, self.checksum)
+
+        self.assertFalse(mock_checksum_model.get_checksum.called)
+        self.assertFalse(mock_checksum_model.set_checksum.called)
+
+    @mock.patch.object(verification, '_server_config_missing', False)
+    def test_no_server_config(self, mock_checksum_model):
+        # a None entry in sys.modules makes importing the module raise ImportError
+        with mock.patch.dict(sys.modules, {'pulp.server.config': None}):
+            for i in range(2):
+                with open(self.path) as test_file:
+                    verification.verify_checksum(test_file, verification.TYPE_SHA256,
+                                                 self.checksum)
+
+            self.assertTrue(verification._server_config_missing)
+        self.assertFalse(mock_checksum_model.get_checksum.called)
+        self.assertFalse(mock_checksum_model.set_checksum.called)
+
+    def test_not_a_file(self, mock_checksum_model):
+        verification.verify_checksum(StringIO('Test data'), verification.TYPE_SHA256,
+                                     self.checksum)
+
+        self.assertFalse(mock_checksum_model.get_checksum.called)
@@ -238,6 +238,23 @@ class TestReplyHandler(TestCase):
         ReplyHandler._bind_succeeded(task_id, call_context)
         bind_manager.action_succeeded.assert_called_with(consumer_id, repo_id, dist_id, task_id)
 
+    @patch('pulp.server.managers.factory.consumer_bind_manager')
+    def test__bind_succeeded_bulk_action(self, mock_get_manager):
+        bind_manager = Mock()
+        mock_get_manager.return_value = bind_manager
+        call_context = {
+            'action': 'bind',
+            'task_id': 'task_1',
+            'action_id': 'action_1',
+            'consumer_id': 'consumer_1',
+            'repo_id': 'repo_1',
+            'distributor_id': 'dist_1'
+        }
+        # handler report: succeeded
+        ReplyHandler._bind_succeeded('task_1', call_context)
+        bind_manager.action_succeeded.assert_called_with(
+            'consumer_1', 'repo_1', 'dist_1', 'action_1')
+
     @patch('pulp.server.managers.factory.consumer_bind_manager')
     def test__bind_failed(self, mock_get_manager):
         bind_manager = Mock()
@@ -343,44 +343,150 @@ class TestSchedulerSetupSchedule(unittest.TestCase):
 class TestSchedulerScheduleChanged(unittest.TestCase):
     @mock.patch('threading.Thread', new=mock.MagicMock())
     @mock.patch('pulp.server.managers.schedule.utils.get_enabled')
-    @mock.patch('pulp.server.managers.schedule.utils.get_updated_since')
-    def test_count_changed(self, mock_updated_since, mock_get_enabled):
-        mock_updated_since.return_value.count.return_value = 0
+    @mock.patch('pulp.server.async.scheduler.ScheduledCallChangeStamp')
+    def test_stamp_changed(self, mock_stamp, mock_get_enabled):
+        mock_stamp.get.return_value = 3
         mock_get_enabled.return_value = SCHEDULES
         sched_instance = scheduler.Scheduler()
 
-        mock_get_enabled.return_value = mock.MagicMock()
-        mock_get_enabled.return_value.count.return_value = sched_instance._loaded_from_db_count + 1
+        mock_stamp.get.return_value = 4
 
         self.assertTrue(sched_instance.schedule_changed is True)
 
     @mock.patch('threading.Thread', new=mock.MagicMock())
     @mock.patch('pulp.server.managers.schedule.utils.get_enabled')
-    @mock.patch('pulp.server.managers.schedule.utils.get_updated_since')
-    def test_new_updated(self, mock_updated_since, mock_get_enabled):
+    @mock.patch('pulp.server.async.scheduler.ScheduledCallChangeStamp')
+    def test_no_changes(self, mock_stamp, mock_get_enabled):
+        mock_stamp.get.return_value = 3
         mock_get_enabled.return_value = SCHEDULES
         sched_instance = scheduler.Scheduler()
 
-        mock_get_enabled.return_value = mock.MagicMock()
-        mock_get_enabled.return_value.count.return_value = sched_instance._loaded_from_db_count
-        mock_updated_since.return_value.count.return_value = 1
+        # the enabled schedules are not counted or queried again
+        mock_get_enabled.reset_mock()
 
-        self.assertTrue(sched_instance.schedule_changed is True)
+        self.assertTrue(sched_instance.schedule_changed is False)
+        self.assertEqual(mock_get_enabled.call_count, 0)
+
+
+@mock.patch('threading.Thread', new=mock.MagicMock())
+@mock.patch('pulp.server.async.scheduler.ScheduledCallChangeStamp')
+@mock.patch('pulp.server.async.scheduler.ScheduledCallChange')
+@mock.patch('pulp.server.managers.schedule.utils.get')
+@mock.patch('pulp.server.managers.schedule.utils.get_enabled')
+class TestSchedulerMergeScheduleChanges(unittest.TestCase):
+    def _scheduler(self, mock_get_enabled, mock_stamp):
+        mock_stamp.get.return_value = 3
+        mock_get_enabled.return_value = [s.copy() for s in SCHEDULES]
+        return scheduler.Scheduler()
+
+    def test_adds_new_schedule(self, mock_get_enabled, mock_get, mock_change, mock_stamp):
+        sched_instance = self._scheduler(mock_get_enabled, mock_stamp)
+        new_schedule = SCHEDULES[0].copy()
+        new_schedule['_id'] = '529f4bd93de3a31d0ec77341'
+        mock_stamp.get.return_value = 4
+        mock_change.get_since.return_value = [
+            {'stamp': 4, 'schedule_ids': ['529f4bd93de3a31d0ec77341']}]
+        mock_get.return_value = [dispatch.ScheduledCall.from_db(new_schedule)]
+
+        sched_instance.merge_schedule_changes()
+
+        mock_change.get_since.assert_called_once_with(3)
+        mock_get.assert_called_once_with(set(['529f4bd93de3a31d0ec77341']))
+        self.assertTrue(isinstance(sched_instance._schedule.get('529f4bd93de3a31d0ec77341'),
+                                   dispatch.ScheduleEntry))
+        self.assertTrue('529f4bd93de3a31d0ec77338' in sched_instance._schedule)
+        self.assertEqual(sched_instance._loaded_from_db_count, 3)
+        self.assertEqual(sched_instance._change_stamp, 4)
+
+    def test_removes_disabled_schedule(self, mock_get_enabled, mock_get, mock_change,
+                                       mock_stamp):
+        sched_instance = self._scheduler(mock_get_enabled, mock_stamp)
+        disabled = SCHEDULES[0].copy()
+        disabled['enabled'] = False
+        mock_stamp.get.return_value = 4
+        mock_change.get_since.return_value = [
+            {'stamp': 4, 'schedule_ids': ['529f4bd93de3a31d0ec77338']}]
+        mock_get.return_value = [dispatch.ScheduledCall.from_db(disabled)]
+
+        sched_instance.merge_schedule_changes()
+
+        self.assertTrue('529f4bd93de3a31d0ec77338' not in sched_instance._schedule)
+        self.assertTrue('529f4bd93de3a31d0ec77339' in sched_instance._schedule)
+        self.assertEqual(sched_instance._loaded_from_db_count, 1)
+
+    def test_removes_deleted_schedule(self, mock_get_enabled, mock_get, mock_change,
+                                      mock_stamp):
+        sched_instance = self._scheduler(mock_get_enabled, mock_stamp)
+        mock_stamp.get.return_value = 4
+        mock_change.get_since.return_value = [
+            {'stamp': 4, 'schedule_ids': ['529f4bd93de3a31d0ec77338']}]
+        mock_get.return_value = []
+
+        sched_instance.merge_schedule_changes()
+
+        self.assertTrue('529f4bd93de3a31d0ec77338' not in sched_instance._schedule)
+        self.assertTrue('529f4bd93de3a31d0ec77339' in sched_instance._schedule)
+        # app schedules are never removed
+        for key in scheduler.app.conf.CELERYBEAT_SCHEDULE:
+            self.assertTrue(key in sched_instance._schedule)
 
-    @mock.patch('threading.Thread', new=mock.MagicMock())
-    @mock.patch('pulp.server.managers.schedule.utils.get_enabled')
-    @mock.patch('pulp.server.managers.schedule.utils.get_updated_since')
-    def test_no_changes(self, mock_updated_since, mock_get_enabled):
-        mock_updated_since.return_value.count.return_value = 0
-        mock_get_enabled.return_value = SCHEDULES
-        sched_instance = scheduler.Scheduler()
+    def test_records_stamp(self, mock_get_enabled, mock_get, mock_change, mock_stamp):
+        sched_instance = self._scheduler(mock_get_enabled, mock_stamp)
+        mock_stamp.get.return_value = 5
+        mock_change.get_since.return_value = [{'stamp': 4, 'schedule_ids': []},
+                                              {'stamp': 5, 'schedule_ids': []}]
+        mock_get.return_value = []
 
-        mock_get_enabled.return_value = mock.MagicMock()
-        # -1 because there is an ignored schedule that has 0 remaining runs
-        mock_get_enabled.return_value.count.return_value = len(SCHEDULES) - 1
+        sched_instance.merge_schedule_changes()
 
         self.assertTrue(sched_instance.schedule_changed is False)
 
+    def test_missing_change_is_merged_later(self, mock_get_enabled, mock_get, mock_change,
+                                            mock_stamp):
+        sched_instance = self._scheduler(mock_get_enabled, mock_stamp)
+        new_schedule = SCHEDULES[0].copy()
+        new_schedule['_id'] = '529f4bd93de3a31d0ec77341'
+        # stamp 4 was allocated, but its change was not recorded yet
+        mock_stamp.get.return_value = 5
+        mock_change.get_since.return_value = [{'stamp': 5, 'schedule_ids': []}]
+        mock_get.return_value = []
+
+        sched_instance.merge_schedule_changes()
+
+        self.assertEqual(sched_instance._change_stamp, 3)
+        self.assertTrue(sched_instance.schedule_changed is True)
+
+        mock_change.get_since.return_value = [
+            {'stamp': 4, 'schedule_ids': ['529f4bd93de3a31d0ec77341']},
+            {'stamp': 5, 'schedule_ids': []}]
+        mock_get.return_value = [dispatch.ScheduledCall.from_db(new_schedule)]
+
+        sched_instance.merge_schedule_changes()
+
+        mock_change.get_since.assert_called_with(3)
+        self.assertTrue('529f4bd93de3a31d0ec77341' in sched_instance._schedule)
+        self.assertEqual(sched_instance._change_stamp, 5)
+        self.assertTrue(sched_instance._change_gap_since is None)
+
+    @mock.patch('time.time')
+    @mock.patch.object(scheduler.Scheduler, 'setup_schedule')
+    def test_missing_change_reloads(self, mock_setup_schedule, mock_time, mock_get_enabled,
+                                    mock_get, mock_change, mock_stamp):
+        mock_time.return_value = 1000
+        sched_instance = self._scheduler(mock_get_enabled, mock_stamp)
+        sched_instance._change_stamp = 3
+        mock_setup_schedule.reset_mock()
+        mock_stamp.get.return_value = 5
+        mock_change.get_since.return_value = [{'stamp': 5, 'schedule_ids': []}]
+
+        sched_instance.merge_schedule_changes()
+        self.assertEqual(mock_setup_schedule.call_count, 0)
+
+        mock_time.return_value = 1000 + scheduler.SCHEDULE_CHANGE_GAP_TIMEOUT + 1
+        sched_instance.merge_schedule_changes()
+
+        mock_setup_schedule.assert_called_once_with()
+
 
 class TestSchedulerSchedule(unittest.TestCase):
     @mock.patch('threading.Thread', new=mock.MagicMock())
@@ -395,15 +501,18 @@ class TestSchedulerSchedule(unittest.TestCase):
         mock_get_schedule.assert_called_once_with()
 
     @mock.patch('threading.Thread', new=mock.MagicMock())
+    @mock.patch.object(scheduler.Scheduler, 'merge_schedule_changes')
     @mock.patch.object(scheduler.Scheduler, 'setup_schedule')
     @mock.patch.object(scheduler.Scheduler, 'schedule_changed', new=True)
-    def test_schedule_changed(self, mock_setup_schedule):
+    def test_schedule_changed(self, mock_setup_schedule, mock_merge_schedule_changes):
         sched_instance = scheduler.Scheduler()
+        sched_instance._schedule = {}
 
         sched_instance.schedule
 
-        # make sure it called the setup_schedule() method
+        # setup_schedule() only runs from __init__, later changes are merged
         mock_setup_schedule.assert_called_once_with()
+        mock_merge_schedule_changes.assert_called_once_with()
 
     @mock.patch('threading.Thread', new=mock.MagicMock())
     @mock.patch.object(scheduler.Scheduler, 'schedule_changed', return_value=False)
@@ -0,0 +1,124 @@
+"""
+This module contains tests for the pulp.server.async.status_writer module.
+"""
+import unittest
+
+import mock
+
+from pulp.server.async import status_writer
+
+
+@mock.patch('pulp.server.async.status_writer.threading.Timer')
+@mock.patch('pulp.server.async.status_writer.time')
+@mock.patch('pulp.server.async.status_writer.TaskStatus')
+class TestProgressWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.writer = status_writer.ProgressWriter(window=2)
+
+    def test_first_report_written(self, mock_task_status, mock_time, mock_timer):
+        mock_time.time.return_value = 100
+
+        self.writer.set_progress('t1', {'step': 1})
+
+        mock_task_status.objects.assert_called_once_with(task_id='t1')
+        mock_task_status.objects.return_value.update_one.assert_called_once_with(
+            set__progress_report={'step': 1})
+        self.assertFalse(mock_timer.called)
+
+    def test_reports_in_window_coalesced(self, mock_task_status, mock_time, mock_timer):
+        mock_time.time.return_value = 100
+        self.writer.set_progress('t1', {'step': 1})
+        mock_time.time.return_value = 100.5
+
+        self.writer.set_progress('t1', {'step': 2})
+        self.writer.set_progress('t1', {'step': 3})
+
+        # only the first report was written, and one timer holds the latest
+        self.assertEqual(mock_task_status.objects.return_value.update_one.call_count, 1)
+        mock_timer.assert_called_once_with(1.5, self.writer._write_pending, ['t1'])
+        mock_timer.return_value.start.assert_called_once_with()
+        self.assertEqual(self.writer._pending['t1'][0], {'step': 3})
+
+    def test_timer_writes_latest(self, mock_task_status, mock_time, mock_timer):
+        mock_time.time.return_value = 100
+        self.writer.set_progress('t1', {'step': 1})
+        self.writer.set_progress('t1', {'step': 2})
+
+        self.writer._write_pending('t1')
+
+        update_one = mock_task_status.objects.return_value.update_one
+        self.assertEqual(update_one.call_count, 2)
+        update_one.assert_called_with(set__progress_report={'step': 2})
+        self.assertFalse('t1' in self.writer._pending)
+
+    def test_report_after_window_written(self, mock_task_status, mock_time, mock_timer):
+        mock_time.time.return_value = 100
+        self.writer.set_progress('t1', {'step': 1})
+        mock_time.time.return_value = 102
+
+        self.writer.set_progress('t1', {'step': 2})
+
+        self.assertEqual(mock_task_status.objects.return_value.update_one.call_count, 2)
+        self.assertFalse(mock_timer.called)
+
+    def test_report_is_copied(self, mock_task_status, mock_time, mock_timer):
+        mock_time.time.return_value = 100
+        self.writer.set_progress('t1', {'step': 1})
+        report = {'step': 2}
+        self.writer.set_progress('t1', report)
+
+        report['step'] = 3
+
+        self.assertEqual(self.writer._pending['t1'][0], {'step': 2})
+
+    def test_pop_pending(self, mock_task_status, mock_time, mock_timer):
+        mock_time.time.return_value = 100
+        self.writer.set_progress('t1', {'step': 1})
+        self.writer.set_progress('t1', {'step': 2})
+
+        report = self.writer.pop_pending('t1')
+
+        self.assertEqual(report, {'step': 2})
+        mock_timer.return_value.cancel.assert_called_once_with()
+        # the timer firing anyway writes nothing
+        self.writer._write_pending('t1')
+        self.assertEqual(mock_task_status.objects.return_value.update_one.call_count, 1)
+        # the task is forgotten, so a later report is written right away
+        self.writer.set_progress('t1', {'step': 3})
+        self.assertEqual(mock_task_status.objects.return_value.update_one.call_count, 2)
+
+    def test_pop_pending_nothing_waiting(self, mock_task_status, mock_time, mock_timer):
+        self.assertTrue(self.writer.pop_pending('t1') is None)
+
+    def test_failed_write_raised_and_retried(self, mock_task_status, mock_time, mock_timer):
+        mock_time.time.return_value = 100
+        update_one = mock_task_status.objects.return_value.update_one
+        update_one.side_effect = [Exception(), None]
+
+        self.assertRaises(Exception, self.writer.set_progress, 't1', {'step': 1})
+        self.writer.set_progress('t1', {'step': 2})
+
+        self.assertEqual(update_one.call_count, 2)
+        self.assertFalse(mock_timer.called)
+
+    @mock.patch('pulp.server.async.status_writer._logger')
+    def test_failed_delayed_write_logged(self, mock_logger, mock_task_status, mock_time,
+                                         mock_timer):
+        mock_time.time.return_value = 100
+        self.writer.set_progress('t1', {'step': 1})
+        self.writer.set_progress('t1', {'step': 2})
+        mock_task_status.objects.return_value.update_one.side_effect = Exception()
+
+        self.writer._write_pending('t1')
+
+        self.assertEqual(mock_logger.exception.call_count, 1)
+
+    def test_old_tasks_trimmed(self, mock_task_status, mock_time, mock_timer):
+        mock_time.time.return_value = 100
+        self.writer.set_progress('t1', {'step': 1})
+        mock_time.time.return_value = 103
+
+        self.writer.set_progress('t2', {'step': 1})
+
+        self.assertEqual(self.writer._last_write.keys(), ['t2'])
@@ -13,14 +13,16 @@ import mock
 
 from ...base import PulpServerTests, ResourceReservationTests
 from pulp.common import dateutils
-from pulp.common.constants import CALL_CANCELED_STATE, CALL_FINISHED_STATE
+from pulp.common.constants import (CALL_CANCELED_STATE, CALL_FINISHED_STATE,
+                                   CALL_RUNNING_STATE, CALL_WAITING_STATE)
 from pulp.common.tags import action_tag
 from pulp.devel.unit.util import compare_dict
 from pulp.server.async import tasks
 from pulp.server.db.model.dispatch import TaskStatus
 from pulp.server.db.model.resources import Worker, ReservedResource
 from pulp.server.db.reaper import queue_reap_expired_documents
-from pulp.server.exceptions import NoWorkers, PulpException
+from pulp.server.exceptions import PulpException
+from pulp.server.managers import resources
 from pulp.server.maintenance.monthly import queue_monthly_maintenance
 
 
@@ -33,20 +35,6 @@ WORKER_3 = 'worker-3'
 class TestQueueReservedTask(ResourceReservationTests):
 
     def setUp(self):
-        self.patch_a = mock.patch('pulp.server.async.tasks.resources.get_worker_for_reservation',
-                                  autospec=True)
-        self.mock_get_worker_for_reservation = self.patch_a.start()
-
-        self.patch_b = mock.patch('pulp.server.async.tasks.resources.get_unreserved_worker',
-                                  autospec=True)
-        self.mock_get_unreserved_worker = self.patch_b.start()
-
-        self.patch_c = mock.patch('pulp.server.async.tasks.time', autospec=True)
-        self.mock_time = self.patch_c.start()
-
-        self.patch_d = mock.patch('pulp.server.async.tasks.ReservedResource', autospec=True)
-        self.mock_reserved_resource = self.patch_d.start()
-
         self.patch_e = mock.patch('pulp.server.async.tasks.celery', autospec=True)
         self.mock_celery = self.patch_e.start()
         self.mock_celery.tasks = {'task_name': mock.Mock()}
@@ -57,71 +45,107 @@ class TestQueueReservedTask(ResourceReservationTests):
         super(TestQueueReservedTask, self).setUp()
 
     def tearDown(self):
-        self.patch_a.stop()
-        self.patch_b.stop()
-        self.patch_c.stop()
-        self.patch_d.stop()
         self.patch_e.stop()
         self.patch_f.stop()
         super(TestQueueReservedTask, self).tearDown()
 
+    def dispatched(self):
+        """
+        :return: the task IDs and worker names the inner tasks were dispatched with, in order
+        :rtype:  list
+        """
+        apply_async = self.mock_celery.tasks['task_name'].apply_async
+        return [(c[1]['task_id'], c[1]['routing_key']) for c in apply_async.call_args_list]
+
     def test_creates_and_saves_reserved_resource(self):
-        self.mock_get_worker_for_reservation.return_value = Worker('worker1', datetime.utcnow())
+        Worker('worker1', datetime.utcnow()).save()
         tasks._queue_reserved_task('task_name', 'my_task_id', 'my_resource_id', [1, 2], {'a': 2})
-        self.mock_reserved_resource.assert_called_once_with('my_task_id', 'worker1',
-                                                            'my_resource_id')
-        self.mock_reserved_resource.return_value.save.assert_called_once_with()
+        reservation = ReservedResource.get_collection().find_one({'_id': 'my_task_id'})
+        self.assertEqual(reservation['worker_name'], 'worker1')
+        self.assertEqual(reservation['resource_id'], 'my_resource_id')
 
     def test_dispatches_inner_task(self):
-        self.mock_get_worker_for_reservation.return_value = Worker('worker1', datetime.utcnow())
+        Worker('worker1', datetime.utcnow()).save()
         tasks._queue_reserved_task('task_name', 'my_task_id', 'my_resource_id', [1, 2], {'a': 2})
         apply_async = self.mock_celery.tasks['task_name'].apply_async
         apply_async.assert_called_once_with(1, 2, a=2, routing_key='worker1', task_id='my_task_id',
                                             exchange='C.dq')
+        self.assertEqual(list(resources.get_reservation_requests()), [])
 
     def test_dispatches__release_resource(self):
-        self.mock_get_worker_for_reservation.return_value = Worker('worker1', datetime.utcnow())
+        Worker('worker1', datetime.utcnow()).save()
         tasks._queue_reserved_task('task_name', 'my_task_id', 'my_resource_id', [1, 2], {'a': 2})
         self.mock__release_resource.apply_async.assert_called_once_with(('my_task_id',),
                                                                         routing_key='worker1',
                                                                         exchange='C.dq')
 
-    def test_get_worker_for_reservation_breaks_out_of_loop(self):
-        self.mock_get_worker_for_reservation.return_value = Worker('worker1', datetime.utcnow())
-        tasks._queue_reserved_task('task_name', 'my_task_id', 'my_resource_id', [1, 2], {'a': 2})
-        self.assertTrue(not self.mock_get_unreserved_worker.called)
-        self.assertTrue(not self.mock_time.sleep.called)
+    def test_dispatches_to_reserving_worker(self):
+        # worker1 is busy with the resource, and worker2 is free
+        Worker('worker1', datetime.utcnow()).save()
+        Worker('worker2', datetime.utcnow()).save()
+        ReservedResource('other_task_id', 'worker1', 'my_resource_id').save()
 
-    def test_get_unreserved_worker_breaks_out_of_loop(self):
-        self.mock_get_worker_for_reservation.side_effect = NoWorkers()
-        self.mock_get_unreserved_worker.return_value = Worker('worker1', datetime.utcnow())
-        tasks._queue_reserved_task('task_name', 'my_task_id', 'my_resource_id', [1, 2], {'a': 2})
-        self.assertTrue(not self.mock_time.sleep.called)
+        tasks._queue_reserved_task('task_name', 'my_task_id', 'my_resource_id', [], {})
 
-    def test_loops_and_sleeps_waiting_for_available_worker(self):
-        self.mock_get_worker_for_reservation.side_effect = NoWorkers()
-        self.mock_get_unreserved_worker.side_effect = NoWorkers()
+        self.assertEqual(self.dispatched(), [('my_task_id', 'worker1')])
 
-        class BreakOutException(Exception):
-            pass
+    def test_waits_without_free_worker(self):
+        Worker('worker1', datetime.utcnow()).save()
+        ReservedResource('other_task_id', 'worker1', 'other_resource_id').save()
 
-        def side_effect(*args):
-            def second_call(*args):
-                raise BreakOutException()
-            self.mock_time.sleep.side_effect = second_call
-            return None
+        tasks._queue_reserved_task('task_name', 'my_task_id', 'my_resource_id', [], {})
 
-        self.mock_time.sleep.side_effect = side_effect
+        self.assertEqual(self.dispatched(), [])
+        self.assertEqual(list(resources.get_reservation_requests()),
+                         [{'task_id': 'my_task_id', 'resource_id': 'my_resource_id'}])
 
-        try:
-            tasks._queue_reserved_task('task_name', 'my_task_id', 'my_resource_id', [1, 2],
-                                       {'a': 2})
-        except BreakOutException:
-            pass
-        else:
-            self.fail('_queue_reserved_task should have raised a BreakOutException')
+    def test_dispatched_when_worker_is_released(self):
+        Worker('worker1', datetime.utcnow()).save()
+        ReservedResource('other_task_id', 'worker1', 'other_resource_id').save()
+        tasks._queue_reserved_task('task_name', 'my_task_id', 'my_resource_id', [], {})
+
+        ReservedResource.get_collection().remove({'_id': 'other_task_id'})
+        tasks._dispatch_reservation_requests()
+
+        self.assertEqual(self.dispatched(), [('my_task_id', 'worker1')])
+
+    def test_same_resource_dispatched_in_order(self):
+        tasks._queue_reserved_task('task_name', 'task-1', 'resource-1', [], {})
+        Worker('worker1', datetime.utcnow()).save()
+        tasks._queue_reserved_task('task_name', 'task-2', 'resource-1', [], {})
+
+        # both go to the worker the first one reserved the resource on
+        self.assertEqual(self.dispatched(), [('task-1', 'worker1'), ('task-2', 'worker1')])
+
+    def test_other_resources_not_held_up(self):
+        # worker1 is busy with resource-2, so a task for resource-1 has to wait
+        Worker('worker1', datetime.utcnow()).save()
+        ReservedResource('other_task_id', 'worker1', 'resource-2').save()
+        tasks._queue_reserved_task('task_name', 'task-1', 'resource-1', [], {})
+
+        tasks._queue_reserved_task('task_name', 'task-2', 'resource-2', [], {})
+
+        self.assertEqual(self.dispatched(), [('task-2', 'worker1')])
+        task_ids = [r['task_id'] for r in resources.get_reservation_requests()]
+        self.assertEqual(task_ids, ['task-1'])
+
+    def test_free_workers_not_reused(self):
+        Worker('worker1', datetime.utcnow()).save()
+        tasks._queue_reserved_task('task_name', 'task-1', 'resource-1', [], {})
+
+        tasks._queue_reserved_task('task_name', 'task-2', 'resource-2', [], {})
+
+        self.assertEqual(self.dispatched(), [('task-1', 'worker1')])
 
-        self.mock_time.sleep.assert_has_calls([mock.call(0.25), mock.call(0.25)])
+    def test_canceled_while_waiting(self):
+        tasks._queue_reserved_task('task_name', 'my_task_id', 'my_resource_id', [], {})
+        resources.pop_reservation_request('my_task_id')
+        Worker('worker1', datetime.utcnow()).save()
+
+        tasks._dispatch_reservation_requests()
+
+        self.assertEqual(self.dispatched(), [])
+        self.assertEqual(ReservedResource.get_collection().count(), 0)
 
 
 class TestDeleteWorker(ResourceReservationTests):
@@ -186,6 +210,10 @@ class TestDeleteWorker(ResourceReservationTests):
         remove = self.mock_reserved_resource.get_collection.return_value.remove
         remove.assert_called_once_with({'worker_name': 'worker1'})
 
+    def test_notifies_waiting_reservations(self):
+        tasks._delete_worker('worker1')
+        self.mock_resources.notify_reservation_event.assert_called_once_with('worker deleted')
+
     def test_criteria_to_find_all_worker_is_correct(self):
         tasks._delete_worker('worker1')
         self.assertEqual(self.mock_criteria.mock_calls[0], mock.call(filters={'_id': 'worker1'}))
@@ -281,7 +309,13 @@ class TestReleaseResource(ResourceReservationTests):
         reserved_resource_2.save()
 
         # This should remove resource_2 from the _resource_map.
-        tasks._release_resource(reserved_resource_2.task_id)
+        resources.queue_reservation_request('waiting_task_id', 'resource_3', 'task_name', [], {})
+        with mock.patch('pulp.server.managers.resources.celery') as mock_celery:
+            tasks._release_resource(reserved_resource_2.task_id)
+
+        # The resource manager should have been woken up to dispatch the waiting task
+        mock_celery.send_task.assert_called_once_with(resources.DISPATCH_TASK_NAME,
+                                                      queue=resources.RESOURCE_MANAGER_QUEUE)
 
         # resource_2 should have been removed from the database
         rrc = ReservedResource.get_collection()
@@ -362,6 +396,53 @@ class TestReservedTaskMixinApplyAsyncWithReservation(ResourceReservationTests):
         self.assertEqual(self.result, str(self.mock_uuid.uuid4.return_value))
 
 
+class TestTaskCall(ResourceReservationTests):
+
+    @mock.patch('celery.Task.__call__')
+    @mock.patch('pulp.server.async.tasks.Task.request')
+    def test_sets_running(self, mock_request, mock_call):
+        task_id = str(uuid.uuid4())
+        mock_request.called_directly = False
+        mock_request.id = task_id
+        TaskStatus(task_id).save()
+
+        with mock.patch('pulp.server.async.tasks.connection.reset_operation_stats') as mock_reset:
+            tasks.Task()(1, a=2)
+
+        mock_reset.assert_called_once_with(task_id)
+        task_status = TaskStatus.objects(task_id=task_id).first()
+        self.assertEqual(task_status['state'], CALL_RUNNING_STATE)
+        self.assertFalse(task_status['start_time'] is None)
+        mock_call.assert_called_once_with(1, a=2)
+
+    @mock.patch('celery.Task.__call__')
+    @mock.patch('pulp.server.async.tasks.Task.request')
+    def test_canceled_task_not_run(self, mock_request, mock_call):
+        task_id = str(uuid.uuid4())
+        mock_request.called_directly = False
+        mock_request.id = task_id
+        TaskStatus(task_id, state=CALL_CANCELED_STATE).save()
+
+        tasks.Task()()
+
+        task_status = TaskStatus.objects(task_id=task_id).first()
+        self.assertEqual(task_status['state'], CALL_CANCELED_STATE)
+        self.assertFalse(mock_call.called)
+
+    @mock.patch('celery.Task.__call__')
+    @mock.patch('pulp.server.async.tasks.Task.request')
+    def test_missing_task_status_created(self, mock_request, mock_call):
+        task_id = str(uuid.uuid4())
+        mock_request.called_directly = False
+        mock_request.id = task_id
+
+        tasks.Task()()
+
+        task_status = TaskStatus.objects(task_id=task_id).first()
+        self.assertEqual(task_status['state'], CALL_RUNNING_STATE)
+        self.assertTrue(mock_call.called)
+
+
 class TestTaskOnSuccessHandler(ResourceReservationTests):
 
     @mock.patch('pulp.server.async.tasks.Task.request')
@@ -482,6 +563,35 @@ class TestTaskOnSuccessHandler(ResourceReservationTests):
         # Make sure that parse_iso8601_datetime is able to parse the finish_time without errors
         dateutils.parse_iso8601_datetime(updated_task_status['finish_time'])
 
+    @mock.patch('pulp.server.async.tasks.progress_writer')
+    @mock.patch('pulp.server.async.tasks.Task.request')
+    def test_writes_pending_progress(self, mock_request, mock_progress_writer):
+        task_id = str(uuid.uuid4())
+        mock_request.called_directly = False
+        mock_progress_writer.pop_pending.return_value = {'step': 'done'}
+        TaskStatus(task_id).save()
+
+        tasks.Task().on_success('retval', task_id, [], {})
+
+        mock_progress_writer.pop_pending.assert_called_once_with(task_id)
+        new_task_status = TaskStatus.objects(task_id=task_id).first()
+        self.assertEqual(new_task_status['state'], 'finished')
+        self.assertEqual(new_task_status['progress_report'], {'step': 'done'})
+
+    @mock.patch('pulp.server.async.tasks.connection.get_operation_stats')
+    @mock.patch('pulp.server.async.tasks.Task.request')
+    def test_writes_database_operations(self, mock_request, mock_get_stats):
+        task_id = str(uuid.uuid4())
+        mock_request.called_directly = False
+        mock_get_stats.return_value = {'count': 3, 'seconds': 0.5, 'documents': 7}
+        TaskStatus(task_id).save()
+
+        tasks.Task().on_success('retval', task_id, [], {})
+
+        new_task_status = TaskStatus.objects(task_id=task_id).first()
+        self.assertEqual(new_task_status['database_operations'],
+                         {'count': 3, 'seconds': 0.5, 'documents': 7})
+
 
 class TestTaskOnFailureHandler(ResourceReservationTests):
 
@@ -648,9 +758,11 @@ class TestCancel(PulpServerTests):
     def test_cancel_successful(self, _logger, revoke):
         task_id = '1234abcd'
         TaskStatus(task_id).save()
+        resources.queue_reservation_request(task_id, 'resource_id', 'task_name', [], {})
         tasks.cancel(task_id)
 
         revoke.assert_called_once_with(task_id, terminate=True)
+        self.assertEqual(resources.pop_reservation_request(task_id), None)
         self.assertEqual(_logger.info.call_count, 1)
         log_msg = _logger.info.mock_calls[0][1][0]
         self.assertTrue(task_id in log_msg)
@@ -687,6 +799,72 @@ class TestCancel(PulpServerTests):
         self.assertEqual(task_status['state'], CALL_CANCELED_STATE)
 
 
+class TestGetTaskStatuses(PulpServerTests):
+    """
+    Test the tasks.get_task_statuses() function.
+    """
+    def setUp(self):
+        PulpServerTests.setUp(self)
+        TaskStatus.objects().delete()
+
+    def tearDown(self):
+        PulpServerTests.tearDown(self)
+        TaskStatus.objects().delete()
+
+    @mock.patch('time.sleep')
+    def test_no_timeout(self, mock_sleep):
+        TaskStatus('t1').save()
+        TaskStatus('t2', state=CALL_RUNNING_STATE).save()
+        TaskStatus('t3').save()
+
+        statuses = tasks.get_task_statuses(['t1', 't2', 'missing'])
+
+        self.assertEqual(set(['t1', 't2']), set(s['task_id'] for s in statuses))
+        self.assertEqual(0, mock_sleep.call_count)
+
+    @mock.patch('time.sleep')
+    def test_known_state_differs(self, mock_sleep):
+        TaskStatus('t1', state=CALL_RUNNING_STATE).save()
+
+        statuses = tasks.get_task_statuses(['t1'], known_states={'t1': CALL_WAITING_STATE},
+                                           timeout=10)
+
+        self.assertEqual(CALL_RUNNING_STATE, statuses[0]['state'])
+        self.assertEqual(0, mock_sleep.call_count)
+
+    @mock.patch('time.sleep')
+    def test_waits_for_state_change(self, mock_sleep):
+        TaskStatus('t1').save()
+
+        def _finish(seconds):
+            TaskStatus.objects(task_id='t1').update_one(set__state=CALL_FINISHED_STATE)
+        mock_sleep.side_effect = _finish
+
+        statuses = tasks.get_task_statuses(['t1'], timeout=10)
+
+        self.assertEqual(CALL_FINISHED_STATE, statuses[0]['state'])
+        self.assertEqual(1, mock_sleep.call_count)
+
+    @mock.patch('time.sleep')
+    def test_completed_tasks_do_not_wait(self, mock_sleep):
+        TaskStatus('t1', state=CALL_FINISHED_STATE).save()
+
+        tasks.get_task_statuses(['t1'], timeout=10)
+
+        self.assertEqual(0, mock_sleep.call_count)
+
+    @mock.patch('pulp.server.async.tasks.time')
+    def test_timeout_expires(self, mock_time):
+        TaskStatus('t1').save()
+        # deadline, first loop check, sleep length, second loop check
+        mock_time.time.side_effect = [0, 0, 0.5, 1]
+
+        statuses = tasks.get_task_statuses(['t1'], timeout=1)
+
+        self.assertEqual(CALL_WAITING_STATE, statuses[0]['state'])
+        mock_time.sleep.assert_called_once_with(0.25)
+
+
 class TestRegisterSigtermHandler(unittest.TestCase):
     """
     Test the register_sigterm_handler() decorator.
@@ -67,6 +67,7 @@ class TestHandleWorkerHeartbeat(unittest.TestCase):
         mock_gettext.assert_called_once_with("New worker '%(worker_name)s' discovered")
         mock__logger.assert_called_once()
         mock_worker.return_value.save.assert_called_once_with()
+        mock_resources.notify_reservation_event.assert_called_once_with('worker discovered')
 
     @mock.patch('__builtin__.list', return_value=True)
     @mock.patch('pulp.server.async.worker_watcher._parse_and_log_event')
@@ -93,6 +94,7 @@ class TestHandleWorkerHeartbeat(unittest.TestCase):
             query={'_id': event_info['worker_name']},
             update={'$set': {'last_heartbeat': event_info['timestamp']}}
         )
+        self.assertTrue(not mock_resources.notify_reservation_event.called)
 
 
 class TestHandleWorkerOffline(unittest.TestCase):
@@ -0,0 +1,62 @@
+"""
+This module contains tests for pulp.server.db.migrations.0015_certificate_serial_number.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from pulp.server import config
+from pulp.server.db.migrate.models import _import_all_the_way
+
+
+migration = _import_all_the_way('pulp.server.db.migrations.0015_certificate_serial_number')
+
+
+@mock.patch('pulp.server.db.migrations.0015_certificate_serial_number.CertificateSerialNumber')
+class TestMigrate(unittest.TestCase):
+    """
+    Test the migrate() function.
+    """
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.working_dir, 'sn.dat')
+        config.config.set('security', 'serial_number_path', self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.working_dir)
+        config.load_configuration()
+
+    def _write(self, contents):
+        with open(self.path, 'w') as serial_file:
+            serial_file.write(contents)
+
+    def test_migrate(self, mock_serial):
+        self._write('41')
+        mock_serial.get.return_value = 0
+
+        migration.migrate()
+
+        mock_serial.reset.assert_called_once_with(41)
+
+    def test_migrate_already_higher(self, mock_serial):
+        self._write('41')
+        mock_serial.get.return_value = 50
+
+        migration.migrate()
+
+        self.assertFalse(mock_serial.reset.called)
+
+    def test_migrate_no_file(self, mock_serial):
+        migration.migrate()
+
+        self.assertFalse(mock_serial.reset.called)
+
+    def test_migrate_damaged_file(self, mock_serial):
+        self._write('')
+
+        migration.migrate()
+
+        self.assertFalse(mock_serial.reset.called)
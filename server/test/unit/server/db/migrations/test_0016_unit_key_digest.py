@@ -0,0 +1,45 @@
+"""
+This module contains tests for pulp.server.db.migrations.0016_unit_key_digest.
+"""
+import unittest
+
+import mock
+
+from pulp.plugins.types import database
+from pulp.server.db.migrate.models import _import_all_the_way
+
+
+migration = _import_all_the_way('pulp.server.db.migrations.0016_unit_key_digest')
+
+
+@mock.patch('pulp.server.db.migrations.0016_unit_key_digest.database.type_units_collection')
+@mock.patch('pulp.server.db.migrations.0016_unit_key_digest.database.all_type_definitions')
+class TestMigrate(unittest.TestCase):
+    """
+    Test the migrate() function.
+    """
+    def test_migrate(self, all_type_definitions, type_units_collection):
+        all_type_definitions.return_value = [{'id': 'type_a', 'unit_key': ['name', 'version']}]
+        collection = type_units_collection.return_value
+        collection.find.return_value = [{'_id': 'u1', 'name': 'a', 'version': '1'},
+                                        {'_id': 'u2', 'name': 'b', 'version': '2'}]
+
+        migration.migrate()
+
+        type_units_collection.assert_called_once_with('type_a')
+        collection.find.assert_called_once_with({database.UNIT_KEY_DIGEST: {'$exists': False}},
+                                                fields=['name', 'version'])
+        self.assertEqual(collection.update.call_args_list, [
+            mock.call({'_id': 'u1'},
+                      {'$set': {database.UNIT_KEY_DIGEST: database.unit_key_digest(
+                          {'name': 'a', 'version': '1'})}}, safe=True),
+            mock.call({'_id': 'u2'},
+                      {'$set': {database.UNIT_KEY_DIGEST: database.unit_key_digest(
+                          {'name': 'b', 'version': '2'})}}, safe=True)])
+
+    def test_migrate_no_unit_key(self, all_type_definitions, type_units_collection):
+        all_type_definitions.return_value = [{'id': 'type_a', 'unit_key': None}]
+
+        migration.migrate()
+
+        self.assertFalse(type_units_collection.called)
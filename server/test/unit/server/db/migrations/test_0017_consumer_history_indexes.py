@@ -0,0 +1,42 @@
+"""
+This module contains tests for pulp.server.db.migrations.0017_consumer_history_indexes.
+"""
+import unittest
+
+import mock
+
+from pulp.server.db.migrate.models import _import_all_the_way
+
+
+migration = _import_all_the_way('pulp.server.db.migrations.0017_consumer_history_indexes')
+
+
+@mock.patch('pulp.server.db.migrations.0017_consumer_history_indexes.connection.get_collection')
+class TestMigrate(unittest.TestCase):
+    """
+    Test the migrate() function.
+    """
+    def test_migrate(self, get_collection):
+        collection = get_collection.return_value
+        collection.index_information.return_value = {
+            '_id_': {'key': [('_id', 1)]},
+            'consumer_id_-1': {'key': [('consumer_id', -1)]},
+            'type_-1': {'key': [('type', -1)]},
+            'originator_-1': {'key': [('originator', -1)]},
+            'consumer_id_-1_timestamp_-1__id_-1': {
+                'key': [('consumer_id', -1), ('timestamp', -1), ('_id', -1)]},
+        }
+
+        migration.migrate()
+
+        get_collection.assert_called_once_with('consumer_history')
+        self.assertEqual(sorted(c[0][0] for c in collection.drop_index.call_args_list),
+                         ['consumer_id_-1', 'type_-1'])
+
+    def test_migrate_already_dropped(self, get_collection):
+        collection = get_collection.return_value
+        collection.index_information.return_value = {'_id_': {'key': [('_id', 1)]}}
+
+        migration.migrate()
+
+        self.assertFalse(collection.drop_index.called)
@@ -0,0 +1,46 @@
+"""
+Tests for the pulp.server.db.model.auth module.
+"""
+import unittest
+
+import mock
+from pymongo.errors import DuplicateKeyError
+
+from pulp.server.db.model.auth import CertificateSerialNumber
+
+
+@mock.patch('pulp.server.db.model.base.Model.get_collection')
+class TestCertificateSerialNumber(unittest.TestCase):
+    def test_next(self, mock_get_collection):
+        find_and_modify = mock_get_collection.return_value.find_and_modify
+        find_and_modify.return_value = {'_id': 'serial_number', 'serial': 8}
+
+        self.assertEqual(CertificateSerialNumber.next(), 8)
+
+        find_and_modify.assert_called_once_with({'_id': 'serial_number'},
+                                                {'$inc': {'serial': 1}}, upsert=True, new=True)
+
+    def test_next_concurrent_create(self, mock_get_collection):
+        find_and_modify = mock_get_collection.return_value.find_and_modify
+        find_and_modify.side_effect = [DuplicateKeyError('dup'),
+                                       {'_id': 'serial_number', 'serial': 2}]
+
+        self.assertEqual(CertificateSerialNumber.next(), 2)
+        self.assertEqual(find_and_modify.call_count, 2)
+
+    def test_get(self, mock_get_collection):
+        mock_get_collection.return_value.find_one.return_value = {'_id': 'serial_number',
+                                                                  'serial': 7}
+
+        self.assertEqual(CertificateSerialNumber.get(), 7)
+
+    def test_get_never_allocated(self, mock_get_collection):
+        mock_get_collection.return_value.find_one.return_value = None
+
+        self.assertEqual(CertificateSerialNumber.get(), 0)
+
+    def test_reset(self, mock_get_collection):
+        CertificateSerialNumber.reset(5)
+
+        mock_get_collection.return_value.update.assert_called_once_with(
+            {'_id': 'serial_number'}, {'$set': {'serial': 5}}, upsert=True, safe=True)
@@ -0,0 +1,26 @@
+"""
+This module contains tests for the pulp.server.db.model.content module.
+"""
+import mock
+import unittest
+
+from pulp.server.db.model.content import ContentChecksum
+
+
+@mock.patch('pulp.server.db.model.content.ContentChecksum.get_collection')
+class TestContentChecksum(unittest.TestCase):
+    """
+    Test the ContentChecksum class.
+    """
+    def test_remove_checksums(self, get_collection):
+        ContentChecksum.remove_checksums('/var/lib/pulp/content/rpm/foo.rpm')
+
+        get_collection.return_value.remove.assert_called_once_with(
+            {'$or': [{'path': '/var/lib/pulp/content/rpm/foo.rpm'},
+                     {'path': {'$regex': '^\\/var\\/lib\\/pulp\\/content\\/rpm\\/foo\\.rpm/'}}]})
+
+    def test_remove_checksums_normalizes_path(self, get_collection):
+        ContentChecksum.remove_checksums('/var/lib/pulp/content/rpm/')
+
+        spec = get_collection.return_value.remove.call_args[0][0]
+        self.assertEqual(spec['$or'][0], {'path': '/var/lib/pulp/content/rpm'})
@@ -10,7 +10,8 @@ import uuid
 
 from celery.schedules import schedule as CelerySchedule
 from mongoengine import ValidationError
-from pymongo import DESCENDING
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
 import bson
 import celery
 import mock
@@ -19,7 +20,8 @@ from .... import base
 from pulp.common import constants, dateutils
 from pulp.server.db.model.auth import User
 from pulp.server.db.model.criteria import Criteria
-from pulp.server.db.model.dispatch import TaskStatus, ScheduledCall, ScheduleEntry
+from pulp.server.db.model.dispatch import (TaskStatus, ScheduledCall, ScheduledCallChange,
+                                           ScheduledCallChangeStamp, ScheduleEntry)
 from pulp.server.managers.factory import initialize
 
 
@@ -653,7 +655,8 @@ class TestScheduledCallSave(unittest.TestCase):
         del expected['_id']
         mock_update.assert_called_once_with({'_id': fake_id}, expected)
 
-    def test_new(self, mock_get_collection):
+    @mock.patch.object(ScheduledCallChange, 'record')
+    def test_new(self, mock_record, mock_get_collection):
         mock_insert = mock_get_collection.return_value.insert
         call = ScheduledCall('PT1M', 'pulp.tasks.dosomething')
 
@@ -663,6 +666,68 @@ class TestScheduledCallSave(unittest.TestCase):
         expected['_id'] = bson.ObjectId(expected['_id'])
         mock_insert.assert_called_once_with(expected, safe=True)
         self.assertFalse(call._new)
+        # a new schedule is recorded as a change
+        mock_record.assert_called_once_with([call.id])
+
+    def test_existing_does_not_change_stamp(self, mock_get_collection):
+        call = ScheduledCall('PT1M', 'pulp.tasks.dosomething', id=bson.ObjectId())
+
+        call.save()
+
+        # only the schedule itself was updated
+        self.assertEqual(mock_get_collection.return_value.update.call_count, 1)
+
+
+@mock.patch('pulp.server.db.model.base.Model.get_collection')
+class TestScheduledCallChangeStamp(unittest.TestCase):
+    def test_increment(self, mock_get_collection):
+        mock_get_collection.return_value.find_and_modify.return_value = {
+            '_id': 'scheduled_calls', 'stamp': 8}
+
+        self.assertEqual(ScheduledCallChangeStamp.increment(), 8)
+
+        mock_get_collection.return_value.find_and_modify.assert_called_once_with(
+            {'_id': 'scheduled_calls'}, {'$inc': {'stamp': 1}}, upsert=True, new=True)
+
+    def test_increment_created_concurrently(self, mock_get_collection):
+        mock_get_collection.return_value.find_and_modify.side_effect = [
+            DuplicateKeyError('duplicate'), {'_id': 'scheduled_calls', 'stamp': 2}]
+
+        self.assertEqual(ScheduledCallChangeStamp.increment(), 2)
+
+    def test_get(self, mock_get_collection):
+        mock_get_collection.return_value.find_one.return_value = {'_id': 'scheduled_calls',
+                                                                  'stamp': 7}
+
+        self.assertEqual(ScheduledCallChangeStamp.get(), 7)
+
+    def test_get_never_changed(self, mock_get_collection):
+        mock_get_collection.return_value.find_one.return_value = None
+
+        self.assertEqual(ScheduledCallChangeStamp.get(), 0)
+
+
+@mock.patch('pulp.server.db.model.base.Model.get_collection')
+class TestScheduledCallChange(unittest.TestCase):
+    @mock.patch.object(ScheduledCallChangeStamp, 'increment')
+    def test_record(self, mock_increment, mock_get_collection):
+        mock_increment.return_value = 4
+
+        ScheduledCallChange.record(['529f4bd93de3a31d0ec77338'])
+
+        self.assertEqual(mock_get_collection.return_value.insert.call_count, 1)
+        change = mock_get_collection.return_value.insert.call_args[0][0]
+        self.assertEqual(change['stamp'], 4)
+        self.assertEqual(change['schedule_ids'], ['529f4bd93de3a31d0ec77338'])
+
+    def test_get_since(self, mock_get_collection):
+        mock_find = mock_get_collection.return_value.find
+
+        ret = ScheduledCallChange.get_since(3)
+
+        mock_find.assert_called_once_with({'stamp': {'$gt': 3}})
+        mock_find.return_value.sort.assert_called_once_with('stamp', ASCENDING)
+        self.assertTrue(ret is mock_find.return_value.sort.return_value)
 
 
 class TestScheduledCallCalculateTimes(unittest.TestCase):
@@ -869,10 +934,16 @@ class TestScheduleEntryInit(unittest.TestCase):
 class TestScheduleEntryNextInstance(unittest.TestCase):
     def setUp(self):
         super(TestScheduleEntryNextInstance, self).setUp()
+        self.patch_record = mock.patch.object(ScheduledCallChange, 'record')
+        self.mock_record = self.patch_record.start()
         self.call = ScheduledCall('2014-01-19T17:15Z/PT1H', 'pulp.tasks.dosomething',
                                   remaining_runs=5)
         self.entry = self.call.as_schedule_entry()
 
+    def tearDown(self):
+        self.patch_record.stop()
+        super(TestScheduleEntryNextInstance, self).tearDown()
+
     def test_increments_last_run(self, mock_save):
         next_entry = next(self.entry)
         now = datetime.utcnow().replace(tzinfo=dateutils.utc_tz())
@@ -901,6 +972,21 @@ class TestScheduleEntryNextInstance(unittest.TestCase):
         # call should have been disabled because the remaining_runs hit 0
         self.assertFalse(self.call.enabled)
 
+    def test_disabling_changes_stamp(self, mock_save):
+        self.call.remaining_runs = 1
+        self.call.last_updated = 0
+
+        next(self.entry)
+
+        # the scheduler needs to notice that this schedule is now disabled
+        self.mock_record.assert_called_once_with([self.call.id])
+        self.assertTrue(self.call.last_updated > 0)
+
+    def test_run_does_not_change_stamp(self, mock_save):
+        next(self.entry)
+
+        self.assertFalse(self.mock_record.called)
+
     def test_calls_save(self, mock_save):
         next(self.entry)
 
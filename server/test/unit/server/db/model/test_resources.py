@@ -3,8 +3,11 @@ This module contains tests for the pulp.server.db.model.resources module.
 """
 from datetime import datetime
 import mock
+import unittest
 import uuid
 
+from pymongo.errors import DuplicateKeyError
+
 from ....base import ResourceReservationTests
 from pulp.server.db.model import resources
 
@@ -140,3 +143,56 @@ class TestReservedResource(ResourceReservationTests):
         self.assertEqual(rrc.count(), 1)
         self.assertEqual(rrc.find_one({'_id': task_id})['worker_name'], 'some_worker')
         self.assertEqual(rrc.find_one({'_id': task_id})['resource_id'], 'some_resource')
+
+
+class TestReservationRequest(ResourceReservationTests):
+
+    def test_search_indices(self):
+        self.assertEqual(resources.ReservationRequest.search_indices, ('seq',))
+
+    def test_save_and_from_bson(self):
+        task_id = str(uuid.uuid4())
+        request = resources.ReservationRequest(task_id, 'some_resource', 3, 'some.task',
+                                               [1, 'a'], {'b': {'c': 2}})
+
+        request.save()
+
+        rrc = resources.ReservationRequest.get_collection()
+        self.assertEqual(rrc.count(), 1)
+        loaded = resources.ReservationRequest.from_bson(rrc.find_one({'_id': task_id}))
+        self.assertEqual(loaded.task_id, task_id)
+        self.assertEqual(loaded.resource_id, 'some_resource')
+        self.assertEqual(loaded.seq, 3)
+        self.assertEqual(loaded.task_name, 'some.task')
+        self.assertEqual(loaded.inner_args, [1, 'a'])
+        self.assertEqual(loaded.inner_kwargs, {'b': {'c': 2}})
+
+    def test_save_twice_keeps_place(self):
+        task_id = str(uuid.uuid4())
+        resources.ReservationRequest(task_id, 'some_resource', 3, 'some.task', [], {}).save()
+
+        resources.ReservationRequest(task_id, 'some_resource', 4, 'some.task', [], {}).save()
+
+        rrc = resources.ReservationRequest.get_collection()
+        self.assertEqual(rrc.count(), 1)
+        self.assertEqual(rrc.find_one({'_id': task_id})['seq'], 3)
+
+
+@mock.patch('pulp.server.db.model.base.Model.get_collection')
+class TestReservationRequestSequence(unittest.TestCase):
+    def test_next(self, mock_get_collection):
+        find_and_modify = mock_get_collection.return_value.find_and_modify
+        find_and_modify.return_value = {'_id': 'reservation_requests', 'seq': 8}
+
+        self.assertEqual(resources.ReservationRequestSequence.next(), 8)
+
+        find_and_modify.assert_called_once_with({'_id': 'reservation_requests'},
+                                                {'$inc': {'seq': 1}}, upsert=True, new=True)
+
+    def test_next_concurrent_create(self, mock_get_collection):
+        find_and_modify = mock_get_collection.return_value.find_and_modify
+        find_and_modify.side_effect = [DuplicateKeyError('dup'),
+                                       {'_id': 'reservation_requests', 'seq': 2}]
+
+        self.assertEqual(resources.ReservationRequestSequence.next(), 2)
+        self.assertEqual(find_and_modify.call_count, 2)
@@ -2,6 +2,7 @@ from ConfigParser import NoOptionError
 import unittest
 
 from mock import patch, Mock, call
+from pymongo import MongoClient, ReadPreference
 
 from pulp.server import config
 from pulp.server.db import connection
@@ -129,6 +130,21 @@ class TestDatabaseReplicaSet(unittest.TestCase):
             'nbachamps', host='champs.example.com', max_pool_size=max_pool_size, port=27018,
             replicaset='real_replica_set')
 
+    @patch('pulp.server.db.connection.mongoengine')
+    def test_database_replica_set_secondary_reads(self, mock_mongoengine):
+        mock_mongoengine.connect.return_value.server_info.return_value = {'version': '2.6.0'}
+        config.config.set('database', 'replica_set', 'real_replica_set')
+        config.config.set('database', 'name', 'nbachamps')
+        config.config.set('database', 'seeds', 'champs.example.com:27018,other.example.com:27018')
+        config.config.set('database', 'search_read_preference', 'secondaryPreferred')
+
+        connection.initialize()
+
+        max_pool_size = connection._DEFAULT_MAX_POOL_SIZE
+        mock_mongoengine.connect.assert_called_once_with(
+            'nbachamps', host='champs.example.com:27018,other.example.com:27018',
+            max_pool_size=max_pool_size, replicaSet='real_replica_set')
+
 
 class TestDatabaseMaxPoolSize(unittest.TestCase):
 
@@ -507,3 +523,183 @@ class TestGetConnectionFunction(unittest.TestCase):
     @patch('pulp.server.db.connection._CONNECTION')
     def test_get_connection(self, mock__CONNECTION):
         self.assertEqual(mock__CONNECTION, connection.get_connection())
+
+
+class TestQueryShape(unittest.TestCase):
+
+    def test_values_replaced(self):
+        spec = {'repo_id': 'foo', 'count': {'$gt': 3}, 'id': {'$in': ['a', 'b']},
+                '$or': [{'a': 1}, {'a': 2}]}
+
+        shape = connection.query_shape(spec)
+
+        self.assertEqual(shape, {'repo_id': '?', 'count': {'$gt': '?'}, 'id': {'$in': ['?']},
+                                 '$or': [{'a': '?'}]})
+
+    def test_none(self):
+        self.assertEqual(connection.query_shape(None), '?')
+
+
+class TestOperationStats(unittest.TestCase):
+
+    def setUp(self):
+        connection.reset_operation_stats('task-1')
+
+    def tearDown(self):
+        connection.reset_operation_stats()
+
+    def test_record(self):
+        connection._record_operation('db.foo', 'update', {'a': 1}, 0.25, 0)
+        connection._record_operation('db.foo', 'find', {'a': 1}, 0.5, 10)
+
+        self.assertEqual(connection.get_operation_stats(),
+                         {'count': 2, 'seconds': 0.75, 'documents': 10})
+
+    def test_reset(self):
+        connection._record_operation('db.foo', 'update', {'a': 1}, 0.25, 0)
+
+        connection.reset_operation_stats()
+
+        self.assertEqual(connection.get_operation_stats(),
+                         {'count': 0, 'seconds': 0.0, 'documents': 0})
+
+    @patch('pulp.server.db.connection._SLOW_OPERATION_THRESHOLD', 1)
+    @patch('pulp.server.db.connection._logger')
+    def test_slow_operation_logged(self, mock_logger):
+        connection._record_operation('db.foo', 'find', {'a': 1}, 0.5, 10)
+        self.assertFalse(mock_logger.warning.called)
+
+        connection._record_operation('db.foo', 'find', {'a': 1}, 1.5, 10)
+
+        self.assertEqual(mock_logger.warning.call_count, 1)
+        message = mock_logger.warning.call_args[0][0]
+        self.assertTrue('task-1' in message)
+        self.assertTrue("{'a': '?'}" in message)
+
+    @patch('pulp.server.db.connection._SLOW_OPERATION_THRESHOLD', 0)
+    @patch('pulp.server.db.connection._logger')
+    def test_slow_operation_log_disabled(self, mock_logger):
+        connection._record_operation('db.foo', 'find', {'a': 1}, 100, 10)
+
+        self.assertFalse(mock_logger.warning.called)
+
+    @patch('pulp.server.db.connection.time')
+    def test_instrument_decorator(self, mock_time):
+        mock_time.time.side_effect = [10, 12]
+        method = Mock(return_value=['a', 'b'], __name__='distinct')
+
+        result = connection.instrument_decorator('db.foo')(method)('key', {'a': 1})
+
+        self.assertEqual(result, ['a', 'b'])
+        self.assertEqual(connection.get_operation_stats(),
+                         {'count': 1, 'seconds': 2, 'documents': 2})
+
+    @patch('pulp.server.db.connection._record_operation')
+    def test_instrument_decorator_spec(self, mock_record):
+        method = Mock(return_value={'n': 1}, __name__='update')
+
+        connection.instrument_decorator('db.foo')(method)({'a': 1}, {'$set': {'b': 2}})
+
+        self.assertEqual(mock_record.call_args[0][:3], ('db.foo', 'update', {'a': 1}))
+
+    def test_initialize_reads_threshold(self):
+        config.config.set('database', 'slow_operation_threshold', '2.5')
+        try:
+            with patch('pulp.server.db.connection.mongoengine') as mock_mongoengine:
+                mock_mongoengine.connect.return_value.server_info.return_value = {
+                    'version': '2.6.0'}
+                connection.initialize()
+            self.assertEqual(connection._SLOW_OPERATION_THRESHOLD, 2.5)
+        finally:
+            config.load_configuration()
+
+
+class TestPulpCursor(unittest.TestCase):
+
+    def setUp(self):
+        client = MongoClient('localhost', 27017, _connect=False)
+        self.collection = connection.PulpCollection(client['pulp_unittest'], 'foo')
+
+    def test_find_returns_pulp_cursor(self):
+        cursor = self.collection.find({'a': 1}, fields=['b'])
+
+        self.assertTrue(isinstance(cursor, connection.PulpCursor))
+        self.assertEqual(cursor._pulp_spec, {'a': 1})
+
+    @patch('pulp.server.db.connection._record_operation')
+    @patch('pymongo.cursor.Cursor._refresh', return_value=5)
+    def test_refresh_recorded(self, mock_refresh, mock_record):
+        cursor = self.collection.find(spec={'a': 1})
+
+        self.assertEqual(cursor._refresh(), 5)
+
+        self.assertEqual(mock_record.call_count, 1)
+        self.assertEqual(mock_record.call_args[0][:3], ('pulp_unittest.foo', 'find', {'a': 1}))
+        self.assertEqual(mock_record.call_args[0][4], 5)
+
+    @patch('pulp.server.db.connection._record_operation')
+    @patch('pymongo.cursor.Cursor._refresh', return_value=0)
+    @patch('pymongo.cursor.Cursor.alive', False)
+    def test_refresh_dead_cursor_not_recorded(self, mock_refresh, mock_record):
+        cursor = self.collection.find({'a': 1})
+
+        cursor._refresh()
+
+        self.assertFalse(mock_record.called)
+
+
+class TestReadPreference(unittest.TestCase):
+
+    def setUp(self):
+        client = MongoClient('localhost', 27017, _connect=False)
+        self.collection = connection.PulpCollection(client['pulp_unittest'], 'foo')
+        self.read_preferences = connection._READ_PREFERENCES
+        connection._READ_PREFERENCES = {connection.READ_SEARCH: ReadPreference.SECONDARY,
+                                        connection.READ_REPORT: ReadPreference.NEAREST}
+
+    def tearDown(self):
+        connection._READ_PREFERENCES = self.read_preferences
+        config.load_configuration()
+
+    def test_default_primary(self):
+        cursor = self.collection.find()
+
+        self.assertEqual(cursor._Cursor__read_preference, ReadPreference.PRIMARY)
+
+    def test_scope(self):
+        with connection.read_preference(connection.READ_SEARCH):
+            search_cursor = self.collection.find()
+            with connection.read_preference(connection.READ_REPORT):
+                report_cursor = self.collection.find()
+            after_report_cursor = self.collection.find()
+        after_cursor = self.collection.find()
+
+        self.assertEqual(search_cursor._Cursor__read_preference, ReadPreference.SECONDARY)
+        self.assertEqual(report_cursor._Cursor__read_preference, ReadPreference.NEAREST)
+        self.assertEqual(after_report_cursor._Cursor__read_preference, ReadPreference.SECONDARY)
+        self.assertEqual(after_cursor._Cursor__read_preference, ReadPreference.PRIMARY)
+
+    def test_scope_explicit_read_preference(self):
+        with connection.read_preference(connection.READ_SEARCH):
+            cursor = self.collection.find(read_preference=ReadPreference.PRIMARY)
+
+        self.assertEqual(cursor._Cursor__read_preference, ReadPreference.PRIMARY)
+
+    def test_load_defaults(self):
+        read_preferences = connection._load_read_preferences()
+
+        self.assertEqual(read_preferences, {connection.READ_SEARCH: ReadPreference.PRIMARY,
+                                            connection.READ_REPORT: ReadPreference.PRIMARY})
+
+    def test_load_configured(self):
+        config.config.set('database', 'report_read_preference', 'secondaryPreferred')
+
+        read_preferences = connection._load_read_preferences()
+
+        self.assertEqual(read_preferences[connection.READ_REPORT],
+                         ReadPreference.SECONDARY_PREFERRED)
+
+    def test_load_invalid(self):
+        config.config.set('database', 'search_read_preference', 'secondary_preferred')
+
+        self.assertRaises(RuntimeError, connection._load_read_preferences)
@@ -28,6 +28,7 @@ class TestReaperCollectionConfig(unittest.TestCase):
                                repository.RepoSyncResult,
                                repository.RepoPublishResult,
                                repo_group.RepoGroupPublishResult,
+                               repo_group.RepoGroupMemberPublish,
                                celery_result.CeleryResult]
         for key in collections_to_reap:
             self.assertTrue(key in reaper._COLLECTION_TIMEDELTAS)
@@ -42,6 +43,8 @@ class TestReaperCollectionConfig(unittest.TestCase):
                          'repo_publish_history')
         self.assertEqual(reaper._COLLECTION_TIMEDELTAS[repo_group.RepoGroupPublishResult],
                          'repo_group_publish_history')
+        self.assertEqual(reaper._COLLECTION_TIMEDELTAS[repo_group.RepoGroupMemberPublish],
+                         'repo_group_member_publish')
         self.assertEqual(reaper._COLLECTION_TIMEDELTAS[celery_result.CeleryResult],
                          'task_result_history')
 
@@ -131,3 +134,22 @@ class TestReapExpiredDocuments(base.PulpServerTests):
 
         # The event should no longer exist
         self.assertTrue(chec.find({'_id': event['_id']}).count() == 0)
+
+
+class TestReapMemberPublishes(unittest.TestCase):
+    """
+    Assert that expired group member publishes are completed rather than removed.
+    """
+    @mock.patch('pulp.server.managers.factory.repo_group_publish_manager')
+    @mock.patch('pulp.server.db.model.repo_group.RepoGroupMemberPublish.get_collection')
+    def test_expired_publishes_are_completed(self, get_collection, repo_group_publish_manager):
+        member_publish = {'id': 'member-publish'}
+        get_collection.return_value.find.return_value = [member_publish]
+
+        repo_group.RepoGroupMemberPublish.reap_old_documents(1.0)
+
+        spec = get_collection.return_value.find.call_args[0][0]
+        self.assertTrue(isinstance(spec['_id']['$lte'], ObjectId))
+        repo_group_publish_manager.return_value.expire_member_publish.assert_called_once_with(
+            member_publish)
+        self.assertFalse(get_collection.return_value.remove.called)
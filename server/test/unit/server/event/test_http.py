@@ -0,0 +1,142 @@
+import httplib
+import socket
+import unittest
+
+import mock
+
+from pulp.server.event import http
+
+
+class TestDispatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.dispatcher = http.Dispatcher()
+
+    @mock.patch('pulp.server.event.http.DeliveryThread')
+    def test_send_one_thread_per_server(self, mock_thread_class):
+        mock_thread_class.side_effect = lambda *args: mock.Mock(queue=mock.Mock())
+
+        self.dispatcher.send({'url': 'http://a/1'}, 'x')
+        self.dispatcher.send({'url': 'http://a/2'}, 'y')
+        self.dispatcher.send({'url': 'https://b/3'}, 'z')
+
+        self.assertEqual(mock_thread_class.call_count, 2)
+        thread = self.dispatcher._threads[('http:', 'a')]
+        self.assertEqual(thread.start.call_count, 1)
+        self.assertEqual([c[0][0][0] for c in thread.queue.put_nowait.call_args_list],
+                         ['/1', '/2'])
+
+    @mock.patch('pulp.server.event.http.DeliveryThread')
+    def test_send_authorization(self, mock_thread_class):
+        config = {'url': 'http://a/', 'username': 'admin', 'password': 'admin'}
+
+        self.dispatcher.send(config, 'x')
+
+        put = mock_thread_class.return_value.queue.put_nowait
+        path, headers, body = put.call_args[0][0]
+        self.assertEqual(headers['Authorization'], 'Basic YWRtaW46YWRtaW4=')
+        self.assertEqual(body, 'x')
+
+    @mock.patch('pulp.server.event.http.DeliveryThread')
+    def test_send_queue_full(self, mock_thread_class):
+        mock_thread_class.return_value.queue.put_nowait.side_effect = http.Queue.Full()
+
+        # dropped with a warning
+        self.dispatcher.send({'url': 'http://a/'}, 'x')
+
+    def test_retire(self):
+        thread = http.DeliveryThread(self.dispatcher, 'http:', 'a')
+        self.dispatcher._threads[thread.key] = thread
+
+        thread.queue.put('event')
+        self.assertFalse(self.dispatcher._retire(thread))
+        self.assertTrue(thread.key in self.dispatcher._threads)
+
+        thread.queue.get()
+        self.assertTrue(self.dispatcher._retire(thread))
+        self.assertFalse(thread.key in self.dispatcher._threads)
+
+
+class TestDeliveryThread(unittest.TestCase):
+
+    def setUp(self):
+        self.thread = http.DeliveryThread(http.Dispatcher(), 'http:', 'localhost')
+        self.connection = mock.Mock()
+        self.response = self.connection.getresponse.return_value
+        self.response.status = httplib.OK
+        self.response.will_close = False
+        patcher = mock.patch('pulp.server.event.http._create_connection',
+                             return_value=self.connection)
+        self.mock_create = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('pulp.server.event.http.time.sleep')
+        self.mock_sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_connection_reused(self):
+        self.thread._deliver('/a', {}, '1')
+        self.thread._deliver('/b', {}, '2')
+
+        self.assertEqual(self.mock_create.call_count, 1)
+        self.assertEqual(self.connection.request.call_count, 2)
+        self.assertEqual(self.response.read.call_count, 2)
+        self.assertFalse(self.connection.close.called)
+
+    def test_connection_closed_by_server(self):
+        self.response.will_close = True
+
+        self.thread._deliver('/a', {}, '1')
+        self.thread._deliver('/b', {}, '2')
+
+        self.assertEqual(self.mock_create.call_count, 2)
+        self.assertEqual(self.connection.close.call_count, 2)
+
+    def test_retry_connection_error(self):
+        self.connection.request.side_effect = [socket.error('refused'), httplib.BadStatusLine(''),
+                                               None]
+
+        self.thread._deliver('/a', {}, '1')
+
+        self.assertEqual(self.connection.request.call_count, 3)
+        self.assertEqual(self.mock_create.call_count, 3)
+        self.assertEqual([c[0][0] for c in self.mock_sleep.call_args_list],
+                         [http.RETRY_DELAY_SECONDS, 2 * http.RETRY_DELAY_SECONDS])
+
+    def test_retry_server_error_gives_up(self):
+        self.response.status = httplib.SERVICE_UNAVAILABLE
+
+        self.thread._deliver('/a', {}, '1')
+
+        self.assertEqual(self.connection.request.call_count, http.MAX_ATTEMPTS)
+
+    def test_client_error_not_retried(self):
+        self.response.status = httplib.NOT_FOUND
+
+        self.thread._deliver('/a', {}, '1')
+
+        self.assertEqual(self.connection.request.call_count, 1)
+        self.assertFalse(self.mock_sleep.called)
+
+    @mock.patch('pulp.server.event.http.IDLE_TIMEOUT_SECONDS', 0.01)
+    def test_run(self):
+        self.thread.dispatcher._threads[self.thread.key] = self.thread
+        for i in range(3):
+            self.thread.queue.put(('/%d' % i, {}, str(i)))
+
+        self.thread.run()
+
+        self.assertEqual([c[0][1] for c in self.connection.request.call_args_list],
+                         ['/0', '/1', '/2'])
+        # idle, so the connection was closed and the thread retired
+        self.assertEqual(self.connection.close.call_count, 1)
+        self.assertEqual(self.thread.dispatcher._threads, {})
+
+    @mock.patch('pulp.server.event.http.IDLE_TIMEOUT_SECONDS', 0.01)
+    def test_run_continues_after_error(self):
+        self.thread.queue.put(('/0', {}, '0'))
+        self.thread.queue.put(('/1', {}, '1'))
+        self.connection.request.side_effect = [ValueError(), None]
+
+        self.thread.run()
+
+        self.assertEqual(self.connection.request.call_count, 2)
@@ -19,7 +19,6 @@ from mock import patch
 
 from pulp.devel.unit.base import PulpCeleryTaskTests
 from pulp.devel.unit.server import util
-from pulp.server.async.tasks import TaskResult
 from pulp.server.db.model.criteria import Criteria
 from pulp.server.db.model.consumer import Consumer, ConsumerGroup
 from pulp.server.exceptions import MissingResource, PulpException, error_codes
@@ -249,41 +248,95 @@ class ConsumerGroupMembershipTests(ConsumerGroupTests):
 
 class TestBind(PulpCeleryTaskTests):
 
-    @patch('pulp.server.managers.consumer.group.cud.bind_task')
+    @patch('pulp.server.managers.factory.consumer_agent_manager')
+    @patch('pulp.server.managers.factory.consumer_bind_manager')
     @patch('pulp.server.managers.factory.consumer_group_query_manager')
-    def test_bind_no_errors(self, mock_query_manager, mock_bind):
+    def test_bind_no_errors(self, mock_query_manager, mock_bind_manager, mock_agent_manager):
         mock_query_manager.return_value.get_group.return_value = {'consumer_ids': ['foo-consumer']}
         binding_config = {'binding': 'foo'}
         agent_options = {'bar': 'baz'}
-        mock_bind.return_value = TaskResult(spawned_tasks=[{'task_id': 'foo-request-id'}])
+        bindings = [{'consumer_id': 'foo-consumer'}]
+        mock_bind_manager.return_value.bind_consumers.return_value = (bindings, [])
+        mock_agent_manager.return_value.bind_all.return_value = (
+            [{'task_id': 'foo-request-id', 'state': 'waiting'}], [])
+
         result = cud.bind('foo_group_id', 'foo_repo_id', 'foo_distributor_id',
                           True, binding_config, agent_options)
-        mock_bind.assert_called_once_with('foo-consumer', 'foo_repo_id', 'foo_distributor_id',
-                                          True, binding_config, agent_options)
-        self.assertEquals(result.spawned_tasks[0], {'task_id': 'foo-request-id'})
 
-    @patch('pulp.server.managers.consumer.group.cud.bind_task')
+        mock_bind_manager.return_value.bind_consumers.assert_called_once_with(
+            ['foo-consumer'], 'foo_repo_id', 'foo_distributor_id', True, binding_config)
+        mock_agent_manager.return_value.bind_all.assert_called_once_with(bindings, agent_options)
+        self.assertEquals(result.spawned_tasks, [{'task_id': 'foo-request-id'}])
+        self.assertTrue(result.error is None)
+
+    @patch('pulp.server.managers.factory.consumer_agent_manager')
+    @patch('pulp.server.managers.factory.consumer_bind_manager')
     @patch('pulp.server.managers.factory.consumer_group_query_manager')
-    def test_bind_with_missing_resource_errors(self, mock_query_manager, mock_bind):
+    def test_bind_no_notify_agent(self, mock_query_manager, mock_bind_manager,
+                                  mock_agent_manager):
+        mock_query_manager.return_value.get_group.return_value = {'consumer_ids': ['foo-consumer']}
+        mock_bind_manager.return_value.bind_consumers.return_value = ([{}], [])
+
+        result = cud.bind('foo_group_id', 'foo_repo_id', 'foo_distributor_id', False, {}, {})
+
+        self.assertFalse(mock_agent_manager.return_value.bind_all.called)
+        self.assertEquals(result.spawned_tasks, [])
+
+    @patch('pulp.server.managers.consumer.group.cud.BIND_BATCH_SIZE', 2)
+    @patch('pulp.server.managers.consumer.group.cud.progress_writer')
+    @patch('pulp.server.managers.consumer.group.cud.get_current_task_id')
+    @patch('pulp.server.managers.factory.consumer_agent_manager')
+    @patch('pulp.server.managers.factory.consumer_bind_manager')
+    @patch('pulp.server.managers.factory.consumer_group_query_manager')
+    def test_bind_batches(self, mock_query_manager, mock_bind_manager, mock_agent_manager,
+                          mock_task_id, mock_progress_writer):
+        consumer_ids = ['c1', 'c2', 'c3']
+        mock_query_manager.return_value.get_group.return_value = {'consumer_ids': consumer_ids}
+        mock_bind_manager.return_value.bind_consumers.side_effect = lambda ids, *args: (
+            [{'consumer_id': c} for c in ids if c != 'c2'], [c for c in ids if c == 'c2'])
+        mock_agent_manager.return_value.bind_all.side_effect = lambda bindings, options: (
+            [{'task_id': b['consumer_id']} for b in bindings], [])
+        mock_task_id.return_value = 'group-task'
+
+        result = cud.bind('foo_group_id', 'foo_repo_id', 'foo_distributor_id', True, {}, {})
+
+        calls = mock_bind_manager.return_value.bind_consumers.call_args_list
+        self.assertEquals([c[0][0] for c in calls], [['c1', 'c2'], ['c3']])
+        self.assertEquals(result.spawned_tasks, [{'task_id': 'c1'}, {'task_id': 'c3'}])
+        self.assertTrue(result.error.error_code is error_codes.PLP0004)
+        self.assertEquals(len(result.error.child_exceptions), 1)
+        self.assertTrue(isinstance(result.error.child_exceptions[0], MissingResource))
+        self.assertEquals(mock_progress_writer.set_progress.call_count, 2)
+        mock_progress_writer.set_progress.assert_called_with(
+            'group-task', {'bind': {'total': 3, 'completed': 2, 'failed': 1}})
+
+    @patch('pulp.server.managers.factory.consumer_agent_manager')
+    @patch('pulp.server.managers.factory.consumer_bind_manager')
+    @patch('pulp.server.managers.factory.consumer_group_query_manager')
+    def test_bind_with_missing_resource_errors(self, mock_query_manager, mock_bind_manager,
+                                               mock_agent_manager):
         mock_query_manager.return_value.get_group.return_value = {'consumer_ids': ['foo-consumer']}
         binding_config = {'binding': 'foo'}
         agent_options = {'bar': 'baz'}
         side_effect_exception = MissingResource()
-        mock_bind.side_effect = side_effect_exception
+        mock_bind_manager.return_value.bind_consumers.side_effect = side_effect_exception
 
         result = cud.bind('foo_group_id', 'foo_repo_id', 'foo_distributor_id',
                           True, binding_config, agent_options)
         self.assertTrue(result.error.error_code is error_codes.PLP0004)
         self.assertEquals(result.error.child_exceptions[0], side_effect_exception)
 
-    @patch('pulp.server.managers.consumer.group.cud.bind_task')
+    @patch('pulp.server.managers.factory.consumer_agent_manager')
+    @patch('pulp.server.managers.factory.consumer_bind_manager')
     @patch('pulp.server.managers.factory.consumer_group_query_manager')
-    def test_bind_with_general_error(self, mock_query_manager, mock_bind):
+    def test_bind_with_general_error(self, mock_query_manager, mock_bind_manager,
+                                     mock_agent_manager):
         mock_query_manager.return_value.get_group.return_value = {'consumer_ids': ['foo-consumer']}
         binding_config = {'binding': 'foo'}
         agent_options = {'bar': 'baz'}
         side_effect_exception = ValueError()
-        mock_bind.side_effect = side_effect_exception
+        mock_bind_manager.return_value.bind_consumers.return_value = ([{}], [])
+        mock_agent_manager.return_value.bind_all.return_value = ([], [side_effect_exception])
 
         result = cud.bind('foo_group_id', 'foo_repo_id', 'foo_distributor_id',
                           True, binding_config, agent_options)
@@ -294,37 +347,48 @@ class TestBind(PulpCeleryTaskTests):
 
 class TestUnbind(PulpCeleryTaskTests):
 
-    @patch('pulp.server.managers.consumer.group.cud.unbind_task')
+    @patch('pulp.server.managers.factory.consumer_agent_manager')
+    @patch('pulp.server.managers.factory.consumer_bind_manager')
     @patch('pulp.server.managers.factory.consumer_group_query_manager')
-    def test_bind_no_errors(self, mock_query_manager, mock_unbind):
+    def test_bind_no_errors(self, mock_query_manager, mock_bind_manager, mock_agent_manager):
         mock_query_manager.return_value.get_group.return_value = {'consumer_ids': ['foo-consumer']}
         options = {'bar': 'baz'}
-        mock_unbind.return_value = TaskResult(spawned_tasks=[{'task_id': 'foo-request-id'}])
+        bindings = [{'consumer_id': 'foo-consumer'}]
+        mock_bind_manager.return_value.unbind_consumers.return_value = (bindings, [])
+        mock_agent_manager.return_value.unbind_all.return_value = (
+            [{'task_id': 'foo-request-id'}], [])
+
         result = cud.unbind('foo_group_id', 'foo_repo_id', 'foo_distributor_id', options)
-        mock_unbind.assert_called_once_with('foo-consumer', 'foo_repo_id', 'foo_distributor_id',
-                                            options)
+
+        mock_bind_manager.return_value.unbind_consumers.assert_called_once_with(
+            ['foo-consumer'], 'foo_repo_id', 'foo_distributor_id')
+        mock_agent_manager.return_value.unbind_all.assert_called_once_with(bindings, options)
         self.assertEquals(result.spawned_tasks[0], {'task_id': 'foo-request-id'})
 
-    @patch('pulp.server.managers.consumer.group.cud.unbind_task')
+    @patch('pulp.server.managers.factory.consumer_agent_manager')
+    @patch('pulp.server.managers.factory.consumer_bind_manager')
     @patch('pulp.server.managers.factory.consumer_group_query_manager')
-    def test_bind_with_missing_resource_errors(self, mock_query_manager, mock_unbind):
+    def test_bind_with_missing_resource_errors(self, mock_query_manager, mock_bind_manager,
+                                               mock_agent_manager):
         mock_query_manager.return_value.get_group.return_value = {'consumer_ids': ['foo-consumer']}
         options = {'bar': 'baz'}
-        side_effect_exception = MissingResource()
-        mock_unbind.side_effect = side_effect_exception
+        mock_bind_manager.return_value.unbind_consumers.return_value = ([], ['foo-consumer'])
+        mock_agent_manager.return_value.unbind_all.return_value = ([], [])
 
         result = cud.unbind('foo_group_id', 'foo_repo_id', 'foo_distributor_id', options)
         self.assertTrue(isinstance(result.error, PulpException))
         self.assertEquals(result.error.error_code, error_codes.PLP0005)
-        self.assertEquals(result.error.child_exceptions[0], side_effect_exception)
+        self.assertTrue(isinstance(result.error.child_exceptions[0], MissingResource))
 
-    @patch('pulp.server.managers.consumer.group.cud.unbind_task')
+    @patch('pulp.server.managers.factory.consumer_agent_manager')
+    @patch('pulp.server.managers.factory.consumer_bind_manager')
     @patch('pulp.server.managers.factory.consumer_group_query_manager')
-    def test_bind_with_general_error(self, mock_query_manager, mock_unbind):
+    def test_bind_with_general_error(self, mock_query_manager, mock_bind_manager,
+                                     mock_agent_manager):
         mock_query_manager.return_value.get_group.return_value = {'consumer_ids': ['foo-consumer']}
         options = {'bar': 'baz'}
         side_effect_exception = ValueError()
-        mock_unbind.side_effect = side_effect_exception
+        mock_bind_manager.return_value.unbind_consumers.side_effect = side_effect_exception
 
         result = cud.unbind('foo_group_id', 'foo_repo_id', 'foo_distributor_id', options)
         self.assertTrue(isinstance(result.error, PulpException))
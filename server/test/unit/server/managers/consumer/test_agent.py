@@ -1,7 +1,7 @@
 from unittest import TestCase
 import itertools
 
-from mock import patch, Mock, ANY
+from mock import patch, Mock, MagicMock, ANY
 
 from pulp.common import tags
 from pulp.plugins.loader import exceptions as plugin_exceptions
@@ -184,6 +184,140 @@ class TestAgentManager(TestCase):
         mock_bind_manager.action_pending.assert_called_with(
             consumer['id'], repo_id, distributor_id, Bind.Action.UNBIND, task_id)
 
+    @staticmethod
+    def _pseudo_task(task_id):
+        task = MagicMock()
+        task.__getitem__.side_effect = {'task_id': task_id}.__getitem__
+        return task
+
+    @patch('pulp.server.managers.consumer.agent.uuid4')
+    @patch('pulp.server.managers.consumer.agent.TaskStatus')
+    @patch('pulp.server.managers.consumer.agent.Consumer')
+    @patch('pulp.server.managers.consumer.agent.AgentManager._bindings')
+    @patch('pulp.server.managers.consumer.agent.managers')
+    @patch('pulp.server.managers.consumer.agent.Context')
+    @patch('pulp.server.agent.direct.pulpagent.Consumer')
+    def test_bind_all(self, *mocks):
+        mock_agent = mocks[0]
+        mock_context = mocks[1]
+        mock_factory = mocks[2]
+        mock_bindings = mocks[3]
+        mock_consumer = mocks[4]
+        mock_task_status = mocks[5]
+        mock_uuid = mocks[6]
+
+        repo_id = '100'
+        distributor_id = '200'
+        consumers = [{'id': 'a'}, {'id': 'b'}]
+        mock_consumer.get_collection.return_value.find.return_value = consumers
+        bindings = [dict(consumer_id=c, repo_id=repo_id, distributor_id=distributor_id)
+                    for c in ('a', 'b', 'missing')]
+        agent_bindings = []
+        mock_bindings.return_value = agent_bindings
+        mock_uuid.side_effect = ['1', '2', 'action']
+        pseudo_tasks = [self._pseudo_task('1'), self._pseudo_task('2')]
+        mock_task_status.side_effect = pseudo_tasks
+        mock_bind_manager = mock_factory.consumer_bind_manager.return_value
+
+        # test manager
+
+        options = {}
+        tasks, errors = AgentManager.bind_all(bindings, options)
+
+        # validations
+
+        # the payload is created once for all of the consumers
+        mock_bindings.assert_called_once_with(bindings[:1])
+        mock_consumer.get_collection.return_value.find.assert_called_once_with(
+            {'id': {'$in': ['a', 'b', 'missing']}})
+        self.assertEqual(tasks, pseudo_tasks)
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(isinstance(errors[0], MissingResource))
+        # the pseudo tasks are inserted together
+        mock_task_status._get_collection.return_value.insert.assert_called_once_with(
+            [t.to_mongo.return_value for t in pseudo_tasks], safe=True)
+        self.assertEqual(mock_agent.bind.call_count, 2)
+        mock_agent.bind.assert_called_with(mock_context.return_value, agent_bindings, options)
+        mock_context.assert_called_with(
+            consumers[1],
+            task_id='2',
+            action_id='action',
+            action='bind',
+            consumer_id='b',
+            repo_id=repo_id,
+            distributor_id=distributor_id)
+        # the pending action is recorded on all of the bindings together
+        mock_bind_manager.actions_pending.assert_called_once_with(
+            ['a', 'b'], repo_id, distributor_id, Bind.Action.BIND, 'action')
+        self.assertFalse(mock_bind_manager.action_pending.called)
+        mock_bind_manager.actions_withdrawn.assert_called_once_with(
+            [], repo_id, distributor_id, 'action')
+
+    @patch('pulp.server.managers.consumer.agent.uuid4')
+    @patch('pulp.server.managers.consumer.agent.TaskStatus')
+    @patch('pulp.server.managers.consumer.agent.Consumer')
+    @patch('pulp.server.managers.consumer.agent.AgentManager._unbindings')
+    @patch('pulp.server.managers.consumer.agent.managers')
+    @patch('pulp.server.managers.consumer.agent.Context')
+    @patch('pulp.server.agent.direct.pulpagent.Consumer')
+    def test_unbind_all(self, *mocks):
+        mock_agent = mocks[0]
+        mock_factory = mocks[2]
+        mock_unbindings = mocks[3]
+        mock_consumer = mocks[4]
+        mock_task_status = mocks[5]
+        mock_uuid = mocks[6]
+
+        repo_id = '100'
+        distributor_id = '200'
+        mock_consumer.get_collection.return_value.find.return_value = [{'id': 'a'}, {'id': 'b'}]
+        bindings = [dict(consumer_id=c, repo_id=repo_id, distributor_id=distributor_id)
+                    for c in ('a', 'b')]
+        agent_bindings = []
+        mock_unbindings.return_value = agent_bindings
+        mock_uuid.side_effect = ['1', '2', 'action']
+        pseudo_tasks = [self._pseudo_task('1'), self._pseudo_task('2')]
+        mock_task_status.side_effect = pseudo_tasks
+        # the agent of the first consumer cannot be reached
+        error = ValueError()
+        mock_agent.unbind.side_effect = [error, None]
+        mock_bind_manager = mock_factory.consumer_bind_manager.return_value
+
+        # test manager
+
+        options = {}
+        tasks, errors = AgentManager.unbind_all(bindings, options)
+
+        # validations
+
+        mock_unbindings.assert_called_once_with(bindings[:1])
+        self.assertEqual(tasks, pseudo_tasks[1:])
+        self.assertEqual(errors, [error])
+        mock_bind_manager.actions_pending.assert_called_once_with(
+            ['a', 'b'], repo_id, distributor_id, Bind.Action.UNBIND, 'action')
+        # nothing is pending for the consumer whose agent was never asked
+        mock_bind_manager.actions_withdrawn.assert_called_once_with(
+            ['a'], repo_id, distributor_id, 'action')
+
+    @patch('pulp.server.managers.consumer.agent.TaskStatus')
+    @patch('pulp.server.managers.consumer.agent.Consumer')
+    @patch('pulp.server.managers.consumer.agent.managers')
+    def test_bind_all_missing_consumers(self, mock_factory, mock_consumer, mock_task_status):
+        mock_consumer.get_collection.return_value.find.return_value = []
+        bindings = [dict(consumer_id='a', repo_id='100', distributor_id='200')]
+
+        tasks, errors = AgentManager._notify_all(
+            bindings, tags.ACTION_AGENT_BIND, Bind.Action.BIND, Mock())
+
+        self.assertEqual(tasks, [])
+        self.assertEqual(len(errors), 1)
+        self.assertFalse(mock_task_status._get_collection.called)
+        self.assertFalse(mock_factory.consumer_bind_manager.return_value.actions_pending.called)
+
+    def test_bind_all_nothing_to_do(self):
+        self.assertEqual(AgentManager.bind_all([], {}), ([], []))
+        self.assertEqual(AgentManager.unbind_all([], {}), ([], []))
+
     @patch('pulp.server.managers.consumer.agent.uuid4')
     @patch('pulp.server.db.model.dispatch.TaskStatus')
     @patch('pulp.server.managers.consumer.agent.AgentManager._profiled_consumer')
@@ -1,3 +1,6 @@
+import unittest
+
+from celery.result import AsyncResult
 import mock
 
 from ..... import base
@@ -6,8 +9,13 @@ from pulp.devel import mock_plugins
 from pulp.plugins.conduits.repo_publish import RepoGroupPublishConduit
 from pulp.plugins.config import PluginCallConfiguration
 from pulp.plugins.model import RepositoryGroup, PublishReport
-from pulp.server.db.model.repo_group import RepoGroup, RepoGroupDistributor, RepoGroupPublishResult
+from pulp.common import constants
+from pulp.server.db.model.dispatch import TaskStatus
+from pulp.server.db.model.repo_group import (RepoGroup, RepoGroupDistributor,
+                                             RepoGroupMemberPublish, RepoGroupPublishResult)
+from pulp.server.db.model.repository import Repo
 from pulp.server.managers import factory as manager_factory
+from pulp.server.managers.repo.group import publish
 
 
 class RepoGroupPublishManagerTests(base.PulpServerTests):
@@ -39,6 +47,8 @@ class RepoGroupPublishManagerTests(base.PulpServerTests):
         RepoGroup.get_collection().remove()
         RepoGroupDistributor.get_collection().remove()
         RepoGroupPublishResult.get_collection().remove()
+        RepoGroupMemberPublish.get_collection().remove()
+        Repo.get_collection().remove()
 
     @mock.patch('pulp.server.managers.repo._common.get_working_directory',
                 return_value="/var/cache/pulp/mock_worker/mock_task_id")
@@ -161,3 +171,246 @@ class RepoGroupPublishManagerTests(base.PulpServerTests):
         now = dateutils.now_utc_datetime_with_tzinfo()
         difference = now - last_publish
         self.assertTrue(difference.seconds < 2)
+
+
+class RepoGroupMemberPublishTests(base.PulpServerTests):
+
+    def setUp(self):
+        super(RepoGroupMemberPublishTests, self).setUp()
+        mock_plugins.install()
+        mock_plugins.MOCK_GROUP_DISTRIBUTOR.split_group_publish.return_value = True
+
+        self.group_id = 'publish-group'
+        self.repo_ids = ['repo-1', 'repo-2']
+        for repo_id in self.repo_ids:
+            manager_factory.repo_manager().create_repo(repo_id)
+        manager_factory.repo_group_manager().create_repo_group(self.group_id,
+                                                               repo_ids=self.repo_ids)
+
+        self.distributor_id = 'publish-dist'
+        self.distributor_manager = manager_factory.repo_group_distributor_manager()
+        self.distributor_manager.add_distributor(self.group_id, 'mock-group-distributor', {},
+                                                 distributor_id=self.distributor_id)
+
+        self.publish_manager = manager_factory.repo_group_publish_manager()
+
+        for patcher in (mock.patch('pulp.server.managers.repo._common.get_working_directory',
+                                   return_value='/var/cache/pulp/mock_worker/mock_task_id'),
+                        mock.patch('pulp.server.managers.repo.group.publish.get_current_task_id',
+                                   return_value='member-task')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        super(RepoGroupMemberPublishTests, self).tearDown()
+        mock_plugins.MOCK_GROUP_DISTRIBUTOR.split_group_publish.return_value = False
+        mock_plugins.MOCK_GROUP_DISTRIBUTOR.publish_group_member.side_effect = None
+        mock_plugins.reset()
+
+    def clean(self):
+        super(RepoGroupMemberPublishTests, self).clean()
+
+        RepoGroup.get_collection().remove()
+        RepoGroupDistributor.get_collection().remove()
+        RepoGroupPublishResult.get_collection().remove()
+        RepoGroupMemberPublish.get_collection().remove()
+        Repo.get_collection().remove()
+        TaskStatus.objects().delete()
+
+    def _start(self):
+        member_publish = RepoGroupMemberPublish(self.group_id, self.distributor_id,
+                                                '2014-01-01T00:00:00Z', self.repo_ids)
+        RepoGroupMemberPublish.get_collection().insert(member_publish, safe=True)
+        return member_publish['id']
+
+    @mock.patch('pulp.server.managers.repo.group.publish.publish_member')
+    def test_publish_starts_member_tasks(self, mock_publish_member):
+        mock_publish_member.apply_async_with_reservation.side_effect = [
+            AsyncResult('task-1'), AsyncResult('task-2')]
+
+        result = self.publish_manager.publish(self.group_id, self.distributor_id,
+                                              publish_config_override={'o': 'o'})
+
+        self.assertEqual(result.return_value, {'members': {'repo-1': 'task-1',
+                                                           'repo-2': 'task-2'}})
+        self.assertEqual(result.spawned_tasks, [{'task_id': 'task-1'}, {'task_id': 'task-2'}])
+        self.assertFalse(mock_plugins.MOCK_GROUP_DISTRIBUTOR.publish_group.called)
+
+        member_publish = RepoGroupMemberPublish.get_collection().find_one()
+        self.assertEqual(member_publish['remaining'], 2)
+        self.assertEqual(member_publish['publish_config_override'], {'o': 'o'})
+        self.assertEqual(member_publish['member_tasks'], {'repo-1': 'task-1',
+                                                          'repo-2': 'task-2'})
+        calls = mock_publish_member.apply_async_with_reservation.call_args_list
+        self.assertEqual(calls[0][0], ('repository', 'repo-1'))
+        self.assertEqual(calls[0][1]['args'], [member_publish['id'], 'repo-1', {'o': 'o'}])
+
+        # nothing is recorded for the group until the members finish
+        self.assertEqual(RepoGroupPublishResult.get_collection().find().count(), 0)
+
+    @mock.patch('pulp.server.managers.repo.group.publish.publish_member')
+    def test_publish_while_members_outstanding(self, mock_publish_member):
+        self._start()
+
+        self.assertRaises(publish.PulpCodedConflictException, self.publish_manager.publish,
+                          self.group_id, self.distributor_id)
+
+        self.assertFalse(mock_publish_member.apply_async_with_reservation.called)
+        self.assertFalse(mock_plugins.MOCK_GROUP_DISTRIBUTOR.publish_group.called)
+        self.assertEqual(RepoGroupMemberPublish.get_collection().find().count(), 1)
+
+    def test_publish_member(self):
+        member_publish_id = self._start()
+        distributor = mock_plugins.MOCK_GROUP_DISTRIBUTOR
+        distributor.publish_group_member.return_value = PublishReport(True, 's', 'd')
+        distributor.finish_publish_group.return_value = PublishReport(True, 'group', 'details')
+
+        self.publish_manager.publish_member(member_publish_id, 'repo-1')
+
+        self.assertEqual(distributor.publish_group_member.call_args[0][1].id, 'repo-1')
+        self.assertFalse(distributor.finish_publish_group.called)
+        member_publish = RepoGroupMemberPublish.get_collection().find_one()
+        self.assertEqual(member_publish['remaining'], 1)
+        self.assertEqual(member_publish['member_results'][0]['task_id'], 'member-task')
+
+        self.publish_manager.publish_member(member_publish_id, 'repo-2')
+
+        # the last member merged the results for the group
+        member_reports = distributor.finish_publish_group.call_args[0][3]
+        self.assertEqual(sorted(member_reports), self.repo_ids)
+        self.assertTrue(member_reports['repo-2'].success_flag)
+        self.assertEqual(RepoGroupMemberPublish.get_collection().find().count(), 0)
+        history_entries = list(RepoGroupPublishResult.get_collection().find())
+        self.assertEqual(1, len(history_entries))
+        self.assertEqual(history_entries[0]['result'], RepoGroupPublishResult.RESULT_SUCCESS)
+        self.assertEqual(history_entries[0]['started'], '2014-01-01T00:00:00Z')
+        self.assertEqual(history_entries[0]['summary'], 'group')
+        distributor = self.distributor_manager.get_distributor(self.group_id, self.distributor_id)
+        self.assertTrue(distributor['last_publish'] is not None)
+
+    def test_publish_member_error(self):
+        self.repo_ids = ['repo-1']
+        member_publish_id = self._start()
+        distributor = mock_plugins.MOCK_GROUP_DISTRIBUTOR
+        distributor.publish_group_member.side_effect = ValueError('boom')
+        distributor.finish_publish_group.return_value = PublishReport(False, 'group', 'details')
+
+        self.assertRaises(ValueError, self.publish_manager.publish_member, member_publish_id,
+                          'repo-1')
+
+        self.assertEqual(distributor.finish_publish_group.call_args[0][3], {'repo-1': None})
+        history_entries = list(RepoGroupPublishResult.get_collection().find())
+        self.assertEqual(history_entries[0]['result'], RepoGroupPublishResult.RESULT_FAILED)
+
+    def test_publish_member_missing(self):
+        self.assertRaises(publish.MissingResource, self.publish_manager.publish_member,
+                          'missing', 'repo-1')
+
+    def test_record_member_error(self):
+        self.repo_ids = ['repo-1']
+        member_publish_id = self._start()
+        distributor = mock_plugins.MOCK_GROUP_DISTRIBUTOR
+        distributor.finish_publish_group.return_value = PublishReport(False, 'group', 'details')
+
+        self.publish_manager.record_member_error(member_publish_id, 'repo-1', 'member-task',
+                                                 'canceled')
+
+        # the canceled member completed the publish of the group
+        self.assertEqual(distributor.finish_publish_group.call_args[0][3], {'repo-1': None})
+        self.assertEqual(RepoGroupMemberPublish.get_collection().find().count(), 0)
+        history_entries = list(RepoGroupPublishResult.get_collection().find())
+        self.assertEqual(history_entries[0]['result'], RepoGroupPublishResult.RESULT_FAILED)
+
+    def test_record_member_error_after_result(self):
+        member_publish_id = self._start()
+        distributor = mock_plugins.MOCK_GROUP_DISTRIBUTOR
+        distributor.publish_group_member.return_value = PublishReport(True, 's', 'd')
+
+        self.publish_manager.publish_member(member_publish_id, 'repo-1')
+        self.publish_manager.record_member_error(member_publish_id, 'repo-1', 'member-task',
+                                                 'canceled')
+
+        # the member already recorded its result, so it is not counted again
+        member_publish = RepoGroupMemberPublish.get_collection().find_one()
+        self.assertEqual(member_publish['remaining'], 1)
+        self.assertEqual(len(member_publish['member_results']), 1)
+        self.assertEqual(member_publish['member_results'][0]['result'],
+                         RepoGroupPublishResult.RESULT_SUCCESS)
+
+    def test_expire_member_publish(self):
+        member_publish_id = self._start()
+        distributor = mock_plugins.MOCK_GROUP_DISTRIBUTOR
+        distributor.publish_group_member.return_value = PublishReport(True, 's', 'd')
+        distributor.finish_publish_group.return_value = PublishReport(False, 'group', 'details')
+        self.publish_manager.publish_member(member_publish_id, 'repo-1')
+
+        member_publish = RepoGroupMemberPublish.get_collection().find_one()
+        self.publish_manager.expire_member_publish(member_publish)
+
+        member_reports = distributor.finish_publish_group.call_args[0][3]
+        self.assertTrue(member_reports['repo-1'].success_flag)
+        self.assertTrue(member_reports['repo-2'] is None)
+        self.assertEqual(RepoGroupMemberPublish.get_collection().find().count(), 0)
+
+    def test_expire_member_publish_running(self):
+        member_publish_id = self._start()
+        RepoGroupMemberPublish.get_collection().update(
+            {'id': member_publish_id},
+            {'$set': {'member_tasks': {'repo-1': 'task-1', 'repo-2': 'task-2'}}}, safe=True)
+        TaskStatus('task-1', state=constants.CALL_RUNNING_STATE).save()
+        TaskStatus('task-2', state=constants.CALL_CANCELED_STATE).save()
+
+        member_publish = RepoGroupMemberPublish.get_collection().find_one()
+        self.publish_manager.expire_member_publish(member_publish)
+
+        # only the member whose task ended is reported, the running one is waited for
+        member_publish = RepoGroupMemberPublish.get_collection().find_one()
+        self.assertEqual(member_publish['remaining'], 1)
+        self.assertEqual(member_publish['member_results'][0]['repo_id'], 'repo-2')
+        self.assertEqual(member_publish['member_results'][0]['task_id'], 'task-2')
+        self.assertFalse(mock_plugins.MOCK_GROUP_DISTRIBUTOR.finish_publish_group.called)
+
+
+@mock.patch('pulp.server.managers.repo.group.publish.RepoGroupPublishManager.record_member_error')
+class MemberPublishTaskTests(unittest.TestCase):
+
+    @mock.patch('pulp.server.async.tasks.Task.on_success')
+    def test_on_success(self, mock_on_success, mock_record_member_error):
+        publish.publish_member.on_success(None, 'task-1', ['member-publish', 'repo-1', None], {})
+
+        mock_on_success.assert_called_once_with(None, 'task-1', ['member-publish', 'repo-1', None],
+                                                {})
+        mock_record_member_error.assert_called_once_with('member-publish', 'repo-1', 'task-1',
+                                                         'The member publish was canceled')
+
+    @mock.patch('pulp.server.async.tasks.Task.on_failure')
+    def test_on_failure(self, mock_on_failure, mock_record_member_error):
+        publish.publish_member.on_failure(ValueError('boom'), 'task-1',
+                                          ['member-publish', 'repo-1', None], {}, None)
+
+        self.assertEqual(mock_on_failure.call_count, 1)
+        mock_record_member_error.assert_called_once_with('member-publish', 'repo-1', 'task-1',
+                                                         'boom')
+
+    @mock.patch('pulp.server.async.tasks.Task.on_failure')
+    def test_on_failure_record_error(self, mock_on_failure, mock_record_member_error):
+        mock_record_member_error.side_effect = ValueError('database')
+
+        # recording is best effort, the handler does not raise
+        publish.publish_member.on_failure(ValueError('boom'), 'task-1',
+                                          ['member-publish', 'repo-1', None], {}, None)
+
+    def test_revoked(self, mock_record_member_error):
+        request = mock.MagicMock(id='task-1', args=['member-publish', 'repo-1', None])
+
+        publish._member_publish_revoked(sender=publish.publish_member, request=request)
+
+        mock_record_member_error.assert_called_once_with('member-publish', 'repo-1', 'task-1',
+                                                         'The member publish was canceled')
+
+    def test_revoked_other_task(self, mock_record_member_error):
+        request = mock.MagicMock(id='task-1', args=['group', 'distributor'])
+
+        publish._member_publish_revoked(sender=publish.publish, request=request)
+
+        self.assertFalse(mock_record_member_error.called)
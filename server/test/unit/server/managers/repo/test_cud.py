@@ -12,7 +12,7 @@ from pulp.devel import mock_plugins
 from pulp.plugins.loader import api as plugin_api
 from pulp.server.async.tasks import TaskResult
 from pulp.server.db.model import dispatch
-from pulp.server.db.model.repository import Repo, RepoImporter, RepoDistributor
+from pulp.server.db.model.repository import Repo, RepoContentUnit, RepoImporter, RepoDistributor
 from pulp.server.db.model.resources import Worker
 from pulp.server.tasks import repository
 import pulp.server.exceptions as exceptions
@@ -50,23 +50,25 @@ class RepoManagerTests(base.ResourceReservationTests):
         # platform migration 0004 has a test for this that uses live data
 
         repo_col = mock_get_repo_col.return_value
-        find = mock_get_assoc_col.return_value.find
-        cursor = find.return_value
-        cursor.distinct.return_value = ['rpm', 'srpm']
-        cursor.count.return_value = 6
+        aggregate = mock_get_assoc_col.return_value.aggregate
+        aggregate.return_value = {'result': [
+            {'_id': {'repo_id': 'repo1', 'unit_type_id': 'rpm'}, 'count': 6},
+            {'_id': {'repo_id': 'repo1', 'unit_type_id': 'srpm'}, 'count': 2},
+        ]}
 
         self.manager.rebuild_content_unit_counts(['repo1'])
 
-        # once to get the type_ids, then once more for each of the 2 types
-        self.assertEqual(find.call_count, 3)
-        find.assert_any_call({'repo_id': 'repo1'})
-        find.assert_any_call({'repo_id': 'repo1', 'unit_type_id': 'rpm'})
-        find.assert_any_call({'repo_id': 'repo1', 'unit_type_id': 'srpm'})
+        # a single aggregation computes the counts for every type
+        self.assertEqual(aggregate.call_count, 1)
+        pipeline = aggregate.call_args[0][0]
+        self.assertEqual(pipeline[0], {'$match': {'repo_id': {'$in': ['repo1']}}})
+        self.assertEqual(pipeline[1]['$group']['_id'],
+                         {'repo_id': '$repo_id', 'unit_type_id': '$unit_type_id'})
 
         self.assertEqual(repo_col.update.call_count, 1)
         repo_col.update.assert_called_once_with(
             {'id': 'repo1'},
-            {'$set': {'content_unit_counts': {'rpm': 6, 'srpm': 6}}},
+            {'$set': {'content_unit_counts': {'rpm': 6, 'srpm': 2}}},
             safe=True
         )
 
@@ -77,15 +79,38 @@ class RepoManagerTests(base.ResourceReservationTests):
         repo_col.find.return_value = [{'id': 'repo1'}, {'id': 'repo2'}]
 
         assoc_col = mock_get_assoc_col.return_value
-        # don't return any type IDs
-        assoc_col.find.return_value.distinct.return_value = []
+        assoc_col.aggregate.return_value = {'result': [
+            {'_id': {'repo_id': 'repo2', 'unit_type_id': 'rpm'}, 'count': 3},
+        ]}
 
         self.manager.rebuild_content_unit_counts()
 
-        # makes sure it found these 2 repos and tried to operate on them
-        assoc_col.find.assert_any_call({'repo_id': 'repo1'})
-        assoc_col.find.assert_any_call({'repo_id': 'repo2'})
-        self.assertEqual(assoc_col.find.call_count, 2)
+        # all associations are grouped, and repos without any get empty counts
+        pipeline = assoc_col.aggregate.call_args[0][0]
+        self.assertEqual(len(pipeline), 1)
+        self.assertTrue('$group' in pipeline[0])
+        self.assertEqual(repo_col.update.call_count, 2)
+        repo_col.update.assert_any_call({'id': 'repo1'}, {'$set': {'content_unit_counts': {}}},
+                                        safe=True)
+        repo_col.update.assert_any_call({'id': 'repo2'},
+                                        {'$set': {'content_unit_counts': {'rpm': 3}}}, safe=True)
+
+    def test_rebuild_content_unit_counts_with_db(self):
+        self.manager.create_repo('repo1')
+        self.manager.create_repo('repo2')
+        self.manager.update_unit_count('repo2', 'rpm', 5)
+        collection = RepoContentUnit.get_collection()
+        for unit_id, unit_type_id in (('a', 'rpm'), ('b', 'rpm'), ('c', 'srpm')):
+            collection.save(RepoContentUnit('repo1', unit_id, unit_type_id, 'user', 'admin'),
+                            safe=True)
+
+        self.manager.rebuild_content_unit_counts()
+
+        repo1 = Repo.get_collection().find_one({'id': 'repo1'})
+        self.assertEqual(repo1['content_unit_counts'], {'rpm': 2, 'srpm': 1})
+        repo2 = Repo.get_collection().find_one({'id': 'repo2'})
+        self.assertEqual(repo2['content_unit_counts'], {})
+        collection.remove()
 
     def test_create(self):
         """
@@ -605,6 +630,22 @@ class RepoManagerTests(base.ResourceReservationTests):
         mock_update.assert_called_once_with({'id': 'repo-123'},
                                             {'$inc': {'content_unit_counts.rpm': 7}}, safe=True)
 
+    @mock.patch.object(Repo, 'get_collection')
+    def test_update_unit_counts(self, mock_get_collection):
+        mock_update = mock_get_collection.return_value.update
+
+        self.manager.update_unit_counts('repo-123', {'rpm': 7, 'srpm': -2, 'erratum': 0})
+
+        mock_update.assert_called_once_with(
+            {'id': 'repo-123'},
+            {'$inc': {'content_unit_counts.rpm': 7, 'content_unit_counts.srpm': -2}}, safe=True)
+
+    @mock.patch.object(Repo, 'get_collection')
+    def test_update_unit_counts_no_change(self, mock_get_collection):
+        self.manager.update_unit_counts('repo-123', {'rpm': 0})
+
+        self.assertFalse(mock_get_collection.return_value.update.called)
+
     def test_update_unit_count_with_db(self):
         """
         This test interacts with the database to ensure that the call to
@@ -634,6 +675,16 @@ class RepoManagerTests(base.ResourceReservationTests):
         set_dict = {'$set': {'field_bar': 2}}
         self.assertEquals(update_call[1], set_dict)
 
+    @mock.patch('pulp.server.managers.repo.cud.Repo.get_collection')
+    @mock.patch('pulp.server.managers.repo.cud.dateutils')
+    def test__set_current_date_on_field_advance_revision(self, mock_dateutils,
+                                                         mock_repo_collection):
+        mock_dateutils.now_utc_datetime_with_tzinfo.return_value = 2
+        self.manager._set_current_date_on_field('foo_repo', 'field_bar', advance_revision=True)
+        update_call = mock_repo_collection.return_value.update.call_args[0]
+        self.assertEquals(update_call[1], {'$set': {'field_bar': 2},
+                                           '$inc': {'content_revision': 1}})
+
     @mock.patch('pulp.server.managers.repo.cud.RepoManager._set_current_date_on_field')
     def test_update_last_unit_added(self, mock_set_date):
         self.manager.update_last_unit_added('foo')
@@ -641,6 +692,7 @@ class RepoManagerTests(base.ResourceReservationTests):
         call = mock_set_date.call_args[0]
         self.assertEquals(call[0], 'foo')
         self.assertEquals(call[1], 'last_unit_added')
+        self.assertTrue(mock_set_date.call_args[1]['advance_revision'])
 
     @mock.patch('pulp.server.managers.repo.cud.RepoManager._set_current_date_on_field')
     def test_update_last_unit_removed(self, mock_set_date):
@@ -649,6 +701,7 @@ class RepoManagerTests(base.ResourceReservationTests):
         call = mock_set_date.call_args[0]
         self.assertEquals(call[0], 'foo')
         self.assertEquals(call[1], 'last_unit_removed')
+        self.assertTrue(mock_set_date.call_args[1]['advance_revision'])
 
 
 class UtilityMethodsTests(unittest.TestCase):
@@ -1,3 +1,5 @@
+import unittest
+
 import mock
 
 from .... import base
@@ -9,6 +11,7 @@ from pulp.server.db.model.criteria import UnitAssociationCriteria
 from pulp.server.db.model.repository import Repo, RepoImporter, RepoContentUnit
 from pulp.server.exceptions import MissingResource
 from pulp.server.managers import factory as manager_factory
+from pulp.server.managers.repo import dependency
 
 
 TYPE_1_DEF = model.TypeDefinition('type-1', 'Type 1', 'Test Definition One',
@@ -26,6 +29,7 @@ class DependencyManagerTests(base.PulpServerTests):
 
         self.repo_id = 'dep-repo'
         self.manager = manager_factory.dependency_manager()
+        dependency.resolution_cache.clear()
 
         manager_factory.repo_manager().create_repo(self.repo_id)
         manager_factory.repo_importer_manager().set_importer(self.repo_id, 'mock-importer', {})
@@ -117,3 +121,100 @@ class DependencyManagerTests(base.PulpServerTests):
 
         args = mock_plugins.MOCK_IMPORTER.resolve_dependencies.call_args[0]
         self.assertEqual(1, len(args[1]))
+
+    @mock.patch('pulp.server.managers.repo._common.get_working_directory',
+                return_value="/var/cache/pulp/mock_worker/mock_task_id")
+    def test_resolve_dependencies_cached(self, mock_get_working_directory):
+        # Setup
+        mock_plugins.MOCK_IMPORTER.resolve_dependencies.return_value = {'resolved': ['dep-1']}
+
+        unit_id_1 = manager_factory.content_manager().add_content_unit('type-1', None,
+                                                                       {'key-1': 'unit-id-1'})
+        unit_id_2 = manager_factory.content_manager().add_content_unit('type-1', None,
+                                                                       {'key-1': 'dep-1'})
+
+        association_manager = manager_factory.repo_unit_association_manager()
+        association_manager.associate_unit_by_id(self.repo_id, 'type-1', unit_id_1, 'user', 'admin')
+
+        criteria = UnitAssociationCriteria(type_ids=['type-1'], unit_filters={'key-1': 'unit-id-1'})
+
+        # Test
+        first = self.manager.resolve_dependencies_by_criteria(self.repo_id, criteria, {'a': 1})
+        first['resolved'].append('changed by the caller')
+        second = self.manager.resolve_dependencies_by_criteria(self.repo_id, criteria, {'a': 1})
+
+        # Verify
+        self.assertEqual(1, mock_plugins.MOCK_IMPORTER.resolve_dependencies.call_count)
+        self.assertEqual(second, {'resolved': ['dep-1']})
+
+        # different options are resolved again
+        self.manager.resolve_dependencies_by_criteria(self.repo_id, criteria, {'a': 2})
+        self.assertEqual(2, mock_plugins.MOCK_IMPORTER.resolve_dependencies.call_count)
+
+        # so is anything after the units of the repository change
+        association_manager.associate_unit_by_id(self.repo_id, 'type-1', unit_id_2, 'user', 'admin')
+        self.manager.resolve_dependencies_by_criteria(self.repo_id, criteria, {'a': 1})
+        self.assertEqual(3, mock_plugins.MOCK_IMPORTER.resolve_dependencies.call_count)
+
+
+class ResolutionCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = dependency.ResolutionCache(size=2)
+        self.repo = {'_id': 'object-id', 'id': 'repo'}
+        self.importer = {'importer_type_id': 'type', 'config': {'b': 1, 'a': 2}}
+        self.units = [{'unit_type_id': 'rpm', 'unit_id': 'u-2'},
+                      {'unit_type_id': 'rpm', 'unit_id': 'u-1'}]
+
+    def test_key(self):
+        key = dependency.ResolutionCache.key(self.repo, self.importer, self.units, {'x': 1})
+
+        # the order of the units and of the configuration does not matter
+        self.importer['config'] = {'a': 2, 'b': 1}
+        self.assertEqual(key, dependency.ResolutionCache.key(self.repo, self.importer,
+                                                             self.units[::-1], {'x': 1}))
+
+        self.repo['content_revision'] = 1
+        self.assertNotEqual(key, dependency.ResolutionCache.key(self.repo, self.importer,
+                                                                self.units, {'x': 1}))
+
+    def test_get_missing(self):
+        self.assertRaises(KeyError, self.cache.get, 'key')
+
+    def test_least_recently_used_dropped(self):
+        self.cache.put('a', 1)
+        self.cache.put('b', 2)
+        self.cache.get('a')
+        self.cache.put('c', 3)
+
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertEqual(self.cache.get('c'), 3)
+        self.assertRaises(KeyError, self.cache.get, 'b')
+
+    def test_reports_copied(self):
+        report = {'resolved': []}
+        self.cache.put('a', report)
+        report['resolved'].append('x')
+        self.cache.get('a')['resolved'].append('y')
+
+        self.assertEqual(self.cache.get('a'), {'resolved': []})
+
+    def test_put_existing_key(self):
+        self.cache.put('a', 1)
+        self.cache.put('b', 2)
+        self.cache.put('a', 3)
+        self.cache.put('c', 4)
+
+        self.assertEqual(self.cache.get('a'), 3)
+        self.assertEqual(self.cache.get('c'), 4)
+        self.assertRaises(KeyError, self.cache.get, 'b')
+
+    def test_clear(self):
+        self.cache.put('a', 1)
+        self.cache.clear()
+        self.cache.put('b', 2)
+        self.cache.put('c', 3)
+
+        self.assertRaises(KeyError, self.cache.get, 'a')
+        self.assertEqual(self.cache.get('b'), 2)
+        self.assertEqual(self.cache.get('c'), 3)
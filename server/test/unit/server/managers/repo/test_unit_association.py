@@ -537,6 +537,58 @@ class RepoUnitAssociationManagerTests(base.PulpServerTests):
             self.repo_id, 'type-1', 'unit-1', OWNER_TYPE_USER, 'admin1')
         self.assertEqual(mock_call.call_count, 1)  # only once for the associates
 
+    @mock.patch('pulp.server.managers.repo.cud.RepoManager.update_last_unit_added')
+    @mock.patch('pulp.server.managers.repo.cud.RepoManager.update_unit_counts')
+    @mock.patch('pulp.server.managers.repo.cud.RepoManager.update_unit_count')
+    def test_batch_repo_metadata(self, mock_count, mock_counts, mock_added):
+        with association_manager.batch_repo_metadata():
+            self.manager.associate_unit_by_id(
+                self.repo_id, 'type-1', 'unit-1', OWNER_TYPE_USER, 'admin')
+            self.manager.associate_unit_by_id(
+                self.repo_id, 'type-1', 'unit-2', OWNER_TYPE_USER, 'admin')
+            with association_manager.batch_repo_metadata():
+                self.manager.associate_unit_by_id(
+                    self.repo_id, 'type-2', 'unit-1', OWNER_TYPE_USER, 'admin')
+            # nothing is written until the outermost batch exits
+            self.assertFalse(mock_counts.called)
+            self.assertFalse(mock_added.called)
+
+        self.assertFalse(mock_count.called)
+        mock_counts.assert_called_once_with(self.repo_id, {'type-1': 2, 'type-2': 1})
+        mock_added.assert_called_once_with(self.repo_id)
+
+        # associations were saved right away
+        self.assertEqual(3, RepoContentUnit.get_collection().find(
+            {'repo_id': self.repo_id}).count())
+
+    @mock.patch('pulp.server.managers.repo.cud.RepoManager.update_unit_count')
+    def test_batch_repo_metadata_written_on_error(self, mock_count):
+        try:
+            with association_manager.batch_repo_metadata():
+                self.manager.associate_unit_by_id(
+                    self.repo_id, 'type-1', 'unit-1', OWNER_TYPE_USER, 'admin')
+                raise ValueError()
+        except ValueError:
+            pass
+
+        mock_count.assert_called_once_with(self.repo_id, 'type-1', 1)
+
+    @mock.patch('pulp.server.managers.repo._common.get_working_directory',
+                return_value="/var/cache/pulp/mock_worker/mock_task_id")
+    @mock.patch('pulp.server.managers.repo.cud.RepoManager.update_last_unit_removed')
+    @mock.patch('pulp.server.managers.repo.cud.RepoManager.update_unit_count')
+    def test_batch_repo_metadata_net_delta(self, mock_count, mock_removed,
+                                           mock_get_working_directory):
+        with association_manager.batch_repo_metadata():
+            self.manager.associate_unit_by_id(
+                self.repo_id, self.unit_type_id, self.unit_id, OWNER_TYPE_USER, 'admin')
+            self.manager.unassociate_unit_by_id(
+                self.repo_id, self.unit_type_id, self.unit_id, OWNER_TYPE_USER, 'admin')
+
+        # the add and the removal cancel out
+        self.assertFalse(mock_count.called)
+        mock_removed.assert_called_once_with(self.repo_id)
+
     @mock.patch('pymongo.cursor.Cursor.count', return_value=1)
     def test_association_exists_true(self, mock_count):
         self.assertTrue(self.manager.association_exists(self.repo_id, 'unit-1', 'type-1'))
@@ -216,6 +216,13 @@ class TestDelete(unittest.TestCase):
 
         mock_get_collection.assert_called_once_with()
 
+    @mock.patch('pulp.server.managers.schedule.utils.ScheduledCallChange')
+    @mock.patch('pulp.server.db.model.dispatch.ScheduledCall.get_collection')
+    def test_records_change(self, mock_get_collection, mock_change):
+        utils.delete(self.schedule_id)
+
+        mock_change.record.assert_called_once_with([self.schedule_id])
+
     def test_invalid_schedule_id(self):
         self.assertRaises(exceptions.InvalidValue, utils.delete, 'notavalidid')
 
@@ -223,12 +230,36 @@ class TestDelete(unittest.TestCase):
 class TestDeleteByResource(unittest.TestCase):
     @mock.patch('pulp.server.db.model.dispatch.ScheduledCall.get_collection')
     def test_calls_remove(self, mock_get_collection):
+        object_id = ObjectId('529f4bd93de3a31d0ec77338')
+        mock_get_collection.return_value.find.return_value = [{'_id': object_id}]
         mock_remove = mock_get_collection.return_value.remove
         mock_remove.return_value = None
 
         utils.delete_by_resource('resource1')
 
-        mock_remove.assert_called_once_with({'resource': 'resource1'}, safe=True)
+        mock_find = mock_get_collection.return_value.find
+        mock_find.assert_called_once_with({'resource': 'resource1'}, fields=['_id'])
+        mock_remove.assert_called_once_with({'_id': {'$in': [object_id]}}, safe=True)
+
+    @mock.patch('pulp.server.managers.schedule.utils.ScheduledCallChange')
+    @mock.patch('pulp.server.db.model.dispatch.ScheduledCall.get_collection')
+    def test_records_change(self, mock_get_collection, mock_change):
+        mock_get_collection.return_value.find.return_value = [
+            {'_id': ObjectId('529f4bd93de3a31d0ec77338')}]
+
+        utils.delete_by_resource('resource1')
+
+        mock_change.record.assert_called_once_with(['529f4bd93de3a31d0ec77338'])
+
+    @mock.patch('pulp.server.managers.schedule.utils.ScheduledCallChange')
+    @mock.patch('pulp.server.db.model.dispatch.ScheduledCall.get_collection')
+    def test_no_schedules(self, mock_get_collection, mock_change):
+        mock_get_collection.return_value.find.return_value = []
+
+        utils.delete_by_resource('resource1')
+
+        self.assertEqual(mock_get_collection.return_value.remove.call_count, 0)
+        self.assertEqual(mock_change.record.call_count, 0)
 
 
 class TestUpdate(unittest.TestCase):
@@ -290,6 +321,15 @@ class TestUpdate(unittest.TestCase):
 
         mock_get_collection.assert_called_once_with()
 
+    @mock.patch('pulp.server.managers.schedule.utils.ScheduledCallChange')
+    @mock.patch('pulp.server.db.model.dispatch.ScheduledCall.get_collection')
+    def test_records_change(self, mock_get_collection, mock_change):
+        mock_get_collection.return_value.find_and_modify.return_value = SCHEDULES[0].copy()
+
+        utils.update(self.schedule_id, {'enabled': False})
+
+        mock_change.record.assert_called_once_with([self.schedule_id])
+
     def test_unknown_key(self):
         self.assertRaises(exceptions.UnsupportedValue, utils.update,
                           self.schedule_id, {'foo': 'bar'})
@@ -334,6 +374,13 @@ class TestResetFailureCount(unittest.TestCase):
 
         mock_get_collection.assert_called_once_with()
 
+    @mock.patch('pulp.server.managers.schedule.utils.ScheduledCallChange')
+    @mock.patch('pulp.server.db.model.dispatch.ScheduledCall.get_collection')
+    def test_records_change(self, mock_get_collection, mock_change):
+        utils.reset_failure_count(self.schedule_id)
+
+        mock_change.record.assert_called_once_with([self.schedule_id])
+
     def test_invalid_schedule_id(self):
         self.assertRaises(exceptions.InvalidValue, utils.reset_failure_count, 'notavalidid')
 
@@ -10,7 +10,7 @@ import pymongo
 from ...base import ResourceReservationTests
 from pulp.server.exceptions import NoWorkers
 from pulp.server.db.model.criteria import Criteria
-from pulp.server.db.model.resources import Worker
+from pulp.server.db.model.resources import ReservedResource, Worker
 from pulp.server.managers import resources
 
 
@@ -128,14 +128,15 @@ class TestGetUnreservedWorker(ResourceReservationTests):
         super(TestGetUnreservedWorker, self).tearDown()
 
     def test_workers_correctly_queried(self):
-        self.mock_filter_workers.return_value = [{'name': 'a'}, {'name': 'b'}]
+        distinct = self.mock_resources.ReservedResource.get_collection.return_value.distinct
+        distinct.return_value = ['a']
+        self.mock_filter_workers.return_value = [{'name': 'b'}]
         resources.get_unreserved_worker()
-        self.mock_criteria.Criteria.assert_called_once_with()
+        self.mock_criteria.Criteria.assert_called_once_with(filters={'_id': {'$nin': ['a']}})
         self.mock_filter_workers.assert_called_once_with(self.mock_criteria.Criteria.return_value)
 
     def test_reserved_resources_queried_correctly(self):
-        find = self.mock_resources.ReservedResource.get_collection.return_value.find
-        find.return_value = [{'worker_name': 'a'}, {'worker_name': 'b'}]
+        self.mock_filter_workers.return_value = []
         try:
             resources.get_unreserved_worker()
         except NoWorkers:
@@ -143,19 +144,22 @@ class TestGetUnreservedWorker(ResourceReservationTests):
         else:
             self.fail("NoWorkers() Exception should have been raised.")
         self.mock_resources.ReservedResource.get_collection.assert_called_once_with()
-        find.assert_called_once_with()
+        distinct = self.mock_resources.ReservedResource.get_collection.return_value.distinct
+        distinct.assert_called_once_with('worker_name')
 
     def test_worker_returned_when_one_worker_is_not_reserved(self):
-        self.mock_filter_workers.return_value = [{'name': 'a'}, {'name': 'b'}]
-        find = self.mock_resources.ReservedResource.get_collection.return_value.find
-        find.return_value = [{'worker_name': 'a'}]
+        self.mock_filter_workers.return_value = [{'name': 'b'}]
+        result = resources.get_unreserved_worker()
+        self.assertEqual(result, {'name': 'b'})
+
+    def test_non_workers_skipped(self):
+        self.mock_filter_workers.return_value = [{'name': 'resource_manager@some.hostname'},
+                                                 {'name': 'b'}]
         result = resources.get_unreserved_worker()
         self.assertEqual(result, {'name': 'b'})
 
     def test_no_workers_raised_when_all_workers_reserved(self):
-        self.mock_filter_workers.return_value = [{'name': 'a'}, {'name': 'b'}]
-        find = self.mock_resources.ReservedResource.get_collection.return_value.find
-        find.return_value = [{'worker_name': 'a'}, {'worker_name': 'b'}]
+        self.mock_filter_workers.return_value = [{'name': 'scheduler@some.hostname'}]
         try:
             resources.get_unreserved_worker()
         except NoWorkers:
@@ -165,8 +169,6 @@ class TestGetUnreservedWorker(ResourceReservationTests):
 
     def test_no_workers_raised_when_there_are_no_workers(self):
         self.mock_filter_workers.return_value = []
-        find = self.mock_resources.ReservedResource.get_collection.return_value.find
-        find.return_value = [{'worker_name': 'a'}, {'worker_name': 'b'}]
         try:
             resources.get_unreserved_worker()
         except NoWorkers:
@@ -182,3 +184,64 @@ class TestGetUnreservedWorker(ResourceReservationTests):
 
     def test_is_not_worker_is_resource_mgr(self):
         self.assertEquals(resources._is_worker("resource_manager@some.hostname"), False)
+
+
+class TestGetReservingWorkerNames(ResourceReservationTests):
+
+    def test_names_of_reserved_resources(self):
+        ReservedResource('task-1', 'worker-1', 'resource-1').save()
+        ReservedResource('task-2', 'worker-2', 'resource-2').save()
+
+        names = resources.get_reserving_worker_names(['resource-1', 'resource-3'])
+
+        self.assertEqual(names, {'resource-1': 'worker-1'})
+
+
+class TestReservationRequests(ResourceReservationTests):
+
+    def test_queued_in_order(self):
+        resources.queue_reservation_request('task-1', 'resource-1', 'some.task', [], {})
+        resources.queue_reservation_request('task-2', 'resource-2', 'some.task', [], {})
+        resources.queue_reservation_request('task-3', 'resource-1', 'some.task', [], {})
+
+        self.assertEqual(list(resources.get_reservation_requests()),
+                         [{'task_id': 'task-1', 'resource_id': 'resource-1'},
+                          {'task_id': 'task-2', 'resource_id': 'resource-2'},
+                          {'task_id': 'task-3', 'resource_id': 'resource-1'}])
+
+    def test_queued_twice_keeps_place(self):
+        resources.queue_reservation_request('task-1', 'resource-1', 'some.task', [], {})
+        resources.queue_reservation_request('task-2', 'resource-1', 'some.task', [], {})
+        resources.queue_reservation_request('task-1', 'resource-1', 'some.task', [], {})
+
+        task_ids = [r['task_id'] for r in resources.get_reservation_requests()]
+        self.assertEqual(task_ids, ['task-1', 'task-2'])
+
+    def test_pop(self):
+        resources.queue_reservation_request('task-1', 'resource-1', 'some.task', [1], {'a': 2})
+
+        request = resources.pop_reservation_request('task-1')
+
+        self.assertEqual(request.task_name, 'some.task')
+        self.assertEqual(request.resource_id, 'resource-1')
+        self.assertEqual(request.inner_args, [1])
+        self.assertEqual(request.inner_kwargs, {'a': 2})
+        self.assertEqual(list(resources.get_reservation_requests()), [])
+        self.assertEqual(resources.pop_reservation_request('task-1'), None)
+
+
+@mock.patch('pulp.server.managers.resources.celery')
+class TestNotifyReservationEvent(ResourceReservationTests):
+
+    def test_wakes_dispatcher(self, mock_celery):
+        resources.queue_reservation_request('task-1', 'resource-1', 'some.task', [], {})
+
+        resources.notify_reservation_event('resource released')
+
+        mock_celery.send_task.assert_called_once_with(resources.DISPATCH_TASK_NAME,
+                                                      queue=resources.RESOURCE_MANAGER_QUEUE)
+
+    def test_nothing_waiting(self, mock_celery):
+        resources.notify_reservation_event('resource released')
+
+        self.assertFalse(mock_celery.send_task.called)
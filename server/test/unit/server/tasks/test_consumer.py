@@ -2,7 +2,9 @@ import unittest
 
 from mock import patch
 
+from pulp.common import error_codes
 from pulp.server.async.tasks import TaskResult
+from pulp.server.db.model.dispatch import TaskStatus
 from pulp.server.tasks import consumer
 
 
@@ -116,6 +118,57 @@ class TestForceUnbind(unittest.TestCase):
         self.assertEquals(result.spawned_tasks, [{'task_id': 'foo-request-id'}])
 
 
+class TestUnbindAll(unittest.TestCase):
+
+    @patch('pulp.server.tasks.consumer.NOTIFY_BATCH_SIZE', 2)
+    @patch('pulp.server.tasks.consumer.notify_unbind')
+    @patch('pulp.server.tasks.consumer.managers')
+    def test_unbind_all(self, mock_factory, mock_notify):
+        bindings = [{'consumer_id': c, 'repo_id': 'repo', 'distributor_id': d}
+                    for c, d in (('a', 'd1'), ('b', 'd1'), ('c', 'd1'), ('d', 'd2'))]
+        mock_factory.consumer_bind_manager.return_value.unbind_by_repo.return_value = bindings
+        mock_notify.apply_async.side_effect = ['t1', 't2', 't3']
+
+        spawned_tasks = consumer.unbind_all('repo', None, {'bar': 'baz'})
+
+        mock_factory.consumer_bind_manager.return_value.unbind_by_repo.assert_called_once_with(
+            'repo', None)
+        self.assertEqual(spawned_tasks, ['t1', 't2', 't3'])
+        batches = [c[0][0][0] for c in mock_notify.apply_async.call_args_list]
+        self.assertEqual(batches, [bindings[:2], bindings[2:3], bindings[3:]])
+        # the agents are not notified by the caller
+        self.assertFalse(mock_factory.consumer_agent_manager.called)
+
+    @patch('pulp.server.tasks.consumer.notify_unbind')
+    @patch('pulp.server.tasks.consumer.managers')
+    def test_unbind_all_no_bindings(self, mock_factory, mock_notify):
+        mock_factory.consumer_bind_manager.return_value.unbind_by_repo.return_value = []
+
+        spawned_tasks = consumer.unbind_all('repo', 'dist', {})
+
+        self.assertEqual(spawned_tasks, [])
+        self.assertFalse(mock_notify.apply_async.called)
+
+
+class TestNotifyUnbind(unittest.TestCase):
+
+    @patch('pulp.server.tasks.consumer.managers')
+    def test_notify_unbind(self, mock_factory):
+        bindings = [{'consumer_id': 'a', 'repo_id': 'repo', 'distributor_id': 'dist'}]
+        error = ValueError()
+        task = TaskStatus('foo-request-id', 'agent')
+        mock_factory.consumer_agent_manager.return_value.unbind_all.return_value = (
+            [task], [error])
+
+        result = consumer.notify_unbind.run(bindings, {'bar': 'baz'})
+
+        mock_factory.consumer_agent_manager.return_value.unbind_all.assert_called_once_with(
+            bindings, {'bar': 'baz'})
+        self.assertEquals(result.spawned_tasks, [{'task_id': 'foo-request-id'}])
+        self.assertEquals(result.error.error_code, error_codes.PLP0002)
+        self.assertEquals(result.error.child_exceptions, [error])
+
+
 class TestInstallContent(unittest.TestCase):
 
     @patch('pulp.server.tasks.consumer.managers')
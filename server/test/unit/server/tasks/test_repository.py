@@ -18,31 +18,28 @@ class TestDelete(PulpCeleryTaskTests):
     @patch('pulp.server.managers.factory.consumer_bind_manager')
     @patch('pulp.server.managers.factory.repo_manager')
     def test_delete_no_bindings(self, mock_repo_manager, mock_bind_manager):
+        mock_bind_manager.return_value.unbind_by_repo.return_value = []
         result = repository.delete('foo-repo')
         mock_repo_manager.return_value.delete_repo.assert_called_with('foo-repo')
+        mock_bind_manager.return_value.unbind_by_repo.assert_called_once_with('foo-repo', None)
         self.assertTrue(isinstance(result, TaskResult))
+        self.assertEquals(result.spawned_tasks, [])
 
-    @patch('pulp.server.tasks.consumer.unbind')
-    @patch('pulp.server.managers.factory.consumer_bind_manager')
+    @patch('pulp.server.tasks.consumer.unbind_all')
     @patch('pulp.server.managers.factory.repo_manager')
-    def test_delete_with_bindings(self, mock_repo_manager, mock_bind_manager, mock_unbind):
-        mock_bind_manager.return_value.find_by_repo.return_value = [
-            {'consumer_id': 'foo', 'repo_id': 'repo-foo', 'distributor_id': 'dist-id'}]
-        mock_unbind.return_value = TaskResult(spawned_tasks=[{'task_id': 'foo-request-id'}])
+    def test_delete_with_bindings(self, mock_repo_manager, mock_unbind_all):
+        mock_unbind_all.return_value = [{'task_id': 'foo-request-id'}]
         result = repository.delete('foo-repo')
-        mock_unbind.assert_called_once_with('foo', 'repo-foo', 'dist-id', ANY)
+        mock_unbind_all.assert_called_once_with('foo-repo', None, ANY)
         self.assertEquals(result.spawned_tasks[0], {'task_id': 'foo-request-id'})
 
-    @patch('pulp.server.tasks.consumer.unbind')
-    @patch('pulp.server.managers.factory.consumer_bind_manager')
+    @patch('pulp.server.tasks.consumer.unbind_all')
     @patch('pulp.server.managers.factory.repo_manager')
-    def test_delete_with_bindings_errors(self, mock_repo_manager, mock_bind_manager, mock_unbind):
-        mock_bind_manager.return_value.find_by_repo.return_value = [
-            {'consumer_id': 'foo', 'repo_id': 'repo-foo', 'distributor_id': 'dist-id'}]
+    def test_delete_with_bindings_errors(self, mock_repo_manager, mock_unbind_all):
         side_effect_exception = PulpException('foo')
-        mock_unbind.side_effect = side_effect_exception
+        mock_unbind_all.side_effect = side_effect_exception
         result = repository.delete('foo-repo')
-        mock_unbind.assert_called_once_with('foo', 'repo-foo', 'dist-id', ANY)
+        mock_unbind_all.assert_called_once_with('foo-repo', None, ANY)
         self.assertTrue(isinstance(result.error, PulpException))
         self.assertEquals(result.error.error_code, error_codes.PLP0007)
         error_dict = result.error.to_dict()
@@ -56,39 +53,30 @@ class TestDistributorDelete(PulpCeleryTaskTests):
     @patch('pulp.server.managers.factory.consumer_bind_manager')
     @patch('pulp.server.managers.factory.repo_distributor_manager')
     def test_distributor_delete_no_bindings(self, mock_dist_manager, mock_bind_manager):
+        mock_bind_manager.return_value.unbind_by_repo.return_value = []
         result = repository.distributor_delete('foo-id', 'bar-id')
         mock_dist_manager.return_value.remove_distributor.assert_called_with('foo-id', 'bar-id')
+        mock_bind_manager.return_value.unbind_by_repo.assert_called_once_with('foo-id', 'bar-id')
         self.assertTrue(isinstance(result, TaskResult))
 
-    @patch('pulp.server.tasks.consumer.unbind')
-    @patch('pulp.server.managers.factory.consumer_bind_manager')
+    @patch('pulp.server.tasks.consumer.unbind_all')
     @patch('pulp.server.managers.factory.repo_distributor_manager')
-    def test_distributor_delete_with_bindings(self, mock_dist_manager, mock_bind_manager,
-                                              mock_unbind):
-        mock_bind_manager.return_value.find_by_distributor.return_value = [
-            {'consumer_id': 'foo', 'repo_id': 'repo-foo', 'distributor_id': 'dist-id'}]
-        mock_unbind.return_value = TaskResult(spawned_tasks=[{'task_id': 'foo-request-id'}])
+    def test_distributor_delete_with_bindings(self, mock_dist_manager, mock_unbind_all):
+        mock_unbind_all.return_value = [{'task_id': 'foo-request-id'}]
         result = repository.distributor_delete('foo-id', 'bar-id')
         mock_dist_manager.return_value.remove_distributor.assert_called_with('foo-id', 'bar-id')
-        mock_unbind.assert_called_once_with('foo', 'repo-foo', 'dist-id', ANY)
+        mock_unbind_all.assert_called_once_with('foo-id', 'bar-id', ANY)
         self.assertEquals(result.spawned_tasks[0], {'task_id': 'foo-request-id'})
 
-    @patch('pulp.server.tasks.consumer.unbind')
-    @patch('pulp.server.managers.factory.consumer_bind_manager')
+    @patch('pulp.server.tasks.consumer.unbind_all')
     @patch('pulp.server.managers.factory.repo_distributor_manager')
-    def test_distributor_delete_with_agent_errors(self, mock_dist_manager, mock_bind_manager,
-                                                  mock_unbind):
-        mock_bind_manager.return_value.find_by_repo.return_value = [
-            {'consumer_id': 'foo', 'repo_id': 'repo-foo', 'distributor_id': 'dist-id'}]
-
-        mock_bind_manager.return_value.find_by_distributor.return_value = [
-            {'consumer_id': 'foo', 'repo_id': 'repo-foo', 'distributor_id': 'dist-id'}]
+    def test_distributor_delete_with_errors(self, mock_dist_manager, mock_unbind_all):
         side_effect_exception = PulpException('foo')
-        mock_unbind.side_effect = side_effect_exception
+        mock_unbind_all.side_effect = side_effect_exception
 
         result = repository.distributor_delete('foo-id', 'bar-id')
 
-        mock_unbind.assert_called_once_with('foo', 'repo-foo', 'dist-id', ANY)
+        mock_unbind_all.assert_called_once_with('foo-id', 'bar-id', ANY)
         self.assertTrue(isinstance(result.error, PulpException))
         self.assertEquals(result.error.error_code, error_codes.PLP0003)
         self.assertEquals(result.error.child_exceptions[0], side_effect_exception)
@@ -1001,6 +1001,37 @@ class TestProfilesNoWSGI(PulpWebservicesTests):
 
         self.validate_auth(authorization.CREATE)
 
+    @mock.patch('pulp.server.webservices.controllers.consumers.Profiles.ok')
+    @mock.patch('pulp.server.tasks.consumer.managers.consumer_profile_manager')
+    def test_post_hash(self, mock_manager, mock_ok):
+        # Setup
+        profiles = consumers.Profiles()
+        profiles.params = mock.Mock(return_value={'content_type': 'bar', 'profile_hash': 'h'})
+        mock_manager.return_value.confirm.return_value = {'profile_hash': 'h'}
+
+        # Test
+        profiles.POST('consumer-foo')
+        mock_manager.return_value.confirm.assert_called_once_with('consumer-foo', 'bar', 'h')
+        self.assertFalse(mock_manager.return_value.create.called)
+        uri_path = self.get_mock_uri_path('consumer-foo', 'bar')
+        compare_dict(mock_ok.mock_calls[0][1][0], {'profile_hash': 'h', '_href': uri_path})
+
+    @mock.patch('pulp.server.webservices.controllers.consumers.Profiles.ok')
+    @mock.patch('pulp.server.tasks.consumer.managers.consumer_profile_manager')
+    def test_post_delta(self, mock_manager, mock_ok):
+        # Setup
+        delta = {'added': ['x'], 'removed': []}
+        profiles = consumers.Profiles()
+        profiles.params = mock.Mock(
+            return_value={'content_type': 'bar', 'profile_hash': 'h', 'delta': delta})
+        mock_manager.return_value.update_delta.return_value = {'profile_hash': 'h2'}
+
+        # Test
+        profiles.POST('consumer-foo')
+        mock_manager.return_value.update_delta.assert_called_once_with(
+            'consumer-foo', 'bar', 'h', delta)
+        self.assertFalse(mock_manager.return_value.create.called)
+
 
 class TestProfileNoWSGI(PulpWebservicesTests):
 
@@ -1147,6 +1178,116 @@ class TestConsumerHistory(PulpWebservicesTests):
         mock_ok.assert_called_with([{'consumer': 'history'}])
         self.assertEqual(response.status, 200)
 
+    @mock.patch('pulp.server.webservices.controllers.consumers.ConsumerHistory.filters')
+    @mock.patch('pulp.server.webservices.controllers.consumers.managers')
+    @mock.patch('pulp.server.webservices.controllers.consumers.ConsumerHistory.ok')
+    def test_get_consumer_history_page(self, mock_ok, mock_managers, mock_filters):
+        """
+        Test that the limit and the ID of the last event of the previous page are passed
+        to the manager.
+        """
+        consumer_history = consumers.ConsumerHistory()
+        mock_filters.return_value = {'limit': ['10'], 'after': ['abc123'],
+                                     'sort': ['ascending']}
+        mock_db = mock_managers.consumer_history_manager.return_value
+        mock_db.query.return_value = [{'consumer': 'history'}]
+
+        consumer_history.GET('test-consumer-history')
+
+        mock_db.query.assert_called_once_with(consumer_id='test-consumer-history',
+                                              event_type=None, limit=10, sort='ascending',
+                                              start_date=None, end_date=None, after='abc123')
+        mock_ok.assert_called_with([{'consumer': 'history'}])
+
+    @mock.patch('pulp.server.webservices.controllers.consumers.ConsumerHistory.filters')
+    @mock.patch('pulp.server.webservices.controllers.consumers.managers')
+    @mock.patch('pulp.server.webservices.controllers.consumers.ConsumerHistory.ok')
+    def test_get_consumer_history_default_limit(self, mock_ok, mock_managers, mock_filters):
+        """
+        Test that a page is limited to the default size when no limit is given.
+        """
+        consumer_history = consumers.ConsumerHistory()
+        mock_filters.return_value = {}
+        mock_db = mock_managers.consumer_history_manager.return_value
+        mock_db.query.return_value = [{'consumer': 'history'}]
+
+        consumer_history.GET('test-consumer-history')
+
+        self.assertEqual(mock_db.query.call_args[1]['limit'],
+                         consumers.CONSUMER_HISTORY_DEFAULT_LIMIT)
+
+    @mock.patch('pulp.server.webservices.controllers.consumers.ConsumerHistory.filters')
+    @mock.patch('pulp.server.webservices.controllers.consumers.managers')
+    @mock.patch('pulp.server.webservices.controllers.consumers.ConsumerHistory.ok')
+    def test_get_consumer_history_max_limit(self, mock_ok, mock_managers, mock_filters):
+        """
+        Test that a limit above the maximum page size is lowered to the maximum.
+        """
+        consumer_history = consumers.ConsumerHistory()
+        limit = consumers.CONSUMER_HISTORY_MAX_LIMIT + 1
+        mock_filters.return_value = {'limit': [str(limit)]}
+        mock_db = mock_managers.consumer_history_manager.return_value
+        mock_db.query.return_value = [{'consumer': 'history'}]
+
+        consumer_history.GET('test-consumer-history')
+
+        self.assertEqual(mock_db.query.call_args[1]['limit'],
+                         consumers.CONSUMER_HISTORY_MAX_LIMIT)
+
+    @mock.patch('pulp.server.webservices.controllers.consumers.ConsumerHistory.filters')
+    @mock.patch('pulp.server.webservices.controllers.consumers.managers')
+    def test_get_consumer_history_invalid_limit(self, mock_managers, mock_filters):
+        """
+        Test that a limit that is not a number is rejected.
+        """
+        consumer_history = consumers.ConsumerHistory()
+        mock_filters.return_value = {'limit': ['many']}
+
+        self.assertRaises(InvalidValue, consumer_history.GET, 'test-consumer-history')
+        self.assertFalse(mock_managers.consumer_history_manager.return_value.query.called)
+
+    @mock.patch('pulp.server.webservices.controllers.consumers.http')
+    @mock.patch('pulp.server.webservices.controllers.consumers.ConsumerHistory.filters')
+    @mock.patch('pulp.server.webservices.controllers.consumers.managers')
+    @mock.patch('pulp.server.webservices.controllers.consumers.ConsumerHistory.ok')
+    def test_get_consumer_history_next_page(self, mock_ok, mock_managers, mock_filters,
+                                            mock_http):
+        """
+        Test that a full page links to the next page, keeping the other filters.
+        """
+        consumer_history = consumers.ConsumerHistory()
+        mock_filters.return_value = {'limit': ['2'], 'after': ['abc123'],
+                                     'event_type': ['consumer_registered']}
+        mock_db = mock_managers.consumer_history_manager.return_value
+        mock_db.query.return_value = [{'_id': 'e1'}, {'_id': 'e2'}]
+        mock_http.uri_path.return_value = '/pulp/api/v2/consumers/c1/history/'
+
+        consumer_history.GET('c1')
+
+        mock_http.header.assert_called_once_with(
+            'Link', '</pulp/api/v2/consumers/c1/history/'
+                    '?event_type=consumer_registered&limit=2&after=e2>; rel="next"')
+        mock_ok.assert_called_once_with([{'_id': 'e1'}, {'_id': 'e2'}])
+
+    @mock.patch('pulp.server.webservices.controllers.consumers.http')
+    @mock.patch('pulp.server.webservices.controllers.consumers.ConsumerHistory.filters')
+    @mock.patch('pulp.server.webservices.controllers.consumers.managers')
+    @mock.patch('pulp.server.webservices.controllers.consumers.ConsumerHistory.ok')
+    def test_get_consumer_history_last_page(self, mock_ok, mock_managers, mock_filters,
+                                            mock_http):
+        """
+        Test that a page that is not full does not link to a next page.
+        """
+        consumer_history = consumers.ConsumerHistory()
+        mock_filters.return_value = {'limit': ['2']}
+        mock_db = mock_managers.consumer_history_manager.return_value
+        mock_db.query.return_value = [{'_id': 'e1'}]
+
+        consumer_history.GET('c1')
+
+        self.assertFalse(mock_http.header.called)
+        mock_ok.assert_called_once_with([{'_id': 'e1'}])
+
     @mock.patch('pulp.server.webservices.controllers.consumers.ConsumerHistory.filters')
     @mock.patch('pulp.server.webservices.controllers.consumers.managers')
     @mock.patch('pulp.server.webservices.controllers.consumers.ConsumerHistory.not_found')
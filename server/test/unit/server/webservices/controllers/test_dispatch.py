@@ -111,6 +111,48 @@ class TestTaskResource(PulpWebservicesTests):
         self.assertTrue(result_json['task_id'] == task_id)
 
 
+class TestTaskStatusCollection(base.PulpWebserviceTests):
+    """
+    Test the TaskStatusCollection class.
+    """
+    def setUp(self):
+        super(TestTaskStatusCollection, self).setUp()
+        TaskStatus.objects().delete()
+
+    def tearDown(self):
+        super(TestTaskStatusCollection, self).tearDown()
+        TaskStatus.objects().delete()
+
+    def test_POST(self):
+        TaskStatus('t1', 'worker_1', state='waiting').save()
+        TaskStatus('t2', 'worker_2', state='running').save()
+        TaskStatus('t3', 'worker_3', state='running').save()
+
+        status, body = self.post('/v2/tasks/status/', {'task_ids': ['t1', 't2']})
+
+        self.assertEqual(200, status)
+        self.assertEqual(set(['t1', 't2']), set(t['task_id'] for t in body))
+        for task in body:
+            self.assertEqual(task['_href'], serialization.dispatch.task_result_href(task)['_href'])
+
+    @mock.patch('pulp.server.async.tasks.get_task_statuses', return_value=[])
+    def test_POST_long_poll(self, mock_get):
+        params = {'task_ids': ['t1'], 'known_states': {'t1': 'waiting'}, 'timeout': 5}
+
+        status, body = self.post('/v2/tasks/status/', params)
+
+        self.assertEqual(200, status)
+        mock_get.assert_called_once_with(['t1'], known_states={'t1': 'waiting'}, timeout=5.0)
+
+    def test_POST_missing_task_ids(self):
+        status, body = self.post('/v2/tasks/status/', {})
+        self.assertEqual(400, status)
+
+    def test_POST_invalid_timeout(self):
+        status, body = self.post('/v2/tasks/status/', {'task_ids': ['t1'], 'timeout': 'soon'})
+        self.assertEqual(400, status)
+
+
 class TestTaskCollection(base.PulpWebserviceTests):
     """
     Test the TaskCollection class.
@@ -125,6 +125,71 @@ class BindManagerTests(base.PulpServerTests):
         self.assertTrue(bind is not None)
         self.assertTrue(bind['deleted'])
 
+    def test_bind_consumers(self):
+        # Setup
+        self.populate()
+        manager = factory.consumer_bind_manager()
+        manager.bind(self.CONSUMER_ID, self.REPO_ID, self.DISTRIBUTOR_ID, False, {})
+        manager.mark_deleted(self.CONSUMER_ID, self.REPO_ID, self.DISTRIBUTOR_ID)
+        # Test
+        consumer_ids = self.ALL_CONSUMERS + ['missing']
+        binds, missing = manager.bind_consumers(consumer_ids, self.REPO_ID, self.DISTRIBUTOR_ID,
+                                                self.NOTIFY_AGENT, self.BINDING_CONFIG)
+        # Verify
+        self.assertEqual(missing, ['missing'])
+        self.assertEqual(sorted(b['consumer_id'] for b in binds), sorted(self.ALL_CONSUMERS))
+        for bind in Bind.get_collection().find():
+            self.assertEqual(bind['notify_agent'], self.NOTIFY_AGENT)
+            self.assertEqual(bind['binding_config'], self.BINDING_CONFIG)
+            self.assertFalse(bind['deleted'])
+
+    def test_bind_consumers_invalid_distributor(self):
+        # Setup
+        self.populate()
+        # Test
+        manager = factory.consumer_bind_manager()
+        self.assertRaises(InvalidValue, manager.bind_consumers, self.ALL_CONSUMERS,
+                          self.REPO_ID, 'missing', self.NOTIFY_AGENT, self.BINDING_CONFIG)
+        self.assertEqual(Bind.get_collection().find().count(), 0)
+
+    def test_unbind_consumers(self):
+        # Setup
+        self.populate()
+        manager = factory.consumer_bind_manager()
+        manager.bind(self.CONSUMER_ID, self.REPO_ID, self.DISTRIBUTOR_ID,
+                     True, self.BINDING_CONFIG)
+        manager.bind(self.EXTRA_CONSUMER_1, self.REPO_ID, self.DISTRIBUTOR_ID,
+                     False, self.BINDING_CONFIG)
+        # Test
+        binds, unbound = manager.unbind_consumers(
+            self.ALL_CONSUMERS, self.REPO_ID, self.DISTRIBUTOR_ID)
+        # Verify
+        self.assertEqual(unbound, [self.EXTRA_CONSUMER_2])
+        self.assertEqual([b['consumer_id'] for b in binds], [self.CONSUMER_ID])
+        collection = Bind.get_collection()
+        # the binding that notifies the agent waits for the agent
+        bind = collection.find_one(self.QUERY)
+        self.assertTrue(bind['deleted'])
+        # the other one is gone
+        self.assertEqual(collection.find().count(), 1)
+
+    def test_unbind_by_repo(self):
+        # Setup
+        self.populate()
+        manager = factory.consumer_bind_manager()
+        manager.bind(self.CONSUMER_ID, self.REPO_ID, self.DISTRIBUTOR_ID,
+                     True, self.BINDING_CONFIG)
+        manager.bind(self.EXTRA_CONSUMER_1, self.REPO_ID, self.DISTRIBUTOR_ID,
+                     False, self.BINDING_CONFIG)
+        # Test
+        bindings = manager.unbind_by_repo(self.REPO_ID)
+        # Verify
+        self.assertEqual(bindings, [self.QUERY])
+        collection = Bind.get_collection()
+        bind = collection.find_one(self.QUERY)
+        self.assertTrue(bind['deleted'])
+        self.assertEqual(collection.find().count(), 1)
+
     def test_get_bind(self):
         # Setup
         self.populate()
@@ -396,6 +461,30 @@ class BindManagerTests(base.PulpServerTests):
         actions = bind['consumer_actions']
         self.assertEqual(len(actions), 2)
 
+    def test_bind_actions_pending_and_withdrawn(self):
+        # Setup
+        self.populate()
+        manager = factory.consumer_bind_manager()
+        manager.bind(self.CONSUMER_ID, self.REPO_ID, self.DISTRIBUTOR_ID,
+                     self.NOTIFY_AGENT, self.BINDING_CONFIG)
+        # Test
+        manager.actions_pending(
+            [self.CONSUMER_ID, 'not-bound'],
+            self.REPO_ID,
+            self.DISTRIBUTOR_ID,
+            Bind.Action.BIND,
+            self.ACTION_IDS[0])
+        bind = manager.get_bind(self.CONSUMER_ID, self.REPO_ID, self.DISTRIBUTOR_ID)
+        actions = bind['consumer_actions']
+        self.assertEqual(len(actions), 1)
+        self.assertEqual(actions[0]['id'], self.ACTION_IDS[0])
+        self.assertEqual(actions[0]['action'], Bind.Action.BIND)
+        self.assertEqual(actions[0]['status'], Bind.Status.PENDING)
+        manager.actions_withdrawn(
+            [self.CONSUMER_ID], self.REPO_ID, self.DISTRIBUTOR_ID, self.ACTION_IDS[0])
+        bind = manager.get_bind(self.CONSUMER_ID, self.REPO_ID, self.DISTRIBUTOR_ID)
+        self.assertEqual(bind['consumer_actions'], [])
+
     def test_mark_deleted(self):
         # Setup
         self.populate()
@@ -13,18 +13,18 @@
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 #
 
+import itertools
 import logging
+import time
 import unittest
 
+import mock
+
 from pulp.server.managers import factory as manager_factory
-from pulp.server.managers.auth.cert.cert_generator import SerialNumber, _make_priv_key
+from pulp.server.managers.auth.cert.cert_generator import KeyPool, _make_priv_key
 
 manager_factory.initialize()
 
-SerialNumber.PATH = '/tmp/sn.dat'
-sn = SerialNumber()
-sn.reset()
-
 
 # The following cert was signed by a non-pulp CA
 INVALID_CERT = '''
@@ -66,6 +66,11 @@ class TestCertGeneration(unittest.TestCase):
     def setUp(self):
         super(TestCertGeneration, self).setUp()
         self.cert_gen_manager = manager_factory.cert_generation_manager()
+        # serial numbers come from the database
+        patcher = mock.patch('pulp.server.db.model.auth.CertificateSerialNumber.next',
+                             side_effect=itertools.count(1).next)
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
     def test_priv_key(self):
         # Test
@@ -101,6 +106,76 @@ class TestCertGeneration(unittest.TestCase):
         invalid_result = self.cert_gen_manager.verify_cert(INVALID_CERT)
         self.assertTrue(not invalid_result)
 
+
+class TestKeyPool(unittest.TestCase):
+    def setUp(self):
+        super(TestKeyPool, self).setUp()
+        self.keys = itertools.count(1)
+        patcher = mock.patch('pulp.server.managers.auth.cert.cert_generator._make_priv_key',
+                             side_effect=lambda: 'key-%d' % self.keys.next())
+        self.mock_make_key = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _wait_for_refill(self, pool):
+        for i in range(100):
+            with pool._lock:
+                if not pool._refilling:
+                    return
+            time.sleep(.01)
+        self.fail('pool was not refilled')
+
+    def test_get_empty_pool(self):
+        pool = KeyPool(size=3)
+
+        self.assertEqual(pool.get(), 'key-1')
+        self._wait_for_refill(pool)
+
+        self.assertEqual(pool._keys.qsize(), 3)
+        self.assertEqual(self.mock_make_key.call_count, 4)
+
+    def test_get_from_pool(self):
+        pool = KeyPool(size=3)
+        pool.get()
+        self._wait_for_refill(pool)
+
+        keys = [pool.get(), pool.get()]
+        self._wait_for_refill(pool)
+
+        self.assertEqual(keys, ['key-2', 'key-3'])
+        self.assertEqual(pool._keys.qsize(), 3)
+        # keys are never handed out twice
+        self.assertEqual(len(set(keys + list(pool._keys.queue))), 5)
+
+    def test_refill_error(self):
+        pool = KeyPool(size=3)
+        self.mock_make_key.side_effect = ['key-1', Exception('openssl failed')]
+
+        self.assertEqual(pool.get(), 'key-1')
+        self._wait_for_refill(pool)
+
+        self.assertEqual(pool._keys.qsize(), 0)
+
+    def test_size_zero(self):
+        pool = KeyPool(size=0)
+
+        self.assertEqual(pool.get(), 'key-1')
+
+        self.assertFalse(pool._refilling)
+
+    @mock.patch('pulp.server.managers.auth.cert.cert_generator.os.getpid')
+    def test_forked(self, mock_getpid):
+        mock_getpid.return_value = 1
+        pool = KeyPool(size=3)
+        pool.get()
+        self._wait_for_refill(pool)
+
+        mock_getpid.return_value = 2
+        key = pool.get()
+
+        # the child does not use the keys generated by its parent
+        self.assertEqual(key, 'key-5')
+
+
 if __name__ == '__main__':
     logging.root.addHandler(logging.StreamHandler())
     logging.root.setLevel(logging.INFO)
@@ -350,6 +350,58 @@ class ConsumerHistoryManagerTests(base.PulpServerTests):
         self.assertEqual(entry['type'], history_manager.TYPE_CONSUMER_REGISTERED)
         self.assertTrue(entry['timestamp'] is not None)
 
+    def test_record_event_missing_consumer(self):
+        self.assertRaises(exceptions.MissingResource, self.history_manager.record_event,
+                          'missing', history_manager.TYPE_REPO_BOUND)
+
+    def test_record_event_skip_consumer_check(self):
+        self.history_manager.record_event('unchecked', history_manager.TYPE_REPO_BOUND,
+                                          check_consumer=False)
+
+        entries = self.history_manager.query(consumer_id='unchecked')
+        self.assertEqual(1, len(entries))
+
+    def _record(self, consumer_id, timestamps):
+        collection = ConsumerHistoryEvent.get_collection()
+        for timestamp in timestamps:
+            event = ConsumerHistoryEvent(consumer_id, 'admin',
+                                         history_manager.TYPE_REPO_BOUND, None)
+            event['timestamp'] = timestamp
+            collection.insert(event, safe=True)
+
+    def test_query_pages(self):
+        # two events share a timestamp, so the pages have to be split by _id as well
+        timestamps = ['2014-01-01T00:00:00Z', '2014-01-02T00:00:00Z', '2014-01-02T00:00:00Z',
+                      '2014-01-03T00:00:00Z', '2014-01-04T00:00:00Z']
+        self._record('abc', timestamps)
+        self._record('other', timestamps)
+
+        for sort in (history_manager.SORT_ASCENDING, history_manager.SORT_DESCENDING):
+            expected = self.history_manager.query(consumer_id='abc', sort=sort)
+            pages = []
+            after = None
+            while True:
+                page = self.history_manager.query(consumer_id='abc', sort=sort, limit=2,
+                                                  after=after)
+                if not page:
+                    break
+                pages.append(page)
+                after = str(page[-1]['_id'])
+
+            self.assertEqual([len(p) for p in pages], [2, 2, 1])
+            self.assertEqual([e['_id'] for p in pages for e in p], [e['_id'] for e in expected])
+        self.assertEqual([e['timestamp'] for e in expected], sorted(timestamps, reverse=True))
+
+    def test_query_after_invalid(self):
+        self._record('abc', ['2014-01-01T00:00:00Z'])
+
+        for after in ('not-an-id', '0123456789abcdef01234567'):
+            try:
+                self.history_manager.query(after=after)
+                self.fail('Invalid marker did not raise an exception')
+            except exceptions.InvalidValue, e:
+                self.assertEqual(e.property_names, ['after'])
+
 
 class UtilityMethodsTests(base.PulpServerTests):
 
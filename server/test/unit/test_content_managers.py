@@ -74,6 +74,8 @@ class PulpContentCUDTests(PulpContentTests):
         units = self.query_manager.list_content_units(TYPE_1_DEF.id)
         self.assertEqual(len(units), 1)
         self.assertTrue('_last_updated' in units[0])
+        self.assertEqual(units[0][database.UNIT_KEY_DIGEST],
+                         database.unit_key_digest({'key-1': TYPE_1_UNITS[0]['key-1']}))
 
     def test_update_content_unit(self):
         unit_id = self.cud_manager.add_content_unit(TYPE_1_DEF.id, None, TYPE_1_UNITS[0])
@@ -84,6 +86,13 @@ class PulpContentCUDTests(PulpContentTests):
         self.assertTrue(unit['search-1'] == 'two')
         self.assertTrue('_last_updated' in unit)
 
+    def test_update_content_unit_key(self):
+        unit_id = self.cud_manager.add_content_unit(TYPE_2_DEF.id, None, TYPE_2_UNITS[0])
+        self.cud_manager.update_content_unit(TYPE_2_DEF.id, unit_id, {'key-2b': 'Z'})
+        unit = self.query_manager.get_content_unit_by_id(TYPE_2_DEF.id, unit_id)
+        self.assertEqual(unit[database.UNIT_KEY_DIGEST],
+                         database.unit_key_digest({'key-2a': 'A', 'key-2b': 'Z'}))
+
     def test_delete_content_unit(self):
         unit_id = self.cud_manager.add_content_unit(TYPE_1_DEF.id, None, TYPE_1_UNITS[0])
         units = self.query_manager.list_content_units(TYPE_1_DEF.id)
@@ -92,6 +101,16 @@ class PulpContentCUDTests(PulpContentTests):
         units = self.query_manager.list_content_units(TYPE_1_DEF.id)
         self.assertEqual(len(units), 0)
 
+    @mock.patch('pulp.server.managers.content.cud.ContentChecksum')
+    def test_delete_content_unit_removes_cached_checksums(self, mock_content_checksum):
+        metadata = dict(TYPE_1_UNITS[0], _storage_path='/var/lib/pulp/content/type-1/a')
+        unit_id = self.cud_manager.add_content_unit(TYPE_1_DEF.id, None, metadata)
+
+        self.cud_manager.remove_content_unit(TYPE_1_DEF.id, unit_id)
+
+        mock_content_checksum.remove_checksums.assert_called_once_with(
+            '/var/lib/pulp/content/type-1/a')
+
     def test_link_child_unit(self):
         parent_id = self.cud_manager.add_content_unit(TYPE_2_DEF.id, None, TYPE_2_UNITS[0])
         child_id = self.cud_manager.add_content_unit(TYPE_1_DEF.id, None, TYPE_1_UNITS[0])
@@ -109,6 +128,46 @@ class PulpContentCUDTests(PulpContentTests):
         parent = self.query_manager.get_content_unit_by_id(TYPE_2_DEF.id, parent_id)
         self.assertEqual(len(parent['_%s_references' % TYPE_1_DEF.id]), 0)
 
+
+@mock.patch('pulp.plugins.types.database.type_units_unit_key', return_value=['a', 'b'])
+@mock.patch('pulp.plugins.types.database.type_units_collection')
+class TestContentManagerUnitKeyDigest(unittest.TestCase):
+
+    def test_add(self, mock_type_collection, mock_type_unit_key):
+        ContentManager().add_content_unit('fake_type', 'u1', {'a': 'x', 'b': '1', 'c': 'y'})
+
+        unit_doc = mock_type_collection.return_value.insert.call_args[0][0]
+        self.assertEqual(unit_doc[database.UNIT_KEY_DIGEST],
+                         database.unit_key_digest({'a': 'x', 'b': '1'}))
+
+    def test_update_not_key(self, mock_type_collection, mock_type_unit_key):
+        ContentManager().update_content_unit('fake_type', 'u1', {'c': 'y',
+                                                                 database.UNIT_KEY_DIGEST: 'old'})
+
+        delta = mock_type_collection.return_value.update.call_args[0][1]['$set']
+        self.assertFalse(database.UNIT_KEY_DIGEST in delta)
+        self.assertFalse(mock_type_collection.return_value.find_one.called)
+
+    def test_update_whole_key(self, mock_type_collection, mock_type_unit_key):
+        ContentManager().update_content_unit('fake_type', 'u1', {'a': 'x', 'b': '2'})
+
+        delta = mock_type_collection.return_value.update.call_args[0][1]['$set']
+        self.assertEqual(delta[database.UNIT_KEY_DIGEST],
+                         database.unit_key_digest({'a': 'x', 'b': '2'}))
+        self.assertFalse(mock_type_collection.return_value.find_one.called)
+
+    def test_update_part_of_key(self, mock_type_collection, mock_type_unit_key):
+        mock_type_collection.return_value.find_one.return_value = {'_id': 'u1', 'a': 'x',
+                                                                   'b': '1'}
+
+        ContentManager().update_content_unit('fake_type', 'u1', {'b': '2'})
+
+        mock_type_collection.return_value.find_one.assert_called_once_with(
+            {'_id': 'u1'}, fields=['a', 'b'])
+        delta = mock_type_collection.return_value.update.call_args[0][1]['$set']
+        self.assertEqual(delta[database.UNIT_KEY_DIGEST],
+                         database.unit_key_digest({'a': 'x', 'b': '2'}))
+
 # query unit tests -------------------------------------------------------------
 
 class PulpContentQueryTests(PulpContentTests):
@@ -178,14 +237,104 @@ class PulpContentQueryTests(PulpContentTests):
         units = self.query_manager.get_multiple_units_by_keys_dicts(TYPE_2_DEF.id, key_dicts)
         self.assertEqual(len(units), len(self.type_2_ids))
 
-    def __test_keys_dicts_query(self):
-        # XXX this test proves my multi-dict query wrong, need to fix it
+    def test_keys_dicts_query(self):
         new_unit = {'key-2a': 'B', 'key-2b': 'B'}
-        unit_id = self.cud_manager.add_content_unit(TYPE_2_DEF.id, None, new_unit)
+        self.cud_manager.add_content_unit(TYPE_2_DEF.id, None, new_unit)
         keys_dicts = TYPE_2_UNITS[1:3]
         units = self.query_manager.get_multiple_units_by_keys_dicts(TYPE_2_DEF.id, keys_dicts)
         self.assertEqual(len(units), 2)
 
+    def test_find_by_keys_dicts(self):
+        keys_dicts = TYPE_2_UNITS[1:3]
+        units = self.query_manager.find_units_by_keys_dicts(TYPE_2_DEF.id, keys_dicts,
+                                                            ['key-2a', 'key-2b'])
+        self.assertTrue(inspect.isgenerator(units))
+        found = sorted((u['key-2a'], u['key-2b']) for u in units)
+        self.assertEqual(found, [('A', 'B'), ('B', 'A')])
+
+    def test_find_by_keys_dicts_invalid(self):
+        units = self.query_manager.find_units_by_keys_dicts(TYPE_2_DEF.id, [{'key-2a': 'A'}])
+        self.assertRaises(ValueError, list, units)
+
+
+@mock.patch('pulp.plugins.types.database.type_units_unit_key', return_value=['a', 'b'])
+@mock.patch('pulp.plugins.types.database.type_units_collection')
+class TestFindUnitsByKeysDicts(unittest.TestCase):
+
+    @staticmethod
+    def _unit(keys_dict, **fields):
+        unit = dict(keys_dict, **fields)
+        unit[database.UNIT_KEY_DIGEST] = database.unit_key_digest(keys_dict)
+        return unit
+
+    def test_digest_spec(self, mock_type_collection, mock_type_unit_key):
+        mock_find = mock_type_collection.return_value.find
+        keys_dicts = [{'a': 'x', 'b': '1'}, {'b': '2', 'a': 'x'}]
+        mock_find.return_value = [self._unit(k) for k in keys_dicts]
+
+        list(ContentQueryManager().find_units_by_keys_dicts('fake_type', keys_dicts))
+
+        digests = [database.unit_key_digest({'a': 'x', 'b': '1'}),
+                   database.unit_key_digest({'a': 'x', 'b': '2'})]
+        expected_spec = {database.UNIT_KEY_DIGEST: {'$in': digests}}
+        mock_find.assert_called_once_with(expected_spec, fields=None)
+
+    @mock.patch('pulp.server.managers.content.query.UNIT_KEYS_QUERY_CHUNK_SIZE', 2)
+    def test_chunks(self, mock_type_collection, mock_type_unit_key):
+        mock_find = mock_type_collection.return_value.find
+        keys_dicts = [{'a': 'x', 'b': str(i)} for i in range(3)]
+        found = [self._unit(k, _id=i) for i, k in enumerate(keys_dicts)]
+        mock_find.side_effect = [found[:2], found[2:]]
+
+        units = ContentQueryManager().find_units_by_keys_dicts('fake_type', keys_dicts, ['_id'])
+
+        self.assertEqual(list(units), found)
+        specs = [c[0][0] for c in mock_find.call_args_list]
+        digests = [database.unit_key_digest(k) for k in keys_dicts]
+        self.assertEqual(specs, [{database.UNIT_KEY_DIGEST: {'$in': digests[:2]}},
+                                 {database.UNIT_KEY_DIGEST: {'$in': digests[2:]}}])
+        for call in mock_find.call_args_list:
+            self.assertEqual(call[1], {'fields': ['_id']})
+
+    def test_duplicate_keys(self, mock_type_collection, mock_type_unit_key):
+        mock_find = mock_type_collection.return_value.find
+        keys_dicts = [{'a': 'x', 'b': '1'}, {'a': 'x', 'b': '1'}]
+        mock_find.return_value = [self._unit(keys_dicts[0])]
+
+        list(ContentQueryManager().find_units_by_keys_dicts('fake_type', keys_dicts))
+
+        digest = database.unit_key_digest(keys_dicts[0])
+        expected_spec = {database.UNIT_KEY_DIGEST: {'$in': [digest]}}
+        mock_find.assert_called_once_with(expected_spec, fields=None)
+
+    def test_not_found(self, mock_type_collection, mock_type_unit_key):
+        mock_find = mock_type_collection.return_value.find
+        keys_dicts = [{'a': 'x', 'b': '1'}, {'a': 'x', 'b': '2'}]
+        mock_find.return_value = [self._unit(keys_dicts[0])]
+
+        units = ContentQueryManager().find_units_by_keys_dicts('fake_type', keys_dicts)
+
+        # keys dicts that are not found cost no further queries
+        self.assertEqual([u['b'] for u in units], ['1'])
+        self.assertEqual(mock_find.call_count, 1)
+
+    def test_empty_unit_key(self, mock_type_collection, mock_type_unit_key):
+        mock_type_unit_key.return_value = []
+        mock_find = mock_type_collection.return_value.find
+        mock_find.return_value = [{'_id': 1}]
+
+        units = ContentQueryManager().find_units_by_keys_dicts('fake_type', [{}], ['_id'])
+
+        # every unit matches an empty keys dictionary
+        self.assertEqual(list(units), [{'_id': 1}])
+        mock_find.assert_called_once_with({}, fields=['_id'])
+
+    def test_no_keys(self, mock_type_collection, mock_type_unit_key):
+        units = ContentQueryManager().find_units_by_keys_dicts('fake_type', [])
+
+        self.assertEqual(list(units), [])
+        self.assertFalse(mock_type_collection.return_value.find.called)
+
 
 @mock.patch('pulp.plugins.types.database.type_units_unit_key', return_value=['a'])
 @mock.patch('pulp.plugins.types.database.type_units_collection')
@@ -202,7 +351,10 @@ class TestGetContentUnitIDs(unittest.TestCase):
         self.assertTrue(inspect.isgenerator(ret))
 
     def test_returns_ids(self, mock_type_collection, mock_type_unit_key):
-        mock_type_collection.return_value.find.return_value = [{'_id': 'abc'}, {'_id': 'def'}]
+        digests = [database.unit_key_digest({'a': 'foo'}), database.unit_key_digest({'a': 'bar'})]
+        mock_type_collection.return_value.find.return_value = [
+            {'_id': 'abc', database.UNIT_KEY_DIGEST: digests[0]},
+            {'_id': 'def', database.UNIT_KEY_DIGEST: digests[1]}]
 
         ret = self.manager.get_content_unit_ids('fake_type', [{'a': 'foo'}, {'a': 'bar'}])
 
@@ -210,11 +362,13 @@ class TestGetContentUnitIDs(unittest.TestCase):
 
     def test_calls_find(self, mock_type_collection, mock_type_unit_key):
         mock_find = mock_type_collection.return_value.find
-        mock_find.return_value = [{'_id': 'abc'}, {'_id': 'def'}]
+        digests = [database.unit_key_digest({'a': 'foo'}), database.unit_key_digest({'a': 'bar'})]
+        mock_find.return_value = [{'_id': 'abc', database.UNIT_KEY_DIGEST: digests[0]},
+                                  {'_id': 'def', database.UNIT_KEY_DIGEST: digests[1]}]
 
         ret = self.manager.get_content_unit_ids('fake_type', [{'a': 'foo'}, {'a': 'bar'}])
 
         # evaluate the generator so the code actually runs
         list(ret)
-        expected_spec = {'a': {'$in': ['foo', 'bar']}}
+        expected_spec = {database.UNIT_KEY_DIGEST: {'$in': digests}}
         mock_find.assert_called_once_with(expected_spec, fields=['_id'])
@@ -291,6 +291,11 @@ class OrphanManagerGeneratorTests(OrphanManagerTests):
 
 class TestDelete(TestCase):
 
+    def setUp(self):
+        patcher = patch('pulp.server.managers.content.orphan.ContentChecksum')
+        self.content_checksum = patcher.start()
+        self.addCleanup(patcher.stop)
+
     @patch('shutil.rmtree')
     @patch('os.unlink')
     @patch('os.path.islink')
@@ -356,6 +361,18 @@ class TestDelete(TestCase):
         # validation
         self.assertTrue(log_error.called)
 
+    @patch('os.unlink')
+    @patch('os.path.isfile')
+    def test_delete_removes_cached_checksums(self, is_file, unlink):
+        path = '/var/lib/pulp/content/rpm/path-1'
+        is_file.return_value = True
+
+        # test
+        OrphanManager.delete(path)
+
+        # validation
+        self.content_checksum.remove_checksums.assert_called_once_with(path)
+
 
 class TestIsShared(TestCase):
 
@@ -14,10 +14,11 @@
 import base
 import mock
 
-from pulp.server.db.model.event import EventListener
+from pulp.server.db.model.event import EventListener, EventListenerGeneration
 from pulp.server.event import notifiers
 from pulp.server.event import data as event_data
 from pulp.server.managers import factory as manager_factory
+from pulp.server.managers.event import fire
 
 
 class EventFireManagerTests(base.PulpServerTests):
@@ -32,6 +33,7 @@ class EventFireManagerTests(base.PulpServerTests):
         super(EventFireManagerTests, self).tearDown()
 
         EventListener.get_collection().remove()
+        fire.listener_cache.invalidate()
         notifiers.reset()
 
     # -- plumbing tests -------------------------------------------------------
@@ -117,6 +119,69 @@ class EventFireManagerTests(base.PulpServerTests):
         self.assertEqual({'2' : '2'}, notifier_2.fire.call_args[0][0])
         self.assertEqual(event, notifier_2.fire.call_args[0][1])
 
+    def test_do_fire_listeners_cached(self):
+        # Setup
+        notifiers.NOTIFIER_FUNCTIONS.clear()
+
+        notifier_1 = mock.Mock()
+
+        notifiers.NOTIFIER_FUNCTIONS['notifier_1'] = notifier_1.fire
+
+        self.event_manager.create('notifier_1', {}, ['*', event_data.TYPE_REPO_SYNC_STARTED])
+        event = event_data.Event(event_data.TYPE_REPO_SYNC_STARTED, 'payload')
+        self.manager._do_fire(event)
+
+        # Test
+        with mock.patch.object(EventListener, 'get_collection') as mock_get_collection:
+            self.manager._do_fire(event)
+
+        # Verify
+        self.assertFalse(mock_get_collection.called)
+        self.assertEqual(2, notifier_1.fire.call_count)
+
+    def test_do_fire_listener_changes(self):
+        # Setup
+        notifiers.NOTIFIER_FUNCTIONS.clear()
+
+        notifier_1 = mock.Mock()
+
+        notifiers.NOTIFIER_FUNCTIONS['notifier_1'] = notifier_1.fire
+
+        listener = self.event_manager.create('notifier_1', {}, [event_data.TYPE_REPO_SYNC_STARTED])
+        event = event_data.Event(event_data.TYPE_REPO_SYNC_FINISHED, 'payload')
+        self.manager._do_fire(event)
+
+        # Test
+        self.event_manager.update(listener['_id'], event_types=[event_data.TYPE_REPO_SYNC_FINISHED])
+        self.manager._do_fire(event)
+
+        self.event_manager.delete(listener['_id'])
+        self.manager._do_fire(event)
+
+        # Verify
+        self.assertEqual(1, notifier_1.fire.call_count)
+
+    def test_do_fire_listener_changed_elsewhere(self):
+        # Setup
+        notifiers.NOTIFIER_FUNCTIONS.clear()
+
+        notifier_1 = mock.Mock()
+
+        notifiers.NOTIFIER_FUNCTIONS['notifier_1'] = notifier_1.fire
+
+        event = event_data.Event(event_data.TYPE_REPO_SYNC_STARTED, 'payload')
+        self.manager._do_fire(event)
+
+        # Test
+        # another process adds a listener, which does not touch this process' copy
+        listener = EventListener('notifier_1', {}, [event_data.TYPE_REPO_SYNC_STARTED])
+        EventListener.get_collection().save(listener, safe=True)
+        EventListenerGeneration.increment()
+        self.manager._do_fire(event)
+
+        # Verify
+        self.assertEqual(1, notifier_1.fire.call_count)
+
     # -- event format tests ---------------------------------------------------
 
     def test_fire_repo_sync_started(self):
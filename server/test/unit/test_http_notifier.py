@@ -28,6 +28,13 @@ import base
 
 class TestHTTPNotifierTests(base.PulpServerTests):
 
+    def setUp(self):
+        super(TestHTTPNotifierTests, self).setUp()
+        # don't share delivery threads, and the connections they hold, between tests
+        patcher = mock.patch('pulp.server.event.http.dispatcher', http.Dispatcher())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
     @mock.patch('pulp.server.event.http._create_connection')
     def test_handle_event(self, mock_create):
         # Setup
@@ -19,8 +19,8 @@ import pymongo
 from mock import patch
 
 from pulp.plugins.profiler import Profiler
-from pulp.server.db.model.consumer import Consumer, UnitProfile
-from pulp.server.exceptions import MissingResource
+from pulp.server.db.model.consumer import Consumer, ReportedUnitProfile, UnitProfile
+from pulp.server.exceptions import InvalidValue, MissingResource, PulpCodedConflictException
 from pulp.server.managers import factory
 from pulp.server.managers.consumer.cud import ConsumerManager
 from pulp.server.managers.consumer.profile import ProfileManager
@@ -40,12 +40,14 @@ class ProfileManagerTests(base.PulpServerTests):
         super(ProfileManagerTests, self).setUp()
         Consumer.get_collection().remove()
         UnitProfile.get_collection().remove()
+        ReportedUnitProfile.get_collection().remove()
         mock_plugins.install()
 
     def tearDown(self):
         super(ProfileManagerTests, self).tearDown()
         Consumer.get_collection().remove()
         UnitProfile.get_collection().remove()
+        ReportedUnitProfile.get_collection().remove()
         mock_plugins.reset()
 
     def populate(self):
@@ -144,6 +146,99 @@ class ProfileManagerTests(base.PulpServerTests):
         expected_hash = UnitProfile.calculate_hash(self.PROFILE_2)
         self.assertEqual(profiles[0]['profile_hash'], expected_hash)
 
+    def test_update_unchanged(self):
+        # Setup
+        self.populate()
+        manager = factory.consumer_profile_manager()
+        manager.update(self.CONSUMER_ID, self.TYPE_1, self.PROFILE_1)
+        # Test
+        with mock.patch.object(UnitProfile.get_collection(), 'save') as mock_save:
+            profile = manager.update(self.CONSUMER_ID, self.TYPE_1, self.PROFILE_1)
+        # Verify
+        self.assertFalse(mock_save.called)
+        self.assertEquals(profile['profile'], self.PROFILE_1)
+
+    def test_confirm(self):
+        # Setup
+        self.populate()
+        manager = factory.consumer_profile_manager()
+        manager.update(self.CONSUMER_ID, self.TYPE_1, self.PROFILE_1)
+        profile_hash = UnitProfile.calculate_hash(self.PROFILE_1)
+        # Test
+        profile = manager.confirm(self.CONSUMER_ID, self.TYPE_1, profile_hash)
+        # Verify
+        self.assertEquals(profile['profile_hash'], profile_hash)
+        self.assertFalse('profile' in profile)
+
+    def test_confirm_mismatch(self):
+        # Setup
+        self.populate()
+        manager = factory.consumer_profile_manager()
+        manager.update(self.CONSUMER_ID, self.TYPE_1, self.PROFILE_1)
+        # Test
+        self.assertRaises(PulpCodedConflictException, manager.confirm,
+                          self.CONSUMER_ID, self.TYPE_1, 'stale')
+        self.assertRaises(PulpCodedConflictException, manager.confirm,
+                          self.CONSUMER_ID, self.TYPE_2, 'stale')
+
+    def test_update_delta(self):
+        # Setup
+        self.populate()
+        manager = factory.consumer_profile_manager()
+        manager.update(self.CONSUMER_ID, self.TYPE_1, [self.PROFILE_1, self.PROFILE_3])
+        profile_hash = UnitProfile.calculate_hash([self.PROFILE_1, self.PROFILE_3])
+        delta = {'added': [self.PROFILE_2], 'removed': [self.PROFILE_1]}
+        # Test
+        summary = manager.update_delta(self.CONSUMER_ID, self.TYPE_1, profile_hash, delta)
+        # Verify
+        profile = manager.get_profile(self.CONSUMER_ID, self.TYPE_1)
+        self.assertEquals(profile['profile'], [self.PROFILE_3, self.PROFILE_2])
+        expected_hash = UnitProfile.calculate_hash([self.PROFILE_3, self.PROFILE_2])
+        self.assertEquals(profile['profile_hash'], expected_hash)
+        self.assertEquals(summary['profile_hash'], expected_hash)
+
+    def test_update_delta_translated(self):
+        # Setup
+        def translate(consumer, content_type, profile, config):
+            return [dict(p, version=p['version'] + '-t') for p in profile]
+        mock_plugins.MOCK_PROFILER.update_profile.side_effect = translate
+        self.populate()
+        manager = factory.consumer_profile_manager()
+        package = {'name': 'bash', 'version': '4.0'}
+        manager.update(self.CONSUMER_ID, self.TYPE_1, [self.PROFILE_1, package])
+        profile_hash = manager.get_profile(self.CONSUMER_ID, self.TYPE_1)['profile_hash']
+        delta = {'added': [self.PROFILE_2], 'removed': [self.PROFILE_1]}
+        # Test
+        summary = manager.update_delta(self.CONSUMER_ID, self.TYPE_1, profile_hash, delta)
+        # Verify
+        # the delta applied to the reported profile, which was translated once
+        self.assertEqual(mock_plugins.MOCK_PROFILER.update_profile.call_args[0][2],
+                         [package, self.PROFILE_2])
+        expected = [{'name': 'bash', 'version': '4.0-t'}, {'name': 'zsh', 'version': '2.0-t'}]
+        profile = manager.get_profile(self.CONSUMER_ID, self.TYPE_1)
+        self.assertEquals(profile['profile'], expected)
+        self.assertEquals(summary['profile_hash'], UnitProfile.calculate_hash(expected))
+        reported = ReportedUnitProfile.get_collection().find_one()
+        self.assertEquals(reported['profile'], [package, self.PROFILE_2])
+        self.assertEquals(reported['profile_hash'], summary['profile_hash'])
+        manager.delete(self.CONSUMER_ID, self.TYPE_1)
+        self.assertEquals(ReportedUnitProfile.get_collection().find().count(), 0)
+
+    def test_update_delta_conflict(self):
+        # Setup
+        self.populate()
+        manager = factory.consumer_profile_manager()
+        manager.update(self.CONSUMER_ID, self.TYPE_1, [self.PROFILE_1])
+        profile_hash = UnitProfile.calculate_hash([self.PROFILE_1])
+        # Test
+        self.assertRaises(PulpCodedConflictException, manager.update_delta,
+                          self.CONSUMER_ID, self.TYPE_1, 'stale', {'added': [self.PROFILE_2]})
+        self.assertRaises(PulpCodedConflictException, manager.update_delta,
+                          self.CONSUMER_ID, self.TYPE_1, profile_hash,
+                          {'removed': [self.PROFILE_2]})
+        self.assertRaises(InvalidValue, manager.update_delta,
+                          self.CONSUMER_ID, self.TYPE_1, profile_hash, {'added': 'x'})
+
     def test_update_calls_profiler_update_profile(self):
         """
         Assert that the update() method calls the profiler update_profile() method.
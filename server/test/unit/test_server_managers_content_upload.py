@@ -9,6 +9,7 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+import hashlib
 import os
 import shutil
 
@@ -23,6 +24,7 @@ from pulp.server.db.model.repository import Repo, RepoImporter
 from pulp.server.exceptions import (MissingResource, PulpDataException, PulpExecutionException,
                                     InvalidValue)
 from pulp.server.managers.repo.unit_association import OWNER_TYPE_USER
+from pulp.server.managers.content import upload
 import pulp.server.managers.factory as manager_factory
 
 
@@ -99,6 +101,137 @@ class ContentUploadManagerTests(base.PulpServerTests):
 
         self.assertEqual(expected_size, found_size)
 
+    def test_save_data_out_of_order(self):
+
+        # Test
+        upload_id = self.upload_manager.initialize_upload()
+
+        self.upload_manager.save_data(upload_id, 5, 'fghi')
+        self.upload_manager.save_data(upload_id, 9, 'jkl')
+        self.upload_manager.save_data(upload_id, 0, 'abcde')
+
+        # Verify
+        written = self.upload_manager.read_upload(upload_id)
+        self.assertEqual(written, 'abcdefghijkl')
+
+    def test_save_data_digests(self):
+
+        # Test
+        upload_id = self.upload_manager.initialize_upload(size=12, checksum_types=['sha256',
+                                                                                   'md5'])
+        self.upload_manager.save_data(upload_id, 0, 'abcde')
+        self.upload_manager.save_data(upload_id, 5, 'fghijkl')
+
+        # Verify
+        metadata = self.upload_manager._upload_metadata(upload_id)
+        self.assertEqual(metadata['received_ranges'], [[0, 12]])
+        checksums = self.upload_manager._uploaded_checksums(upload_id, metadata)
+        self.assertEqual(checksums, {'sha256': hashlib.sha256('abcdefghijkl').hexdigest(),
+                                     'md5': hashlib.md5('abcdefghijkl').hexdigest()})
+        # the upload is complete, so its running digests were released
+        self.assertTrue(upload_id not in upload._running_digests)
+
+    def test_save_data_digests_out_of_order(self):
+
+        # Test
+        upload_id = self.upload_manager.initialize_upload(size=12)
+        self.upload_manager.save_data(upload_id, 5, 'fghi')
+        self.upload_manager.save_data(upload_id, 9, 'jkl')
+
+        metadata = self.upload_manager._upload_metadata(upload_id)
+        self.assertEqual(metadata['received_ranges'], [[5, 12]])
+        self.assertEqual(self.upload_manager._uploaded_checksums(upload_id, metadata), {})
+
+        self.upload_manager.save_data(upload_id, 0, 'abcde')
+
+        # Verify
+        metadata = self.upload_manager._upload_metadata(upload_id)
+        self.assertEqual(metadata['received_ranges'], [[0, 12]])
+        self.assertEqual(self.upload_manager._uploaded_checksums(upload_id, metadata),
+                         {'sha256': hashlib.sha256('abcdefghijkl').hexdigest()})
+
+    def test_save_data_digests_other_process(self):
+
+        # Test
+        upload_id = self.upload_manager.initialize_upload(size=12)
+        self.upload_manager.save_data(upload_id, 0, 'abcde')
+        # the next segments are received by processes that do not hold the running digests
+        upload._running_digests.clear()
+        self.upload_manager.save_data(upload_id, 5, 'fghi')
+
+        metadata = self.upload_manager._upload_metadata(upload_id)
+        self.assertEqual(metadata['digest_offset'], 5)
+
+        upload._running_digests.clear()
+        self.upload_manager.save_data(upload_id, 9, 'jkl')
+
+        # Verify
+        # the whole file arrived, so the last process calculated the digests from the start
+        metadata = self.upload_manager._upload_metadata(upload_id)
+        self.assertEqual(self.upload_manager._uploaded_checksums(upload_id, metadata),
+                         {'sha256': hashlib.sha256('abcdefghijkl').hexdigest()})
+
+    def test_save_data_digests_other_process_no_size(self):
+
+        # Test
+        upload_id = self.upload_manager.initialize_upload()
+        self.upload_manager.save_data(upload_id, 0, 'abcde')
+        upload._running_digests.clear()
+        self.upload_manager.save_data(upload_id, 5, 'fghijkl')
+
+        # Verify
+        # without a declared size the digests stop short, and are calculated at import
+        metadata = self.upload_manager._upload_metadata(upload_id)
+        self.assertEqual(metadata['digest_offset'], 5)
+        self.assertEqual(self.upload_manager._uploaded_checksums(upload_id, metadata), {})
+
+    @mock.patch('pulp.server.managers.content.upload.MAX_RUNNING_DIGESTS', 1)
+    def test_save_data_running_digests_dropped(self):
+
+        # Test
+        first_id = self.upload_manager.initialize_upload(size=12)
+        second_id = self.upload_manager.initialize_upload(size=12)
+        self.upload_manager.save_data(first_id, 0, 'abcde')
+        self.upload_manager.save_data(second_id, 0, 'abcde')
+        self.upload_manager.save_data(first_id, 5, 'fghijkl')
+
+        # Verify
+        self.assertEqual(upload._running_digests.keys(), [second_id])
+        # the first upload's digests were dropped, so they are not offered
+        metadata = self.upload_manager._upload_metadata(first_id)
+        self.assertEqual(metadata['received_ranges'], [[0, 12]])
+        self.assertEqual(self.upload_manager._uploaded_checksums(first_id, metadata), {})
+
+        self.upload_manager.delete_upload(second_id)
+        self.assertEqual(upload._running_digests, {})
+
+    def test_initialize_upload_preallocates(self):
+
+        # Test
+        upload_id = self.upload_manager.initialize_upload(size=1024)
+
+        # Verify
+        uploaded_filename = self.upload_manager._upload_file_path(upload_id)
+        self.assertEqual(1024, os.path.getsize(uploaded_filename))
+
+    def test_initialize_upload_invalid_values(self):
+        self.assertRaises(InvalidValue, self.upload_manager.initialize_upload, size=-1)
+        self.assertRaises(InvalidValue, self.upload_manager.initialize_upload,
+                          checksum_types=['crc-not-real'])
+        self.assertRaises(InvalidValue, self.upload_manager.initialize_upload,
+                          checksum_types=['sha256', 1])
+        self.assertRaises(InvalidValue, self.upload_manager.initialize_upload,
+                          checksum_types='sha256')
+
+    def test_initialize_upload_records_checksum_types(self):
+
+        # Test
+        upload_id = self.upload_manager.initialize_upload(checksum_types=['SHA', 'md5'])
+
+        # Verify
+        metadata = self.upload_manager._upload_metadata(upload_id)
+        self.assertEqual(metadata['checksum_types'], ['sha1', 'md5'])
+
     def test_save_no_init(self):
 
         # Test
@@ -122,6 +255,7 @@ class ContentUploadManagerTests(base.PulpServerTests):
 
         # Verify
         self.assertTrue(not os.path.exists(uploaded_filename))
+        self.assertTrue(not os.path.exists(self.upload_manager._upload_metadata_path(upload_id)))
 
     def test_list_upload_ids(self):
 
@@ -204,6 +338,7 @@ class ContentUploadManagerTests(base.PulpServerTests):
         self.assertEqual(call_args[5].repo_id, 'repo-u')
         self.assertEqual(conduit.association_owner_type, OWNER_TYPE_USER)
         self.assertEqual(conduit.association_owner_id, fake_user.login)
+        self.assertEqual(conduit.get_checksum('sha256'), hashlib.sha256('').hexdigest())
 
         # Clean up
         mock_plugins.MOCK_IMPORTER.upload_unit.return_value = None
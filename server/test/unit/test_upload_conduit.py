@@ -0,0 +1,63 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from pulp.plugins.conduits.upload import UploadConduit
+
+
+class UploadConduitChecksumTests(unittest.TestCase):
+
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.working_dir, 'upload')
+        with open(self.file_path, 'w') as f:
+            f.write('Test data')
+
+    def tearDown(self):
+        shutil.rmtree(self.working_dir)
+
+    def _conduit(self, **kwargs):
+        return UploadConduit('repo-1', 'importer-1', 'user', 'admin', **kwargs)
+
+    def test_get_checksum(self):
+        conduit = self._conduit(file_path=self.file_path, checksum_types=['sha256'])
+
+        self.assertEqual(conduit.get_checksum('sha256'), hashlib.sha256('Test data').hexdigest())
+
+    @mock.patch('pulp.plugins.conduits.upload.verification.calculate_checksums')
+    def test_declared_types_read_once(self, mock_calculate):
+        mock_calculate.return_value = {'sha256': 'a', 'md5': 'b'}
+        conduit = self._conduit(file_path=self.file_path, checksum_types=['sha256', 'md5'])
+
+        self.assertEqual(conduit.get_checksum('md5'), 'b')
+        self.assertEqual(conduit.get_checksum('sha256'), 'a')
+
+        self.assertEqual(mock_calculate.call_count, 1)
+        self.assertEqual(mock_calculate.call_args[0][1], set(['sha256', 'md5']))
+
+    @mock.patch('pulp.plugins.conduits.upload.verification.calculate_checksums')
+    def test_uploaded_checksums(self, mock_calculate):
+        mock_calculate.return_value = {'md5': 'b'}
+        conduit = self._conduit(file_path=self.file_path, checksum_types=['sha256', 'md5'],
+                                checksums={'sha256': 'a'})
+
+        self.assertEqual(conduit.get_checksum('sha256'), 'a')
+        self.assertFalse(mock_calculate.called)
+
+        # only the checksum that was not calculated during the upload is read
+        self.assertEqual(conduit.get_checksum('md5'), 'b')
+        self.assertEqual(mock_calculate.call_args[0][1], set(['md5']))
+
+    def test_undeclared_type(self):
+        conduit = self._conduit(file_path=self.file_path, checksum_types=['sha256'])
+
+        self.assertEqual(conduit.get_checksum('SHA'), hashlib.sha1('Test data').hexdigest())
+
+    def test_no_file(self):
+        conduit = self._conduit()
+
+        self.assertEqual(conduit.get_checksum('sha256'), None)
@@ -27,9 +27,6 @@ class UserManagerTests(base.PulpServerTests):
     def setUp(self):
         super(UserManagerTests, self).setUp()
 
-        # Hardcoded to /var/lib/pulp, so change here to avoid permissions issues
-        self.default_sn_path = SerialNumber.PATH
-        SerialNumber.PATH = '/tmp/sn.dat'
         sn = SerialNumber()
         sn.reset()
 
@@ -39,11 +36,6 @@ class UserManagerTests(base.PulpServerTests):
         self.cert_generation_manager = manager_factory.cert_generation_manager()
 
 
-    def tearDown(self):
-        super(UserManagerTests, self).tearDown()
-
-        SerialNumber.PATH = self.default_sn_path
-
     def clean(self):
         base.PulpServerTests.clean(self)
 